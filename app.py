@@ -149,10 +149,11 @@ def create_app(server=None) -> dash.Dash:
                 id="gallery-products-store",
                 data={
                     "status": "loading",
-                    "items": [],
-                    "offset": 0,
+                    "version": None,
+                    "cursor": None,
+                    "ids": [],
                     "hasMore": False,
-                    "v": 1,
+                    "v": 2,
                 },
                 storage_type="session",
             ),
@@ -171,6 +172,8 @@ def create_app(server=None) -> dash.Dash:
                 ),
                 style={"display": "none"},
             ),
+            # SSE 接続状態（assets/enrichmentEvents.js の clientside コールバックの Output 先）
+            dcc.Store(id="enrichment-sse-status", data=None),
         ],
         className="app-root",
     )
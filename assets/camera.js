@@ -1,6 +1,105 @@
 (function () {
   const SETUP_INTERVAL_MS = 2000;
 
+  // 撮影品質の端末側チェック（services/capture_quality.py と同じ 256px・同じしきい値）
+  const QUALITY_SIZE = 256;
+  const BLUR_REJECT = 12;
+  const DARK_LEVEL = 24;
+  const BRIGHT_LEVEL = 245;
+  const EXPOSURE_REJECT_FRACTION = 0.85;
+  const BARCODE_CONTRAST_REJECT = 40;
+  const TILE_GRID = 4;
+  const QUALITY_MESSAGES = {
+    blur: '写真がブレています。ピントを合わせて撮り直してください。',
+    dark: '写真が暗すぎます。明るい場所で撮り直してください。',
+    bright: '写真が白飛びしています。光の反射を避けて撮り直してください。',
+    contrast: 'バーコードがはっきり写っていません。バーコードに近づいて撮り直してください。',
+  };
+
+  function grayscaleSample(source) {
+    const scale = Math.min(1, QUALITY_SIZE / Math.max(source.width, source.height));
+    const width = Math.max(3, Math.round(source.width * scale));
+    const height = Math.max(3, Math.round(source.height * scale));
+    const sample = document.createElement('canvas');
+    sample.width = width;
+    sample.height = height;
+    const ctx = sample.getContext('2d');
+    ctx.drawImage(source, 0, 0, width, height);
+    const rgba = ctx.getImageData(0, 0, width, height).data;
+    const gray = new Float32Array(width * height);
+    for (let i = 0; i < gray.length; i += 1) {
+      // PIL の convert("L") と同じ重み
+      gray[i] = (rgba[i * 4] * 299 + rgba[i * 4 + 1] * 587 + rgba[i * 4 + 2] * 114) / 1000;
+    }
+    return { gray, width, height };
+  }
+
+  function laplacianVariance({ gray, width, height }) {
+    let sum = 0;
+    let sumSq = 0;
+    let n = 0;
+    for (let y = 1; y < height - 1; y += 1) {
+      for (let x = 1; x < width - 1; x += 1) {
+        const i = y * width + x;
+        const lap = gray[i - width] + gray[i + width] + gray[i - 1] + gray[i + 1] - 4 * gray[i];
+        sum += lap;
+        sumSq += lap * lap;
+        n += 1;
+      }
+    }
+    return n ? sumSq / n - (sum / n) ** 2 : 0;
+  }
+
+  function barcodeContrast({ gray, width, height }) {
+    const th = Math.max(Math.floor(height / TILE_GRID), 2);
+    const tw = Math.max(Math.floor(width / TILE_GRID), 2);
+    let best = -1;
+    let bestTile = null;
+    for (let top = 0; top + th <= height; top += th) {
+      for (let left = 0; left + tw <= width; left += tw) {
+        let energy = 0;
+        const values = [];
+        for (let y = top; y < top + th; y += 1) {
+          for (let x = left; x < left + tw; x += 1) {
+            const i = y * width + x;
+            values.push(gray[i]);
+            if (x < left + tw - 1) {
+              energy += Math.abs(gray[i + 1] - gray[i]);
+            }
+          }
+        }
+        if (energy > best) {
+          best = energy;
+          bestTile = values;
+        }
+      }
+    }
+    if (!bestTile) {
+      return 0;
+    }
+    bestTile.sort((a, b) => a - b);
+    const pick = (q) => bestTile[Math.min(bestTile.length - 1, Math.floor(q * (bestTile.length - 1)))];
+    return pick(0.95) - pick(0.05);
+  }
+
+  // 弾くべき撮影なら案内文、問題なければ null（最終判定はサーバー側でも行う）
+  function captureProblem(source, isBarcode) {
+    const sample = grayscaleSample(source);
+    let dark = 0;
+    let bright = 0;
+    sample.gray.forEach((v) => {
+      if (v < DARK_LEVEL) dark += 1;
+      if (v > BRIGHT_LEVEL) bright += 1;
+    });
+    const total = sample.gray.length;
+    if (dark / total >= EXPOSURE_REJECT_FRACTION) return QUALITY_MESSAGES.dark;
+    if (bright / total >= EXPOSURE_REJECT_FRACTION) return QUALITY_MESSAGES.bright;
+    if (!isBarcode) return null;
+    if (laplacianVariance(sample) < BLUR_REJECT) return QUALITY_MESSAGES.blur;
+    if (barcodeContrast(sample) < BARCODE_CONTRAST_REJECT) return QUALITY_MESSAGES.contrast;
+    return null;
+  }
+
   function setupGroup(group, uploadId) {
     const startBtn = document.querySelector(
       `[data-camera-group="${group}"][data-camera-role="start"]`
@@ -89,6 +188,13 @@
       const context = canvas.getContext('2d');
       context.drawImage(video, 0, 0, canvas.width, canvas.height);
 
+      // 使えない撮影はアップロードせず、カメラを開いたまま撮り直してもらう
+      const problem = captureProblem(canvas, group === 'barcode');
+      if (problem) {
+        alert(problem);
+        return;
+      }
+
       canvas.toBlob(
         (blob) => {
           if (!blob) {
@@ -0,0 +1,174 @@
+// 登録ドラフトのエンリッチ進捗（画像説明・タグ生成）を SSE で受け取り registration-store に反映する。
+// io-intelligence-interval の 2 秒ポーリングの代替。接続できなければ meta.enrichment を "poll" に戻す。
+// store がサーバー側ドラフトの薄いハンドル（draft / version）のときは、本体はサーバーが既に書いているので
+// 版数と UI 項目（services/registration_drafts.py の MIRROR_FIELDS）だけを反映する。
+(function () {
+  const PATCH_EVENTS = ["lookup", "partial", "description", "tags", "error"];
+  const DRAFT_ID_RE = /^[0-9a-f]{32}$/;
+  const MIRROR_FIELDS = {
+    meta: null,
+    barcode: ["status"],
+    front_photo: ["status", "description_status"],
+    tags: ["status"],
+    color_tags: ["selected_slots"],
+  };
+
+  let source = null;
+  let sourceDraftId = null;
+  let latest = null;
+  const finished = {};
+
+  function isPlainObject(v) {
+    return v !== null && typeof v === "object" && !Array.isArray(v);
+  }
+
+  // セクション単位の差分を store に深くマージする（配列は置き換え）
+  function mergePatch(base, patch) {
+    const out = Object.assign({}, base);
+    Object.keys(patch || {}).forEach(function (key) {
+      const val = patch[key];
+      out[key] = isPlainObject(val) && isPlainObject(out[key])
+        ? mergePatch(out[key], val)
+        : val;
+    });
+    return out;
+  }
+
+  // ハンドル用: 版数と UI 項目だけを取り出す
+  function thinPatch(patch) {
+    const out = {};
+    if (patch && patch.version != null) {
+      out.version = patch.version;
+    }
+    Object.keys(MIRROR_FIELDS).forEach(function (section) {
+      const val = patch && patch[section];
+      if (!isPlainObject(val)) {
+        return;
+      }
+      const fields = MIRROR_FIELDS[section];
+      if (!fields) {
+        out[section] = val;
+        return;
+      }
+      const picked = {};
+      fields.forEach(function (field) {
+        if (Object.prototype.hasOwnProperty.call(val, field)) {
+          picked[field] = val[field];
+        }
+      });
+      if (Object.keys(picked).length) {
+        out[section] = picked;
+      }
+    });
+    return out;
+  }
+
+  function writeStore(patch) {
+    if (!latest || !window.dash_clientside || !window.dash_clientside.set_props) {
+      return;
+    }
+    latest = mergePatch(latest, latest.draft ? thinPatch(patch) : patch);
+    window.dash_clientside.set_props("registration-store", { data: latest });
+  }
+
+  function closeSource() {
+    if (source) {
+      source.close();
+    }
+    source = null;
+    sourceDraftId = null;
+  }
+
+  // SSE が使えないときはサーバー側のポーリング経路（process_tags）に処理を戻す
+  function fallbackToPoll(draftId) {
+    finished[draftId] = true;
+    closeSource();
+    const meta = (latest && latest.meta) || {};
+    if (meta.draft_id !== draftId || !latest.tags || latest.tags.status !== "loading") {
+      return;
+    }
+    const patch = {
+      meta: { enrichment: "poll" },
+      tags: { processing_lock: false },
+    };
+    const front = latest.front_photo || {};
+    if (
+      front.status === "captured" &&
+      (front.description_status === "processing" || front.description_status === "streaming")
+    ) {
+      patch.front_photo = { description_status: "pending" };
+    }
+    writeStore(patch);
+  }
+
+  function open(draftId) {
+    closeSource();
+    if (typeof window.EventSource !== "function") {
+      fallbackToPoll(draftId);
+      return;
+    }
+    const es = new EventSource("/events/enrichment/" + draftId);
+    source = es;
+    sourceDraftId = draftId;
+
+    PATCH_EVENTS.forEach(function (name) {
+      es.addEventListener(name, function (ev) {
+        if (sourceDraftId !== draftId) {
+          return;
+        }
+        try {
+          writeStore(JSON.parse(ev.data));
+        } catch (e) {
+          console.warn("enrichment event parse error", e);
+        }
+      });
+    });
+    es.addEventListener("done", function () {
+      if (sourceDraftId !== draftId) {
+        return;
+      }
+      // ジョブが結果を返さずに終わった場合はポーリングで仕上げる
+      if (latest && latest.tags && latest.tags.status === "loading") {
+        fallbackToPoll(draftId);
+        return;
+      }
+      finished[draftId] = true;
+      closeSource();
+    });
+    es.onerror = function () {
+      // 一時的な切断はブラウザが Last-Event-ID 付きで自動再接続する。CLOSED（404 等）のみ諦める
+      if (es.readyState === EventSource.CLOSED && sourceDraftId === draftId) {
+        fallbackToPoll(draftId);
+      }
+    };
+  }
+
+  window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    enrichment: {
+      connect: function (storeData) {
+        const noUpdate = window.dash_clientside.no_update;
+        latest = storeData || null;
+        const meta = (storeData && storeData.meta) || {};
+        const draftId = meta.draft_id;
+        const loading = !!(storeData && storeData.tags && storeData.tags.status === "loading");
+
+        if (meta.enrichment !== "push" || !draftId || !DRAFT_ID_RE.test(draftId)) {
+          if (source) {
+            closeSource();
+            return "idle";
+          }
+          return noUpdate;
+        }
+        if (sourceDraftId === draftId || finished[draftId]) {
+          return noUpdate;
+        }
+        if (!loading) {
+          closeSource();
+          return "idle";
+        }
+        open(draftId);
+        return "open:" + draftId;
+      },
+    },
+  });
+})();
@@ -0,0 +1,193 @@
+// ギャラリーの絞り込み（テキスト・カラータグ）をブラウザ内で行う。
+// 読み込み済みカードのデータ（gallery-cards の search / slots）から 2-gram の索引を作り、
+// 入力 1 文字ごと・色スウォッチのクリックごとに一致するカードを返す（サーバー往復なし）。
+// 描画は assets/galleryGrid.js が一致したカードのうち見えている範囲だけ行う。
+// 正規化は services/search_text.py・DB の app_search_fold と同じ（NFKC → ひらがな→カタカナ → 小文字）。
+// サーバーは「さらに表示」と検索確定（Enter）でコレクション全体を読むときだけ使う。
+(function () {
+  let indexed = [];
+  let postings = new Map();
+
+  function fold(text) {
+    let out = "";
+    const normalized = String(text || "").normalize("NFKC");
+    for (const ch of normalized) {
+      const code = ch.codePointAt(0);
+      if (code >= 0x3041 && code <= 0x3096) {
+        out += String.fromCodePoint(code + 0x60);
+      } else if (ch === "ゝ") {
+        out += "ヽ";
+      } else if (ch === "ゞ") {
+        out += "ヾ";
+      } else {
+        out += ch;
+      }
+    }
+    return out.toLowerCase();
+  }
+
+  function terms(query) {
+    const seen = [];
+    fold(query)
+      .split(/\s+/)
+      .forEach(function (term) {
+        if (term && seen.indexOf(term) < 0) {
+          seen.push(term);
+        }
+      });
+    return seen.sort(function (a, b) {
+      return b.length - a.length;
+    });
+  }
+
+  function bigrams(text) {
+    const chars = Array.from(text);
+    const out = new Set();
+    for (let i = 0; i + 1 < chars.length; i += 1) {
+      out.add(chars[i] + chars[i + 1]);
+    }
+    return out;
+  }
+
+  // 索引をカードのデータに合わせる。続きのページ（末尾への追加）は追加分だけ索引に足す
+  function ensureIndex(items) {
+    const n = indexed.length;
+    const appended = n > 0 && items.length >= n && items[0] === indexed[0] && items[n - 1] === indexed[n - 1];
+    if (!appended) {
+      indexed = [];
+      postings = new Map();
+    }
+    for (let position = indexed.length; position < items.length; position += 1) {
+      const item = items[position] || {};
+      indexed.push(item);
+      bigrams(String(item.search || "")).forEach(function (gram) {
+        let list = postings.get(gram);
+        if (!list) {
+          list = [];
+          postings.set(gram, list);
+        }
+        list.push(position);
+      });
+    }
+  }
+
+  // 1 語に一致するカード位置（2-gram の積集合で候補を絞り、部分一致で確かめる）
+  function matchTerm(items, term) {
+    const grams = Array.from(bigrams(term));
+    let candidates = null;
+    if (grams.length) {
+      const lists = grams.map(function (gram) {
+        return postings.get(gram) || [];
+      });
+      lists.sort(function (a, b) {
+        return a.length - b.length;
+      });
+      candidates = new Set(lists[0]);
+      for (let i = 1; i < lists.length && candidates.size; i += 1) {
+        const next = new Set(lists[i]);
+        candidates.forEach(function (position) {
+          if (!next.has(position)) {
+            candidates.delete(position);
+          }
+        });
+      }
+    }
+    const out = new Set();
+    const positions = candidates === null ? items.keys() : candidates;
+    for (const position of positions) {
+      if (String(items[position].search || "").indexOf(term) >= 0) {
+        out.add(position);
+      }
+    }
+    return out;
+  }
+
+  function normalizeSlots(raw) {
+    const out = [];
+    (Array.isArray(raw) ? raw : []).forEach(function (value) {
+      const slot = Number(value);
+      if (typeof value !== "boolean" && Number.isInteger(slot) && slot >= 1 && slot <= 7 && out.indexOf(slot) < 0) {
+        out.push(slot);
+      }
+    });
+    return out.sort(function (a, b) {
+      return a - b;
+    });
+  }
+
+  // 一致するカード位置（昇順）。絞り込みが無ければ null
+  function match(items, query, selectedSlots) {
+    const queryTerms = terms(query);
+    const slotSet = new Set(normalizeSlots(selectedSlots));
+    if (!queryTerms.length && !slotSet.size) {
+      return null;
+    }
+    ensureIndex(items);
+    let matched = null;
+    queryTerms.forEach(function (term) {
+      const hits = matchTerm(items, term);
+      matched = matched === null ? hits : new Set(Array.from(matched).filter(function (p) {
+        return hits.has(p);
+      }));
+    });
+    const out = [];
+    items.forEach(function (item, position) {
+      if (matched !== null && !matched.has(position)) {
+        return;
+      }
+      // 色スロットは OR
+      if (slotSet.size && !(item.slots || []).some(function (s) {
+        return slotSet.has(Number(s));
+      })) {
+        return;
+      }
+      out.push(position);
+    });
+    return out;
+  }
+
+  window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    galleryFilter: {
+      // galleryGrid.js から呼ぶ（コールバックではない）
+      match: match,
+      // スウォッチのクリックで色スロットを切り替える
+      toggleSlot: function (nClicks, selected) {
+        const noUpdate = window.dash_clientside.no_update;
+        const ctx = window.dash_clientside.callback_context;
+        const trig = ctx && ctx.triggered_id;
+        const slot = trig && Number(trig.slot);
+        if (!slot || slot < 1 || slot > 7) {
+          return noUpdate;
+        }
+        // ALL の再マウントで n_clicks=0 のまま発火したときは無視する
+        const clicks = Array.isArray(nClicks) ? nClicks[slot - 1] : nClicks;
+        if (!clicks || Number(clicks) < 1) {
+          return noUpdate;
+        }
+        const current = normalizeSlots(selected);
+        const at = current.indexOf(slot);
+        if (at >= 0) {
+          current.splice(at, 1);
+        } else {
+          current.push(slot);
+        }
+        return normalizeSlots(current);
+      },
+      // 選択中のスウォッチに枠を付ける（背景色は描画時のものを保つ）
+      swatchStyles: function (selected, styles) {
+        const selectedSet = new Set(normalizeSlots(selected));
+        return (styles || []).map(function (style, idx) {
+          const out = Object.assign({}, style);
+          const on = selectedSet.has(idx + 1);
+          out.border = on ? "3px solid #0d6efd" : "1px solid rgba(0,0,0,0.15)";
+          if (on) {
+            out.boxShadow = "0 0 0 0.2rem rgba(13, 110, 253, 0.25)";
+          } else {
+            delete out.boxShadow;
+          }
+          return out;
+        });
+      },
+    },
+  });
+})();
@@ -0,0 +1,289 @@
+// ギャラリーのカードを仮想スクロールで描画する。
+// gallery-cards（読み込み済み全件のデータ）のうち、画面に見えている行と前後の余白分だけを DOM に置き、
+// 残りは高さだけを確保する。件数が 5,000 を超えてもスクロール 1 回で触る要素数は一定。
+// 続きのページは Patch で末尾に足されるため、描画済みのカードはそのまま・追加分だけ索引に入る。
+// 末尾に近づいたら「さらに表示」を押して次のページを先読みする（ブラウザ内の絞り込み中は行わない）。
+(function () {
+  const HOST_ID = "gallery-virtual";
+  const SEARCH_INPUT_ID = "gallery-search-input";
+  const LOAD_MORE_ID = "gallery-load-more";
+  const DETAIL_PATH = "/gallery/detail";
+  // styles.css の .gallery-vcard / .gallery-vrow の高さと .photo-grid の gap に合わせる
+  const GRID_ROW_PX = 228 + 15;
+  const LIST_ROW_PX = 96;
+  // 見えている範囲の前後に余分に描く行数
+  const BUFFER_ROWS = 4;
+  // 残りがこの行数を切ったら次のページを読む
+  const PREFETCH_ROWS = 6;
+  // 描画先（#gallery-virtual）がまだ DOM に無いときに待つフレーム数
+  const MOUNT_RETRY_FRAMES = 30;
+
+  let items = [];
+  let view = "thumb";
+  let slots = [];
+  // 絞り込み後に表示するカード位置（null は全件）
+  let visible = null;
+  let host = null;
+  let spacer = null;
+  let win = null;
+  let drawn = null;
+  let prefetchedAt = -1;
+  let frame = 0;
+  let retries = 0;
+
+  function visibleCount() {
+    return visible === null ? items.length : visible.length;
+  }
+
+  function itemAt(i) {
+    return items[visible === null ? i : visible[i]];
+  }
+
+  function refilter() {
+    const filter = window.dash_clientside && window.dash_clientside.galleryFilter;
+    const input = document.getElementById(SEARCH_INPUT_ID);
+    visible = filter ? filter.match(items, input ? input.value : "", slots) : null;
+    drawn = null;
+  }
+
+  function schedule() {
+    if (!frame) {
+      frame = window.requestAnimationFrame(function () {
+        frame = 0;
+        draw();
+      });
+    }
+  }
+
+  // カードのクリックは描画先 1 か所で受け、data-gallery-item の id で詳細へ移動する（サーバー往復なし）。
+  // 移動先は固定の同一オリジンのパスだけ（id は数字、view は thumb / list のみ）
+  function onClick(event) {
+    const card = event.target.closest ? event.target.closest("[data-gallery-item]") : null;
+    if (!card || !host || !host.contains(card)) {
+      return;
+    }
+    const id = card.getAttribute("data-gallery-item") || "";
+    if (!/^\d+$/.test(id) || !window.dash_clientside.set_props) {
+      return;
+    }
+    event.preventDefault();
+    window.dash_clientside.set_props("_pages_location", {
+      pathname: DETAIL_PATH,
+      search: "?registration_product_id=" + id + "&view=" + (view === "list" ? "list" : "thumb"),
+    });
+  }
+
+  // Dash が gallery-content を描き直すと描画先も作り直されるため、毎回つなぎ直す
+  function mount() {
+    const el = document.getElementById(HOST_ID);
+    if (!el) {
+      return false;
+    }
+    if (el !== host) {
+      host = el;
+      spacer = document.createElement("div");
+      spacer.className = "gallery-virtual-spacer";
+      win = document.createElement("div");
+      win.className = "gallery-virtual-window";
+      spacer.appendChild(win);
+      host.appendChild(spacer);
+      host.addEventListener("click", onClick);
+      drawn = null;
+    }
+    return true;
+  }
+
+  function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) {
+      node.className = className;
+    }
+    if (text) {
+      node.textContent = text;
+    }
+    return node;
+  }
+
+  function thumb(item, className, placeholderClass, iconSize) {
+    if (item.thumb) {
+      const img = el("img", className);
+      img.src = item.thumb;
+      img.alt = "";
+      img.loading = "lazy";
+      img.decoding = "async";
+      return img;
+    }
+    const placeholder = el("div", placeholderClass);
+    const icon = el("i", "bi bi-image");
+    icon.style.fontSize = iconSize;
+    placeholder.appendChild(icon);
+    return placeholder;
+  }
+
+  function chips(item) {
+    const wrap = el("div", "d-flex flex-wrap gap-1 align-items-center mt-1");
+    (item.chips || []).forEach(function (chip) {
+      if (chip.icon) {
+        const badge = el("span", "badge rounded-pill bg-light text-dark border gallery-vchip");
+        badge.title = chip.title || "";
+        const icon = el("i", chip.icon);
+        icon.style.fontSize = "0.75rem";
+        badge.appendChild(icon);
+        wrap.appendChild(badge);
+      } else {
+        const swatch = el("span", "gallery-vswatch");
+        swatch.title = chip.title || "";
+        swatch.style.background = chip.color || "#adb5bd";
+        wrap.appendChild(swatch);
+      }
+    });
+    return wrap;
+  }
+
+  function gridCard(item) {
+    const card = el("button", "photo-card-btn text-start p-0 border-0 gallery-vcard");
+    card.type = "button";
+    card.setAttribute("data-gallery-item", String(item.id == null ? "" : item.id));
+    card.appendChild(
+      thumb(item, "gallery-vcard-img", "d-flex align-items-center justify-content-center photo-placeholder", "28px")
+    );
+    const body = el("div", "p-2 gallery-vcard-body");
+    body.appendChild(el("div", "fw-semibold text-dark text-truncate", item.name));
+    body.appendChild(el("div", "text-muted small text-truncate", item.sub));
+    body.appendChild(chips(item));
+    card.appendChild(body);
+    return card;
+  }
+
+  function listRow(item) {
+    const row = el("button", "list-group-item list-group-item-action d-flex align-items-center gap-3 gallery-vrow");
+    row.type = "button";
+    row.setAttribute("data-gallery-item", String(item.id == null ? "" : item.id));
+    row.appendChild(
+      thumb(
+        item,
+        "rounded gallery-vrow-img",
+        "d-flex align-items-center justify-content-center border rounded gallery-vrow-img",
+        "22px"
+      )
+    );
+    const body = el("div", "flex-grow-1 text-start gallery-vrow-body");
+    body.appendChild(el("div", "fw-semibold text-dark text-truncate", item.name));
+    body.appendChild(el("div", "text-muted small text-truncate", item.sub));
+    if (item.memo) {
+      body.appendChild(el("div", "text-muted small text-truncate", item.memo));
+    }
+    body.appendChild(chips(item));
+    row.appendChild(body);
+    return row;
+  }
+
+  function columns() {
+    const template = window.getComputedStyle(win).gridTemplateColumns || "";
+    const count = template.split(" ").filter(Boolean).length;
+    return count > 0 ? count : 3;
+  }
+
+  function updateSummary(count) {
+    const filtering = visible !== null;
+    const summary = document.getElementById("gallery-summary");
+    if (summary) {
+      const label = filtering
+        ? count + " / " + items.length + " 件を表示中"
+        : summary.getAttribute("data-total-label") || "全 " + items.length + " 件の登録があります";
+      if (summary.textContent !== label) {
+        summary.textContent = label;
+      }
+    }
+    const empty = document.getElementById("gallery-filter-empty");
+    if (empty) {
+      empty.style.display = filtering && count === 0 ? "" : "none";
+    }
+  }
+
+  function prefetch() {
+    const button = document.getElementById(LOAD_MORE_ID);
+    // 同じ件数のまま何度も押さない（応答で件数が増えたら次を先読みできる）
+    if (!button || button.disabled || prefetchedAt === items.length) {
+      return;
+    }
+    prefetchedAt = items.length;
+    button.click();
+  }
+
+  function draw() {
+    if (!mount()) {
+      if (retries > 0) {
+        retries -= 1;
+        schedule();
+      }
+      return;
+    }
+    const list = view === "list";
+    win.className = list ? "list-group gallery-virtual-window" : "photo-grid gallery-virtual-window";
+    const count = visibleCount();
+    const cols = list ? 1 : columns();
+    const rowPx = list ? LIST_ROW_PX : GRID_ROW_PX;
+    const rows = Math.ceil(count / cols);
+    spacer.style.height = rows * rowPx + "px";
+    updateSummary(count);
+
+    const top = host.getBoundingClientRect().top;
+    const viewTop = Math.max(0, -top);
+    const viewBottom = Math.max(0, window.innerHeight - top);
+    const startRow = Math.max(0, Math.floor(viewTop / rowPx) - BUFFER_ROWS);
+    const endRow = Math.min(rows, Math.ceil(viewBottom / rowPx) + BUFFER_ROWS);
+    const start = startRow * cols;
+    const end = Math.min(count, endRow * cols);
+    const key = [view, cols, start, end, count].join(":");
+    if (drawn !== key) {
+      drawn = key;
+      const fragment = document.createDocumentFragment();
+      for (let i = start; i < end; i += 1) {
+        const item = itemAt(i);
+        if (item) {
+          fragment.appendChild(list ? listRow(item) : gridCard(item));
+        }
+      }
+      win.style.transform = "translateY(" + startRow * rowPx + "px)";
+      win.replaceChildren(fragment);
+    }
+    if (visible === null && rows > 0 && endRow >= rows - PREFETCH_ROWS) {
+      prefetch();
+    }
+  }
+
+  window.addEventListener("scroll", schedule, { passive: true });
+  window.addEventListener("resize", function () {
+    drawn = null;
+    schedule();
+  });
+
+  // 入力 1 文字ごと（dcc.Input の debounce でサーバーには確定時だけ送る）
+  document.addEventListener("input", function (event) {
+    if (event.target && event.target.id === SEARCH_INPUT_ID) {
+      refilter();
+      schedule();
+    }
+  });
+
+  window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    galleryGrid: {
+      // カードのデータ・表示モード・色フィルターが変わったとき（続きのページの追加を含む）
+      render: function (cards, viewMode, selectedSlots) {
+        const next = Array.isArray(cards) ? cards : [];
+        if (next.length < items.length || next[0] !== items[0]) {
+          // 一覧を取り直した: 先読みの記録を消し、先頭から描き直す
+          prefetchedAt = -1;
+        }
+        items = next;
+        view = viewMode === "list" ? "list" : "thumb";
+        slots = Array.isArray(selectedSlots) ? selectedSlots : [];
+        refilter();
+        retries = MOUNT_RETRY_FRAMES;
+        schedule();
+        return visibleCount();
+      },
+    },
+  });
+})();
@@ -1,5 +1,11 @@
 from typing import Any, Dict
 
+from dash import Patch, no_update
+
+from services import registration_drafts
+
+_MISSING = object()
+
 
 def empty_registration_state() -> Dict[str, Any]:
     """初期状態の登録ストアを返す。"""
@@ -12,6 +18,13 @@ def empty_registration_state() -> Dict[str, Any]:
             # 直近の保存結果（バナー表示用）
             "last_save_message": None,
             "last_save_status": None,
+            # 写真取得ごとに発行するドラフトID（SSE の購読キー）
+            "draft_id": None,
+            # エンリッチ結果の受け取り方: push（SSE）/ poll（io-intelligence-interval）
+            "enrichment": None,
+            # サーバー側ドラフトの id と読み込み時のセクションダイジェスト（ブラウザには出さない）
+            "draft_key": None,
+            "draft_base": None,
         },
         "barcode": {
             "value": None,
@@ -19,6 +32,8 @@ def empty_registration_state() -> Dict[str, Any]:
             "status": "idle",
             "source": None,
             "filename": None,
+            # 2/5 桁のアドオン（雑誌の号数など）。value は正規化済みの本体コード
+            "addon": None,
         },
         "front_photo": {
             "content": None,
@@ -32,6 +47,10 @@ def empty_registration_state() -> Dict[str, Any]:
             "vision_raw": None,
             "structured_data": None,
             "original_tmp_path": None,
+            # 撮影直後の類似写真検索の結果（登録済みアイテムの id・名前・距離のみ）
+            "similar": [],
+            # 撮影品質の判定（warn / reject のときだけ verdict と案内文）
+            "quality": None,
         },
         "lookup": {
             "status": "idle",
@@ -48,6 +67,8 @@ def empty_registration_state() -> Dict[str, Any]:
         # 製品に付与するカラータグの slot (1..7) を保持
         "color_tags": {
             "selected_slots": [],
+            # 写真の主要色から選んだ候補（撮影時に未選択なら selected_slots にも入れる）
+            "suggested_slots": [],
         },
     }
 
@@ -57,6 +78,9 @@ def ensure_state(data: Dict[str, Any]) -> Dict[str, Any]:
     state = empty_registration_state()
     if not isinstance(data, dict):
         return state
+    if registration_drafts.is_handle(data):
+        # ブラウザには薄いハンドルだけがある。本体はサーバー側のドラフトから読む
+        data = registration_drafts.from_handle(data) or data
 
     meta = data.get("meta") or {}
     state["meta"].update(
@@ -65,6 +89,10 @@ def ensure_state(data: Dict[str, Any]) -> Dict[str, Any]:
             "flow_source": meta.get("flow_source", state["meta"]["flow_source"]),
             "last_save_message": meta.get("last_save_message"),
             "last_save_status": meta.get("last_save_status"),
+            "draft_id": meta.get("draft_id"),
+            "enrichment": meta.get("enrichment"),
+            "draft_key": meta.get("draft_key"),
+            "draft_base": meta.get("draft_base"),
         }
     )
 
@@ -76,6 +104,7 @@ def ensure_state(data: Dict[str, Any]) -> Dict[str, Any]:
             "status": barcode.get("status", state["barcode"]["status"]),
             "source": barcode.get("source"),
             "filename": barcode.get("filename"),
+            "addon": barcode.get("addon"),
         }
     )
 
@@ -95,6 +124,8 @@ def ensure_state(data: Dict[str, Any]) -> Dict[str, Any]:
             "vision_raw": front.get("vision_raw"),
             "structured_data": front.get("structured_data"),
             "original_tmp_path": front.get("original_tmp_path"),
+            "similar": front.get("similar") or [],
+            "quality": front.get("quality"),
         }
     )
 
@@ -123,6 +154,7 @@ def ensure_state(data: Dict[str, Any]) -> Dict[str, Any]:
         {
             "selected_slots": color_tags.get("selected_slots", [])
             or state["color_tags"]["selected_slots"],
+            "suggested_slots": color_tags.get("suggested_slots") or [],
         }
     )
 
@@ -130,6 +162,21 @@ def ensure_state(data: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def serialise_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    store に書く値を返す。ログイン中はドラフトをサーバーに保存して薄いハンドル（id・版数・UI 項目）を返し、
+    ドラフトを保存できない場合（未ログイン・テスト）は状態のコピーをそのまま返す。
+    """
+    snapshot = _copy_state(state)
+    handle = registration_drafts.to_handle(snapshot)
+    if handle is None:
+        return snapshot
+    # 同じコールバック内で再度 serialise しても同じドラフトに書く
+    state["meta"]["draft_key"] = snapshot["meta"]["draft_key"]
+    state["meta"]["draft_base"] = snapshot["meta"]["draft_base"]
+    return handle
+
+
+def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
     """状態をコピーして安全に返す（副作用防止）。"""
     return {
         "meta": {
@@ -137,6 +184,10 @@ def serialise_state(state: Dict[str, Any]) -> Dict[str, Any]:
             "flow_source": state["meta"].get("flow_source"),
             "last_save_message": state["meta"].get("last_save_message"),
             "last_save_status": state["meta"].get("last_save_status"),
+            "draft_id": state["meta"].get("draft_id"),
+            "enrichment": state["meta"].get("enrichment"),
+            "draft_key": state["meta"].get("draft_key"),
+            "draft_base": state["meta"].get("draft_base"),
         },
         "barcode": state["barcode"].copy(),
         "front_photo": state["front_photo"].copy(),
@@ -157,5 +208,42 @@ def serialise_state(state: Dict[str, Any]) -> Dict[str, Any]:
         },
         "color_tags": {
             "selected_slots": list(state["color_tags"].get("selected_slots", [])),
+            "suggested_slots": list(state["color_tags"].get("suggested_slots", [])),
         },
     }
+
+
+def _diff_into(patch: Patch, old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+    """old → new の差分を patch に積む（辞書は再帰、それ以外は値ごと置き換え）。差分があれば True。"""
+    changed = False
+    for key in old.keys() - new.keys():
+        del patch[key]
+        changed = True
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            changed = _diff_into(patch[key], previous, value) or changed
+        elif previous is _MISSING or previous != value:
+            patch[key] = value
+            changed = True
+    return changed
+
+
+def store_patch(previous: Any, new_value: Dict[str, Any]) -> Any:
+    """
+    store の現在値 previous から new_value（serialise_state 済み）への Dash Patch を返す。
+    差分が無ければ no_update、形が違う（初回・ハンドルへの切替）なら new_value をそのまま返す。
+    """
+    if not isinstance(previous, dict) or not isinstance(new_value, dict):
+        return new_value
+    if registration_drafts.is_handle(previous) != registration_drafts.is_handle(new_value):
+        return new_value
+    patch = Patch()
+    if not _diff_into(patch, previous, new_value):
+        return no_update
+    return patch
+
+
+def patch_state(previous: Any, state: Dict[str, Any]) -> Any:
+    """state を保存し、store の現在値 previous からの差分だけを返す（registration-store の Output 用）。"""
+    return store_patch(previous, serialise_state(state))
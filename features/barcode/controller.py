@@ -5,9 +5,11 @@ from dash.exceptions import PreventUpdate
 from components.state_utils import (
     ensure_state,
     empty_registration_state,
-    serialise_state,
+    patch_state,
 )
+from services.barcode_canonical import canonicalize
 from services.barcode_lookup import lookup_product_by_barcode
+from services.owned_barcodes import owned_count_for_current_user
 from services.barcode_service import decode_from_base64
 from services.tag_extraction import extract_tags
 
@@ -124,6 +126,47 @@ def _update_tags(state: Dict[str, Any]) -> Dict[str, Any]:
     return state["tags"]
 
 
+def _owned_notice(owned: int) -> Optional[html.Div]:
+    if not owned:
+        return None
+    return html.Div(
+        f"すでに所持しています（{owned}点）",
+        className="alert alert-warning",
+        style={"fontWeight": "600"},
+    )
+
+
+def owned_notice_for(
+    trigger_id: str,
+    upload_contents: Optional[str],
+    camera_contents: Optional[str],
+    manual_value: Optional[str],
+) -> Optional[html.Div]:
+    """
+    スキャン・手入力したバーコードの所持確認の表示（所持していなければ None）。
+    楽天照合とは別のコールバックから呼び、照合の完了（最大 LOOKUP_DEADLINE_SEC）を待たずに出す。
+    """
+    if trigger_id == "barcode-manual-submit":
+        canonical = canonicalize(manual_value)
+        if not canonical.valid:
+            return None
+        return _owned_notice(owned_count_for_current_user(canonical.key))
+    if trigger_id not in {"barcode-upload", "barcode-camera-upload"}:
+        return None
+    contents = camera_contents if trigger_id == "barcode-camera-upload" else upload_contents
+    if not contents:
+        return None
+    try:
+        decode_result = decode_from_base64(contents)
+    except ValueError:
+        return None
+    if not decode_result:
+        return None
+    canonical = canonicalize(decode_result["barcode"], decode_result["barcode_type"])
+    barcode_value = canonical.key if canonical.valid else decode_result["barcode"]
+    return _owned_notice(owned_count_for_current_user(barcode_value))
+
+
 def register_barcode_callbacks(app):
     @app.callback(
         Output("register-success-banner", "children"),
@@ -192,7 +235,9 @@ def register_barcode_callbacks(app):
         nav_path = no_update
 
         def success_message(
-            barcode_value: str, barcode_type: str, lookup_result: Dict[str, Any]
+            barcode_value: str,
+            barcode_type: str,
+            lookup_result: Dict[str, Any],
         ):
             info_card = html.Div(
                 [
@@ -254,14 +299,18 @@ def register_barcode_callbacks(app):
                 className="card-custom",
             )
         elif trigger_id == "barcode-manual-submit":
+            canonical = canonicalize(manual_value)
             if not manual_value:
                 message = html.Div(
                     "バーコード番号を入力してください。",
                     className="alert alert-danger",
                 )
+            elif not canonical.valid:
+                # 桁数・チェックディジットの誤りは API を呼ばずにその場で返す
+                message = html.Div(canonical.message, className="alert alert-danger")
             else:
-                barcode_value = manual_value.strip()
-                print(f"DEBUG: Manual barcode input: {barcode_value}")
+                barcode_value = canonical.key
+                print(f"DEBUG: Manual barcode input: {barcode_value} ({canonical.kind})")
                 lookup_result = lookup_product_by_barcode(barcode_value)
                 print(f"DEBUG: Rakuten API result for manual: {lookup_result}")
                 state["barcode"].update(
@@ -271,6 +320,7 @@ def register_barcode_callbacks(app):
                         "status": "manual",
                         "source": "manual",
                         "filename": None,
+                        "addon": canonical.addon or None,
                     }
                 )
                 state["lookup"] = lookup_result
@@ -330,12 +380,17 @@ def register_barcode_callbacks(app):
                         className="card-custom",
                     )
                 else:
-                    barcode_value = decode_result["barcode"]
                     barcode_type = decode_result["barcode_type"]
+                    canonical = canonicalize(decode_result["barcode"], barcode_type)
+                    barcode_value = (
+                        canonical.key if canonical.valid else decode_result["barcode"]
+                    )
                     print(
                         f"DEBUG: Decoded barcode: {barcode_value}, type: {barcode_type}"
                     )
-                    lookup_result = lookup_product_by_barcode(barcode_value)
+                    lookup_result = lookup_product_by_barcode(
+                        barcode_value, symbology=barcode_type
+                    )
                     print(f"DEBUG: Rakuten API result for decoded: {lookup_result}")
                     state["barcode"].update(
                         {
@@ -346,13 +401,12 @@ def register_barcode_callbacks(app):
                             if trigger_id == "barcode-camera-upload"
                             else "upload",
                             "filename": filename,
+                            "addon": canonical.addon or None,
                         }
                     )
                     state["lookup"] = lookup_result
                     print(f"DEBUG: Saved lookup to state: {state.get('lookup')}")
-                    message = success_message(
-                        barcode_value, barcode_type, lookup_result
-                    )
+                    message = success_message(barcode_value, barcode_type, lookup_result)
                     nav_path = "/register/photo"
 
         print(
@@ -371,4 +425,26 @@ def register_barcode_callbacks(app):
                 ]
             )
 
-        return serialise_state(state), message, url
+        return patch_state(store_data, state), message, url
+
+    @app.callback(
+        Output("barcode-owned-notice", "children"),
+        [
+            Input("barcode-upload", "contents"),
+            Input("barcode-camera-upload", "contents"),
+            Input("barcode-manual-submit", "n_clicks"),
+            Input("barcode-skip-button", "n_clicks"),
+            Input("barcode-retry-button", "n_clicks"),
+        ],
+        [State("barcode-manual-input", "value")],
+        prevent_initial_call=True,
+    )
+    def _show_owned_notice(
+        upload_contents, camera_contents, manual_submit, skip_click, retry_click, manual_value
+    ):
+        """所持確認だけを返す（楽天照合を待つ handle_barcode_actions とは並行して走る）。"""
+        triggered = callback_context.triggered
+        if not triggered:
+            raise PreventUpdate
+        trigger_id = triggered[0]["prop_id"].split(".")[0]
+        return owned_notice_for(trigger_id, upload_contents, camera_contents, manual_value)
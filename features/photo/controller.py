@@ -4,10 +4,20 @@ import tempfile
 from dash import html, callback_context, no_update, Input, Output, State
 from dash.exceptions import PreventUpdate
 
-from components.state_utils import ensure_state, serialise_state, empty_registration_state
+from components.state_utils import (
+    empty_registration_state,
+    ensure_state,
+    patch_state,
+    serialise_state,
+    store_patch,
+)
 from services.photo_service import upload_to_storage
 from services.supabase_client import get_supabase_client
 from services.debug_log import dash_debug_print
+from services.enrichment_jobs import new_draft_id, start_enrichment
+from services.capture_quality import check_photo_capture
+from services.photo_colors import suggest_color_slots_for_current_user
+from services.similar_photos import find_similar_for_current_user
 from services.registration_service import (
     save_quick_registration_with_photo,
     save_quick_registration_barcode_only,
@@ -103,14 +113,14 @@ def register_photo_callbacks(app):
                         new_state["meta"]["last_save_status"] = status
                         message = html.Div(result.get("message"), className="alert alert-success")
                         nav_path = "/register/barcode"
-                        return serialise_state(new_state), message, nav_path
+                        return patch_state(store_data, new_state), message, nav_path
                     if status == "business_error":
                         message = html.Div(result.get("message"), className="alert alert-danger")
                         nav_path = no_update
-                        return result_state, message, nav_path
+                        return store_patch(store_data, result_state), message, nav_path
                     message = html.Div(result.get("message"), className="alert alert-danger")
                     nav_path = no_update
-                    return result_state, message, nav_path
+                    return store_patch(store_data, result_state), message, nav_path
                 else:
                     # 両方なし → 登録せず barcode へ戻して注意喚起
                     new_state = empty_registration_state()
@@ -119,7 +129,7 @@ def register_photo_callbacks(app):
                     new_state["meta"]["last_save_message"] = "バーコードまたは正面写真のどちらかが必要です。"
                     new_state["meta"]["last_save_status"] = "business_error"
                     nav_path = "/register/barcode"
-                    return serialise_state(new_state), message, nav_path
+                    return patch_state(store_data, new_state), message, nav_path
         else:
             contents = (
                 camera_contents
@@ -156,6 +166,7 @@ def register_photo_callbacks(app):
             vision_raw = None
             public_url = None
             display_data_url = contents
+            quality = None
 
             if contents:
                 original_bytes = None
@@ -177,6 +188,10 @@ def register_photo_callbacks(app):
                     else:
                         original_bytes = base64.b64decode(contents)
 
+                    if not is_quick:
+                        # 暗すぎる・白飛びした写真は画像説明・タグ生成を呼ばない
+                        quality = check_photo_capture(original_bytes)
+
                     preview_bytes = None
                     preview_buffer = None
                     try:
@@ -231,6 +246,16 @@ def register_photo_callbacks(app):
                             f"DEBUG: Failed to persist original photo to temp file: {tmp_error}"
                         )
                     state["front_photo"]["original_tmp_path"] = temp_file_path
+                    if not is_quick:
+                        # 知覚ハッシュで登録済みの似たアイテムを探す（重複登録の確認用）
+                        state["front_photo"]["similar"] = find_similar_for_current_user(
+                            original_bytes
+                        )
+                        # 写真の主要色に近いカラータグを候補にする（未選択のときだけ事前選択）
+                        suggested = suggest_color_slots_for_current_user(original_bytes)
+                        state["color_tags"]["suggested_slots"] = suggested
+                        if not state["color_tags"]["selected_slots"]:
+                            state["color_tags"]["selected_slots"] = suggested
 
                     vision_raw = base64.b64encode(reduced_bytes_for_vision).decode(
                         "utf-8"
@@ -265,6 +290,12 @@ def register_photo_callbacks(app):
                 state["front_photo"]["description_status"] = "pending"
                 state["front_photo"]["vision_source"] = api_contents
                 state["front_photo"]["vision_raw"] = vision_raw
+                state["front_photo"]["quality"] = (
+                    {"verdict": quality.verdict, "message": quality.message}
+                    if quality is not None and quality.verdict != "ok"
+                    else None
+                )
+                skip_vision = quality is not None and quality.rejected
 
                 # 直前までのタグは保持しつつ、ステータスのみ更新
                 state["tags"]["status"] = "loading"
@@ -298,6 +329,37 @@ def register_photo_callbacks(app):
                 state["description"] = {"status": "processing"}
                 state["front_photo"]["content"] = display_data_url
 
+                # 画像説明・タグ生成はサーバー側で走らせ、結果は SSE で push する。
+                # 投入できない場合のみ従来の io-intelligence-interval ポーリングに戻す。
+                draft_id = new_draft_id()
+                state["meta"]["draft_id"] = draft_id
+                if skip_vision:
+                    # 失敗が確実な画像説明だけを投入しない（写真は保存できる。撮り直しを案内する）
+                    state["front_photo"]["description_status"] = "skipped"
+                    state["description"] = {"status": "skipped"}
+                can_tag_without_vision = bool(
+                    state["lookup"].get("items") or state["barcode"].get("value")
+                )
+                if skip_vision and not can_tag_without_vision:
+                    state["tags"]["status"] = "idle"
+                    state["tags"]["message"] = (
+                        f"{quality.message} 写真が判別できないため、タグ生成をスキップしました。"
+                    )
+                    state["meta"]["enrichment"] = "skipped"
+                elif skip_vision:
+                    # 楽天照合の結果（または照合待ちのバーコード）があれば、照合とタグ生成は行う
+                    state["tags"]["message"] = (
+                        f"{quality.message} 画像説明はスキップし、楽天API情報からタグを生成中です..."
+                    )
+                    state["meta"]["enrichment"] = (
+                        "push" if start_enrichment(draft_id, state) else "poll"
+                    )
+                elif start_enrichment(draft_id, state):
+                    state["meta"]["enrichment"] = "push"
+                    state["front_photo"]["description_status"] = "processing"
+                else:
+                    state["meta"]["enrichment"] = "poll"
+
                 cards = [preview_card]
                 message = html.Div(cards)
                 dash_debug_print(
@@ -322,22 +384,22 @@ def register_photo_callbacks(app):
                     new_state["meta"]["last_save_status"] = status
                     message = html.Div(result.get("message"), className="alert alert-success")
                     nav_path = "/register/barcode"
-                    return serialise_state(new_state), message, nav_path
+                    return patch_state(store_data, new_state), message, nav_path
 
                 if status == "business_error":
                     message = html.Div(result.get("message"), className="alert alert-danger")
                     nav_path = no_update
-                    return result_state, message, nav_path
+                    return store_patch(store_data, result_state), message, nav_path
 
                 message = html.Div(
                     result.get("message", "保存中にエラーが発生しました。"),
                     className="alert alert-danger",
                 )
                 nav_path = no_update
-                return result_state, message, nav_path
+                return store_patch(store_data, result_state), message, nav_path
 
         dash_debug_print(f"DEBUG handle_front_photo: returning nav_path={nav_path}")
-        return serialise_state(state), message, nav_path
+        return patch_state(store_data, state), message, nav_path
 
 
 def register_x_share_callbacks(app):
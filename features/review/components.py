@@ -303,7 +303,10 @@ def render_review_section() -> html.Div:
             html.Div(
                 [
                     html.H4("カラータグ", className="card-title"),
-                    html.P("色見本を複数選択できます（最大7）。", className="text-muted"),
+                    html.P(
+                        "色見本を複数選択できます（最大7）。写真の主な色に近い色をあらかじめ選択します。",
+                        className="text-muted",
+                    ),
                     dcc.Checklist(
                         id="color-tag-select",
                         options=color_options,
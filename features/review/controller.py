@@ -1,12 +1,13 @@
 import os
 import base64
 from typing import Any, Dict, List, Optional
-from dash import html, Input, Output, State, callback_context
+from dash import ClientsideFunction, html, Input, Output, State, callback_context
 from dash.exceptions import PreventUpdate
 from PIL import Image
 import io
 
-from components.state_utils import ensure_state
+from components.state_utils import ensure_state, patch_state
+from services.deadline import ENRICHMENT_DEADLINE_SEC, Deadline
 from services.io_intelligence import describe_image
 from services.debug_log import dash_debug_print
 
@@ -54,7 +55,56 @@ def _render_tags_card(tag_result: Dict[str, Any]) -> html.Div:
     return html.Div(children, className="card-custom")
 
 
+def _render_quality_notice(quality: Optional[Dict[str, Any]]) -> Any:
+    """撮影品質の警告（問題が無ければ何も表示しない）。"""
+    if not isinstance(quality, dict) or not quality.get("message"):
+        return None
+    level = "alert-danger" if quality.get("verdict") == "reject" else "alert-warning"
+    return html.Div(quality["message"], className=f"alert {level} mb-2")
+
+
+def _render_similar_card(similar: List[Dict[str, Any]]) -> Any:
+    """撮影写真に似た登録済みアイテム（無ければ何も表示しない）。"""
+    links = []
+    for item in similar or []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            product_id = int(item.get("registration_product_id"))
+        except (TypeError, ValueError):
+            continue
+        name = item.get("product_name") or f"登録済みアイテム #{product_id}"
+        links.append(
+            html.Li(
+                html.A(
+                    name,
+                    href=f"/gallery/detail?registration_product_id={product_id}&view=thumb",
+                )
+            )
+        )
+    if not links:
+        return None
+    return html.Div(
+        [
+            html.Div("似ている登録済みアイテム", className="card-text fw-semibold mb-2"),
+            html.Div(
+                "同じ写真を登録済みかもしれません。重複していないか確認してください。",
+                className="lookup-message",
+            ),
+            html.Ul(links, className="mb-0"),
+        ],
+        className="card-custom",
+    )
+
+
 def register_review_callbacks(app):
+    # エンリッチ進捗は SSE で受け取り、ブラウザ側で registration-store に差分マージする
+    app.clientside_callback(
+        ClientsideFunction(namespace="enrichment", function_name="connect"),
+        Output("enrichment-sse-status", "data"),
+        Input("registration-store", "data"),
+    )
+
     @app.callback(
         [
             Output("color-tag-select", "value"),
@@ -69,7 +119,9 @@ def register_review_callbacks(app):
         state = ensure_state(store_data)
         color_val = state.get("color_tags", {}).get("selected_slots", []) or []
         tags_status = state.get("tags", {}).get("status")
-        interval_disabled = tags_status != "loading"
+        # SSE push 中はポーリング不要（進捗は assets/enrichmentEvents.js が store に書き込む）
+        push_mode = state.get("meta", {}).get("enrichment") == "push"
+        interval_disabled = tags_status != "loading" or push_mode
         barcode_ready = state["barcode"]["status"] in {"captured", "manual", "skipped"}
         photo_ready = state["front_photo"]["status"] in {"captured", "skipped"}
         save_disabled = not (barcode_ready or photo_ready)
@@ -84,7 +136,7 @@ def register_review_callbacks(app):
     def _update_color_tags(selected, store_data):
         state = ensure_state(store_data)
         state["color_tags"]["selected_slots"] = selected or []
-        return state
+        return patch_state(store_data, state)
 
     @app.callback(
         Output("tag-feedback", "children"), Input("registration-store", "data")
@@ -132,8 +184,11 @@ def register_review_callbacks(app):
         other_tags = other_tags or []
         note_text = (note_text or "").strip()
 
-        # 画像説明（IOインテリジェンスの説明）
+        # 画像説明（IOインテリジェンスの説明）。ストリーミング中は途中経過を表示する
         description = state.get("front_photo", {}).get("description")
+        description_streaming = (
+            state.get("front_photo", {}).get("description_status") == "streaming"
+        )
 
         barcode_value = state["barcode"].get("value") or "未取得"
         barcode_type = state["barcode"].get("type") or "不明"
@@ -188,6 +243,9 @@ def register_review_callbacks(app):
                             description or "画像説明は生成されていません。",
                             className="description-text",
                         ),
+                        html.Div("生成中...", className="lookup-message")
+                        if description_streaming
+                        else None,
                     ],
                     className="review-summary-card",
                 ),
@@ -294,6 +352,11 @@ def register_review_callbacks(app):
 
             raise PreventUpdate
 
+        # サーバー側ジョブが SSE で結果を返すモードでは二重に処理しない
+        if state.get("meta", {}).get("enrichment") == "push":
+            dash_debug_print("DEBUG: process_tags skipping - enrichment is pushed via SSE")
+            raise PreventUpdate
+
         front_photo = state.get("front_photo", {})
         photo_status = front_photo.get("status")
         description_status = front_photo.get("description_status", "idle")
@@ -308,6 +371,8 @@ def register_review_callbacks(app):
             raise PreventUpdate
 
         tags_state["processing_lock"] = True
+        # 説明生成とタグ生成で締め切り・リトライ予算を共有する
+        deadline = Deadline(ENRICHMENT_DEADLINE_SEC)
 
         # 1. 必要であれば画像説明を生成
         if photo_status == "captured" and description_status == "pending":
@@ -320,7 +385,7 @@ def register_review_callbacks(app):
 
             try:
                 description_result = describe_image(
-                    vision_source, raw_base64=vision_raw
+                    vision_source, raw_base64=vision_raw, deadline=deadline
                 )
                 dash_debug_print(
                     f"DEBUG: describe_image result status: {description_result.get('status')}"
@@ -347,9 +412,7 @@ def register_review_callbacks(app):
                 state["tags"]["status"] = "error"
                 state["tags"]["message"] = f"画像説明生成エラー: {str(io_error)}"
                 state["tags"]["processing_lock"] = False
-                from services.state_utils import serialise_state
-
-                return serialise_state(state)
+                return patch_state(store_data, state)
 
             if description_result.get("status") == "success":
                 dash_debug_print("DEBUG: Description generation successful")
@@ -380,11 +443,11 @@ def register_review_callbacks(app):
         from services.tag_service import _update_tags
 
         dash_debug_print("DEBUG: Calling _update_tags from process_tags")
-        _update_tags(state)
+        _update_tags(state, deadline=deadline)
         final_status = state.get("tags", {}).get("status")
         if final_status != "loading":
             state["tags"]["processing_lock"] = False
-        result = ensure_state(state)
+        result = patch_state(store_data, state)
         dash_debug_print("DEBUG: process_tags completed")
         return result
 
@@ -501,6 +564,7 @@ def register_review_callbacks(app):
         [
             Output("rakuten-lookup-display", "children"),
             Output("io-intelligence-tags-display", "children"),
+            Output("similar-items-display", "children"),
         ],
         [
             Input("registration-store", "data"),
@@ -530,7 +594,12 @@ def register_review_callbacks(app):
         tags_data = state.get("tags", {})
         io_display = _render_tags_card(tags_data)
 
-        return rakuten_display, io_display
+        similar_display = [
+            _render_quality_notice(state["front_photo"].get("quality")),
+            _render_similar_card(state["front_photo"].get("similar")),
+        ]
+
+        return rakuten_display, io_display, similar_display
 
     @app.callback(
         Output("auto-fill-trigger", "children"),
@@ -1,47 +1,77 @@
+import re
+
 from dash import html
 from dash import dcc
-from dash import callback, Output, Input, State, callback_context, register_page, no_update
+from dash import (
+    ClientsideFunction,
+    Input,
+    Output,
+    Patch,
+    State,
+    callback,
+    callback_context,
+    clientside_callback,
+    no_update,
+    register_page,
+)
 from dash.dependencies import ALL
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-from typing import Mapping, List, Dict, Any
-from services.tag_service import ensure_default_color_tags
-from services.product_color_tag_service import get_product_color_tag_slots
+from typing import Mapping, List, Dict, Any, Optional
+from services import gallery_cache, gallery_facets, search_text
+from services.tag_service import (
+    ensure_default_color_tags,
+    get_category_tags_ordered,
+    get_receipt_location_tags_ordered,
+)
 
 Photo = Mapping[str, str]
 
+# gallery-products-store の形式。v1（行そのものを session に持つ形）は読み直す
+GALLERY_STORE_VERSION = 2
+
+_ICON_CLASS_RE = re.compile(r"bi-[a-z0-9-]+")
+
+
+def _current_members_id() -> Optional[str]:
+    try:
+        from flask import g, has_app_context
+    except Exception:
+        return None
+    if not has_app_context():
+        return None
+    uid = getattr(g, "user_id", None)
+    return str(uid) if uid else None
+
 
 def _gallery_store_loading() -> dict:
     """初回・再取得前。pathname コールバック完了まで空リストと区別する。"""
     return {
         "status": "loading",
-        "items": [],
-        "offset": 0,
+        "version": None,
+        "cursor": None,
+        "ids": [],
         "hasMore": False,
-        "v": 1,
+        "v": GALLERY_STORE_VERSION,
     }
 
 
 def _gallery_store_ready_for_cache(store_data) -> bool:
-    """session に「取得済み」が載っているとき True（pathname で再フェッチを省略）。"""
-    if store_data is None:
-        return False
-    if isinstance(store_data, list):
-        return True
+    """session の版がサーバー側キャッシュと一致するとき True（pathname で再フェッチを省略）。"""
     if not isinstance(store_data, dict):
         return False
-    if store_data.get("status") == "loading":
+    if store_data.get("status") != "ready" or store_data.get("v") != GALLERY_STORE_VERSION:
         return False
-    return True
+    return gallery_cache.is_current(_current_members_id(), store_data.get("version"))
 
 
 def _gallery_products_loading(store_data) -> bool:
-    """UI はローディング。None は旧セッション互換。"""
-    if store_data is None:
+    """UI はローディング。None・旧形式（v1）の session は読み直しが終わるまでローディング扱い。"""
+    if not isinstance(store_data, dict):
         return True
-    if isinstance(store_data, dict) and store_data.get("status") == "loading":
+    if store_data.get("v") != GALLERY_STORE_VERSION:
         return True
-    return False
+    return store_data.get("status") == "loading"
 
 
 def _photo_unique_id(photo: Photo, fallback: str) -> str:
@@ -89,36 +119,6 @@ def _photo_thumb_url(photo: Photo):
     return None
 
 
-def _attach_color_slots(
-    supabase, products: List[Dict[str, Any]]
-) -> List[Dict[str, Any]]:
-    """製品リストに color_slots を付与する。"""
-    if not products:
-        return products
-    ids: List[int] = []
-    for p in products:
-        if not isinstance(p, dict):
-            continue
-        raw = p.get("registration_product_id")
-        if raw is None or raw == "":
-            continue
-        try:
-            ids.append(int(raw))
-        except (TypeError, ValueError):
-            continue
-    slots_map = get_product_color_tag_slots(supabase, None, ids)
-    for p in products:
-        if not isinstance(p, dict):
-            continue
-        raw = p.get("registration_product_id")
-        try:
-            pid_int = int(raw) if raw is not None and raw != "" else None
-        except (TypeError, ValueError):
-            pid_int = None
-        p["color_slots"] = slots_map.get(pid_int, []) if pid_int is not None else []
-    return products
-
-
 def _slot_to_color_map() -> Dict[int, str]:
     tags = ensure_default_color_tags() or []
     out: Dict[int, str] = {}
@@ -145,109 +145,86 @@ def _embed_dict(row: Dict[str, Any], key: str):
     return None
 
 
-def _render_product_tag_chips(photo: Dict[str, Any]) -> html.Div:
-    """一覧カード用のタグチップ（カラー・カテゴリ・収納）。"""
-    sm = _slot_to_color_map()
-    pieces: List[Any] = []
+def _icon_class(raw: Optional[str], fallback: str) -> str:
+    """Bootstrap Icons のクラス名（ブラウザ側で className に入れるため bi-英数字とハイフンだけ許す）。"""
+    ic = (raw or "").strip()
+    if ic and not ic.startswith("bi-"):
+        ic = f"bi-{ic}"
+    return ic if _ICON_CLASS_RE.fullmatch(ic) else fallback
+
+
+def _card_chips(photo: Dict[str, Any], slot_colors: Optional[Dict[int, str]]) -> List[Dict[str, str]]:
+    """一覧カードのタグチップ（カラー・カテゴリ・収納）。色は行（RPC）→ 描画単位のマップの順に使う。"""
+    sm = photo.get("color_slot_colors")
+    if not isinstance(sm, dict):
+        sm = slot_colors if slot_colors is not None else _slot_to_color_map()
+    chips: List[Dict[str, str]] = []
     for s in photo.get("color_slots") or []:
         try:
             si = int(s)
         except (TypeError, ValueError):
             continue
-        bg = sm.get(si, "#adb5bd")
-        pieces.append(
-            html.Span(
-                "",
-                title=f"色スロット{si}",
-                style={
-                    "display": "inline-block",
-                    "width": "10px",
-                    "height": "10px",
-                    "borderRadius": "2px",
-                    "background": bg,
-                    "border": "1px solid rgba(0,0,0,0.12)",
-                },
-            )
-        )
+        chips.append({"color": str(sm.get(si, "#adb5bd")), "title": f"色スロット{si}"})
     ct = _embed_dict(photo, "category_tag")
     if ct and ct.get("category_tag_name"):
-        ic = (ct.get("category_tag_icon") or "bi-tag").strip()
-        if not ic.startswith("bi-"):
-            ic = f"bi-{ic}" if ic else "bi-tag"
-        pieces.append(
-            html.Span(
-                [html.I(className=ic, style={"fontSize": "0.75rem"})],
-                className="badge rounded-pill bg-light text-dark border",
-                style={"padding": "2px 6px"},
-                title=str(ct.get("category_tag_name") or ""),
-            )
+        chips.append(
+            {
+                "icon": _icon_class(ct.get("category_tag_icon"), "bi-tag"),
+                "title": str(ct.get("category_tag_name") or ""),
+            }
         )
     rl = _embed_dict(photo, "receipt_location")
     if rl and rl.get("receipt_location_name"):
-        ic = (rl.get("receipt_location_icon") or "bi-box-seam").strip()
-        if not ic.startswith("bi-"):
-            ic = f"bi-{ic}" if ic else "bi-box-seam"
-        pieces.append(
-            html.Span(
-                [html.I(className=ic, style={"fontSize": "0.75rem"})],
-                className="badge rounded-pill bg-light text-dark border",
-                style={"padding": "2px 6px"},
-                title=str(rl.get("receipt_location_name") or ""),
-            )
+        chips.append(
+            {
+                "icon": _icon_class(rl.get("receipt_location_icon"), "bi-box-seam"),
+                "title": str(rl.get("receipt_location_name") or ""),
+            }
         )
-    if not pieces:
-        return html.Div()
-    return html.Div(pieces, className="d-flex flex-wrap gap-1 align-items-center mt-1")
-
-
-def _normalize_gallery_color_filter_slots(raw) -> List[int]:
-    """Store 由来の値を 1..7 の整数リストに正規化（bool の True→1 等を除外）。"""
-    out: List[int] = []
-    if raw is None:
-        return out
-    if isinstance(raw, bool):
-        return out
-    if isinstance(raw, int):
-        return [raw] if 1 <= raw <= 7 else out
-    if not isinstance(raw, (list, tuple)):
-        return out
-    for x in raw:
-        if isinstance(x, bool):
-            continue
-        try:
-            i = int(x)
-        except (TypeError, ValueError):
-            continue
-        if 1 <= i <= 7 and i not in out:
-            out.append(i)
-    return sorted(out)
-
-
-def _filter_products(products: List[Dict[str, Any]], text: str, slots: List[int]):
-    """テキストとカラータグでフィルタ。slotsはOR、テキストはAND適用。"""
-    text = (text or "").strip().lower()
-    slots_set = set(_normalize_gallery_color_filter_slots(slots or []))
-
-    def match_text(p: Dict[str, Any]) -> bool:
-        if not text:
-            return True
-        fields = [
-            p.get("product_name"),
-            p.get("product_group_name"),
-            p.get("works_series_name"),
-            p.get("title"),
-            p.get("character_name"),
-            p.get("memo"),
-        ]
-        return any((f or "").lower().find(text) >= 0 for f in fields)
+    return chips
+
+
+def _card_payload(photo: Dict[str, Any], slot_colors: Optional[Dict[int, str]]) -> Dict[str, Any]:
+    """
+    assets/galleryGrid.js が描画する 1 枚分のデータ（コンポーネントツリーではなく値だけを送る）。
+    search は DB の search_text と同じ正規化済みテキストで、ブラウザ内の絞り込みに使う。
+    """
+    fields = [
+        photo.get("product_name"),
+        photo.get("product_group_name"),
+        photo.get("works_series_name"),
+        photo.get("title"),
+        photo.get("character_name"),
+        photo.get("memo"),
+    ]
+    slots = []
+    for raw in photo.get("color_slots") or []:
+        slot = gallery_cache.as_id(raw)
+        if slot is not None and 1 <= slot <= 7:
+            slots.append(slot)
+    return {
+        "id": gallery_cache.row_id(photo),
+        "thumb": _photo_thumb_url(photo),
+        "name": photo.get("product_name") or "名称未設定",
+        "sub": photo.get("title")
+        or photo.get("character_name")
+        or photo.get("works_series_name")
+        or "説明なし",
+        "memo": photo.get("memo") or "",
+        "search": search_text.fold(" ".join(f for f in fields if f)),
+        "slots": slots,
+        "chips": _card_chips(photo, slot_colors),
+    }
 
-    def match_slots(p: Dict[str, Any]) -> bool:
-        if not slots_set:
-            return True
-        ps = set(int(s) for s in p.get("color_slots") or [])
-        return bool(ps & slots_set)  # OR
 
-    return [p for p in products if match_text(p) and match_slots(p)]
+def _card_payloads(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # RPC の行は slot の色を持つ。持たない行があるときだけ、描画 1 回につき 1 度だけ色マップを読む
+    slot_colors = (
+        None
+        if all(isinstance(p.get("color_slot_colors"), dict) for p in products)
+        else _slot_to_color_map()
+    )
+    return [_card_payload(photo, slot_colors) for photo in products]
 
 
 def _render_gallery_loading():
@@ -266,220 +243,78 @@ def _render_gallery_loading():
     )
 
 
-def _render_cards(products: List[Dict[str, Any]], view_mode: str):
-    if not products:
-        return html.Div(
-            [
-                html.H4("まだ写真が登録されていません", className="mb-2"),
-                html.Div(
-                    "「写真を登録」からバーコードまたは写真で登録を開始できます。",
-                    className="text-muted",
-                ),
-                html.A(
-                    [html.I(className="bi bi-camera me-2"), "写真を登録する"],
-                    href="/register/barcode",
-                    className="btn btn-primary mt-3",
-                ),
-            ],
-            className="card-main-secondary mb-4",
-        )
+def _render_gallery_empty():
+    return html.Div(
+        [
+            html.H4("まだ写真が登録されていません", className="mb-2"),
+            html.Div(
+                "「写真を登録」からバーコードまたは写真で登録を開始できます。",
+                className="text-muted",
+            ),
+            html.A(
+                [html.I(className="bi bi-camera me-2"), "写真を登録する"],
+                href="/register/barcode",
+                className="btn btn-primary mt-3",
+            ),
+        ],
+        className="card-main-secondary mb-4",
+    )
 
-    summary = html.Div(
+
+def _render_gallery_shell(total_label: Optional[str] = None) -> html.Div:
+    """
+    一覧の枠だけを描画する。カードは gallery-cards のデータから assets/galleryGrid.js が
+    見えている範囲（前後の余白分を含む）だけを #gallery-virtual に描く。
+    件数の表示は galleryGrid.js が読み込み済みの件数・ブラウザ内の絞り込み結果に合わせて書く。
+    """
+    return html.Div(
         [
             html.P(
-                f"全 {len(products)} 件の登録があります",
+                total_label or "",
+                id="gallery-summary",
                 className="text-muted text-center mb-4",
-            )
+                **({"data-total-label": total_label} if total_label else {}),
+            ),
+            # ブラウザ内の絞り込みで 1 件も残らないときだけ表示する
+            html.Div(
+                "条件に一致するアイテムはありません。",
+                id="gallery-filter-empty",
+                className="text-muted text-center mb-4",
+                style={"display": "none"},
+            ),
+            html.Div(id="gallery-virtual", className="gallery-virtual"),
         ]
     )
-    grid_items = []
-    for photo in products:
-        thumb_url = _photo_thumb_url(photo)
-        content = html.Div(
-            [
-                (
-                    html.Img(
-                        src=thumb_url,
-                        style={
-                            "width": "100%",
-                            "height": "150px",
-                            "objectFit": "cover",
-                            "borderTopLeftRadius": "10px",
-                            "borderTopRightRadius": "10px",
-                        },
-                    )
-                    if thumb_url
-                    else html.Div(
-                        [
-                            html.I(
-                                className="bi bi-image",
-                                style={"fontSize": "28px"},
-                            )
-                        ],
-                        className="d-flex align-items-center justify-content-center photo-placeholder",
-                        style={
-                            "height": "150px",
-                            "borderTopLeftRadius": "10px",
-                            "borderTopRightRadius": "10px",
-                            "background": "#f8f9fa",
-                        },
-                    )
-                ),
-                        html.Div(
-                            [
-                                html.Div(
-                                    photo.get("product_name") or "名称未設定",
-                                    className="fw-semibold text-dark",
-                                ),
-                                html.Div(
-                                    photo.get("title")
-                                    or photo.get("character_name")
-                                    or photo.get("works_series_name")
-                                    or "説明なし",
-                                    className="text-muted small",
-                                ),
-                                _render_product_tag_chips(photo),
-                            ],
-                            className="p-2",
-                            style={
-                                "minHeight": "72px",
-                                "overflow": "hidden",
-                            },
-                        ),
-            ],
-            className="h-100"
-        )
-
-        card = (
-            html.Button(
-                content,
-                id={"type": "gallery-thumb", "index": photo.get("registration_product_id")},
-                className="photo-card-btn text-start p-0 border-0",
-                n_clicks=0,
-                style={
-                    "borderRadius": "10px",
-                    "overflow": "hidden",
-                    "boxShadow": "0 2px 6px rgba(0,0,0,0.08)",
-                    "background": "var(--bs-card-bg)",
-                    "minHeight": "228px",
-                    "height": "auto",
-                    "width": "100%",
-                },
-            )
-            if not photo.get("_dummy")
-            else html.Div(
-                html.Div(
-                    [
-                        html.Div(
-                            [
-                                html.I(
-                                    className="bi bi-image",
-                                    style={"fontSize": "28px"},
-                                )
-                            ],
-                            className="d-flex align-items-center justify-content-center photo-placeholder",
-                            style={
-                                "height": "150px",
-                                "background": "#f8f9fa",
-                            },
-                        ),
-                        html.Div(
-                            [
-                                html.Div("サンプル枠", className="fw-bold text-dark mb-1"),
-                                html.Div("追加の写真が表示されます", className="text-muted small"),
-                            ],
-                            className="p-2",
-                        ),
-                    ],
-                    className="h-100",
-                ),
-                style={
-                    "borderRadius": "10px",
-                    "overflow": "hidden",
-                    "boxShadow": "0 2px 6px rgba(0,0,0,0.08)",
-                    "background": "var(--bs-card-bg)",
-                    "height": "214px",
-                    "width": "100%",
-                },
-            )
-        )
-        grid_items.append(card)
 
-    grid = html.Div(
-        grid_items,
-        className="photo-grid",
-        id="gallery-grid-wrapper",
-        style={} if view_mode == "thumb" else {"display": "none"},
-    )
 
-    list_view = html.Div(
+def _facet_labels(color_tag_palette) -> Dict[str, List[List[Any]]]:
+    """絞り込みの選択肢（[値, 表示名]）。件数は Store の counts から後で付ける。0 は未設定。"""
+    categories = [
+        [int(row["category_tag_id"]), (row.get("category_tag_name") or "").strip() or f"ID{row['category_tag_id']}"]
+        for row in get_category_tags_ordered() or []
+        if row.get("category_tag_id") is not None and int(row.get("category_tag_use_flag") or 0) == 1
+    ]
+    locations = [
         [
-            html.Div(
-                [
-                    dbc.ListGroup(
-                        [
-                            dbc.ListGroupItem(
-                                [
-                                    html.Img(
-                                        src=_photo_thumb_url(photo),
-                                        style={
-                                            "width": "56px",
-                                            "height": "56px",
-                                            "objectFit": "cover",
-                                        },
-                                        className="rounded",
-                                    )
-                                    if _photo_thumb_url(photo)
-                                    else html.Div(
-                                        html.I(
-                                            className="bi bi-image",
-                                            style={"fontSize": "22px"},
-                                        ),
-                                        className="d-flex align-items-center justify-content-center border rounded",
-                                        style={"width": "56px", "height": "56px"},
-                                    ),
-                                    html.Div(
-                                        [
-                                            html.Div(
-                                                photo.get("product_name")
-                                                or "名称未設定",
-                                                className="fw-semibold text-dark",
-                                            ),
-                                            html.Div(
-                                                photo.get("title")
-                                                or photo.get("character_name")
-                                                or photo.get("works_series_name")
-                                                or "説明なし",
-                                                className="text-muted small",
-                                            ),
-                                            html.Div(
-                                                photo.get("memo") or "",
-                                                className="text-muted small",
-                                            ),
-                                            _render_product_tag_chips(photo),
-                                        ],
-                                        className="flex-grow-1 text-start",
-                                    ),
-                                ],
-                                id={
-                                    "type": "gallery-thumb",
-                                    "index": photo.get("registration_product_id"),
-                                },
-                                className="list-group-item list-group-item-action d-flex align-items-center gap-3",
-                                n_clicks=0,
-                            )
-                            for photo in products
-                        ]
-                    )
-                ]
-            )
-        ],
-        className="list-group mb-4",
-        id="gallery-list-wrapper",
-        style={} if view_mode == "list" else {"display": "none"},
-    )
+            int(row["receipt_location_id"]),
+            (row.get("receipt_location_name") or "").strip() or f"ID{row['receipt_location_id']}",
+        ]
+        for row in get_receipt_location_tags_ordered() or []
+        if row.get("receipt_location_id") is not None and int(row.get("receipt_location_use_flag") or 0) == 1
+    ]
+    return {
+        "category": categories + [[0, "未設定"]],
+        "location": locations + [[0, "未設定"]],
+        "color": [[idx + 1, str(name)] for idx, (name, _color) in enumerate(color_tag_palette)],
+    }
+
 
-    return html.Div([summary, grid, list_view])
+def _facet_options(labels, counts, kind: str) -> List[Dict[str, Any]]:
+    """Dropdown・Checklist の options。counts があれば表示名に件数を付ける。"""
+    return [
+        {"label": gallery_facets.count_label(str(name), counts, kind, value), "value": value}
+        for value, name in labels or []
+    ]
 
 
 def render_gallery(search: str = "", view: str = "thumb", **kwargs) -> html.Div:
@@ -526,7 +361,9 @@ def render_gallery(search: str = "", view: str = "thumb", **kwargs) -> html.Div:
                         placeholder="タグで検索（例: 猫、白、キーホルダー）",
                         className="form-control me-2",
                         style={"maxWidth": "420px"},
-                        type="text",
+                        type="search",
+                        # Enter・フォーカスを外したときだけサーバー検索する（1 打鍵ごとに往復しない）
+                        debounce=True,
                     ),
                 ],
                 className="d-flex flex-column flex-md-row align-items-start",
@@ -556,6 +393,66 @@ def render_gallery(search: str = "", view: str = "thumb", **kwargs) -> html.Div:
         className="card-main-secondary mb-3",
     )
 
+    facet_labels = _facet_labels(color_tag_palette)
+    facet_panel = html.Div(
+        [
+            html.H4("絞り込み", className="card-title"),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Dropdown(
+                            id="gallery-facet-category",
+                            options=_facet_options(facet_labels["category"], None, "category"),
+                            value=[],
+                            multi=True,
+                            placeholder="カテゴリ",
+                        ),
+                        md=4,
+                        className="mb-2",
+                    ),
+                    dbc.Col(
+                        dcc.Dropdown(
+                            id="gallery-facet-location",
+                            options=_facet_options(facet_labels["location"], None, "location"),
+                            value=[],
+                            multi=True,
+                            placeholder="収納場所",
+                        ),
+                        md=4,
+                        className="mb-2",
+                    ),
+                    dbc.Col(
+                        dbc.Select(
+                            id="gallery-sort",
+                            options=[
+                                {"label": label, "value": value}
+                                for value, label in gallery_facets.SORT_OPTIONS
+                            ],
+                            value="date",
+                        ),
+                        md=4,
+                        className="mb-2",
+                    ),
+                ]
+            ),
+            dbc.Checklist(
+                id="gallery-facet-price",
+                options=_facet_options(gallery_facets.PRICE_BUCKETS, None, "price"),
+                value=[],
+                inline=True,
+                className="mb-1",
+            ),
+            dbc.Checklist(
+                id="gallery-facet-flags",
+                options=_facet_options(gallery_facets.FLAGS, None, "flags"),
+                value=[],
+                inline=True,
+            ),
+            dcc.Store(id="gallery-facet-labels", data=facet_labels),
+        ],
+        className="card-main-secondary mb-3",
+    )
+
     view_toggle = html.Div(
         [
             dbc.RadioItems(
@@ -575,6 +472,7 @@ def render_gallery(search: str = "", view: str = "thumb", **kwargs) -> html.Div:
     dashboard_content = html.Div(
         [
             tag_search,
+            facet_panel,
             view_toggle,
             html.Div(
                 [
@@ -595,6 +493,10 @@ def render_gallery(search: str = "", view: str = "thumb", **kwargs) -> html.Div:
                 className="d-flex justify-content-end mb-2",
             ),
             html.Div(id="gallery-content"),
+            # 読み込み済みカードのデータ（続きのページは Patch で末尾に足す）と、その版・件数
+            dcc.Store(id="gallery-cards", data=[]),
+            dcc.Store(id="gallery-cards-meta", data=None),
+            dcc.Store(id="gallery-filter-visible"),
         ]
     )
 
@@ -603,120 +505,111 @@ def render_gallery(search: str = "", view: str = "thumb", **kwargs) -> html.Div:
     )
 
 
-@callback(
+# 色スウォッチの選択・枠の切り替えはブラウザ内で行う（assets/galleryFilter.js）
+clientside_callback(
+    ClientsideFunction(namespace="galleryFilter", function_name="swatchStyles"),
     Output({"type": "gallery-color-swatch", "slot": ALL}, "style"),
     Input("gallery-color-filter", "data"),
     State({"type": "gallery-color-swatch", "slot": ALL}, "style"),
     prevent_initial_call=False,
 )
-def _update_swatch_styles(selected_slots, styles):
-    selected_set = set(_normalize_gallery_color_filter_slots(selected_slots))
-    user_color_tags = ensure_default_color_tags() or []
-    slot_to_color = {
-        int(item.get("slot")): (item.get("color_tag_color") or "#6c757d")
-        for item in user_color_tags
-        if item.get("slot")
-    }
-    fallback_colors = [
-        "#dc3545",
-        "#0d6efd",
-        "#198754",
-        "#ffc107",
-        "#6f42c1",
-        "#212529",
-        "#f8f9fa",
-    ]
 
-    updated = []
-    target_count = len(styles or [])
-    for idx in range(target_count):
-        slot = idx + 1
-        base_color = slot_to_color.get(slot)
-        if not base_color and idx < len(fallback_colors):
-            base_color = fallback_colors[idx]
-        base_color = base_color or "#6c757d"
-
-        style = {
-            "display": "inline-block",
-            "width": "32px",
-            "height": "32px",
-            "background": base_color,
-            "borderRadius": "8px",
-            "border": "3px solid #0d6efd"
-            if slot in selected_set
-            else "1px solid rgba(0,0,0,0.15)",
-        }
-        if slot in selected_set:
-            style["boxShadow"] = "0 0 0 0.2rem rgba(13, 110, 253, 0.25)"
-        updated.append(style)
-    return updated
-
-
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace="galleryFilter", function_name="toggleSlot"),
     Output("gallery-color-filter", "data"),
     Input({"type": "gallery-color-swatch", "slot": ALL}, "n_clicks"),
     State("gallery-color-filter", "data"),
     prevent_initial_call=True,
 )
-def _toggle_color_filter(n_clicks, selected):
-    ctx = callback_context
-    if not ctx.triggered:
-        raise PreventUpdate
-    trig = ctx.triggered_id
-    if not isinstance(trig, dict):
-        raise PreventUpdate
-    slot = trig.get("slot")
-    if slot is None:
-        raise PreventUpdate
-    try:
-        slot_i = int(slot)
-    except (TypeError, ValueError):
-        raise PreventUpdate
-    if not (1 <= slot_i <= 7):
-        raise PreventUpdate
 
-    # ALL の再マウント等で n_clicks=0 のまま発火すると slot 1 だけ選ばれる誤動作になるため、対象ボタンの実クリックのみ処理する
-    seq = n_clicks if isinstance(n_clicks, (list, tuple)) else (() if n_clicks is None else (n_clicks,))
-    idx = slot_i - 1
-    if idx < 0 or idx >= len(seq):
-        raise PreventUpdate
-    try:
-        clicks_here = int(seq[idx] or 0)
-    except (TypeError, ValueError):
-        raise PreventUpdate
-    if clicks_here < 1:
-        raise PreventUpdate
-
-    current = set(_normalize_gallery_color_filter_slots(selected))
-    if slot_i in current:
-        current.remove(slot_i)
-    else:
-        if len(current) < 7:
-            current.add(slot_i)
-    return sorted(current)
+# カードの描画（見えている範囲だけ）・ブラウザ内の絞り込み・表示切り替え・詳細への移動（assets/galleryGrid.js）
+clientside_callback(
+    ClientsideFunction(namespace="galleryGrid", function_name="render"),
+    Output("gallery-filter-visible", "data"),
+    Input("gallery-cards", "data"),
+    Input("gallery-view-mode", "value"),
+    Input("gallery-color-filter", "data"),
+    prevent_initial_call=False,
+)
 
 
-def _gallery_items_from_store(store_data):
-    """session Store の dict / 旧 list 双方を許容する。"""
-    if store_data is None:
+def _gallery_ids_from_store(store_data) -> List[int]:
+    if not isinstance(store_data, dict) or store_data.get("v") != GALLERY_STORE_VERSION:
         return []
-    if isinstance(store_data, dict):
-        return [p for p in (store_data.get("items") or []) if isinstance(p, dict)]
-    if isinstance(store_data, list):
-        return [p for p in store_data if isinstance(p, dict)]
-    return []
+    return [pid for pid in (gallery_cache.as_id(x) for x in store_data.get("ids") or []) if pid is not None]
 
 
-def _gallery_pack(items, has_more: bool) -> dict:
+def _gallery_items_from_store(
+    supabase, store_data, ids: Optional[List[int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Store の id（ids を渡したときはその一部）の行をサーバー側キャッシュから引く。
+    無い行（別プロセス・期限切れ）は id で読み直す。
+    """
+    if ids is None:
+        ids = _gallery_ids_from_store(store_data)
+    if not ids:
+        return []
+    members_id = _current_members_id()
+    version = store_data.get("version")
+    found, missing = gallery_cache.get_rows(members_id, version, ids)
+    if missing and supabase is not None:
+        from services.photo_service import attach_color_slots, get_products_by_ids
+
+        fetched = attach_color_slots(supabase, get_products_by_ids(supabase, missing))
+        gallery_cache.fill(members_id, version, fetched)
+        for row in fetched:
+            pid = gallery_cache.row_id(row)
+            if pid is not None:
+                found[pid] = row
+    return [found[pid] for pid in ids if pid in found]
+
+
+def _gallery_pack(
+    version: Optional[int],
+    ids: List[int],
+    cursor: Optional[str],
+    query: str = "",
+    facets: Optional[dict] = None,
+    counts: Optional[dict] = None,
+    total: Optional[int] = None,
+) -> dict:
+    """
+    session に載せるのはカーソル・版・表示中の id・検索語・絞り込み条件と件数だけ（行はサーバー側キャッシュ）。
+    """
     return {
         "status": "ready",
-        "items": items,
-        "offset": len(items),
-        "hasMore": has_more,
-        "v": 1,
+        "version": version,
+        "cursor": cursor,
+        "ids": ids,
+        "hasMore": cursor is not None,
+        "query": query,
+        "facets": gallery_facets.normalize(facets),
+        "counts": counts,
+        "total": total,
+        "v": GALLERY_STORE_VERSION,
     }
 
 
+def _gallery_store_query(store_data) -> str:
+    return str(store_data.get("query") or "") if isinstance(store_data, dict) else ""
+
+
+def _gallery_store_facets(store_data) -> dict:
+    return gallery_facets.normalize(store_data.get("facets") if isinstance(store_data, dict) else None)
+
+
+def _gallery_first_page(supabase, page_size: int, query: str = "", facets: Optional[dict] = None) -> dict:
+    """先頭ページと項目ごとの件数。query・facets はコレクション全体に対してサーバー側で当てる。"""
+    from services.photo_service import get_gallery_facet_page
+
+    query = (query or "").strip()
+    facets = gallery_facets.normalize(facets)
+    page = get_gallery_facet_page(supabase, limit=page_size, search=query, facets=facets)
+    version, ids = gallery_cache.reset(_current_members_id(), page.rows)
+    return _gallery_pack(version, ids, page.next_cursor, query, facets, page.counts, page.total)
+
+
 @callback(
     Output("gallery-products-store", "data", allow_duplicate=True),
     Output("gallery-tags-dirty", "data", allow_duplicate=True),
@@ -729,7 +622,6 @@ def _gallery_pack(items, has_more: bool) -> dict:
 )
 def _gallery_on_pathname(pathname, nav_hist, cur, dirty):
     """他画面から /gallery へ来たときの初回・再訪。登録フローからは常に再取得（C2）。"""
-    from services.photo_service import get_products_page
     from services.supabase_client import get_supabase_client
 
     if pathname != "/gallery":
@@ -738,18 +630,23 @@ def _gallery_on_pathname(pathname, nav_hist, cur, dirty):
     page_size = 48
     supabase = get_supabase_client()
     if supabase is None:
-        return _gallery_pack([], False), no_update, []
+        return _gallery_pack(None, [], None), no_update, []
 
     prev_path = (nav_hist or {}).get("prev") if isinstance(nav_hist, dict) else None
     from_register = isinstance(prev_path, str) and prev_path.startswith("/register")
     need_refresh = isinstance(dirty, dict) and bool(dirty.get("refresh"))
-    # loading プレースホルダは truthy のため、ready のときだけキャッシュを使う
-    if _gallery_store_ready_for_cache(cur) and not from_register and not need_refresh:
+    # ready かつサーバー側キャッシュが書き込みで無効化されていないときだけ再取得を省く。
+    # 再訪時の検索欄・絞り込みは空なので、検索・絞り込み結果が載っている Store は全件に取り直す
+    if (
+        _gallery_store_ready_for_cache(cur)
+        and not _gallery_store_query(cur)
+        and gallery_facets.is_default(_gallery_store_facets(cur))
+        and not from_register
+        and not need_refresh
+    ):
         raise PreventUpdate
 
-    batch = get_products_page(supabase, limit=page_size, offset=0)
-    batch = _attach_color_slots(supabase, batch)
-    pack = _gallery_pack(batch, len(batch) >= page_size)
+    pack = _gallery_first_page(supabase, page_size)
     dirty_out = None if need_refresh else no_update
     # 一覧をサーバーから取り直したタイミングでは色フィルターをクリア（誤選択・タグ保存後の不整合を防ぐ）
     return pack, dirty_out, []
@@ -759,14 +656,27 @@ def _gallery_on_pathname(pathname, nav_hist, cur, dirty):
     Output("gallery-products-store", "data", allow_duplicate=True),
     Input("gallery-load-more", "n_clicks"),
     Input("gallery-refresh-list", "n_clicks"),
+    Input("gallery-search-input", "value"),
+    Input("gallery-facet-category", "value"),
+    Input("gallery-facet-location", "value"),
+    Input("gallery-facet-price", "value"),
+    Input("gallery-facet-flags", "value"),
+    Input("gallery-sort", "value"),
+    State("gallery-color-filter", "data"),
     State("gallery-products-store", "data"),
     State("_pages_location", "pathname"),
     prevent_initial_call="initial_duplicate",
 )
-def _gallery_on_pager(n_more, n_refresh, cur, pathname):
-    """ページングと手動更新（ボタン）。"""
+def _gallery_on_pager(
+    n_more, n_refresh, search, category, location, price, flags, sort, color, cur, pathname
+):
+    """
+    ページング・手動更新（ボタン）・検索（確定時）・絞り込みと並び替えの変更。
+    色スウォッチの選択はブラウザ内の絞り込み（galleryFilter.js）で即時に当て、
+    サーバーには次に一覧を取り直すとき（検索・絞り込み・更新）の条件として渡す。
+    """
     from dash.exceptions import PreventUpdate as PU
-    from services.photo_service import get_products_page
+    from services.photo_service import get_gallery_facet_page
     from services.supabase_client import get_supabase_client
 
     if pathname != "/gallery":
@@ -779,109 +689,199 @@ def _gallery_on_pager(n_more, n_refresh, cur, pathname):
     page_size = 48
     supabase = get_supabase_client()
     if supabase is None:
-        return _gallery_pack([], False)
+        return _gallery_pack(None, [], None)
+
+    facets = gallery_facets.normalize(
+        {
+            "category": category,
+            "location": location,
+            "color": color,
+            "price": price,
+            "flags": flags,
+            "sort": sort,
+        }
+    )
+
+    if "gallery-search-input" in prop_id:
+        query = (search or "").strip()
+        if query == _gallery_store_query(cur):
+            raise PU
+        return _gallery_first_page(supabase, page_size, query, facets)
+
+    if "gallery-facet-" in prop_id or "gallery-sort" in prop_id:
+        if facets == _gallery_store_facets(cur):
+            raise PU
+        return _gallery_first_page(supabase, page_size, _gallery_store_query(cur), facets)
 
     if "gallery-refresh-list" in prop_id:
         if not n_refresh:
             raise PU
-        batch = get_products_page(supabase, limit=page_size, offset=0)
-        batch = _attach_color_slots(supabase, batch)
-        return _gallery_pack(batch, len(batch) >= page_size)
+        return _gallery_first_page(supabase, page_size, _gallery_store_query(cur), facets)
 
     if "gallery-load-more" in prop_id:
         if not n_more:
             raise PU
 
-        prev_items = _gallery_items_from_store(cur)
-        offset = len(prev_items)
-        more = get_products_page(supabase, limit=page_size, offset=offset)
-        more = _attach_color_slots(supabase, more)
-        merged = prev_items + list(more)
-        return _gallery_pack(merged, len(more) >= page_size)
+        prev_ids = _gallery_ids_from_store(cur)
+        version = cur.get("version") if isinstance(cur, dict) else None
+        cursor = cur.get("cursor") if isinstance(cur, dict) else None
+        # 続きのページは先頭ページと同じ条件で読む（カーソルはその条件・並びのもの）
+        query = _gallery_store_query(cur)
+        stored_facets = _gallery_store_facets(cur)
+        if not prev_ids or not isinstance(cursor, str):
+            return _gallery_first_page(supabase, page_size, query, stored_facets)
+        page = get_gallery_facet_page(
+            supabase,
+            limit=page_size,
+            cursor=cursor,
+            search=query,
+            facets=stored_facets,
+            with_counts=False,
+        )
+        if page is None:
+            # カーソルを作った経路（RPC / 登録日順の一覧）と今の経路が違う: 先頭から取り直す
+            return _gallery_first_page(supabase, page_size, query, stored_facets)
+        added = gallery_cache.extend(_current_members_id(), version, page.rows)
+        if added is None:
+            # 書き込みで無効化・期限切れ: 先頭から取り直す（古い行と混ぜない）
+            return _gallery_first_page(supabase, page_size, query, stored_facets)
+        return _gallery_pack(
+            version,
+            prev_ids + added,
+            page.next_cursor,
+            query,
+            stored_facets,
+            cur.get("counts"),
+            cur.get("total"),
+        )
 
     raise PU
 
 
+def _gallery_cards_meta(version: Optional[int], ids: List[int]) -> Optional[dict]:
+    """gallery-cards に載っているカードの版・件数・末尾の id（続きのページの判定用）。"""
+    if version is None or not ids:
+        return None
+    return {"version": version, "count": len(ids), "last": ids[-1]}
+
+
+def _gallery_appended_ids(meta, version: Optional[int], ids: List[int]) -> Optional[List[int]]:
+    """描画済みのカードの後ろに足された id。同じ版で末尾に追加されただけのときだけ返す。"""
+    if not isinstance(meta, dict) or version is None or meta.get("version") != version:
+        return None
+    count = gallery_cache.as_id(meta.get("count"))
+    if not count or count >= len(ids) or ids[count - 1] != gallery_cache.as_id(meta.get("last")):
+        return None
+    return ids[count:]
+
+
 @callback(
-    [
-        Output("gallery-load-more", "disabled"),
-        Output("gallery-content", "children"),
-    ],
+    Output("gallery-load-more", "disabled"),
+    Output("gallery-content", "children"),
+    Output("gallery-cards", "data"),
+    Output("gallery-cards-meta", "data"),
     Input("gallery-products-store", "data"),
-    Input("gallery-color-filter", "data"),
-    State("gallery-search-input", "value", allow_optional=True),
-    State("gallery-view-mode", "value", allow_optional=True),
+    State("gallery-cards-meta", "data"),
     State("_pages_location", "pathname"),
     prevent_initial_call=False,
 )
-def _gallery_products_to_ui(store_data, selected_slots, text, view_mode, pathname):
-    """同一トリガーで「さらに表示」無効化とグリッド描画をまとめ、往復を削減する。"""
+def _gallery_products_to_ui(store_data, meta, pathname):
+    """
+    同一トリガーで「さらに表示」無効化と一覧の描画をまとめ、往復を削減する。
+    続きのページは追加分のカードだけを Patch で送り、描画済みの枠・カードはそのままにする。
+    """
+    from services.supabase_client import get_supabase_client
+
     if pathname != "/gallery":
         raise PreventUpdate
-    view_mode = view_mode or "thumb"
     if _gallery_products_loading(store_data):
-        return True, _render_gallery_loading()
+        return True, _render_gallery_loading(), [], None
 
     if not store_data or not isinstance(store_data, dict):
         load_more_disabled = True
     else:
         load_more_disabled = not bool(store_data.get("hasMore"))
 
-    products = _gallery_items_from_store(store_data)
-    slots_clean = _normalize_gallery_color_filter_slots(selected_slots)
-    filtered = _filter_products(products, text, slots_clean)
-    return load_more_disabled, _render_cards(filtered, view_mode)
+    ids = _gallery_ids_from_store(store_data)
+    version = store_data.get("version") if isinstance(store_data, dict) else None
+    supabase = get_supabase_client()
+    appended = _gallery_appended_ids(meta, version, ids)
+    if appended is not None:
+        cards = Patch()
+        cards.extend(_card_payloads(_gallery_items_from_store(supabase, store_data, appended)))
+        return load_more_disabled, no_update, cards, _gallery_cards_meta(version, ids)
+
+    # 読み込み済みの行はすべてカードのデータにし、入力中のテキスト・色スロットの絞り込みはブラウザ側で当てる
+    products = _gallery_items_from_store(supabase, store_data, ids)
+    query = _gallery_store_query(store_data)
+    filtered = gallery_facets.has_filters(_gallery_store_facets(store_data))
+    if not products:
+        if query or filtered:
+            message = (
+                f"「{query}」に一致するアイテムはありません。"
+                if query
+                else "絞り込み条件に一致するアイテムはありません。"
+            )
+            content = html.Div(
+                message,
+                className="card-main-secondary mb-4 p-4 text-center text-muted",
+            )
+        else:
+            content = _render_gallery_empty()
+        return load_more_disabled, content, [], None
+
+    total = store_data.get("total") if isinstance(store_data, dict) else None
+    total_label = None
+    if isinstance(total, int) and not isinstance(total, bool):
+        total_label = (
+            f"条件に一致する {total} 件"
+            if query or filtered
+            else f"全 {total} 件の登録があります"
+        )
+    content = _render_gallery_shell(total_label)
+    if filtered and total_label is None:
+        # app_gallery_facets が未適用の DB では絞り込み・並び替えなしの一覧になる
+        content = html.Div(
+            [
+                html.Div(
+                    "この環境では絞り込み・並び替えを使えないため、すべてのアイテムを表示しています。",
+                    className="text-muted small text-center mb-2",
+                ),
+                content,
+            ]
+        )
+    return load_more_disabled, content, _card_payloads(products), _gallery_cards_meta(version, ids)
 
 
 @callback(
-    Output("_pages_location", "pathname", allow_duplicate=True),
-    Output("_pages_location", "search", allow_duplicate=True),
-    Input({"type": "gallery-thumb", "index": ALL}, "n_clicks"),
-    State("_pages_location", "search"),
-    prevent_initial_call="initial_duplicate",
+    Output("gallery-facet-category", "options"),
+    Output("gallery-facet-location", "options"),
+    Output("gallery-facet-price", "options"),
+    Output("gallery-facet-flags", "options"),
+    Output({"type": "gallery-color-swatch", "slot": ALL}, "title"),
+    Input("gallery-products-store", "data"),
+    State("gallery-facet-labels", "data"),
+    State("_pages_location", "pathname"),
+    prevent_initial_call=False,
 )
-def _navigate_to_detail(clicks, current_search):
-    from urllib.parse import parse_qs
-
-    ctx = callback_context
-    if not ctx.triggered:
-        raise PreventUpdate
-
-    triggered = ctx.triggered_id
-    if not isinstance(triggered, dict):
+def _gallery_facet_counts_to_ui(store_data, labels, pathname):
+    """先頭ページと一緒に集計した件数を、絞り込みの選択肢と色スウォッチの title に出す。"""
+    if pathname != "/gallery" or not isinstance(labels, dict):
         raise PreventUpdate
-    if triggered.get("type") != "gallery-thumb":
-        raise PreventUpdate
-
-    pid = triggered.get("index")
-    if not pid:
-        raise PreventUpdate
-
-    # Dash 3 + ALL では triggered の value が「全サムネの n_clicks 配列」のことがあり単一 int にならない。
-    # 再マウントだけの発火ではすべて 0。いずれか >= 1 のときだけ実クリックとみなす。
-    if isinstance(clicks, (list, tuple)):
-        seq = clicks
-    elif clicks is None:
-        seq = ()
-    else:
-        seq = (clicks,)
-    has_real_click = False
-    for x in seq:
-        try:
-            if int(x or 0) >= 1:
-                has_real_click = True
-                break
-        except (TypeError, ValueError):
-            continue
-    if not has_real_click:
-        raise PreventUpdate
-
-    qs = parse_qs((current_search or "").lstrip("?"))
-    view_mode = qs.get("view", ["thumb"])[0] or "thumb"
-
+    counts = store_data.get("counts") if isinstance(store_data, dict) else None
+    counts = counts if isinstance(counts, dict) else None
+    color_names = {int(value): str(name) for value, name in labels.get("color") or []}
+    titles = []
+    for out in callback_context.outputs_list[4]:
+        slot = gallery_cache.as_id((out.get("id") or {}).get("slot"))
+        name = color_names.get(slot, f"色{slot}")
+        titles.append(gallery_facets.count_label(name, counts, "color", slot))
     return (
-        "/gallery/detail",
-        f"?registration_product_id={pid}&view={view_mode or 'thumb'}",
+        _facet_options(labels.get("category"), counts, "category"),
+        _facet_options(labels.get("location"), counts, "location"),
+        _facet_options(gallery_facets.PRICE_BUCKETS, counts, "price"),
+        _facet_options(gallery_facets.FLAGS, counts, "flags"),
+        titles,
     )
 
 
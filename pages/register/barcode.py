@@ -21,6 +21,7 @@ def render_barcode_page() -> html.Div:
                         className="step-description",
                     ),
                     render_barcode_section(),
+                    html.Div(id="barcode-owned-notice"),
                     html.Div(id="barcode-feedback"),
                 ],
                 className="step-section",
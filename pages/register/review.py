@@ -19,6 +19,7 @@ def render_review_page() -> html.Div:
                     ),
                     html.Div(id="rakuten-lookup-display"),
                     html.Div(id="io-intelligence-tags-display", className="mt-3"),
+                    html.Div(id="similar-items-display", className="mt-3"),
                 ],
                 className="step-section",
             ),
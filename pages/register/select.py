@@ -9,7 +9,7 @@ from dash import (
     register_page,
 )
 
-from components.state_utils import empty_registration_state, ensure_state, serialise_state
+from components.state_utils import empty_registration_state, ensure_state, patch_state, serialise_state
 
 
 def _card(title: str, description: str, button_id: str, color: str, disabled: bool) -> html.Div:
@@ -129,7 +129,7 @@ def handle_select(quick, full, book, store_data):
     state = ensure_state(store_data)
 
     if not triggered:
-        return serialise_state(state), no_update, no_update
+        return patch_state(store_data, state), no_update, no_update
 
     trigger_id = triggered[0]["prop_id"].split(".")[0]
 
@@ -147,7 +147,7 @@ def handle_select(quick, full, book, store_data):
 
     if trigger_id == "select-book":
         message = "書籍登録は現在準備中です。"
-        return serialise_state(state), no_update, _info(message)
+        return patch_state(store_data, state), no_update, _info(message)
 
-    return serialise_state(state), no_update, no_update
+    return patch_state(store_data, state), no_update, no_update
 
@@ -0,0 +1,88 @@
+"""既存の写真に知覚ハッシュ（photo_phash / photo_dhash）を埋めるバックフィル。
+
+Storage の原本をダウンロードしてハッシュを計算し、photo に書き戻す。
+全ユーザーの写真を読むため SUPABASE_SECRET_DEFAULT_KEY（管理クライアント）が必要。
+
+    python scripts/backfill_photo_hashes.py --limit 500
+    python scripts/backfill_photo_hashes.py --dry-run
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = str(Path(__file__).resolve().parents[1])
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from services.image_hash import compute_hashes, to_signed64
+from services.supabase_client import get_secret_client
+
+BUCKET = "photos"
+PAGE_SIZE = 100
+
+
+def _pending(supabase, after_id: int):
+    response = (
+        supabase.table("photo")
+        .select("photo_id,photo_high_resolution_url")
+        .is_("photo_phash", "null")
+        .not_.is_("photo_high_resolution_url", "null")
+        .gt("photo_id", after_id)
+        .order("photo_id")
+        .limit(PAGE_SIZE)
+        .execute()
+    )
+    return getattr(response, "data", None) or []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="photo の知覚ハッシュを埋める")
+    parser.add_argument("--limit", type=int, default=0, help="処理する最大件数（0 で全件）")
+    parser.add_argument("--dry-run", action="store_true", help="計算のみで書き戻さない")
+    args = parser.parse_args()
+
+    supabase = get_secret_client()
+    if supabase is None:
+        print("ERROR: SUPABASE_SECRET_DEFAULT_KEY が設定されていません。")
+        return 1
+
+    done = failed = 0
+    after_id = 0
+    while True:
+        rows = _pending(supabase, after_id)
+        if not rows:
+            break
+        for row in rows:
+            after_id = row["photo_id"]
+            path = row.get("photo_high_resolution_url") or ""
+            if not path or path.startswith("http"):
+                # 旧形式（公開 URL）は対象外
+                continue
+            try:
+                hashes = compute_hashes(supabase.storage.from_(BUCKET).download(path))
+            except Exception as exc:
+                print(f"DEBUG: photo {after_id} download failed: {exc}")
+                hashes = None
+            if hashes is None:
+                failed += 1
+                continue
+            if not args.dry_run:
+                supabase.table("photo").update(
+                    {
+                        "photo_phash": to_signed64(hashes.phash),
+                        "photo_dhash": to_signed64(hashes.dhash),
+                    }
+                ).eq("photo_id", after_id).execute()
+            done += 1
+            if args.limit and done >= args.limit:
+                break
+        if args.limit and done >= args.limit:
+            break
+
+    print(f"updated: {done}{' (dry-run)' if args.dry_run else ''}, failed: {failed}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,435 @@
+"""画像説明からの構造化データ抽出のベンチマーク（旧: 正規表現ループ / 新: services.description_extractor）。
+
+使い方:
+    python scripts/bench_description_extractor.py --iterations 2000 --user-terms 300
+
+旧実装は比較用にこのスクリプト内へ退避している（アプリからは参照しない）。
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = str(Path(__file__).resolve().parents[1])
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from services.description_extractor import DescriptionExtractor
+
+SAMPLE_DESCRIPTIONS: List[str] = [
+    "- ブランド: なし\n- キャラクター: 星野アイ\n- 作品名: 推しの子\n- 色: ピンク、白\n- 素材: アクリル\n"
+    "- 印字テキスト: 「B小町」\n- 特徴: 描き下ろしイラストのアクリルスタンド。台座付き、限定版。",
+    "青い髪の女の子が描かれた缶バッジです。背景は水色で、雪の結晶のモチーフがあります。"
+    "金属製で表面はクリア加工、直径は約57mm。イベント限定の生誕祭グッズと思われます。",
+    "シマエナガのラバーキーホルダー。白と黒のシリコン製マスコットで、北海道のお土産。"
+    "ボールチェーン付き。パッケージに「ふわふわシマエナガ」と印字。",
+    "A blue acrylic keychain with the text LOVELIVE printed. 作品: ラブライブ！ 形状: キーホルダー",
+]
+
+
+def _legacy_extract_structured_data(description: str) -> Dict[str, Any]:
+    """Extract structured data from IO Intelligence description."""
+    structured_data = {
+        "character_name": "",
+        "works_name": "",
+        "works_series_name": "",
+        "copyright_company_name": "",
+        "product_shape": "",
+        "product_type_flags": [],
+        "other_tags": [],
+        "colors": [],
+        "materials": [],
+        "features": []
+    }
+
+    if not description:
+        return structured_data
+
+    # Extract character names (common patterns)
+    character_patterns = [
+        r'キャラクター[：:]\s*([^。\n,]*)',
+        r'キャラクター名[：:]\s*([^。\n,]*)',
+        r'キャラ[：:]\s*([^。\n,]*)',
+        r'([^、。\n]*)(?:ちゃん|さん|くん|さま)',
+        r'([^\s、。\n]*)(?:のイラスト|のフィギュア|のキャラクター)',
+    ]
+
+    for pattern in character_patterns:
+        matches = re.findall(pattern, description, re.IGNORECASE)
+        if matches:
+            # Take the first meaningful match
+            for match in matches:
+                if match.strip() and len(match.strip()) > 1:
+                    structured_data["character_name"] = match.strip()
+                    break
+            if structured_data["character_name"]:
+                break
+
+    # Extract work names (anime/manga titles)
+    work_patterns = [
+        r'作品[：:]\s*([^。\n,]*)',
+        r'アニメ[：:]\s*([^。\n,]*)',
+        r'漫画[：:]\s*([^。\n,]*)',
+        r'シリーズ[：:]\s*([^。\n,]*)',
+        r'([^、。\n]*)(?:のグッズ|のキャラクター|のイラスト)',
+    ]
+
+    for pattern in work_patterns:
+        matches = re.findall(pattern, description, re.IGNORECASE)
+        if matches:
+            for match in matches:
+                if match.strip() and len(match.strip()) > 1:
+                    # Check if it's a known anime/manga title
+                    cleaned_match = match.strip()
+                    if not any(skip in cleaned_match.lower() for skip in ['の', 'キャラクター', 'キャラ', 'イラスト']):
+                        structured_data["works_name"] = cleaned_match
+                        break
+            if structured_data["works_name"]:
+                break
+
+    # Extract product shape/type
+    shape_patterns = [
+        r'形状[：:]\s*([^。\n,]*)',
+        r'タイプ[：:]\s*([^。\n,]*)',
+        r'種類[：:]\s*([^。\n,]*)',
+        r'(アクリルスタンド|フィギュア|缶バッジ|キーホルダー|タペストリー|ポスター|クリアファイル)',
+    ]
+
+    for pattern in shape_patterns:
+        matches = re.findall(pattern, description, re.IGNORECASE)
+        if matches:
+            for match in matches:
+                if match.strip():
+                    structured_data["product_shape"] = match.strip()
+                    break
+            break
+
+    # Extract colors
+    color_patterns = [
+        r'色[：:]\s*([^。\n,]*)',
+        r'カラー[：:]\s*([^。\n,]*)',
+        r'(赤|青|黄|緑|紫|ピンク|白|黒|オレンジ|茶色|灰色|銀色|金色|虹色)',
+    ]
+
+    for pattern in color_patterns:
+        matches = re.findall(pattern, description, re.IGNORECASE)
+        if matches:
+            structured_data["colors"].extend([m.strip() for m in matches if m.strip()])
+            break
+
+    # Extract materials
+    material_patterns = [
+        r'素材[：:]\s*([^。\n,]*)',
+        r'材質[：:]\s*([^。\n,]*)',
+        r'(プラスチック|アクリル|布|紙|金属|PVC|ABS樹脂)',
+    ]
+
+    for pattern in material_patterns:
+        matches = re.findall(pattern, description, re.IGNORECASE)
+        if matches:
+            structured_data["materials"].extend([m.strip() for m in matches if m.strip()])
+            break
+
+    # Extract features and other tags
+    feature_keywords = [
+        '限定', 'イベント', 'コンサート', 'ライブ', '生誕祭', '周年', '復刻',
+        'オリジナル', '描き下ろし', 'レア', 'スペシャル', 'プレミアム',
+        'セット', 'コンプリート', 'コレクション', 'シリーズ',
+        '大サイズ', '小サイズ', '特大', 'ミニ',
+        '光る', '発光', 'LED', '蓄光',
+        '透明', 'クリア', '半透明',
+        '立体', '3D', '浮き出し',
+        '箔押し', 'エンボス', 'デボス',
+    ]
+
+    # Find features in description
+    for keyword in feature_keywords:
+        if keyword in description:
+            structured_data["features"].append(keyword)
+
+    # Extract other potential tags (nouns and descriptive words)
+    # This is a simple extraction - in production, you might want to use NLP libraries
+    other_tag_patterns = [
+        r'(\w{2,})色',  # Color words
+        r'(\w{2,})版',  # Version words
+        r'(\w{2,})タイプ',  # Type words
+        r'(\w{2,})仕様',  # Specification words
+    ]
+
+    found_tags = set()
+    for pattern in other_tag_patterns:
+        matches = re.findall(pattern, description)
+        found_tags.update(matches)
+
+    # Add features and other found tags to other_tags
+    structured_data["other_tags"] = list(found_tags) + structured_data["features"]
+
+    # Determine product type flags based on content
+    if any(word in description.lower() for word in ['同人', '個人制作', 'インディーズ']):
+        structured_data["product_type_flags"].append("doujin")
+    else:
+        structured_data["product_type_flags"].append("commercial")
+
+    if any(word in description.lower() for word in ['デジタル', 'ダウンロード', 'データ']):
+        structured_data["product_type_flags"].append("digital")
+
+    return structured_data
+
+
+def _legacy_semantic_tags(description: str) -> List[str]:
+    """Lightweight heuristic tags (color/material/object/character) extracted from the description text."""
+    if not description:
+        return []
+
+    import re
+
+    text = description.replace("\u3000", " ")
+    normalized = text
+
+    # Helper to deduplicate while preserving order
+    seen_lower = set()
+
+    def _dedup(seq: List[str]) -> List[str]:
+        result: List[str] = []
+        for item in seq:
+            candidate = item.strip()
+            if not candidate:
+                continue
+            key = candidate.lower()
+            if key in seen_lower:
+                continue
+            seen_lower.add(key)
+            result.append(candidate)
+        return result
+
+    # Known vocabularies
+    COLOR_VARIANTS = {
+        "白色": "白",
+        "白い": "白",
+        "ホワイト": "白",
+        "白": "白",
+        "青色": "青",
+        "青い": "青",
+        "ブルー": "青",
+        "青": "青",
+        "水色": "水色",
+        "ライトブルー": "水色",
+        "紺色": "紺",
+        "ネイビー": "紺",
+        "紺": "紺",
+        "灰色": "灰色",
+        "グレー": "灰色",
+        "オレンジ色": "オレンジ",
+        "オレンジ": "オレンジ",
+        "赤色": "赤",
+        "赤い": "赤",
+        "レッド": "赤",
+        "赤": "赤",
+        "黒色": "黒",
+        "ブラック": "黒",
+        "黒": "黒",
+        "金色": "金色",
+        "ゴールド": "金色",
+        "銀色": "銀色",
+        "シルバー": "銀色",
+        "紫色": "紫",
+        "パープル": "紫",
+        "紫": "紫",
+        "緑色": "緑",
+        "グリーン": "緑",
+        "緑": "緑",
+        "黄色": "黄色",
+        "イエロー": "黄色",
+        "黄": "黄色",
+        "ピンク色": "ピンク",
+        "ピンク": "ピンク",
+        "茶色": "茶色",
+        "ブラウン": "茶色",
+    }
+
+    MATERIAL_VARIANTS = {
+        "シリコン": "シリコン",
+        "シリコン製": "シリコン",
+        "シリコンや": "シリコン",
+        "ゴム": "ゴム",
+        "ゴム製": "ゴム",
+        "ラバー": "ラバー",
+        "PVC": "PVC",
+        "pvc": "PVC",
+        "アクリル": "アクリル",
+        "プラスチック": "プラスチック",
+        "金属": "金属",
+        "メタル": "金属",
+        "布": "布",
+        "布製": "布",
+        "紙": "紙",
+        "紙製": "紙",
+        "木製": "木製",
+    }
+
+    ITEM_KEYWORDS = [
+        "キーホルダー",
+        "キーリング",
+        "チャーム",
+        "ストラップ",
+        "マスコット",
+        "フィギュア",
+        "アクリルスタンド",
+        "缶バッジ",
+        "ステッカー",
+        "ラバーキーホルダー",
+        "アクセサリー",
+        "雑貨",
+        "グッズ",
+    ]
+
+    MOTIF_KEYWORDS = [
+        "雪だるま",
+        "雪の結晶",
+        "冬",
+        "北海道",
+        "キャラクター",
+        "動物",
+        "鳥",
+        "シマエナガ",
+        "ペンギン",
+        "星",
+    ]
+
+    # Collect candidates per category
+    colors: List[str] = []
+    for variant, canonical in COLOR_VARIANTS.items():
+        if variant and variant in normalized:
+            colors.append(canonical)
+    colors = _dedup(colors)
+
+    materials: List[str] = []
+    for variant, canonical in MATERIAL_VARIANTS.items():
+        if variant and variant in normalized:
+            materials.append(canonical)
+    materials = _dedup(materials)
+
+    items: List[str] = []
+    for kw in ITEM_KEYWORDS:
+        if kw in normalized:
+            items.append(kw)
+    items = _dedup(items)
+
+    motifs: List[str] = []
+    for kw in MOTIF_KEYWORDS:
+        if kw in normalized:
+            motifs.append(kw)
+    motifs = _dedup(motifs)
+
+    names: List[str] = []
+    for quoted in re.findall(r"[『「\"]([^』」\"\n]{1,12})[』」\"]", text):
+        name = quoted.strip().strip("・,，。:：;；")
+        if name and len(name) >= 2:
+            names.append(name)
+    for latin in re.findall(r"\b[A-Za-z][A-Za-z0-9\-]{2,}\b", text):
+        names.append(latin.strip())
+    names = _dedup(names)
+
+    # Combine with balanced coverage (item, motif, color, material, name)
+    final_tags: List[str] = []
+    added_lower = set()
+
+    def push(tag: str):
+        candidate = tag.strip()
+        if not candidate:
+            return
+        key = candidate.lower()
+        if key in added_lower:
+            return
+        added_lower.add(key)
+        final_tags.append(candidate)
+
+    category_priority = [
+        ("item", items),
+        ("motif", motifs),
+        ("color", colors),
+        ("material", materials),
+        ("name", names),
+    ]
+
+    # First pass: one from each category when available
+    for _, bucket in category_priority:
+        if len(final_tags) >= 5:
+            break
+        if bucket:
+            push(bucket[0])
+
+    # Second pass: fill remaining slots with leftover values in priority order
+    if len(final_tags) < 5:
+        for _, bucket in category_priority:
+            for candidate in bucket[1:]:
+                if len(final_tags) >= 5:
+                    break
+                push(candidate)
+            if len(final_tags) >= 5:
+                break
+
+    return final_tags[:5]
+
+
+def _bench(label: str, fn: Callable[[str], Any], texts: List[str], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / (iterations * len(texts)) * 1e6
+    print(f"{label:<34} {elapsed:8.3f}s  {per_call_us:8.1f} us/call")
+    return elapsed
+
+
+def _user_terms(count: int) -> Dict[str, List[str]]:
+    return {
+        "works_series_name": [f"作品シリーズ{i:04d}" for i in range(count)] + ["推しの子"],
+        "character_name": [f"キャラクター{i:04d}" for i in range(count)] + ["星野アイ"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--user-terms", type=int, default=300, help="ユーザー辞書の語数（各フィールド）")
+    args = parser.parse_args()
+
+    texts = SAMPLE_DESCRIPTIONS
+    build_start = time.perf_counter()
+    extractor = DescriptionExtractor(_user_terms(args.user_terms))
+    build_ms = (time.perf_counter() - build_start) * 1000
+    print(f"automaton build ({extractor.user_term_count} user terms): {build_ms:.1f} ms")
+
+    print("-- structured data --")
+    legacy = _bench("legacy _extract_structured_data", _legacy_extract_structured_data, texts, args.iterations)
+    new = _bench("DescriptionExtractor.extract", extractor.extract_structured_data, texts, args.iterations)
+    print(f"speedup: x{legacy / new:.1f}")
+
+    # 旧方式でユーザー辞書を足した場合（語ごとに部分文字列検索）との比較
+    terms = [t for values in _user_terms(args.user_terms).values() for t in values]
+
+    def _naive_with_user_terms(text: str) -> Any:
+        hits = [t for t in terms if t in text]
+        return _legacy_extract_structured_data(text), hits
+
+    naive = _bench("legacy + naive user-term scan", _naive_with_user_terms, texts, args.iterations)
+    print(f"speedup vs naive user terms: x{naive / new:.1f}")
+
+    print("-- semantic tags --")
+    legacy = _bench("legacy _semantic_tags", _legacy_semantic_tags, texts, args.iterations)
+    new = _bench("DescriptionExtractor.semantic_tags", extractor.semantic_tags, texts, args.iterations)
+    print(f"speedup: x{legacy / new:.1f}")
+
+    print("-- sample output --")
+    for text in texts[:2]:
+        print("legacy:", _legacy_extract_structured_data(text))
+        print("new:   ", extractor.extract_structured_data(text))
+
+
+if __name__ == "__main__":
+    main()
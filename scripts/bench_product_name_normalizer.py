@@ -0,0 +1,147 @@
+"""楽天の商品名正規化のベンチマーク（旧: re.sub ループ / 新: services.product_name_normalizer）。
+
+使い方:
+    python scripts/bench_product_name_normalizer.py --iterations 2000
+
+旧実装は比較用にこのスクリプト内へ退避している（アプリからは参照しない）。
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_ROOT = str(Path(__file__).resolve().parents[1])
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from services.product_name_normalizer import normalize_name, normalize_names
+
+# 楽天市場の検索結果で実際に見られる形の商品名（1 回の検索 = 10 件、店舗違いの重複を含む）
+SAMPLE_TITLES: List[str] = [
+    "【送料無料】呪術廻戦 アクリルスタンド 五条悟 描き下ろし【新品】",
+    "呪術廻戦 アクリルスタンド 五条悟 描き下ろし 【即納】",
+    "【予約受付中】推しの子 【B小町】 缶バッジ 星野アイ (ホロ仕様)",
+    "ちいかわ ぬいぐるみ ハチワレ Sサイズ ［限定］ ｱｸｽﾀ付き",
+    "バンダイ【ワンピース】フィギュア ルフィ ギア5 送料無料 代引不可",
+    "[メール便対応] ＳＰＹ×ＦＡＭＩＬＹ ラバーストラップ アーニャ",
+    "ブルーロック トレーディング缶バッジ BOX 12個入り【楽天市場】",
+    "【中古】ラブライブ！サンシャイン!! タペストリー 黒澤ダイヤ（生誕祭2023）",
+    "【送料無料】呪術廻戦 アクリルスタンド 五条悟 描き下ろし【新品】",
+    "ホロライブ 兎田ぺこら アクリルキーホルダー 在庫あり 最安値",
+]
+
+
+def _legacy_clean_product_name(name: str) -> str:
+    """Clean product name by removing unwanted text patterns."""
+    if not name:
+        return ""
+
+    # Remove common unwanted patterns
+    patterns_to_remove = [
+        r'\s*送料無料\s*',
+        r'\s*代引不可\s*',
+        r'\s*メール便対応\s*',
+        r'\s*\[.*?\]\s*',  # Remove bracketed content
+        r'\s*【.*?】\s*',  # Remove double-bracketed content
+        r'\s*楽天市場\s*',
+        r'\s*Yahoo!ショッピング\s*',
+        r'\s*Amazon\s*',
+        r'\s*価格比較\s*',
+        r'\s*最安値\s*',
+        r'\s*新品\s*',
+        r'\s*中古\s*',
+        r'\s*即納\s*',
+        r'\s*在庫あり\s*',
+        r'\s*限定\s*',
+        r'\s*予約受付中\s*',
+        r'\s*完売\s*',
+    ]
+
+    cleaned_name = name
+    for pattern in patterns_to_remove:
+        cleaned_name = re.sub(pattern, '', cleaned_name, flags=re.IGNORECASE)
+
+    # Clean up extra whitespace
+    cleaned_name = re.sub(r'\s+', ' ', cleaned_name).strip()
+
+    return cleaned_name
+
+
+def _legacy_extract_brand_and_series(name: str) -> Dict[str, str]:
+    """Extract brand and series information from product name."""
+    # Common patterns for anime/merchandise
+    patterns = {
+        'brand': [
+            r'(.+?)\s*[【\[][^\]】]*[】\]]\s*(.+)',  # Brand [content] product
+            r'^([^【\[]+?)\s*[【\[](.*?)[】\]]\s*(.+)',  # Brand [series] product
+        ],
+        'series': [
+            r'.*[【\[](.*?)[】\]].*',  # Extract content in brackets
+            r'.*[（(](.*?)[）)].*',    # Extract content in parentheses
+        ]
+    }
+
+    result = {'brand': '', 'series': ''}
+
+    # Try to extract brand
+    for pattern in patterns['brand']:
+        match = re.search(pattern, name, re.IGNORECASE)
+        if match:
+            result['brand'] = match.group(1).strip()
+            break
+
+    # Try to extract series
+    for pattern in patterns['series']:
+        match = re.search(pattern, name, re.IGNORECASE)
+        if match:
+            result['series'] = match.group(1).strip()
+            break
+
+    return result
+
+
+def _legacy_normalise(names: List[str]) -> List[Dict[str, str]]:
+    results = []
+    for name in names:
+        brand_series = _legacy_extract_brand_and_series(name)
+        results.append({"name": _legacy_clean_product_name(name), **brand_series})
+    return results
+
+
+def _new_per_item(names: List[str]) -> List[object]:
+    return [normalize_name(name) for name in names]
+
+
+def _bench(label: str, fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(SAMPLE_TITLES)
+    elapsed = time.perf_counter() - start
+    per_set_us = elapsed / iterations * 1e6
+    print(f"{label:<34} {elapsed:8.3f}s  {per_set_us:8.1f} us/result set")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--show", action="store_true", help="新旧の正規化結果を並べて表示する")
+    args = parser.parse_args()
+
+    if args.show:
+        for title, old, new in zip(SAMPLE_TITLES, _legacy_normalise(SAMPLE_TITLES), normalize_names(SAMPLE_TITLES)):
+            print(title)
+            print(f"  legacy: {old}")
+            print(f"  new   : {new._asdict()}")
+
+    legacy = _bench("legacy re.sub loop", _legacy_normalise, args.iterations)
+    per_item = _bench("normalize_name (per item)", _new_per_item, args.iterations)
+    batch = _bench("normalize_names (batch)", normalize_names, args.iterations)
+    print(f"speedup per item: x{legacy / per_item:.1f}  batch: x{legacy / batch:.1f}")
+
+
+if __name__ == "__main__":
+    main()
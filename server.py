@@ -16,15 +16,18 @@ import requests
 from dotenv import load_dotenv
 from flask import (
     Flask,
+    Response,
     g,
     jsonify,
     make_response,
     redirect,
     render_template_string,
     request,
+    stream_with_context,
 )
 
 from app import create_app
+from services import candidate_condenser, capture_quality, circuit_breaker, enrichment_events
 # get_user_client は REST 検証に移行したため未使用
 
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -39,6 +42,8 @@ COOKIE_SECURE = os.getenv("COOKIE_SECURE", "false").lower() == "true"
 COOKIE_SAMESITE = os.getenv("COOKIE_SAMESITE", "Lax")
 COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN") or None
 AUTH_DEBUG = os.getenv("AUTH_DEBUG", "").lower() in {"1", "true", "yes"}
+# /metrics の Bearer トークン（未設定なら /metrics は 404）
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or ""
 
 AUTH_COOKIE = "sb-access-token"
 REFRESH_COOKIE = "sb-refresh-token"
@@ -232,7 +237,7 @@ def _is_public_path(path: str) -> bool:
             "/_dash-dependencies",
             "/_favicon.ico",
         )
-    ) or path in {"/login", "/auth/login", "/auth/callback"}
+    ) or path in {"/login", "/auth/login", "/auth/callback", "/healthz", "/metrics"}
 
 
 def _set_g_from_user(access_token: str, user) -> None:
@@ -896,6 +901,86 @@ def oauth_consent():
     )
 
 
+# ---- ヘルスチェック / メトリクス ----
+
+
+@flask_app.get("/healthz")
+def healthz():
+    """プロセス生存と外部依存のブレーカー状態を返す（依存先が open でもアプリ自体は 200）。"""
+    breakers = {
+        name: snap["state"] for name, snap in circuit_breaker.snapshot_all().items()
+    }
+    degraded = any(state != circuit_breaker.STATE_CLOSED for state in breakers.values())
+    return jsonify({"status": "degraded" if degraded else "ok", "breakers": breakers})
+
+
+@flask_app.get("/metrics")
+def metrics():
+    """Prometheus テキスト形式でブレーカーの状態とカウンタを返す（METRICS_TOKEN 必須）。"""
+    auth_header = request.headers.get("Authorization") or ""
+    if not METRICS_TOKEN or not secrets.compare_digest(
+        auth_header, f"Bearer {METRICS_TOKEN}"
+    ):
+        return jsonify({"error": "not_found"}), 404
+    state_values = {
+        circuit_breaker.STATE_CLOSED: 0,
+        circuit_breaker.STATE_HALF_OPEN: 1,
+        circuit_breaker.STATE_OPEN: 2,
+    }
+    lines = [
+        "# HELP oshi_circuit_breaker_state 0=closed 1=half_open 2=open",
+        "# TYPE oshi_circuit_breaker_state gauge",
+    ]
+    snapshots = circuit_breaker.snapshot_all()
+    for name, snap in snapshots.items():
+        lines.append(
+            f'oshi_circuit_breaker_state{{name="{name}"}} {state_values[snap["state"]]}'
+        )
+    for counter in ("calls_total", "failures_total", "rejected_total", "opened_total"):
+        lines.append(f"# TYPE oshi_circuit_breaker_{counter} counter")
+        for name, snap in snapshots.items():
+            lines.append(
+                f'oshi_circuit_breaker_{counter}{{name="{name}"}} {snap[counter]}'
+            )
+    for counter, value in candidate_condenser.stats().items():
+        lines.append(f"# TYPE oshi_tag_prompt_candidate_{counter} counter")
+        lines.append(f"oshi_tag_prompt_candidate_{counter} {value}")
+    for counter, value in capture_quality.stats().items():
+        lines.append(f"# TYPE oshi_capture_quality_{counter} counter")
+        lines.append(f"oshi_capture_quality_{counter} {value}")
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+# ---- 登録ドラフトのエンリッチ進捗（SSE） ----
+
+
+@flask_app.get("/events/enrichment/<draft_id>")
+def enrichment_events_stream(draft_id: str):
+    """画像説明・タグ生成の進捗を text/event-stream で push する（認証必須・本人のドラフトのみ）。"""
+    exists, owner = enrichment_events.channel_owner(draft_id)
+    user_id = getattr(g, "user_id", None)
+    if not exists or not owner or str(owner) != str(user_id):
+        # 他人のドラフトか存在確認かを区別させない
+        return jsonify({"error": "not_found"}), 404
+    try:
+        last_seq = int(request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        last_seq = 0
+
+    def _generate():
+        yield "retry: 3000\n\n"
+        for item in enrichment_events.iter_events(draft_id, last_seq=last_seq):
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            yield enrichment_events.format_sse(*item)
+
+    resp = Response(stream_with_context(_generate()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
 # Dash を Flask にマウント
 dash_app = create_app(server=flask_app)
 app = dash_app.server  # for compatibility (gunicorn etc.)
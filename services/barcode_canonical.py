@@ -0,0 +1,138 @@
+"""バーコードの正規化（チェックディジット検証・正規キーへの変換・アドオン分離）。
+
+同じ商品でも UPC-A / EAN-13、ISBN-10 / ISBN-13、アドオン付きなど表記が揺れるため、
+照合キャッシュ・JAN カタログ・所持判定はすべてここで作る正規キーを使う。
+- EAN-13 / UPC-A / ISBN-10 / ISBN-13 / GTIN-14（先頭 0）→ 13 桁（GTIN-13）
+- UPC-E → UPC-A に展開して 13 桁、EAN-8 → 8 桁のまま
+- 2 桁・5 桁のアドオン（雑誌の号数・価格）は addon に分ける
+手入力の誤り（桁数・チェックディジット）は外部 API を呼ぶ前にここで弾く。
+canonical_key は DB の public.app_barcode_key と同じ規則（集計 RPC と fallback の件数をそろえる）。
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+from services.product_name_normalizer import fold_width
+
+KIND_EAN13 = "EAN13"
+KIND_UPCA = "UPCA"
+KIND_UPCE = "UPCE"
+KIND_EAN8 = "EAN8"
+KIND_ISBN13 = "ISBN13"
+KIND_ISBN10 = "ISBN10"
+KIND_GTIN14 = "GTIN14"
+# EAN/UPC 系以外（QR コードなど）。検証せず、空白を除いた値をそのままキーにする
+KIND_OTHER = "OTHER"
+
+# pyzbar の種別のうち EAN/UPC 系として検証するもの
+_GTIN_SYMBOLOGIES = {"EAN13", "EAN8", "UPCA", "UPCE", "ISBN10", "ISBN13", "EAN5", "EAN2"}
+# 手入力で混ざりやすい区切り（NFKC 後の半角ハイフン・長音など）
+_SEPARATOR_RE = re.compile(r"[\s\-‐ー]+")
+
+
+class CanonicalBarcode(NamedTuple):
+    # 照合・キャッシュ・重複判定に使う正規キー（無効なら空）
+    key: str
+    kind: str
+    addon: str
+    valid: bool
+    # 無効な場合の理由（画面表示用）
+    message: str
+
+
+def _invalid(message: str) -> CanonicalBarcode:
+    return CanonicalBarcode("", "", "", False, message)
+
+
+def gtin_check_digit(payload: str) -> str:
+    """GTIN（EAN-8/12/13/14）のチェックディジット。右端から 3,1,3,... の重み。"""
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(payload)))
+    return str((10 - total % 10) % 10)
+
+
+def _gtin_valid(digits: str) -> bool:
+    return digits.isdigit() and gtin_check_digit(digits[:-1]) == digits[-1]
+
+
+def _isbn10_valid(code: str) -> bool:
+    if not (code[:9].isdigit() and (code[9].isdigit() or code[9] == "X")):
+        return False
+    total = sum((10 - i) * int(d) for i, d in enumerate(code[:9]))
+    total += 10 if code[9] == "X" else int(code[9])
+    return total % 11 == 0
+
+
+def expand_upce(code: str) -> Optional[str]:
+    """UPC-E（8 桁）を UPC-A（12 桁）に展開する。形式が不正なら None。"""
+    if len(code) != 8 or not code.isdigit() or code[0] not in "01":
+        return None
+    system, body, check = code[0], code[1:7], code[7]
+    last = body[5]
+    if last in "012":
+        upca = system + body[0:2] + last + "0000" + body[2:5]
+    elif last == "3":
+        upca = system + body[0:3] + "00000" + body[3:5]
+    elif last == "4":
+        upca = system + body[0:4] + "00000" + body[4]
+    else:
+        upca = system + body[0:5] + "0000" + last
+    return upca + check
+
+
+def _from_digits(code: str, symbology: Optional[str]) -> CanonicalBarcode:
+    length = len(code)
+    if symbology == "UPCE" or (length == 8 and symbology is None and not _gtin_valid(code)):
+        upca = expand_upce(code)
+        if upca and _gtin_valid(upca):
+            return CanonicalBarcode("0" + upca, KIND_UPCE, "", True, "")
+    if length == 13:
+        if not _gtin_valid(code):
+            return _invalid("チェックディジットが一致しません。番号を確認してください。")
+        kind = KIND_ISBN13 if code.startswith(("978", "979")) else KIND_EAN13
+        return CanonicalBarcode(code, kind, "", True, "")
+    if length == 12:
+        if not _gtin_valid(code):
+            return _invalid("チェックディジットが一致しません。番号を確認してください。")
+        return CanonicalBarcode("0" + code, KIND_UPCA, "", True, "")
+    if length == 8:
+        if not _gtin_valid(code):
+            return _invalid("チェックディジットが一致しません。番号を確認してください。")
+        return CanonicalBarcode(code, KIND_EAN8, "", True, "")
+    if length == 10:
+        if not _isbn10_valid(code):
+            return _invalid("ISBN のチェックディジットが一致しません。番号を確認してください。")
+        isbn13 = "978" + code[:9]
+        return CanonicalBarcode(isbn13 + gtin_check_digit(isbn13), KIND_ISBN10, "", True, "")
+    if length == 14 and _gtin_valid(code):
+        # 先頭 0 の GTIN-14 は EAN-13 と同じ商品
+        return CanonicalBarcode(code[1:] if code.startswith("0") else code, KIND_GTIN14, "", True, "")
+    # アドオン付き: 13+2 / 13+5 / 12+2 / 12+5
+    for base_len in (13, 12):
+        addon = code[base_len:]
+        if len(addon) in (2, 5) and _gtin_valid(code[:base_len]):
+            base = _from_digits(code[:base_len], None)
+            return base._replace(addon=addon)
+    return _invalid("バーコードの桁数が正しくありません（8・12・13 桁、または ISBN の 10 桁）。")
+
+
+def canonicalize(raw: Optional[str], symbology: Optional[str] = None) -> CanonicalBarcode:
+    """
+    読み取り値・手入力値を正規化する。
+
+    symbology は pyzbar の種別（EAN13 / UPCE / QRCODE など）。EAN/UPC 系以外が明示されていれば検証しない。
+    """
+    text = (raw or "").strip()
+    if not text:
+        return _invalid("バーコードが空です。")
+    if symbology and symbology.upper() not in _GTIN_SYMBOLOGIES:
+        return CanonicalBarcode(text, KIND_OTHER, "", True, "")
+    code = _SEPARATOR_RE.sub("", fold_width(text)).upper()
+    if not code.isdigit() and not (len(code) == 10 and code[:9].isdigit() and code[9] == "X"):
+        return _invalid("バーコード番号は数字で入力してください。")
+    return _from_digits(code, symbology.upper() if symbology else None)
+
+
+def canonical_key(raw: Optional[str], symbology: Optional[str] = None) -> str:
+    """正規キー。無効な値（過去データの誤入力など）は空白を除いた元の値を返す。"""
+    result = canonicalize(raw, symbology)
+    return result.key if result.valid else (raw or "").strip()
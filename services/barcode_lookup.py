@@ -1,17 +1,77 @@
 """Rakuten API lookup utilities."""
 
 import os
-import re
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from copy import deepcopy
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
+from services import jan_catalog
+from services.barcode_canonical import canonicalize
+from services.circuit_breaker import get_breaker
+from services.deadline import LOOKUP_DEADLINE_SEC, Deadline
+from services.product_name_normalizer import fold_width, normalize_name, normalize_names
+
 RAKUTEN_ENDPOINT = "https://app.rakuten.co.jp/services/api/IchibaItem/Search/20220601"
 APPLICATION_ID = os.getenv("RAKUTEN_APPLICATION_ID")
 AFFILIATE_ID = os.getenv("RAKUTEN_AFFILIATE_ID")
 DEFAULT_HITS = 10
 TIMEOUT = 10
 
+RAKUTEN_BREAKER = get_breaker("rakuten", slow_call_sec=5.0, open_sec=30.0)
+
+# 検索結果キャッシュ（success / not_found のみ）。TTL 切れでも API 障害時のフォールバックには使う
+CACHE_TTL_SEC = float(os.getenv("RAKUTEN_CACHE_TTL_SEC", "21600"))
+_CACHE_MAX_ENTRIES = 512
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _cache_key(params: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
+def _cache_get(key: Tuple[Any, ...], allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if not allow_stale and time.monotonic() - stored_at > CACHE_TTL_SEC:
+            return None
+        _cache.move_to_end(key)
+        return deepcopy(result)
+
+
+def _cache_put(key: Tuple[Any, ...], result: Dict[str, Any]) -> None:
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), deepcopy(result))
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def _unavailable_response(params: Dict[str, Any], message: str) -> Dict[str, Any]:
+    """API 障害時: 期限切れでもキャッシュがあればそれを返し、なければ error を返す。"""
+    stale = _cache_get(_cache_key(params), allow_stale=True)
+    if stale is not None:
+        stale["cached"] = True
+        stale["message"] = "楽天APIに接続できないため、以前の検索結果を表示しています。"
+        return stale
+    return {
+        "status": "error",
+        "items": [],
+        "message": message,
+        "source": params.get("source"),
+        "keyword": params.get("keyword"),
+    }
+
 
 def _missing_credentials_response() -> Dict[str, Any]:
     return {
@@ -23,86 +83,15 @@ def _missing_credentials_response() -> Dict[str, Any]:
     }
 
 
-def _clean_product_name(name: str) -> str:
-    """Clean product name by removing unwanted text patterns."""
-    if not name:
-        return ""
-
-    # Remove common unwanted patterns
-    patterns_to_remove = [
-        r'\s*送料無料\s*',
-        r'\s*代引不可\s*',
-        r'\s*メール便対応\s*',
-        r'\s*\[.*?\]\s*',  # Remove bracketed content
-        r'\s*【.*?】\s*',  # Remove double-bracketed content
-        r'\s*楽天市場\s*',
-        r'\s*Yahoo!ショッピング\s*',
-        r'\s*Amazon\s*',
-        r'\s*価格比較\s*',
-        r'\s*最安値\s*',
-        r'\s*新品\s*',
-        r'\s*中古\s*',
-        r'\s*即納\s*',
-        r'\s*在庫あり\s*',
-        r'\s*限定\s*',
-        r'\s*予約受付中\s*',
-        r'\s*完売\s*',
-    ]
-
-    cleaned_name = name
-    for pattern in patterns_to_remove:
-        cleaned_name = re.sub(pattern, '', cleaned_name, flags=re.IGNORECASE)
-
-    # Clean up extra whitespace
-    cleaned_name = re.sub(r'\s+', ' ', cleaned_name).strip()
-
-    return cleaned_name
-
-
-def _extract_brand_and_series(name: str) -> Dict[str, str]:
-    """Extract brand and series information from product name."""
-    # Common patterns for anime/merchandise
-    patterns = {
-        'brand': [
-            r'(.+?)\s*[【\[][^\]】]*[】\]]\s*(.+)',  # Brand [content] product
-            r'^([^【\[]+?)\s*[【\[](.*?)[】\]]\s*(.+)',  # Brand [series] product
-        ],
-        'series': [
-            r'.*[【\[](.*?)[】\]].*',  # Extract content in brackets
-            r'.*[（(](.*?)[）)].*',    # Extract content in parentheses
-        ]
-    }
-
-    result = {'brand': '', 'series': ''}
-
-    # Try to extract brand
-    for pattern in patterns['brand']:
-        match = re.search(pattern, name, re.IGNORECASE)
-        if match:
-            result['brand'] = match.group(1).strip()
-            break
-
-    # Try to extract series
-    for pattern in patterns['series']:
-        match = re.search(pattern, name, re.IGNORECASE)
-        if match:
-            result['series'] = match.group(1).strip()
-            break
-
-    return result
-
-
 def _normalise_items(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     normalised: List[Dict[str, Any]] = []
-    for entry in items:
-        item = entry.get("Item", {}) if isinstance(entry, dict) else {}
-
-        # Clean product name
+    entries = [entry.get("Item", {}) if isinstance(entry, dict) else {} for entry in items]
+    # 商品名の正規化（宣伝文句の除去・ブランド/シリーズ抽出）は結果セット単位でまとめて行う
+    names = normalize_names(item.get("itemName", "") for item in entries)
+    for item, normalized in zip(entries, names):
         raw_name = item.get("itemName", "")
-        cleaned_name = _clean_product_name(raw_name)
-
-        # Extract brand and series
-        brand_series = _extract_brand_and_series(raw_name)
+        cleaned_name = normalized.name
+        brand_series = {"brand": normalized.brand, "series": normalized.series}
 
         normalised.append(
             {
@@ -133,7 +122,9 @@ def _normalise_items(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return normalised
 
 
-def _call_rakuten(params: Dict[str, Any]) -> Dict[str, Any]:
+def _call_rakuten(
+    params: Dict[str, Any], deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
     if not APPLICATION_ID:
         return _missing_credentials_response()
 
@@ -147,19 +138,37 @@ def _call_rakuten(params: Dict[str, Any]) -> Dict[str, Any]:
         request_params["affiliateId"] = AFFILIATE_ID
     request_params.update(params)
 
+    key = _cache_key(params)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    deadline = deadline or Deadline(LOOKUP_DEADLINE_SEC)
+    if deadline.expired():
+        return _unavailable_response(
+            params, "楽天APIの照合が時間内に完了しませんでした。"
+        )
+    timeout = deadline.timeout(TIMEOUT)
+
+    if not RAKUTEN_BREAKER.allow_request():
+        return _unavailable_response(
+            params, "楽天APIが一時的に利用できません。しばらくしてから再度お試しください。"
+        )
+    start = time.monotonic()
     try:
         response = requests.get(
-            RAKUTEN_ENDPOINT, params=request_params, timeout=TIMEOUT
+            RAKUTEN_ENDPOINT, params=request_params, timeout=timeout
         )
         response.raise_for_status()
     except requests.RequestException as exc:  # pragma: no cover - ネットワーク依存
-        return {
-            "status": "error",
-            "items": [],
-            "message": f"楽天API通信エラー: {exc}",
-            "source": params.get("source"),
-            "keyword": params.get("keyword"),
-        }
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+        # 4xx（パラメータ不正など）は依存先の障害として数えない。429 は数える
+        RAKUTEN_BREAKER.record(
+            status_code is not None and status_code < 500 and status_code != 429,
+            time.monotonic() - start,
+        )
+        return _unavailable_response(params, f"楽天API通信エラー: {exc}")
+    RAKUTEN_BREAKER.record(True, time.monotonic() - start)
 
     try:
         payload = response.json()
@@ -174,30 +183,353 @@ def _call_rakuten(params: Dict[str, Any]) -> Dict[str, Any]:
 
     items = _normalise_items(payload.get("Items", []))
     if not items:
-        return {
+        result = {
             "status": "not_found",
             "items": [],
             "message": "該当する商品が見つかりませんでした。",
             "source": params.get("source"),
             "keyword": params.get("keyword"),
         }
+    else:
+        result = {
+            "status": "success",
+            "items": items,
+            "message": "楽天市場で商品を取得しました。",
+            "source": params.get("source"),
+            "keyword": params.get("keyword"),
+            "resultCount": payload.get("count"),
+        }
+    _cache_put(key, result)
+    return result
+
+
+# ---- 商品照合プロバイダ ----
+# 楽天はプロバイダの 1 つ。ローカルカタログや追加の HTTP 照合元と同じ締め切りの下で並列に問い合わせ、
+# 結果を信頼度順にまとめる。JAN が一致する高信頼の候補が届いた時点で残りは待たない。
+
+# JAN 完全一致の信頼度 = 0.5 + 0.5 * weight。楽天（0.8）の JAN 一致で早期終了できる値
+HIGH_CONFIDENCE = 0.9
+PROVIDER_WORKERS = int(os.getenv("LOOKUP_PROVIDER_WORKERS", "4"))
+_provider_executor = ThreadPoolExecutor(
+    max_workers=max(1, PROVIDER_WORKERS), thread_name_prefix="lookup-provider"
+)
 
+
+def _provider_result(
+    status: str, items: List[Dict[str, Any]], message: str, barcode: Optional[str] = None
+) -> Dict[str, Any]:
     return {
-        "status": "success",
+        "status": status,
         "items": items,
-        "message": "楽天市場で商品を取得しました。",
-        "source": params.get("source"),
-        "keyword": params.get("keyword"),
-        "resultCount": payload.get("count"),
+        "message": message,
+        "source": "barcode",
+        "keyword": barcode,
     }
 
 
-def lookup_product(barcode: str) -> Dict[str, Any]:
+def make_item(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """楽天以外の照合元の商品を _normalise_items と同じ形にする（name / jan / price / url / shopName / imageUrl / brand / series）。"""
+    raw_name = str(fields.get("name") or "")
+    normalized = normalize_name(raw_name)
+    brand = fields.get("brand") or normalized.brand
+    series = fields.get("series") or normalized.series
+    image_url = fields.get("imageUrl")
+    return {
+        "name": normalized.name,
+        "raw_name": raw_name,
+        "price": fields.get("price"),
+        "url": fields.get("url"),
+        "affiliateUrl": None,
+        "mediumImageUrls": [image_url] if image_url else [],
+        "shopName": fields.get("shopName"),
+        "genreId": None,
+        "itemCode": fields.get("itemCode"),
+        "jan": fields.get("jan") or "",
+        "brand": brand,
+        "series": series,
+        "structured_data": {
+            "product_name": normalized.name,
+            "works_series_name": series,
+            "copyright_company_name": brand,
+            "purchase_price": fields.get("price"),
+            "works_name": fields.get("works") or "",
+            "character_name": fields.get("character") or "",
+        },
+    }
+
+
+class LookupProvider(ABC):
+    """バーコードから商品候補を返す照合元。lookup() は _call_rakuten と同じ形の dict を返す。"""
+
+    name = "provider"
+    label = "照合元"
+    # 順位付けに使う照合元の信頼度（0〜1）
+    weight = 0.5
+    # 外部 API を呼ばない照合元は並列照合の前に同期で引き、高信頼の一致があれば外部は呼ばない
+    local = False
+
+    @abstractmethod
+    def lookup(self, barcode: str, deadline: Deadline) -> Dict[str, Any]:
+        ...
+
+
+class RakutenProvider(LookupProvider):
+    name = "rakuten"
+    label = "楽天市場"
+    weight = 0.8
+
+    def lookup(self, barcode: str, deadline: Deadline) -> Dict[str, Any]:
+        # JAN コード向けのパラメータも併用 (ドキュメントに従い省略可能)
+        params = {"keyword": barcode, "source": "barcode", "isbnjan": barcode}
+        result = _call_rakuten(params, deadline=deadline)
+        if result.get("status") == "success" and not result.get("cached"):
+            jan_catalog.record_lookup_items(barcode, result.get("items") or [])
+        return result
+
+
+class CatalogProvider(LookupProvider):
+    """登録済み商品と過去の楽天照合から作ったローカル JAN カタログ（services.jan_catalog）。"""
+
+    name = "catalog"
+    label = "登録済みカタログ"
+    weight = 1.0
+    local = True
+
+    def lookup(self, barcode: str, deadline: Deadline) -> Dict[str, Any]:
+        rows = jan_catalog.get_catalog().lookup(barcode)
+        if not rows:
+            return _provider_result("not_found", [], "該当する商品が見つかりませんでした。", barcode)
+        items = [make_item(dict(row, imageUrl=row.get("image_url"))) for row in rows]
+        return _provider_result("success", items, f"{self.label}から商品情報を取得しました。", barcode)
+
+
+class StaticCatalogProvider(LookupProvider):
+    """メモリ上の JAN→商品の表。オフラインのテストや手元の既知データの照合元として使う。"""
+
+    def __init__(
+        self,
+        entries: Dict[str, List[Dict[str, Any]]],
+        name: str = "static",
+        label: str = "ローカルカタログ",
+        weight: float = 1.0,
+        delay_sec: float = 0.0,
+    ):
+        self.entries = {code: [make_item(e) for e in items] for code, items in entries.items()}
+        self.name = name
+        self.label = label
+        self.weight = weight
+        # テストで遅い照合元を再現するための待ち時間
+        self.delay_sec = delay_sec
+
+    def lookup(self, barcode: str, deadline: Deadline) -> Dict[str, Any]:
+        if self.delay_sec:
+            time.sleep(min(self.delay_sec, deadline.remaining()))
+        items = deepcopy(self.entries.get(barcode, []))
+        if not items:
+            return _provider_result("not_found", [], "該当する商品が見つかりませんでした。", barcode)
+        return _provider_result("success", items, f"{self.label}で商品を取得しました。", barcode)
+
+
+class HttpJsonProvider(LookupProvider):
+    """GET url_template（{jan} を置換）が {"items": [{name, price, url, jan, ...}]} を返す汎用の照合元。"""
+
+    def __init__(self, name: str, url_template: str, weight: float = 0.6, items_key: str = "items"):
+        if not url_template.startswith("https://"):
+            raise ValueError(f"lookup provider '{name}' must use https")
+        self.name = name
+        self.label = name
+        self.weight = weight
+        self.url_template = url_template
+        self.items_key = items_key
+        self.breaker = get_breaker(f"lookup_{name}", slow_call_sec=5.0, open_sec=30.0)
+
+    def lookup(self, barcode: str, deadline: Deadline) -> Dict[str, Any]:
+        if deadline.expired() or not self.breaker.allow_request():
+            return _provider_result("error", [], f"{self.label}は現在利用できません。", barcode)
+        start = time.monotonic()
+        try:
+            response = requests.get(
+                self.url_template.format(jan=barcode), timeout=deadline.timeout(TIMEOUT)
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as exc:  # pragma: no cover - ネットワーク依存
+            status_code = getattr(getattr(exc, "response", None), "status_code", None)
+            self.breaker.record(
+                status_code is not None and status_code < 500 and status_code != 429,
+                time.monotonic() - start,
+            )
+            return _provider_result("error", [], f"{self.label}通信エラー: {exc}", barcode)
+        self.breaker.record(True, time.monotonic() - start)
+        raw_items = payload.get(self.items_key) if isinstance(payload, dict) else None
+        items = [make_item(entry) for entry in raw_items or [] if isinstance(entry, dict)]
+        if not items:
+            return _provider_result("not_found", [], "該当する商品が見つかりませんでした。", barcode)
+        return _provider_result("success", items, f"{self.label}で商品を取得しました。", barcode)
+
+
+def _item_confidence(provider: LookupProvider, item: Dict[str, Any], barcode: str) -> float:
+    if item.get("jan") and str(item["jan"]) == barcode:
+        return round(0.5 + 0.5 * provider.weight, 3)
+    return round(0.5 * provider.weight, 3)
+
+
+def _merge_items(
+    providers: List[LookupProvider], results: Dict[str, Dict[str, Any]], barcode: str
+) -> List[Dict[str, Any]]:
+    """照合元の候補を信頼度順にまとめる。照合元を跨いだ同一商品（JAN＋商品名）は信頼度の高い方だけ残す。"""
+    ranked: List[Tuple[float, int, Dict[str, Any]]] = []
+    claimed: Dict[Tuple[str, str], int] = {}
+    for provider in providers:
+        own: Dict[Tuple[str, str], int] = {}
+        for item in results[provider.name]["items"]:
+            confidence = _item_confidence(provider, item, barcode)
+            entry = dict(item, provider=provider.name, confidence=confidence)
+            key = (str(item.get("jan") or ""), fold_width(item.get("name") or "").lower())
+            idx = claimed.get(key)
+            if idx is None:
+                own.setdefault(key, len(ranked))
+                ranked.append((confidence, len(ranked), entry))
+            elif confidence > ranked[idx][0]:
+                ranked[idx] = (confidence, ranked[idx][1], entry)
+        claimed.update(own)
+    ranked.sort(key=lambda e: (-e[0], e[1]))
+    return [e[2] for e in ranked]
+
+
+class ProviderChain:
+    """照合元を同じ締め切りの下で並列に問い合わせ、候補をまとめる。"""
+
+    def __init__(
+        self,
+        providers: List[LookupProvider],
+        early_stop_confidence: float = HIGH_CONFIDENCE,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.providers = list(providers)
+        self.early_stop_confidence = early_stop_confidence
+        self.executor = executor or _provider_executor
+
+    def _collect(self, barcode: str, deadline: Deadline) -> Dict[str, Dict[str, Any]]:
+        def _safe_lookup(provider: LookupProvider) -> Dict[str, Any]:
+            try:
+                return provider.lookup(barcode, deadline)
+            except Exception as exc:
+                return _provider_result("error", [], f"{provider.label}: {exc}", barcode)
+
+        def _is_confident(provider: LookupProvider, result: Dict[str, Any]) -> bool:
+            return any(
+                _item_confidence(provider, item, barcode) >= self.early_stop_confidence
+                for item in result.get("items") or []
+            )
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for provider in (p for p in self.providers if p.local):
+            results[provider.name] = _safe_lookup(provider)
+            if _is_confident(provider, results[provider.name]):
+                return results
+        remote = [p for p in self.providers if not p.local]
+        if len(remote) == 1:
+            results[remote[0].name] = _safe_lookup(remote[0])
+            return results
+
+        futures = {self.executor.submit(_safe_lookup, p): p for p in remote}
+        try:
+            for future in as_completed(futures, timeout=deadline.remaining()):
+                provider = futures[future]
+                result = future.result()
+                results[provider.name] = result
+                if _is_confident(provider, result):
+                    # 高信頼の JAN 一致が届いたら残りの照合元は待たない（結果は捨てる）
+                    break
+        except FuturesTimeout:
+            pass
+        return results
+
+    def lookup(self, barcode: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        deadline = deadline or Deadline(LOOKUP_DEADLINE_SEC)
+        results = self._collect(barcode, deadline)
+
+        contributors = [
+            p for p in self.providers if (results.get(p.name) or {}).get("items")
+        ]
+        items = _merge_items(contributors, results, barcode)
+        statuses = {name: result.get("status") for name, result in results.items()}
+
+        if items:
+            if len(contributors) == 1:
+                merged = dict(results[contributors[0].name])
+                merged["items"] = items
+            else:
+                labels = "・".join(p.label for p in contributors)
+                merged = _provider_result("success", items, f"{labels}で商品を取得しました。", barcode)
+            merged["providers"] = statuses
+            return merged
+
+        # ローカルの「見つからない」で外部の障害を隠さないよう、外部の照合元の状態を優先する
+        for group in (
+            [p for p in self.providers if not p.local],
+            [p for p in self.providers if p.local],
+        ):
+            for status in ("not_found", "missing_credentials", "error"):
+                for provider in group:
+                    result = results.get(provider.name)
+                    if result and result.get("status") == status:
+                        merged = dict(result)
+                        merged["providers"] = statuses
+                        return merged
+        merged = _provider_result(
+            "error", [], "商品の照合が時間内に完了しませんでした。", barcode
+        )
+        merged["providers"] = statuses
+        return merged
+
+
+def _http_providers_from_env() -> List[LookupProvider]:
+    """LOOKUP_HTTP_PROVIDERS="name|https://example.com/jan/{jan},..." から追加の照合元を作る。"""
+    providers: List[LookupProvider] = []
+    for spec in (os.getenv("LOOKUP_HTTP_PROVIDERS") or "").split(","):
+        name, _, url_template = spec.strip().partition("|")
+        if not name or not url_template:
+            continue
+        try:
+            providers.append(HttpJsonProvider(name.strip(), url_template.strip()))
+        except ValueError as exc:
+            print(f"DEBUG: skip lookup provider: {exc}")
+    return providers
+
+
+_chain_lock = threading.Lock()
+_default_chain: Optional[ProviderChain] = None
+
+
+def get_default_chain() -> ProviderChain:
+    global _default_chain
+    with _chain_lock:
+        if _default_chain is None:
+            _default_chain = ProviderChain(
+                [CatalogProvider(), RakutenProvider()] + _http_providers_from_env()
+            )
+        return _default_chain
+
+
+def set_default_providers(providers: Optional[List[LookupProvider]]) -> None:
+    """既定の照合元を差し替える（None で環境変数からの既定に戻す）。"""
+    global _default_chain
+    with _chain_lock:
+        _default_chain = ProviderChain(providers) if providers is not None else None
+
+
+def lookup_product(
+    barcode: str, deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
     """Lookup product information using the provided barcode string."""
-    return lookup_product_by_barcode(barcode)
+    return lookup_product_by_barcode(barcode, deadline=deadline)
 
 
-def lookup_product_by_barcode(barcode: str) -> Dict[str, Any]:
+def lookup_product_by_barcode(
+    barcode: str, deadline: Optional[Deadline] = None, symbology: Optional[str] = None
+) -> Dict[str, Any]:
     if not barcode:
         return {
             "status": "invalid",
@@ -206,18 +538,22 @@ def lookup_product_by_barcode(barcode: str) -> Dict[str, Any]:
             "source": "barcode",
             "keyword": None,
         }
-
-    params = {
-        "keyword": barcode,
-        "source": "barcode",
-    }
-
-    # JAN コード向けのパラメータも併用 (ドキュメントに従い省略可能)
-    params["isbnjan"] = barcode
-    return _call_rakuten(params)
+    # UPC-A / ISBN-10 / アドオン付きなどを 1 つの正規キーにまとめ、誤った番号は API を呼ばずに弾く
+    canonical = canonicalize(barcode, symbology)
+    if not canonical.valid:
+        return {
+            "status": "invalid",
+            "items": [],
+            "message": canonical.message,
+            "source": "barcode",
+            "keyword": barcode,
+        }
+    return get_default_chain().lookup(canonical.key, deadline=deadline)
 
 
-def lookup_product_by_keyword(keyword: str) -> Dict[str, Any]:
+def lookup_product_by_keyword(
+    keyword: str, deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
     if not keyword:
         return {
             "status": "invalid",
@@ -231,4 +567,18 @@ def lookup_product_by_keyword(keyword: str) -> Dict[str, Any]:
         "keyword": keyword,
         "source": "description",
     }
-    return _call_rakuten(params)
+    result = _call_rakuten(params, deadline=deadline)
+    if result.get("status") in {"not_found", "error", "missing_credentials"}:
+        # 楽天で見つからない（イベント限定品など）・使えないときはローカルカタログを全文検索する
+        rows = jan_catalog.get_catalog().search(keyword)
+        if rows:
+            return {
+                "status": "success",
+                "items": [
+                    make_item(dict(row, imageUrl=row.get("image_url"))) for row in rows
+                ],
+                "message": "登録済みカタログから商品情報を取得しました。",
+                "source": "description",
+                "keyword": keyword,
+            }
+    return result
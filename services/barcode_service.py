@@ -5,6 +5,8 @@ from typing import Optional
 from PIL import Image
 from pyzbar.pyzbar import decode as decode_barcode
 
+from services.capture_quality import check_barcode_capture
+
 
 def decode_from_base64(contents: str) -> Optional[dict]:
     """Decode barcode information from a dash upload base64 string."""
@@ -14,6 +16,11 @@ def decode_from_base64(contents: str) -> Optional[dict]:
     except Exception as exc:
         raise ValueError("画像の解析に失敗しました。別の写真でお試しください。") from exc
 
+    # ブレ・露出不良・バーコードの写っていない画像は pyzbar の試行前に弾く
+    quality = check_barcode_capture(decoded)
+    if quality is not None and quality.rejected:
+        raise ValueError(quality.message)
+
     try:
         with Image.open(io.BytesIO(decoded)) as pil_image:
             pil_image = pil_image.convert("L")
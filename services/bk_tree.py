@@ -0,0 +1,66 @@
+"""ハミング距離の BK-tree（半径 r 以内の近傍を全件走査せずに探す）。
+
+三角不等式により、問い合わせとの距離 d のノードでは辺の距離が [d - r, d + r] の子だけを辿ればよい。
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def _hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class _Node:
+    __slots__ = ("key", "payloads", "children")
+
+    def __init__(self, key: int, payload: Any):
+        self.key = key
+        self.payloads: List[Any] = [payload]
+        self.children: Dict[int, "_Node"] = {}
+
+
+class BKTree:
+    def __init__(
+        self,
+        items: Iterable[Tuple[int, Any]] = (),
+        distance: Callable[[int, int], int] = _hamming,
+    ):
+        self._root: Optional[_Node] = None
+        self._distance = distance
+        self.size = 0
+        for key, payload in items:
+            self.add(key, payload)
+
+    def add(self, key: int, payload: Any) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = _Node(key, payload)
+            return
+        node = self._root
+        while True:
+            d = self._distance(key, node.key)
+            if d == 0:
+                node.payloads.append(payload)
+                return
+            child = node.children.get(d)
+            if child is None:
+                node.children[d] = _Node(key, payload)
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> List[Tuple[int, Any]]:
+        """(距離, ペイロード) を距離の昇順で返す。"""
+        if self._root is None:
+            return []
+        found: List[Tuple[int, Any]] = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = self._distance(key, node.key)
+            if d <= radius:
+                found.extend((d, payload) for payload in node.payloads)
+            for edge, child in node.children.items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        found.sort(key=lambda entry: entry[0])
+        return found
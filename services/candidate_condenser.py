@@ -0,0 +1,177 @@
+"""タグ生成プロンプトに渡す楽天候補の圧縮。
+
+楽天の検索結果は同じ JAN の商品が店舗違いで並ぶことが多く、そのまま渡すとプロンプトが膨らむ。
+- 商品名の文字シングル（3-gram）の MinHash で近似重複をまとめ、同じ JAN も同じクラスタにする
+- クラスタ毎に代表 1 件を残し、価格帯・店舗・件数をまとめて 1 行にする
+- 推定トークン数が予算を超える行は落とす
+削減できたトークン数は呼び出し毎に返し、累計は stats() で /metrics に出す。
+"""
+
+import math
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+from services.product_name_normalizer import fold_width
+
+TOKEN_BUDGET = int(os.getenv("TAG_PROMPT_CANDIDATE_TOKEN_BUDGET", "300"))
+SIMILARITY_THRESHOLD = 0.6
+_SHINGLE_SIZE = 3
+_NUM_PERM = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_SHOPS_PER_LINE = 3
+
+# 固定シードの (a, b)。プロセスを跨いでも同じ署名になるよう hash() は使わない
+_PERMUTATIONS = [
+    ((i * 0x9E3779B1 + 0x7F4A7C15) % _MERSENNE_PRIME | 1, (i * 0x85EBCA6B + 0xC2B2AE35) % _MERSENNE_PRIME)
+    for i in range(1, _NUM_PERM + 1)
+]
+_NOISE_RE = re.compile(r"[\s\W_]+")
+
+_stats_lock = threading.Lock()
+_stats = {"calls_total": 0, "tokens_before_total": 0, "tokens_saved_total": 0}
+
+
+class CondensedCandidates(NamedTuple):
+    text: str
+    tokens_before: int
+    tokens_after: int
+    clusters: int
+    dropped: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（ASCII は 4 文字で 1、それ以外は 1 文字 1）。tokenizer には依存しない。"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def _shingle_key(name: str) -> str:
+    return _NOISE_RE.sub("", fold_width(name).lower())
+
+
+def shingles(name: str, size: int = _SHINGLE_SIZE) -> Set[str]:
+    key = _shingle_key(name)
+    if len(key) <= size:
+        return {key} if key else set()
+    return {key[i : i + size] for i in range(len(key) - size + 1)}
+
+
+def minhash_signature(shingle_set: Iterable[str]) -> List[int]:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    if not hashes:
+        return [_MERSENNE_PRIME] * _NUM_PERM
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimated_similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return same / len(sig_a) if sig_a else 0.0
+
+
+def cluster_candidates(
+    candidates: Sequence[Dict[str, Any]], threshold: float = SIMILARITY_THRESHOLD
+) -> List[List[int]]:
+    """近似重複（または同一 JAN）の候補をまとめたインデックスのクラスタ（元の順序を保つ）。"""
+    parent = list(range(len(candidates)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    signatures = [
+        minhash_signature(shingles(str(c.get("name") or c.get("raw_name") or "")))
+        for c in candidates
+    ]
+    for i in range(len(candidates)):
+        for j in range(i + 1, len(candidates)):
+            jan_i = str(candidates[i].get("jan") or "")
+            jan_j = str(candidates[j].get("jan") or "")
+            if (jan_i and jan_i == jan_j) or estimated_similarity(
+                signatures[i], signatures[j]
+            ) >= threshold:
+                parent[find(j)] = find(i)
+
+    groups: Dict[int, List[int]] = {}
+    for idx in range(len(candidates)):
+        groups.setdefault(find(idx), []).append(idx)
+    return sorted(groups.values(), key=lambda members: members[0])
+
+
+def _format_cluster(rank: int, members: List[Dict[str, Any]]) -> str:
+    # 代表は最も短い名前（店舗毎の宣伝文句が少ない）。同じ長さなら検索順位が上のもの
+    head = min(members, key=lambda item: len(str(item.get("name") or "")) or float("inf"))
+    parts = [f"#{rank}"]
+    name = head.get("name") or ""
+    if name:
+        parts.append(f"Name: {name}")
+    shops: List[str] = []
+    for item in members:
+        shop = item.get("shopName")
+        if shop and shop not in shops:
+            shops.append(shop)
+    if shops:
+        extra = len(shops) - _MAX_SHOPS_PER_LINE
+        shop_text = ", ".join(shops[:_MAX_SHOPS_PER_LINE])
+        parts.append(f"Shop: {shop_text}" + (f" (+{extra})" if extra > 0 else ""))
+    prices = [p for p in (item.get("price") for item in members) if isinstance(p, (int, float))]
+    if prices:
+        low, high = min(prices), max(prices)
+        parts.append(f"Price: {low}" if low == high else f"Price: {low}-{high}")
+    jan = next((item.get("jan") for item in members if item.get("jan")), "")
+    if jan:
+        parts.append(f"JAN: {jan}")
+    if len(members) > 1:
+        parts.append(f"Listings: {len(members)}")
+    return " | ".join(parts)
+
+
+def condense_candidates(
+    candidates: Iterable[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    baseline_text: Optional[str] = None,
+) -> CondensedCandidates:
+    """
+    候補をクラスタ毎の 1 行にまとめ、推定トークン数 token_budget 以内で返す。
+
+    baseline_text は従来の整形結果（削減量の基準）。省略時は削減量 0 として扱う。
+    """
+    items = [c for c in candidates if isinstance(c, dict)]
+    budget = TOKEN_BUDGET if token_budget is None else token_budget
+    lines: List[str] = []
+    used = 0
+    clusters = cluster_candidates(items)
+    dropped = 0
+    for rank, members in enumerate(clusters, start=1):
+        line = _format_cluster(rank, [items[i] for i in members])
+        cost = estimate_tokens(line) + 1
+        # 先頭クラスタは予算に関係なく残す（候補ゼロよりは長いほうがよい）
+        if lines and used + cost > budget:
+            dropped = len(clusters) - rank + 1
+            break
+        lines.append(line)
+        used += cost
+    text = "\n".join(lines)
+    tokens_after = estimate_tokens(text)
+    tokens_before = estimate_tokens(baseline_text) if baseline_text is not None else tokens_after
+    result = CondensedCandidates(text, tokens_before, tokens_after, len(clusters), dropped)
+    with _stats_lock:
+        _stats["calls_total"] += 1
+        _stats["tokens_before_total"] += tokens_before
+        _stats["tokens_saved_total"] += result.tokens_saved
+    return result
+
+
+def stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
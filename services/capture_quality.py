@@ -0,0 +1,182 @@
+"""撮影画像の品質判定（ブレ・露出・バーコード領域のコントラスト）を NumPy で行う。
+
+ピンぼけ・真っ暗・白飛びの写真は pyzbar の 5 回の試行や画像説明・タグ生成の呼び出しを
+すべて無駄にするため、デコードや API の前にここで弾く（または警告する）。
+- ブレ: 256px グレースケールのラプラシアン分散（弾くのはバーコードのみ。正面写真は警告）
+- 露出: 平均輝度と、黒つぶれ（<24）・白飛び（>245）の画素割合
+- バーコード: 横方向の輝度勾配が最も強いタイルの明暗差（p95 - p5）
+しきい値は assets/camera.js の端末側チェックと揃えている（同じ 256px で計算する）。
+"""
+
+import io
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+_WORKING_SIZE = 256
+_TILE_GRID = 4
+
+# ラプラシアン分散（256px）。これ未満は読み取り不能なブレ、WARN 未満は警告
+BLUR_REJECT = 12.0
+BLUR_WARN = 40.0
+DARK_LEVEL = 24
+BRIGHT_LEVEL = 245
+# 画素の大半が黒つぶれ・白飛び
+EXPOSURE_REJECT_FRACTION = 0.85
+EXPOSURE_WARN_FRACTION = 0.5
+# バーコードらしい領域の明暗差（0..255）
+BARCODE_CONTRAST_REJECT = 40.0
+
+# 弾いた 1 枚あたりに省ける呼び出し（decode_from_base64 の試行数・画像説明＋タグ生成）
+DECODE_ATTEMPTS_PER_CAPTURE = 5
+VISION_CALLS_PER_CAPTURE = 2
+
+VERDICT_OK = "ok"
+VERDICT_WARN = "warn"
+VERDICT_REJECT = "reject"
+
+_MESSAGES = {
+    "blur": "写真がブレています。ピントを合わせて撮り直してください。",
+    "dark": "写真が暗すぎます。明るい場所で撮り直してください。",
+    "bright": "写真が白飛びしています。光の反射を避けて撮り直してください。",
+    "contrast": "バーコードがはっきり写っていません。バーコードに近づいて撮り直してください。",
+}
+
+
+class QualityReport(NamedTuple):
+    verdict: str
+    # 該当した問題（"blur" / "dark" / "bright" / "contrast"）
+    issues: Tuple[str, ...]
+    blur: float
+    brightness: float
+    dark_fraction: float
+    bright_fraction: float
+    barcode_contrast: Optional[float]
+
+    @property
+    def rejected(self) -> bool:
+        return self.verdict == VERDICT_REJECT
+
+    @property
+    def message(self) -> str:
+        # 暗さ・白飛びが原因のブレは重ねて出さない（先頭の問題だけ案内する）
+        return _MESSAGES[self.issues[0]] if self.issues else ""
+
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "checked_total": 0,
+    "warned_total": 0,
+    "rejected_total": 0,
+    "decode_attempts_saved_total": 0,
+    "vision_calls_saved_total": 0,
+}
+
+
+def _record(report: QualityReport, saved_key: Optional[str], saved: int) -> None:
+    with _stats_lock:
+        _stats["checked_total"] += 1
+        if report.verdict == VERDICT_WARN:
+            _stats["warned_total"] += 1
+        elif report.rejected:
+            _stats["rejected_total"] += 1
+            if saved_key:
+                _stats[saved_key] += saved
+
+
+def stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """4 近傍ラプラシアンの分散（大きいほどシャープ）。"""
+    lap = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:] - 4 * gray[1:-1, 1:-1]
+    )
+    return float(lap.var()) if lap.size else 0.0
+
+
+def barcode_region_contrast(gray: np.ndarray, grid: int = _TILE_GRID) -> float:
+    """横方向の勾配が最も強いタイル（バーコードの縦縞）の明暗差。"""
+    height, width = gray.shape
+    th, tw = max(height // grid, 2), max(width // grid, 2)
+    gradient = np.abs(np.diff(gray, axis=1))
+    best_energy, best_tile = -1.0, gray
+    for top in range(0, height - th + 1, th):
+        for left in range(0, width - tw + 1, tw):
+            energy = float(gradient[top : top + th, left : left + tw - 1].mean())
+            if energy > best_energy:
+                best_energy, best_tile = energy, gray[top : top + th, left : left + tw]
+    low, high = np.percentile(best_tile, (5, 95))
+    return float(high - low)
+
+
+def analyze_gray(gray: np.ndarray, for_barcode: bool = False) -> QualityReport:
+    gray = gray.astype(np.float64)
+    blur = laplacian_variance(gray)
+    brightness = float(gray.mean()) if gray.size else 0.0
+    dark_fraction = float((gray < DARK_LEVEL).mean()) if gray.size else 1.0
+    bright_fraction = float((gray > BRIGHT_LEVEL).mean()) if gray.size else 0.0
+    contrast = barcode_region_contrast(gray) if for_barcode and gray.size else None
+
+    rejected, warned = [], []
+    for issue, value, reject_at, warn_at in (
+        ("dark", dark_fraction, EXPOSURE_REJECT_FRACTION, EXPOSURE_WARN_FRACTION),
+        ("bright", bright_fraction, EXPOSURE_REJECT_FRACTION, EXPOSURE_WARN_FRACTION),
+    ):
+        if value >= reject_at:
+            rejected.append(issue)
+        elif value >= warn_at:
+            warned.append(issue)
+    if blur < BLUR_REJECT and for_barcode:
+        rejected.append("blur")
+    elif blur < BLUR_WARN:
+        # 無地の背景のぬいぐるみなど、滑らかな被写体は写真としては使えるので警告に留める
+        warned.append("blur")
+    if contrast is not None and contrast < BARCODE_CONTRAST_REJECT:
+        rejected.append("contrast")
+
+    verdict = VERDICT_REJECT if rejected else VERDICT_WARN if warned else VERDICT_OK
+    return QualityReport(
+        verdict,
+        tuple(rejected or warned),
+        round(blur, 2),
+        round(brightness, 2),
+        round(dark_fraction, 3),
+        round(bright_fraction, 3),
+        round(contrast, 2) if contrast is not None else None,
+    )
+
+
+def analyze_image(image_bytes: bytes, for_barcode: bool = False) -> Optional[QualityReport]:
+    """画像バイト列を判定する。画像として読めなければ None（判定せず従来の処理に任せる）。"""
+    if not image_bytes:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.draft("L", (_WORKING_SIZE * 2, _WORKING_SIZE * 2))
+            gray = ImageOps.exif_transpose(image).convert("L")
+            gray.thumbnail((_WORKING_SIZE, _WORKING_SIZE))
+            pixels = np.asarray(gray)
+    except Exception:
+        return None
+    return analyze_gray(pixels, for_barcode=for_barcode)
+
+
+def check_barcode_capture(image_bytes: bytes) -> Optional[QualityReport]:
+    """バーコード撮影の判定。reject ならデコード試行分を節約として数える。"""
+    report = analyze_image(image_bytes, for_barcode=True)
+    if report is not None:
+        _record(report, "decode_attempts_saved_total", DECODE_ATTEMPTS_PER_CAPTURE)
+    return report
+
+
+def check_photo_capture(image_bytes: bytes) -> Optional[QualityReport]:
+    """正面写真の判定。reject なら画像説明・タグ生成の呼び出し分を節約として数える。"""
+    report = analyze_image(image_bytes)
+    if report is not None:
+        _record(report, "vision_calls_saved_total", VISION_CALLS_PER_CAPTURE)
+    return report
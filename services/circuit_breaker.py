@@ -0,0 +1,189 @@
+"""外部依存（IO Intelligence / 楽天API）ごとのサーキットブレーカー。
+
+- 直近 window 件の呼び出しで失敗率または遅延率が閾値を超えたら open にし、open_sec の間は即座に失敗させる。
+- open_sec 経過後は half-open として少数のプローブだけ通し、成功すれば closed に戻す。
+- 状態は snapshot_all() で取り出し、server.py の /healthz と /metrics で公開する。
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """ブレーカーが open のため呼び出しを行わなかったことを表す。"""
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit '{name}' is open")
+        self.name = name
+
+
+def _env_float(key: str, default: float) -> float:
+    try:
+        return float(os.getenv(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_sec: float = 10.0,
+        slow_rate: float = 0.8,
+        window: int = 20,
+        min_calls: int = 5,
+        open_sec: float = 30.0,
+        half_open_probes: int = 1,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_sec = slow_call_sec
+        self.slow_rate = slow_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_sec = open_sec
+        self.half_open_probes = max(1, half_open_probes)
+        self._lock = threading.Lock()
+        # (成功したか, 遅延超過か)
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.rejected_total = 0
+        self.opened_total = 0
+        self.calls_total = 0
+        self.failures_total = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state_locked()
+
+    def _current_state_locked(self) -> str:
+        if (
+            self._state == STATE_OPEN
+            and time.monotonic() - self._opened_at >= self.open_sec
+        ):
+            self._state = STATE_HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        """呼び出してよければ True。half-open ではプローブ枠を1つ確保する。"""
+        with self._lock:
+            state = self._current_state_locked()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected_total += 1
+            return False
+
+    def _trip_locked(self) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._calls.clear()
+        self.opened_total += 1
+
+    def record(self, success: bool, elapsed_sec: float) -> None:
+        slow = elapsed_sec >= self.slow_call_sec
+        with self._lock:
+            self.calls_total += 1
+            if not success:
+                self.failures_total += 1
+            state = self._current_state_locked()
+            if state == STATE_HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if success and not slow:
+                    self._state = STATE_CLOSED
+                    self._calls.clear()
+                else:
+                    self._trip_locked()
+                return
+            if state == STATE_OPEN:
+                return
+            self._calls.append((success, slow))
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            slows = sum(1 for _, is_slow in self._calls if is_slow)
+            if failures / total >= self.failure_rate or slows / total >= self.slow_rate:
+                self._trip_locked()
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """with 内の例外を失敗として記録する。open なら CircuitOpenError を送出する。"""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state_locked()
+            total = len(self._calls)
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            return {
+                "state": state,
+                "window_calls": total,
+                "window_failures": failures,
+                "calls_total": self.calls_total,
+                "failures_total": self.failures_total,
+                "rejected_total": self.rejected_total,
+                "opened_total": self.opened_total,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._calls.clear()
+            self._probes_in_flight = 0
+
+
+_registry_lock = threading.Lock()
+_registry: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, **defaults: Any) -> CircuitBreaker:
+    """名前付きブレーカーを返す（なければ作る）。閾値は CB_<NAME>_* 環境変数で上書きできる。"""
+    with _registry_lock:
+        breaker = _registry.get(name)
+        if breaker is None:
+            prefix = f"CB_{name.upper()}_"
+            params = dict(defaults)
+            for key in ("failure_rate", "slow_call_sec", "slow_rate", "open_sec"):
+                if os.getenv(prefix + key.upper()) is not None:
+                    params[key] = _env_float(prefix + key.upper(), params.get(key, 0.0))
+            breaker = CircuitBreaker(name, **params)
+            _registry[name] = breaker
+        return breaker
+
+
+def snapshot_all() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        breakers = list(_registry.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def is_open(name: str) -> bool:
+    """登録済みブレーカーが open（half-open は含まない）なら True。"""
+    with _registry_lock:
+        breaker: Optional[CircuitBreaker] = _registry.get(name)
+    return breaker is not None and breaker.state == STATE_OPEN
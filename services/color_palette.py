@@ -0,0 +1,183 @@
+"""写真の主要色（パレット）を NumPy の k-means で抽出し、Lab 色空間で最寄りの色に割り当てる。
+
+LLM の説明文から色名を拾う代わりに、縮小画像の画素を Lab に変換して k-means でまとめる。
+初期値は固定シードの k-means++ なので、同じ写真からは常に同じパレットが得られる。
+色の近さは CIE76（Lab のユークリッド距離 ΔE）で測る。
+"""
+
+import io
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+PALETTE_SIZE = 5
+# k-means に使う縮小画像の一辺（48x48 = 2304 画素）
+_SAMPLE_SIZE = 48
+_ITERATIONS = 12
+_SEED = 0
+# これ未満の割合の色はスロット候補にしない（先頭の主要色は常に候補）
+SUGGEST_MIN_SHARE = 0.2
+SUGGEST_MAX_SLOTS = 2
+
+_HEX_RE = re.compile(r"^#?([0-9a-fA-F]{6})$")
+# sRGB（D65）→ XYZ
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+_WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+
+class PaletteColor(NamedTuple):
+    hex: str
+    # 画素に占める割合（0..1）
+    share: float
+    lab: Tuple[float, float, float]
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """(..., 3) の 0..255 sRGB を CIE Lab に変換する。"""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = (linear @ _RGB_TO_XYZ.T) / _WHITE_D65
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def hex_to_lab(value: Optional[str]) -> Optional[np.ndarray]:
+    match = _HEX_RE.match((value or "").strip())
+    if not match:
+        return None
+    code = match.group(1)
+    rgb = [int(code[i : i + 2], 16) for i in (0, 2, 4)]
+    return rgb_to_lab(np.array(rgb, dtype=np.float64))
+
+
+def _to_hex(rgb: np.ndarray) -> str:
+    r, g, b = (int(v) for v in np.clip(np.rint(rgb), 0, 255))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _init_centers(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ の初期値（固定シードで決定的）。"""
+    centers = [points[rng.integers(len(points))]]
+    distances = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = distances.sum()
+        if total <= 0:
+            break
+        centers.append(points[rng.choice(len(points), p=distances / total)])
+        distances = np.minimum(distances, ((points - centers[-1]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def kmeans(points: np.ndarray, k: int, iterations: int = _ITERATIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """(N, d) の点を k 個にまとめ、(中心, 各点のラベル) を返す。空になったクラスタは落とす。"""
+    rng = np.random.default_rng(_SEED)
+    centers = _init_centers(points, min(k, len(points)), rng)
+    labels = np.zeros(len(points), dtype=np.intp)
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        counts = np.bincount(new_labels, minlength=len(centers))
+        keep = counts > 0
+        sums = np.zeros_like(centers)
+        np.add.at(sums, new_labels, points)
+        new_centers = sums[keep] / counts[keep, None]
+        if keep.all() and np.array_equal(new_labels, labels):
+            break
+        if not keep.all():
+            # 空クラスタを詰めてラベルを振り直す
+            remap = np.cumsum(keep) - 1
+            new_labels = remap[new_labels]
+        centers, labels = new_centers, new_labels
+    return centers, labels
+
+
+def palette_from_image(image: Image.Image, size: int = PALETTE_SIZE) -> List[PaletteColor]:
+    sample = ImageOps.exif_transpose(image).convert("RGB")
+    sample.thumbnail((_SAMPLE_SIZE, _SAMPLE_SIZE))
+    rgb = np.asarray(sample, dtype=np.float64).reshape(-1, 3)
+    if not len(rgb):
+        return []
+    lab = rgb_to_lab(rgb)
+    centers, labels = kmeans(lab, size)
+    counts = np.bincount(labels, minlength=len(centers))
+    palette = []
+    for index in np.argsort(-counts, kind="stable"):
+        members = rgb[labels == index]
+        if not len(members):
+            continue
+        palette.append(
+            PaletteColor(
+                _to_hex(members.mean(axis=0)),
+                round(float(counts[index]) / len(rgb), 3),
+                tuple(round(float(v), 2) for v in centers[index]),
+            )
+        )
+    return palette
+
+
+def extract_palette(image_bytes: bytes, size: int = PALETTE_SIZE) -> List[PaletteColor]:
+    """画像バイト列から主要色を割合の大きい順に返す。画像として読めなければ空。"""
+    if not image_bytes:
+        return []
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            # JPEG は縮小デコードで読む（大きな写真でもデコードが支配的にならない）
+            image.draft("RGB", (_SAMPLE_SIZE * 4, _SAMPLE_SIZE * 4))
+            return palette_from_image(image, size)
+    except Exception:
+        return []
+
+
+def palette_json(palette: Sequence[PaletteColor]) -> List[Dict[str, Any]]:
+    """DB（jsonb）・store 用の軽い表現。"""
+    return [{"hex": color.hex, "share": color.share} for color in palette]
+
+
+def nearest_color(lab: Sequence[float], candidates: Iterable[Tuple[Any, Optional[str]]]) -> Optional[Any]:
+    """(キー, HEX) の候補から Lab で最も近いもののキー。有効な候補が無ければ None。"""
+    keys, labs = [], []
+    for key, hex_value in candidates:
+        candidate_lab = hex_to_lab(hex_value)
+        if candidate_lab is not None:
+            keys.append(key)
+            labs.append(candidate_lab)
+    if not keys:
+        return None
+    distances = ((np.array(labs) - np.asarray(lab, dtype=np.float64)) ** 2).sum(axis=1)
+    return keys[int(distances.argmin())]
+
+
+def suggest_slots(
+    palette: Sequence[PaletteColor],
+    color_tags: Sequence[Dict[str, Any]],
+    min_share: float = SUGGEST_MIN_SHARE,
+    max_slots: int = SUGGEST_MAX_SLOTS,
+) -> List[int]:
+    """主要色ごとに最寄りのカラータグ slot を選ぶ（重複なし・主要色の順）。"""
+    candidates = [
+        (int(tag["slot"]), tag.get("color_tag_color"))
+        for tag in color_tags
+        if isinstance(tag, dict) and tag.get("slot")
+    ]
+    slots: List[int] = []
+    for position, color in enumerate(palette):
+        if len(slots) >= max_slots:
+            break
+        if position and color.share < min_share:
+            break
+        slot = nearest_color(color.lab, candidates)
+        if slot is not None and slot not in slots:
+            slots.append(slot)
+    return slots
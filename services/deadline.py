@@ -0,0 +1,92 @@
+"""登録ステップ単位の締め切り（deadline）と、ステップ内で共有するリトライ予算。
+
+1 ステップ（バーコード照合・画像説明〜タグ生成など）の入口で Deadline を作り、
+describe_image / extract_tags / lookup_product_by_barcode に渡す。
+各 HTTP 呼び出しは残り時間をタイムアウトに使い、リトライは共有予算から差し引くため、
+呼び出しが何層に重なっても合計時間は SLO 内に収まる。
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 画像説明＋タグ生成（バックグラウンドのエンリッチ 1 回分）の SLO
+ENRICHMENT_DEADLINE_SEC = float(os.getenv("ENRICHMENT_DEADLINE_SEC", "60"))
+# バーコード照合（楽天）の SLO。コールバック内で同期実行されるため短め
+LOOKUP_DEADLINE_SEC = float(os.getenv("LOOKUP_DEADLINE_SEC", "12"))
+# 1 ステップ内で許すリトライ総数（変種×モデル×HTTP リトライの掛け算を防ぐ）
+STEP_RETRY_BUDGET = int(os.getenv("STEP_RETRY_BUDGET", "3"))
+# これ未満の残り時間では新しい HTTP 呼び出しを始めない
+MIN_CALL_TIMEOUT_SEC = 1.0
+
+
+class DeadlineExceeded(Exception):
+    """ステップの締め切りを過ぎたため呼び出しを行わなかったことを表す。"""
+
+
+class RetryBudget:
+    def __init__(self, max_retries: int):
+        self._remaining = max(0, int(max_retries))
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return self._remaining
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+
+class Deadline:
+    def __init__(self, budget_sec: float, retry_budget: Optional[RetryBudget] = None):
+        self.budget_sec = budget_sec
+        self.expires_at = time.monotonic() + max(0.0, budget_sec)
+        self.retries = retry_budget or RetryBudget(STEP_RETRY_BUDGET)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() < MIN_CALL_TIMEOUT_SEC
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """次の HTTP 呼び出しに使うタイムアウト（残り時間と cap の小さい方）。足りなければ DeadlineExceeded。"""
+        remaining = self.remaining()
+        if remaining < MIN_CALL_TIMEOUT_SEC:
+            raise DeadlineExceeded(f"deadline exceeded ({self.budget_sec:.0f}s)")
+        return min(remaining, cap) if cap else remaining
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    deadline: Deadline,
+    should_retry: Callable[[BaseException], bool],
+    wait_sec: float = 2.0,
+    max_attempts: int = 3,
+) -> T:
+    """
+    fn を呼び、should_retry(例外) が真ならリトライする。
+
+    リトライは deadline の共有予算を 1 つ消費し、待機後に最低限の残り時間がない場合は行わない。
+    """
+    attempt = 1
+    while True:
+        try:
+            return fn()
+        except Exception as exc:
+            if not should_retry(exc) or attempt >= max_attempts:
+                raise
+            if deadline.remaining() < wait_sec + MIN_CALL_TIMEOUT_SEC:
+                raise
+            if not deadline.retries.try_acquire():
+                raise
+            time.sleep(wait_sec)
+            attempt += 1
@@ -0,0 +1,403 @@
+"""画像説明テキストから構造化データ・タグ候補を取り出す事前コンパイル済みの抽出エンジン。
+
+- 色・素材・形状・モチーフ・特徴などの語彙と、ユーザーが登録済みの作品シリーズ名・キャラクター名を
+  1 つの Aho-Corasick オートマトン（services.text_matcher）にまとめ、説明文を 1 回走査して全フィールドを埋める。
+- 「キャラクター: ○○」のようなラベル付き記述は 1 本の正規表現（事前コンパイル）で拾う。
+- io_intelligence._extract_structured_data / tag_extraction._semantic_tags_from_description の実体。
+  モデルが使えないときのローカル抽出（サーキットブレーカー open 時など）もこれに頼る。
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.text_matcher import AhoCorasick
+
+# 表記ゆれ → 正規形
+COLOR_VARIANTS: Dict[str, str] = {
+    "白色": "白",
+    "白い": "白",
+    "ホワイト": "白",
+    "白": "白",
+    "青色": "青",
+    "青い": "青",
+    "ブルー": "青",
+    "青": "青",
+    "水色": "水色",
+    "ライトブルー": "水色",
+    "紺色": "紺",
+    "ネイビー": "紺",
+    "紺": "紺",
+    "灰色": "灰色",
+    "グレー": "灰色",
+    "オレンジ色": "オレンジ",
+    "オレンジ": "オレンジ",
+    "赤色": "赤",
+    "赤い": "赤",
+    "レッド": "赤",
+    "赤": "赤",
+    "黒色": "黒",
+    "ブラック": "黒",
+    "黒": "黒",
+    "金色": "金色",
+    "ゴールド": "金色",
+    "銀色": "銀色",
+    "シルバー": "銀色",
+    "紫色": "紫",
+    "パープル": "紫",
+    "紫": "紫",
+    "緑色": "緑",
+    "グリーン": "緑",
+    "緑": "緑",
+    "黄色": "黄色",
+    "イエロー": "黄色",
+    "黄": "黄色",
+    "ピンク色": "ピンク",
+    "ピンク": "ピンク",
+    "茶色": "茶色",
+    "ブラウン": "茶色",
+    "虹色": "虹色",
+}
+
+MATERIAL_VARIANTS: Dict[str, str] = {
+    "シリコン": "シリコン",
+    "ゴム": "ゴム",
+    "ラバー": "ラバー",
+    "PVC": "PVC",
+    "ABS樹脂": "ABS樹脂",
+    "アクリル": "アクリル",
+    "プラスチック": "プラスチック",
+    "金属": "金属",
+    "メタル": "金属",
+    "布": "布",
+    "紙": "紙",
+    "木製": "木製",
+}
+
+# 製品の形状として structured_data.product_shape に入れてよい語
+SHAPE_KEYWORDS: List[str] = [
+    "アクリルスタンド",
+    "フィギュア",
+    "缶バッジ",
+    "キーホルダー",
+    "ラバーキーホルダー",
+    "キーリング",
+    "タペストリー",
+    "ポスター",
+    "クリアファイル",
+    "ステッカー",
+]
+
+# タグ候補としての物品名（形状より広い）
+ITEM_KEYWORDS: List[str] = SHAPE_KEYWORDS + [
+    "チャーム",
+    "ストラップ",
+    "マスコット",
+    "アクセサリー",
+    "雑貨",
+    "グッズ",
+]
+
+MOTIF_KEYWORDS: List[str] = [
+    "雪だるま",
+    "雪の結晶",
+    "冬",
+    "北海道",
+    "キャラクター",
+    "動物",
+    "鳥",
+    "シマエナガ",
+    "ペンギン",
+    "星",
+]
+
+FEATURE_KEYWORDS: List[str] = [
+    "限定", "イベント", "コンサート", "ライブ", "生誕祭", "周年", "復刻",
+    "オリジナル", "描き下ろし", "レア", "スペシャル", "プレミアム",
+    "セット", "コンプリート", "コレクション", "シリーズ",
+    "大サイズ", "小サイズ", "特大", "ミニ",
+    "光る", "発光", "LED", "蓄光",
+    "透明", "クリア", "半透明",
+    "立体", "3D", "浮き出し",
+    "箔押し", "エンボス", "デボス",
+]
+
+# 「〜ちゃん」「〜のグッズ」など後方参照が要る記述の目印。走査で見つかったときだけ正規表現を動かす
+CHARACTER_SUFFIXES = ["ちゃん", "さん", "くん", "さま", "のイラスト", "のフィギュア", "のキャラクター"]
+WORKS_SUFFIXES = ["のグッズ", "のキャラクター", "のイラスト"]
+
+DOUJIN_KEYWORDS = ["同人", "個人制作", "インディーズ"]
+DIGITAL_KEYWORDS = ["デジタル", "ダウンロード", "データ"]
+
+# ユーザー辞書の語はこれ未満の長さだと誤一致が多いので使わない
+_MIN_USER_TERM_LEN = 2
+_MAX_USER_TERMS = 2000
+
+# ラベル付き記述（例: 「キャラクター: 〇〇」「素材：アクリル」）。長いラベルを先に置く
+_LABEL_FIELDS: List[Tuple[str, str]] = [
+    ("キャラクター名", "character_name"),
+    ("キャラクター", "character_name"),
+    ("キャラ", "character_name"),
+    ("作品", "works_name"),
+    ("アニメ", "works_name"),
+    ("漫画", "works_name"),
+    ("シリーズ", "works_name"),
+    ("形状", "product_shape"),
+    ("タイプ", "product_shape"),
+    ("種類", "product_shape"),
+    ("素材", "materials"),
+    ("材質", "materials"),
+    ("カラー", "colors"),
+    ("色", "colors"),
+]
+_LABEL_TO_FIELD = dict(_LABEL_FIELDS)
+_LABEL_RE = re.compile(
+    "(?P<label>"
+    + "|".join(re.escape(label) for label, _ in _LABEL_FIELDS)
+    + r")[：:]\s*(?P<value>[^。\n,]*)"
+)
+_CHARACTER_SUFFIX_RE = re.compile(
+    r"([^、。\n]*)(?:ちゃん|さん|くん|さま)|([^\s、。\n]*)(?:のイラスト|のフィギュア|のキャラクター)"
+)
+_WORKS_SUFFIX_RE = re.compile(r"([^、。\n]*)(?:のグッズ|のキャラクター|のイラスト)")
+_WORKS_SKIP = ("の", "キャラクター", "キャラ", "イラスト")
+_OTHER_TAG_RE = re.compile(r"(\w{2,})(?:色|版|タイプ|仕様)")
+_QUOTED_NAME_RE = re.compile(r"[『「\"]([^』」\"\n]{1,12})[』」\"]")
+_LATIN_NAME_RE = re.compile(r"\b[A-Za-z][A-Za-z0-9\-]{2,}\b")
+
+SEMANTIC_TAG_LIMIT = 5
+
+
+def _empty_structured_data() -> Dict[str, Any]:
+    return {
+        "character_name": "",
+        "works_name": "",
+        "works_series_name": "",
+        "copyright_company_name": "",
+        "product_shape": "",
+        "product_type_flags": [],
+        "other_tags": [],
+        "colors": [],
+        "materials": [],
+        "features": [],
+    }
+
+
+def _dedup(values: Iterable[str]) -> List[str]:
+    seen = set()
+    result: List[str] = []
+    for value in values:
+        candidate = (value or "").strip()
+        key = candidate.lower()
+        if candidate and key not in seen:
+            seen.add(key)
+            result.append(candidate)
+    return result
+
+
+class DescriptionExtractor:
+    """語彙＋ユーザー辞書から構築した抽出器。構築後は読み取り専用でスレッド間共有できる。"""
+
+    def __init__(self, user_terms: Optional[Dict[str, Iterable[str]]] = None):
+        entries: List[Tuple[str, Tuple[str, str]]] = []
+        for variant, canonical in COLOR_VARIANTS.items():
+            entries.append((variant, ("color", canonical)))
+        for variant, canonical in MATERIAL_VARIANTS.items():
+            entries.append((variant, ("material", canonical)))
+        for word in SHAPE_KEYWORDS:
+            entries.append((word, ("shape", word)))
+        for word in ITEM_KEYWORDS:
+            entries.append((word, ("item", word)))
+        for word in MOTIF_KEYWORDS:
+            entries.append((word, ("motif", word)))
+        for word in FEATURE_KEYWORDS:
+            entries.append((word, ("feature", word)))
+        for word in CHARACTER_SUFFIXES:
+            entries.append((word, ("character_suffix", word)))
+        for word in WORKS_SUFFIXES:
+            entries.append((word, ("works_suffix", word)))
+        for word in DOUJIN_KEYWORDS:
+            entries.append((word, ("doujin", word)))
+        for word in DIGITAL_KEYWORDS:
+            entries.append((word, ("digital", word)))
+        self.user_term_count = 0
+        for field, terms in (user_terms or {}).items():
+            for term in _dedup(terms)[:_MAX_USER_TERMS]:
+                if len(term) >= _MIN_USER_TERM_LEN:
+                    entries.append((term, (f"user:{field}", term)))
+                    self.user_term_count += 1
+        self._matcher = AhoCorasick(entries)
+
+    def _scan(self, text: str) -> Dict[str, List[str]]:
+        """1 回の走査でカテゴリ毎の一致（出現順・重複なし）を集める。"""
+        found: Dict[str, List[str]] = {}
+        for _start, _end, (category, value) in self._matcher.iter_matches(text):
+            bucket = found.setdefault(category, [])
+            if value not in bucket:
+                bucket.append(value)
+        return found
+
+    def extract_structured_data(self, description: str) -> Dict[str, Any]:
+        data = _empty_structured_data()
+        if not description:
+            return data
+
+        labelled: Dict[str, str] = {}
+        for match in _LABEL_RE.finditer(description):
+            field = _LABEL_TO_FIELD[match.group("label")]
+            value = match.group("value").strip()
+            if value and field not in labelled:
+                labelled[field] = value
+        found = self._scan(description)
+
+        # キャラクター名: ラベル → ユーザー辞書 → 「〜ちゃん」「〜のイラスト」
+        character = labelled.get("character_name", "")
+        if len(character) <= 1:
+            character = (found.get("user:character_name") or [""])[0]
+        if not character and found.get("character_suffix"):
+            for match in _CHARACTER_SUFFIX_RE.finditer(description):
+                candidate = (match.group(1) or match.group(2) or "").strip()
+                if len(candidate) > 1:
+                    character = candidate
+                    break
+        data["character_name"] = character
+
+        # 作品名: ラベル → 「〜のグッズ」。作品シリーズ名はユーザー辞書の一致のみ
+        works = labelled.get("works_name", "")
+        if len(works) <= 1 or any(skip in works for skip in _WORKS_SKIP):
+            works = ""
+            suffix_matches = (
+                _WORKS_SUFFIX_RE.finditer(description) if found.get("works_suffix") else ()
+            )
+            for match in suffix_matches:
+                candidate = match.group(1).strip()
+                if len(candidate) > 1 and not any(skip in candidate.lower() for skip in _WORKS_SKIP):
+                    works = candidate
+                    break
+        data["works_name"] = works
+        data["works_series_name"] = (found.get("user:works_series_name") or [""])[0]
+
+        data["product_shape"] = labelled.get("product_shape") or (found.get("shape") or [""])[0]
+        data["colors"] = [labelled["colors"]] if labelled.get("colors") else list(found.get("color", []))
+        data["materials"] = (
+            [labelled["materials"]] if labelled.get("materials") else list(found.get("material", []))
+        )
+        data["features"] = list(found.get("feature", []))
+        data["other_tags"] = _dedup(_OTHER_TAG_RE.findall(description)) + data["features"]
+        data["product_type_flags"] = ["doujin" if found.get("doujin") else "commercial"]
+        if found.get("digital"):
+            data["product_type_flags"].append("digital")
+        return data
+
+    def semantic_tags(self, description: str, limit: int = SEMANTIC_TAG_LIMIT) -> List[str]:
+        """物品・モチーフ・色・素材・固有名をバランスよく選んだタグ候補（最大 limit 件）。"""
+        if not description:
+            return []
+        text = description.replace("　", " ")
+        found = self._scan(text)
+
+        names = [q.strip().strip("・,，。:：;；") for q in _QUOTED_NAME_RE.findall(text)]
+        names = [n for n in names if len(n) >= 2]
+        names += found.get("user:character_name", []) + found.get("user:works_series_name", [])
+        names += _LATIN_NAME_RE.findall(text)
+
+        buckets = [
+            _dedup(found.get("item", [])),
+            _dedup(found.get("motif", [])),
+            _dedup(found.get("color", [])),
+            _dedup(found.get("material", [])),
+            _dedup(names),
+        ]
+        final_tags: List[str] = []
+        added = set()
+
+        def push(tag: str) -> None:
+            key = tag.lower()
+            if tag and key not in added and len(final_tags) < limit:
+                added.add(key)
+                final_tags.append(tag)
+
+        # 1 周目: 各カテゴリから 1 つずつ、2 周目: 残りを優先順に
+        for bucket in buckets:
+            if bucket:
+                push(bucket[0])
+        for bucket in buckets:
+            for tag in bucket[1:]:
+                push(tag)
+        return final_tags
+
+
+_default_lock = threading.Lock()
+_default_extractor: Optional[DescriptionExtractor] = None
+
+# ユーザー辞書つき抽出器のキャッシュ（members_id → (構築時刻, 抽出器)）
+_USER_CACHE_TTL_SEC = 600.0
+_USER_CACHE_MAX = 128
+_user_cache_lock = threading.Lock()
+_user_cache: "OrderedDict[str, Tuple[float, DescriptionExtractor]]" = OrderedDict()
+
+
+def default_extractor() -> DescriptionExtractor:
+    """語彙だけの共有抽出器（初回に 1 度だけ構築）。"""
+    global _default_extractor
+    if _default_extractor is None:
+        with _default_lock:
+            if _default_extractor is None:
+                _default_extractor = DescriptionExtractor()
+    return _default_extractor
+
+
+def load_user_terms(supabase: Any, members_id: str) -> Dict[str, List[str]]:
+    """登録済み製品の作品シリーズ名・キャラクター名を集める（RLS の効いたユーザークライアントで呼ぶ）。"""
+    response = (
+        supabase.table("registration_product_information")
+        .select("works_series_name, character_name")
+        .eq("members_id", members_id)
+        .limit(_MAX_USER_TERMS)
+        .execute()
+    )
+    rows = getattr(response, "data", None) or []
+    return {
+        "works_series_name": _dedup(r.get("works_series_name") or "" for r in rows),
+        "character_name": _dedup(r.get("character_name") or "" for r in rows),
+    }
+
+
+def extractor_for_user(members_id: Optional[str], supabase: Any = None) -> DescriptionExtractor:
+    """ユーザー辞書つき抽出器を返す。取得できなければ語彙だけの抽出器にフォールバックする。"""
+    if not members_id or supabase is None:
+        return default_extractor()
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(members_id)
+        if entry is not None and now - entry[0] < _USER_CACHE_TTL_SEC:
+            _user_cache.move_to_end(members_id)
+            return entry[1]
+    try:
+        extractor = DescriptionExtractor(load_user_terms(supabase, members_id))
+    except Exception:
+        return default_extractor()
+    with _user_cache_lock:
+        _user_cache[members_id] = (now, extractor)
+        _user_cache.move_to_end(members_id)
+        while len(_user_cache) > _USER_CACHE_MAX:
+            _user_cache.popitem(last=False)
+    return extractor
+
+
+def invalidate_user_terms(members_id: Optional[str]) -> None:
+    """製品の登録・更新後に呼び、次回の抽出で辞書を作り直させる。"""
+    if not members_id:
+        return
+    with _user_cache_lock:
+        _user_cache.pop(members_id, None)
+
+
+def extract_structured_data(description: str) -> Dict[str, Any]:
+    return default_extractor().extract_structured_data(description)
+
+
+def semantic_tags(description: str, limit: int = SEMANTIC_TAG_LIMIT) -> List[str]:
+    return default_extractor().semantic_tags(description, limit=limit)
@@ -0,0 +1,128 @@
+"""登録ドラフト単位のエンリッチ進捗イベント（SSE 配信用のプロセス内バス）。
+
+- バックグラウンドのエンリッチ処理が publish し、server.py の SSE エンドポイントが購読する。
+- イベントは連番付きで保持し、EventSource の再接続（Last-Event-ID）時は続きから再送する。
+- gunicorn は 1 worker 前提（Dockerfile）。複数 worker にする場合は外部ブローカーへ置き換える。
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+EVENT_LOOKUP = "lookup"
+EVENT_DESCRIPTION = "description"
+# ストリーミング中の途中経過（画像説明の累積テキスト・暫定タグ）
+EVENT_PARTIAL = "partial"
+EVENT_TAGS = "tags"
+EVENT_ERROR = "error"
+EVENT_DONE = "done"
+
+# 完了後もしばらく保持し、遅れて繋いだクライアントにも結果を再送できるようにする
+_CHANNEL_TTL_SEC = 600.0
+_MAX_CHANNELS = 256
+
+_lock = threading.Lock()
+_channels: Dict[str, "_Channel"] = {}
+
+
+class _Channel:
+    def __init__(self, owner: Optional[str]):
+        self.owner = owner
+        self.events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self.closed = False
+        self.updated_at = time.monotonic()
+        self.cond = threading.Condition(_lock)
+
+
+def _purge_expired_locked() -> None:
+    now = time.monotonic()
+    expired = [
+        key
+        for key, ch in _channels.items()
+        if now - ch.updated_at > _CHANNEL_TTL_SEC
+    ]
+    for key in expired:
+        del _channels[key]
+    if len(_channels) > _MAX_CHANNELS:
+        oldest = sorted(_channels.items(), key=lambda kv: kv[1].updated_at)
+        for key, _ in oldest[: len(_channels) - _MAX_CHANNELS]:
+            del _channels[key]
+
+
+def open_channel(draft_id: str, owner: Optional[str]) -> None:
+    """ドラフトのチャネルを作り直す（同じ draft_id の古いイベントは破棄）。"""
+    with _lock:
+        _purge_expired_locked()
+        old = _channels.get(draft_id)
+        if old is not None:
+            old.closed = True
+            old.cond.notify_all()
+        _channels[draft_id] = _Channel(owner)
+
+
+def channel_owner(draft_id: str) -> Tuple[bool, Optional[str]]:
+    """(存在するか, 所有者 members_id) を返す。"""
+    with _lock:
+        ch = _channels.get(draft_id)
+        if ch is None:
+            return False, None
+        return True, ch.owner
+
+
+def publish(draft_id: str, event: str, data: Dict[str, Any]) -> None:
+    """イベントを追加し、待機中の購読者を起こす。閉じたチャネルへは何もしない。"""
+    with _lock:
+        ch = _channels.get(draft_id)
+        if ch is None or ch.closed:
+            return
+        seq = len(ch.events) + 1
+        ch.events.append((seq, event, data))
+        ch.updated_at = time.monotonic()
+        if event == EVENT_DONE:
+            ch.closed = True
+        ch.cond.notify_all()
+
+
+def iter_events(
+    draft_id: str,
+    last_seq: int = 0,
+    heartbeat_sec: float = 15.0,
+    max_duration_sec: float = 300.0,
+) -> Iterator[Optional[Tuple[int, str, Dict[str, Any]]]]:
+    """
+    last_seq より後のイベントを順に返す。待機が heartbeat_sec を超えたら None を返す（keepalive 用）。
+    done を返すか、チャネルが消えるか、max_duration_sec を超えたら終了する。
+    """
+    deadline = time.monotonic() + max_duration_sec
+    cursor = max(0, int(last_seq or 0))
+    while True:
+        with _lock:
+            ch = _channels.get(draft_id)
+            if ch is None:
+                return
+            if cursor >= len(ch.events) and not ch.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                ch.cond.wait(timeout=min(heartbeat_sec, remaining))
+            pending = ch.events[cursor:]
+            finished = ch.closed and cursor + len(pending) >= len(ch.events)
+        if not pending:
+            if finished or time.monotonic() >= deadline:
+                return
+            yield None
+            continue
+        for item in pending:
+            cursor = item[0]
+            yield item
+            if item[1] == EVENT_DONE:
+                return
+        if finished:
+            return
+
+
+def format_sse(seq: int, event: str, data: Dict[str, Any]) -> str:
+    """text/event-stream の 1 メッセージに整形する。"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {seq}\nevent: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,304 @@
+"""登録ドラフトのエンリッチ（画像説明・タグ生成）をバックグラウンドで実行する。
+
+楽天照合と画像説明（→説明を使ったキーワード検索）は services.task_graph で並列に走らせ、
+入力が揃ってからタグ生成を 1 回行う。所要時間は各分岐の合計ではなく最長の分岐になる。
+結果はサーバー側の登録ドラフト（services.registration_drafts）にセクション単位の差分として書き、
+同じ差分を版数付きで services.enrichment_events に publish する。レビュー画面は SSE で版数と
+UI 項目だけを registration-store に反映し、本体はコールバックがドラフトから読む（2 秒ポーリングの代替）。
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from typing import Any, Dict, List, Optional
+
+from services import enrichment_events as events
+from services import registration_drafts
+from services.debug_log import dash_debug_print
+from services.deadline import ENRICHMENT_DEADLINE_SEC, Deadline
+from services.description_extractor import DescriptionExtractor, default_extractor
+from services.task_graph import Task, run_graph
+
+try:
+    from flask import g, has_app_context
+except Exception:  # pragma: no cover
+    g = None
+    has_app_context = lambda: False  # type: ignore
+
+_MAX_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "2"))
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, _MAX_WORKERS), thread_name_prefix="enrichment"
+)
+
+
+# enrichment の draft_id（SSE の購読キー）→ サーバー側ドラフトの id
+_draft_keys_lock = threading.Lock()
+_draft_keys: Dict[str, str] = {}
+
+
+def _publish(draft_id: str, event: str, data: Dict[str, Any]) -> None:
+    """差分をサーバー側ドラフトに反映し、反映後の版数を付けて SSE に流す。"""
+    with _draft_keys_lock:
+        draft_key = _draft_keys.get(draft_id)
+    version = registration_drafts.apply_patch(draft_key, data) if data else None
+    events.publish(draft_id, event, dict(data, version=version) if version else data)
+
+
+def _current_members_id() -> Optional[str]:
+    if g is None or not has_app_context():
+        return None
+    uid = getattr(g, "user_id", None)
+    return str(uid) if uid else None
+
+
+def new_draft_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _description_patch(state: Dict[str, Any]) -> Dict[str, Any]:
+    front = state["front_photo"]
+    return {
+        "front_photo": {
+            "description": front.get("description"),
+            "model_used": front.get("model_used"),
+            "structured_data": front.get("structured_data"),
+            "description_status": front.get("description_status"),
+        }
+    }
+
+
+def _tags_patch(state: Dict[str, Any]) -> Dict[str, Any]:
+    tags = state.get("tags") or {}
+    return {
+        "tags": {
+            "status": tags.get("status"),
+            "tags": list(tags.get("tags") or []),
+            "message": tags.get("message"),
+        }
+    }
+
+
+def _publish_partial_tags(draft_id: str, tags: List[str]) -> None:
+    _publish(
+        draft_id,
+        events.EVENT_PARTIAL,
+        {
+            "tags": {
+                "status": "loading",
+                "tags": list(tags),
+                "message": "タグを生成中です...（途中経過）",
+            }
+        },
+    )
+
+
+def _lookup_branch(
+    draft_id: str, state: Dict[str, Any], deadline: Deadline
+) -> Optional[Dict[str, Any]]:
+    """バーコードはあるが照合が未実施/失敗のときだけ再照合する。不要なら None。"""
+    from services.barcode_lookup import lookup_product_by_barcode
+
+    barcode_value = state["barcode"].get("value")
+    lookup_status = state["lookup"].get("status")
+    if not barcode_value or lookup_status not in {"idle", "error"}:
+        return None
+    lookup = lookup_product_by_barcode(barcode_value, deadline=deadline)
+    _publish(draft_id, events.EVENT_LOOKUP, {"lookup": lookup})
+    return lookup
+
+
+def _description_branch(
+    draft_id: str,
+    state: Dict[str, Any],
+    deadline: Deadline,
+    extractor: DescriptionExtractor,
+) -> Optional[Dict[str, Any]]:
+    """画像説明を生成し、front_photo に書き込む値を返す。写真が無い・説明を見送ったときは None。"""
+    from services.io_intelligence import describe_image
+
+    front = state["front_photo"]
+    # 撮影品質で画像説明を見送った写真（照合・タグ生成だけ行う）
+    if front.get("status") != "captured" or front.get("description_status") == "skipped":
+        return None
+    vision_source = front.get("vision_source") or front.get("content")
+
+    def _on_partial(text: str) -> None:
+        _publish(
+            draft_id,
+            events.EVENT_PARTIAL,
+            {"front_photo": {"description": text, "description_status": "streaming"}},
+        )
+
+    result = describe_image(
+        vision_source,
+        raw_base64=front.get("vision_raw"),
+        on_partial=_on_partial,
+        deadline=deadline,
+    )
+    if result.get("status") == "success":
+        text = result.get("text") or result.get("description") or None
+        fields = {
+            "description": text,
+            "model_used": result.get("model_used"),
+            # ユーザーの登録済み作品シリーズ名・キャラ名を辞書に含めた抽出器で取り直す
+            "structured_data": extractor.extract_structured_data(text)
+            if text
+            else result.get("structured_data"),
+            "description_status": "done",
+        }
+    else:
+        dash_debug_print(f"DEBUG: enrichment description failed: {result.get('status')}")
+        fields = {
+            "description": None,
+            "model_used": None,
+            "structured_data": None,
+            "description_status": "error",
+        }
+    _publish(draft_id, events.EVENT_DESCRIPTION, {"front_photo": dict(fields)})
+    return fields
+
+
+def _keyword_from_structured(structured: Optional[Dict[str, Any]]) -> str:
+    if not isinstance(structured, dict):
+        return ""
+    parts = [
+        str(structured.get(key) or "").strip()
+        for key in ("works_name", "character_name", "product_shape")
+    ]
+    return " ".join(p for p in parts if p)
+
+
+def _keyword_lookup_branch(
+    draft_id: str,
+    state: Dict[str, Any],
+    deadline: Deadline,
+    description: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """バーコードが無いときだけ、画像説明の作品名・キャラ名で楽天をキーワード検索する。"""
+    from services.barcode_lookup import lookup_product_by_keyword
+
+    if state["barcode"].get("value") or (state["lookup"].get("items") or []):
+        return None
+    keyword = _keyword_from_structured((description or {}).get("structured_data"))
+    if not keyword:
+        return None
+    lookup = lookup_product_by_keyword(keyword, deadline=deadline)
+    if lookup.get("items"):
+        _publish(draft_id, events.EVENT_LOOKUP, {"lookup": lookup})
+    return lookup
+
+
+def _run_branches(
+    draft_id: str,
+    state: Dict[str, Any],
+    deadline: Deadline,
+    extractor: DescriptionExtractor,
+) -> None:
+    """照合・画像説明（→キーワード検索）を並列に走らせ、結果を state に反映する。"""
+    graph = run_graph(
+        [
+            Task("lookup", lambda _r: _lookup_branch(draft_id, state, deadline)),
+            Task(
+                "description",
+                lambda _r: _description_branch(draft_id, state, deadline, extractor),
+            ),
+            Task(
+                "keyword_lookup",
+                lambda r: _keyword_lookup_branch(
+                    draft_id, state, deadline, r.get("description")
+                ),
+                deps=("description",),
+            ),
+        ],
+        deadline=deadline,
+    )
+    for name, exc in graph.errors.items():
+        dash_debug_print(f"DEBUG: enrichment branch '{name}' failed: {exc}")
+    if graph.pending:
+        dash_debug_print(f"DEBUG: enrichment branches past deadline: {graph.pending}")
+
+    results = graph.results
+    if results.get("lookup"):
+        state["lookup"] = results["lookup"]
+    keyword_lookup = results.get("keyword_lookup")
+    if keyword_lookup and keyword_lookup.get("items") and not state["lookup"].get("items"):
+        state["lookup"] = keyword_lookup
+    if results.get("description"):
+        state["front_photo"].update(results["description"])
+    elif (
+        state["front_photo"].get("status") == "captured"
+        and state["front_photo"].get("description_status") != "skipped"
+    ):
+        # 説明ブランチが失敗・時間切れ
+        state["front_photo"]["description_status"] = "error"
+        _publish(draft_id, events.EVENT_DESCRIPTION, _description_patch(state))
+
+
+def _run(
+    draft_id: str,
+    state: Dict[str, Any],
+    extractor: Optional[DescriptionExtractor] = None,
+) -> None:
+    from services.tag_service import _update_tags
+
+    # 照合・説明・タグの 1 ステップで締め切りとリトライ予算を共有する
+    deadline = Deadline(ENRICHMENT_DEADLINE_SEC)
+    try:
+        _run_branches(draft_id, state, deadline, extractor or default_extractor())
+        # タグは入力（照合結果・説明）が揃ってから 1 回だけ生成する
+        _update_tags(
+            state,
+            on_partial=lambda tags: _publish_partial_tags(draft_id, tags),
+            deadline=deadline,
+        )
+        _publish(draft_id, events.EVENT_TAGS, _tags_patch(state))
+    except Exception as exc:
+        dash_debug_print(f"DEBUG: enrichment job failed: {exc}")
+        _publish(
+            draft_id,
+            events.EVENT_ERROR,
+            {
+                "front_photo": {"description_status": "error"},
+                "tags": {
+                    "status": "error",
+                    "tags": [],
+                    "message": f"画像説明生成エラー: {exc}",
+                },
+            },
+        )
+    finally:
+        _publish(draft_id, events.EVENT_DONE, {})
+        with _draft_keys_lock:
+            _draft_keys.pop(draft_id, None)
+
+
+def start_enrichment(draft_id: str, state: Dict[str, Any]) -> bool:
+    """
+    ドラフトのエンリッチをスレッドプールに投入する。投入できなければ False（呼び出し側はポーリングに戻す）。
+    結果を書き込めるよう、投入前にサーバー側ドラフトを保存する（state["meta"] にドラフト id が入る）。
+    ジョブには state のコピーを渡す。購読できるのは投入したユーザーのみ。
+    """
+    if not draft_id:
+        return False
+    members_id = _current_members_id()
+    events.open_channel(draft_id, members_id)
+    if registration_drafts.persist(state) is not None:
+        with _draft_keys_lock:
+            _draft_keys[draft_id] = state["meta"][registration_drafts.DRAFT_KEY]
+    # ユーザー辞書はリクエスト文脈（RLS のユーザークライアント）で取得し、ジョブには抽出器だけ渡す
+    try:
+        from services.description_extractor import extractor_for_user
+        from services.supabase_client import get_supabase_client
+
+        extractor = extractor_for_user(members_id, get_supabase_client())
+    except Exception as exc:
+        dash_debug_print(f"DEBUG: user dictionary unavailable: {exc}")
+        extractor = default_extractor()
+    try:
+        _executor.submit(_run, draft_id, deepcopy(state), extractor)
+    except RuntimeError as exc:
+        dash_debug_print(f"DEBUG: enrichment submit failed: {exc}")
+        return False
+    return True
@@ -0,0 +1,179 @@
+"""ユーザー毎のギャラリー一覧キャッシュ（LRU + TTL、書き込みで無効化）。
+
+一覧の行（photo・category_tag・receipt_location の埋め込みと署名 URL を含む）はサーバー側に置き、
+session の gallery-products-store にはカーソル・版（version）・表示中の id だけを持たせる。
+版はキャッシュを作り直すたびに振り直すため、Store の版と一致しないときは行を読み直す。
+登録・タグ付け・全件削除など一覧の中身が変わる書き込みで、そのユーザーのキャッシュを捨てる。
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import g, has_app_context
+
+# 署名 URL の有効期限（3600 秒）より十分短くする
+CACHE_TTL_SEC = 600
+_MAX_USERS = 128
+# 1 ユーザーで保持する行数の上限（超えたら古く読み込んだ行から捨て、必要時に id で読み直す）
+_MAX_ROWS = 5000
+
+_lock = threading.Lock()
+_versions = itertools.count(1)
+# 無効化の印（どの Store の版とも一致しない）
+_STALE = 0
+
+
+class _Entry:
+    __slots__ = ("version", "rows", "loaded_at")
+
+    def __init__(self, version: int) -> None:
+        self.version = version
+        self.rows: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.loaded_at = time.monotonic()
+
+
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+
+def _current_members_id() -> Optional[str]:
+    """flask.g から現在のユーザーIDを取得（無ければ None）。"""
+    if g is None or not has_app_context():
+        return None
+    uid = getattr(g, "user_id", None)
+    return str(uid) if uid else None
+
+
+def as_id(raw: Any) -> Optional[int]:
+    if raw is None or raw == "" or isinstance(raw, bool):
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def row_id(row: Any) -> Optional[int]:
+    return as_id(row.get("registration_product_id")) if isinstance(row, dict) else None
+
+
+def _live_entry(members_id: str) -> Optional[_Entry]:
+    """ロック内で呼ぶ。TTL 切れは捨てる。"""
+    entry = _entries.get(members_id)
+    if entry is None:
+        return None
+    if time.monotonic() - entry.loaded_at > CACHE_TTL_SEC:
+        del _entries[members_id]
+        return None
+    _entries.move_to_end(members_id)
+    return entry
+
+
+def _add_rows(entry: _Entry, rows: Iterable[Any]) -> List[int]:
+    ids: List[int] = []
+    for row in rows:
+        pid = row_id(row)
+        if pid is None:
+            continue
+        entry.rows[pid] = row
+        entry.rows.move_to_end(pid)
+        ids.append(pid)
+    while len(entry.rows) > _MAX_ROWS:
+        entry.rows.popitem(last=False)
+    return ids
+
+
+def _install(members_id: str, entry: _Entry) -> None:
+    _entries[members_id] = entry
+    _entries.move_to_end(members_id)
+    while len(_entries) > _MAX_USERS:
+        _entries.popitem(last=False)
+
+
+def reset(members_id: Optional[str], rows: List[Dict[str, Any]]) -> Tuple[int, List[int]]:
+    """先頭ページの取得・再取得: キャッシュを作り直し、(新しい版, 行の id) を返す。"""
+    entry = _Entry(next(_versions))
+    ids = _add_rows(entry, rows)
+    if members_id:
+        with _lock:
+            _install(members_id, entry)
+    return entry.version, ids
+
+
+def extend(
+    members_id: Optional[str], version: Optional[int], rows: List[Dict[str, Any]]
+) -> Optional[List[int]]:
+    """続きのページを追加する。版が古い（無効化・期限切れ）なら None。"""
+    if not members_id or version is None:
+        return None
+    with _lock:
+        entry = _live_entry(members_id)
+        if entry is None or entry.version != version:
+            return None
+        return _add_rows(entry, rows)
+
+
+def fill(members_id: Optional[str], version: Optional[int], rows: List[Dict[str, Any]]) -> None:
+    """
+    id で読み直した行を Store の版のキャッシュに戻す（別プロセス・期限切れ後の描画用）。
+    無効化済み・別の版が載っている場合は戻さない（次の先頭ページ取得で作り直す）。
+    """
+    if not members_id or version is None:
+        return
+    with _lock:
+        entry = _live_entry(members_id)
+        if entry is None:
+            entry = _Entry(version)
+            _install(members_id, entry)
+        if entry.version == version:
+            _add_rows(entry, rows)
+
+
+def get_rows(
+    members_id: Optional[str], version: Optional[int], ids: Iterable[Any]
+) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+    """Store の版と id から (キャッシュにある行, 無い id) を返す。"""
+    wanted = [pid for pid in (as_id(x) for x in ids or []) if pid is not None]
+    if not members_id or version is None:
+        return {}, wanted
+    found: Dict[int, Dict[str, Any]] = {}
+    missing: List[int] = []
+    with _lock:
+        entry = _live_entry(members_id)
+        if entry is None or entry.version != version:
+            return {}, wanted
+        for pid in wanted:
+            row = entry.rows.get(pid)
+            if row is None:
+                missing.append(pid)
+            else:
+                found[pid] = row
+    return found, missing
+
+
+def is_current(members_id: Optional[str], version: Optional[int]) -> bool:
+    """Store の版がキャッシュと一致し、書き込みで無効化されていなければ True。"""
+    if not members_id or version is None:
+        return False
+    with _lock:
+        entry = _live_entry(members_id)
+        return entry is not None and entry.version == version
+
+
+def invalidate(members_id: Optional[str]) -> None:
+    """一覧の中身が変わる書き込みの後に呼ぶ（行を捨て、Store の版を古い扱いにする）。"""
+    if not members_id:
+        return
+    with _lock:
+        _install(str(members_id), _Entry(_STALE))
+
+
+def invalidate_current_user() -> None:
+    invalidate(_current_members_id())
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,127 @@
+"""ギャラリーの絞り込み条件（ファセット）と件数。
+
+条件はカテゴリ・収納場所・カラータグ（いずれも OR）、価格帯（OR）、フラグ（AND）、並び替え。
+絞り込みと件数の集計は DB の app_gallery_facets が 1 回の呼び出しで行う
+（絞り込みなしの登録日順は行を app_gallery_page で読み、app_gallery_facets では件数だけを数える）。
+件数は「その項目以外の条件をすべて当てたときの件数」（選択中の項目を外しても 0 件にならない）。
+カテゴリ・収納場所の 0 は未設定を表す。
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.page_cursor import SORTS
+
+# (値, 表示名)
+SORT_OPTIONS: Tuple[Tuple[str, str], ...] = (
+    ("date", "登録が新しい順"),
+    ("price_desc", "価格が高い順"),
+    ("price_asc", "価格が安い順"),
+    ("name", "名前順"),
+)
+
+# 価格帯の区切り（SQL の width_bucket と同じ）。-1 は価格未入力
+PRICE_BOUNDS: Tuple[int, ...] = (1000, 3000, 5000, 10000)
+PRICE_BUCKETS: Tuple[Tuple[int, str], ...] = (
+    (0, "〜999円"),
+    (1, "1,000〜2,999円"),
+    (2, "3,000〜4,999円"),
+    (3, "5,000〜9,999円"),
+    (4, "10,000円〜"),
+    (-1, "価格未入力"),
+)
+
+# registration_product_information のフラグ列（値 1 の行だけに絞る）
+FLAGS: Tuple[Tuple[str, str], ...] = (
+    ("want_object_flag", "ほしい物"),
+    ("flag_with_freebie", "特典付き"),
+    ("sales_desired_flag", "譲渡希望"),
+    ("digital_product_flag", "デジタル"),
+    ("personal_product_flag", "個人制作"),
+)
+
+_PRICE_VALUES = {value for value, _ in PRICE_BUCKETS}
+_FLAG_VALUES = {name for name, _ in FLAGS}
+# 件数の種類（app_gallery_facets の counts のキー）
+COUNT_KEYS = ("category", "location", "color", "price", "flags")
+
+
+def _ids(raw: Any, *, low: int, high: Optional[int] = None, allowed=None) -> List[int]:
+    out: List[int] = []
+    for value in raw if isinstance(raw, (list, tuple)) else []:
+        if isinstance(value, bool):
+            continue
+        try:
+            num = int(value)
+        except (TypeError, ValueError):
+            continue
+        if num < low or (high is not None and num > high):
+            continue
+        if allowed is not None and num not in allowed:
+            continue
+        if num not in out:
+            out.append(num)
+    return sorted(out)
+
+
+def normalize(raw: Any) -> Dict[str, Any]:
+    """Store・コールバック入力の条件を正規化する（不正な値は落とす）。"""
+    raw = raw if isinstance(raw, dict) else {}
+    flags = raw.get("flags")
+    sort = raw.get("sort")
+    return {
+        "category": _ids(raw.get("category"), low=0),
+        "location": _ids(raw.get("location"), low=0),
+        "color": _ids(raw.get("color"), low=1, high=7),
+        "price": _ids(raw.get("price"), low=-1, allowed=_PRICE_VALUES),
+        "flags": sorted({f for f in flags if f in _FLAG_VALUES}) if isinstance(flags, (list, tuple)) else [],
+        "sort": sort if sort in SORTS else "date",
+    }
+
+
+def has_filters(facets: Any) -> bool:
+    """行を絞り込む条件が 1 つでもあれば True（並び替えは含めない）。"""
+    f = normalize(facets)
+    return any(f[k] for k in ("category", "location", "color", "price", "flags"))
+
+
+def is_default(facets: Any) -> bool:
+    """絞り込みなし・登録日順（app_gallery_page と同じ結果）なら True。"""
+    return not has_filters(facets) and normalize(facets)["sort"] == "date"
+
+
+def rpc_params(facets: Any) -> Dict[str, Any]:
+    """app_gallery_facets の絞り込み引数（空の条件は null）。"""
+    f = normalize(facets)
+    return {
+        "p_sort": f["sort"],
+        "p_category_ids": f["category"] or None,
+        "p_location_ids": f["location"] or None,
+        "p_slots": f["color"] or None,
+        "p_price_buckets": f["price"] or None,
+        "p_flags": f["flags"] or None,
+    }
+
+
+def parse_counts(raw: Any) -> Optional[Dict[str, Dict[str, int]]]:
+    """RPC の counts（JSON のキーは文字列）を {種類: {値: 件数}} にそろえる。無ければ None。"""
+    if not isinstance(raw, dict):
+        return None
+    out: Dict[str, Dict[str, int]] = {}
+    for kind in COUNT_KEYS:
+        group = raw.get(kind)
+        counts: Dict[str, int] = {}
+        if isinstance(group, dict):
+            for key, value in group.items():
+                try:
+                    counts[str(key)] = int(value)
+                except (TypeError, ValueError):
+                    continue
+        out[kind] = counts
+    return out
+
+
+def count_label(label: str, counts: Optional[Dict[str, Dict[str, int]]], kind: str, value: Any) -> str:
+    """選択肢の表示名に件数を付ける（件数が無い＝RPC 未適用のときは名前だけ）。"""
+    if not counts:
+        return label
+    return f"{label}（{counts.get(kind, {}).get(str(value), 0)}）"
@@ -0,0 +1,82 @@
+"""写真の知覚ハッシュ（pHash / dHash, 各 64 bit）を NumPy で計算する。
+
+バーコードの無いグッズ（ガチャ・イベント限定・同人）の重複確認に使う。
+- pHash: 32x32 グレースケールの 2 次元 DCT の低周波 8x8（直流成分を除く中央値で 2 値化）
+- dHash: 9x8 グレースケールの横方向の明暗差
+似た写真ほどハミング距離が小さい。DB（bigint）には符号付き 64 bit で保存する。
+"""
+
+import io
+from typing import NamedTuple, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+_PHASH_SIZE = 32
+_PHASH_LOW = 8
+# 先に縮小してから各サイズへリサイズする（大きな写真でも数 ms で済む）
+_WORKING_SIZE = 256
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0, :] = np.sqrt(1.0 / n)
+    return matrix
+
+
+_DCT = _dct_matrix(_PHASH_SIZE)
+_BIT_WEIGHTS = (1 << np.arange(63, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+class ImageHashes(NamedTuple):
+    phash: int
+    dhash: int
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int(np.bitwise_or.reduce(bits.ravel().astype(np.uint64) * _BIT_WEIGHTS))
+
+
+def _grayscale(image: Image.Image) -> Image.Image:
+    gray = ImageOps.exif_transpose(image).convert("L")
+    gray.thumbnail((_WORKING_SIZE, _WORKING_SIZE))
+    return gray
+
+
+def phash_from_gray(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((_PHASH_SIZE, _PHASH_SIZE), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:_PHASH_LOW, :_PHASH_LOW]
+    median = np.median(low.ravel()[1:])
+    return _bits_to_int(low > median)
+
+
+def dhash_from_gray(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def compute_hashes(image_bytes: bytes) -> Optional[ImageHashes]:
+    """画像バイト列から pHash / dHash を計算する。画像として読めなければ None。"""
+    if not image_bytes:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            gray = _grayscale(image)
+    except Exception:
+        return None
+    return ImageHashes(phash_from_gray(gray), dhash_from_gray(gray))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_signed64(value: int) -> int:
+    """0..2^64-1 を Postgres bigint の範囲に写す。"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
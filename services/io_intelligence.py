@@ -1,12 +1,21 @@
 """IO Intelligence API client helpers."""
 
+import json
 import os
 import re
 import time
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Optional
 
 import requests
-from retrying import retry
+
+from services.circuit_breaker import CircuitOpenError, get_breaker
+from services.description_extractor import extract_structured_data
+from services.deadline import (
+    ENRICHMENT_DEADLINE_SEC,
+    Deadline,
+    DeadlineExceeded,
+    call_with_retry,
+)
 
 IO_API_URL = os.getenv(
     "IO_INTELLIGENCE_API_URL",
@@ -21,6 +30,10 @@ IO_FALLBACK_MODEL = os.getenv(
     "IO_INTELLIGENCE_FALLBACK_MODEL", "meta-llama/Llama-3.2-90B-Vision-Instruct"
 )
 IO_TIMEOUT = int(os.getenv("IO_INTELLIGENCE_TIMEOUT", "30"))
+# on_partial が渡されたときだけ stream: true で呼ぶ（0 で常に一括応答）
+IO_STREAMING = os.getenv("IO_INTELLIGENCE_STREAMING", "1").lower() in {"1", "true", "yes"}
+# 途中経過コールバックの最小間隔（秒）。トークン毎に UI を更新しないよう間引く
+IO_STREAM_PARTIAL_INTERVAL = float(os.getenv("IO_INTELLIGENCE_STREAM_INTERVAL", "0.3"))
 
 # Use only .env models by default; allow provider fallbacks only if explicitly enabled
 _ENABLE_EXTRA_VISION_FALLBACKS = (
@@ -51,161 +64,142 @@ def _extract_text_from_content(content: Any) -> str:
     return ""
 
 
-def _extract_structured_data(description: str) -> Dict[str, Any]:
-    """Extract structured data from IO Intelligence description."""
-    structured_data = {
-        "character_name": "",
-        "works_name": "",
-        "works_series_name": "",
-        "copyright_company_name": "",
-        "product_shape": "",
-        "product_type_flags": [],
-        "other_tags": [],
-        "colors": [],
-        "materials": [],
-        "features": []
-    }
-
-    if not description:
-        return structured_data
-
-    # Extract character names (common patterns)
-    character_patterns = [
-        r'キャラクター[：:]\s*([^。\n,]*)',
-        r'キャラクター名[：:]\s*([^。\n,]*)',
-        r'キャラ[：:]\s*([^。\n,]*)',
-        r'([^、。\n]*)(?:ちゃん|さん|くん|さま)',
-        r'([^\s、。\n]*)(?:のイラスト|のフィギュア|のキャラクター)',
-    ]
-
-    for pattern in character_patterns:
-        matches = re.findall(pattern, description, re.IGNORECASE)
-        if matches:
-            # Take the first meaningful match
-            for match in matches:
-                if match.strip() and len(match.strip()) > 1:
-                    structured_data["character_name"] = match.strip()
-                    break
-            if structured_data["character_name"]:
-                break
-
-    # Extract work names (anime/manga titles)
-    work_patterns = [
-        r'作品[：:]\s*([^。\n,]*)',
-        r'アニメ[：:]\s*([^。\n,]*)',
-        r'漫画[：:]\s*([^。\n,]*)',
-        r'シリーズ[：:]\s*([^。\n,]*)',
-        r'([^、。\n]*)(?:のグッズ|のキャラクター|のイラスト)',
-    ]
+# IO Intelligence 全体で1つのブレーカー（Vision・タグ生成の両方が同じ API を叩くため）
+IO_BREAKER = get_breaker("io_intelligence", slow_call_sec=20.0, open_sec=60.0)
 
-    for pattern in work_patterns:
-        matches = re.findall(pattern, description, re.IGNORECASE)
-        if matches:
-            for match in matches:
-                if match.strip() and len(match.strip()) > 1:
-                    # Check if it's a known anime/manga title
-                    cleaned_match = match.strip()
-                    if not any(skip in cleaned_match.lower() for skip in ['の', 'キャラクター', 'キャラ', 'イラスト']):
-                        structured_data["works_name"] = cleaned_match
-                        break
-            if structured_data["works_name"]:
-                break
 
-    # Extract product shape/type
-    shape_patterns = [
-        r'形状[：:]\s*([^。\n,]*)',
-        r'タイプ[：:]\s*([^。\n,]*)',
-        r'種類[：:]\s*([^。\n,]*)',
-        r'(アクリルスタンド|フィギュア|缶バッジ|キーホルダー|タペストリー|ポスター|クリアファイル)',
-    ]
+def is_transient_error(exc: BaseException) -> bool:
+    """リトライで回復しうる失敗か（通信断・タイムアウト・5xx・429）。4xx はリトライしない。"""
+    if isinstance(exc, requests.HTTPError):
+        status = getattr(exc.response, "status_code", None)
+        return status is None or status >= 500 or status == 429
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
 
-    for pattern in shape_patterns:
-        matches = re.findall(pattern, description, re.IGNORECASE)
-        if matches:
-            for match in matches:
-                if match.strip():
-                    structured_data["product_shape"] = match.strip()
-                    break
-            break
 
-    # Extract colors
-    color_patterns = [
-        r'色[：:]\s*([^。\n,]*)',
-        r'カラー[：:]\s*([^。\n,]*)',
-        r'(赤|青|黄|緑|紫|ピンク|白|黒|オレンジ|茶色|灰色|銀色|金色|虹色)',
-    ]
+def post_chat_completion(
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    deadline: Optional[Deadline] = None,
+    stream: bool = False,
+) -> requests.Response:
+    """chat completions への POST をブレーカー経由で行う。
 
-    for pattern in color_patterns:
-        matches = re.findall(pattern, description, re.IGNORECASE)
-        if matches:
-            structured_data["colors"].extend([m.strip() for m in matches if m.strip()])
-            break
-
-    # Extract materials
-    material_patterns = [
-        r'素材[：:]\s*([^。\n,]*)',
-        r'材質[：:]\s*([^。\n,]*)',
-        r'(プラスチック|アクリル|布|紙|金属|PVC|ABS樹脂)',
-    ]
+    タイムアウトは deadline の残り時間（上限 IO_TIMEOUT）。残りが無ければ DeadlineExceeded。
+    通信失敗・5xx・429 を失敗として数える（4xx はペイロード形状の問題なので数えない）。
+    open 中は通信せずに CircuitOpenError を送出する。
+    """
+    timeout = deadline.timeout(IO_TIMEOUT) if deadline is not None else IO_TIMEOUT
+    if not IO_BREAKER.allow_request():
+        raise CircuitOpenError(IO_BREAKER.name)
+    start = time.monotonic()
+    try:
+        response = requests.post(
+            IO_API_URL,
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+            stream=stream,
+        )
+    except requests.RequestException:
+        IO_BREAKER.record(False, time.monotonic() - start)
+        raise
+    status = response.status_code
+    IO_BREAKER.record(status < 500 and status != 429, time.monotonic() - start)
+    return response
 
-    for pattern in material_patterns:
-        matches = re.findall(pattern, description, re.IGNORECASE)
-        if matches:
-            structured_data["materials"].extend([m.strip() for m in matches if m.strip()])
-            break
-
-    # Extract features and other tags
-    feature_keywords = [
-        '限定', 'イベント', 'コンサート', 'ライブ', '生誕祭', '周年', '復刻',
-        'オリジナル', '描き下ろし', 'レア', 'スペシャル', 'プレミアム',
-        'セット', 'コンプリート', 'コレクション', 'シリーズ',
-        '大サイズ', '小サイズ', '特大', 'ミニ',
-        '光る', '発光', 'LED', '蓄光',
-        '透明', 'クリア', '半透明',
-        '立体', '3D', '浮き出し',
-        '箔押し', 'エンボス', 'デボス',
-    ]
 
-    # Find features in description
-    for keyword in feature_keywords:
-        if keyword in description:
-            structured_data["features"].append(keyword)
-
-    # Extract other potential tags (nouns and descriptive words)
-    # This is a simple extraction - in production, you might want to use NLP libraries
-    other_tag_patterns = [
-        r'(\w{2,})色',  # Color words
-        r'(\w{2,})版',  # Version words
-        r'(\w{2,})タイプ',  # Type words
-        r'(\w{2,})仕様',  # Specification words
-    ]
+def _unavailable_response() -> Dict[str, Any]:
+    return {
+        "status": "unavailable",
+        "text": None,
+        "structured_data": _extract_structured_data(""),
+        "message": "IO Intelligence が一時的に利用できないため、画像説明をスキップしました。",
+    }
 
-    found_tags = set()
-    for pattern in other_tag_patterns:
-        matches = re.findall(pattern, description)
-        found_tags.update(matches)
 
-    # Add features and other found tags to other_tags
-    structured_data["other_tags"] = list(found_tags) + structured_data["features"]
+def iter_stream_deltas(response: requests.Response) -> Iterator[str]:
+    """stream: true の chat completions 応答（text/event-stream）から差分テキストを順に返す。"""
+    for raw_line in response.iter_lines(decode_unicode=True):
+        if not raw_line:
+            continue
+        line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+        try:
+            chunk = json.loads(payload)
+            choice = (chunk.get("choices") or [{}])[0]
+            delta = choice.get("delta") or choice.get("message") or {}
+        except (ValueError, AttributeError, IndexError):
+            continue
+        content = delta.get("content") if isinstance(delta, dict) else None
+        if isinstance(content, list):
+            content = "".join(
+                str(entry.get("text", ""))
+                for entry in content
+                if isinstance(entry, dict) and entry.get("type") in {"output_text", "text"}
+            )
+        if content:
+            yield str(content)
+
+
+def read_completion_text(
+    response: requests.Response,
+    on_partial: Optional[Callable[[str], None]] = None,
+    min_interval: float = IO_STREAM_PARTIAL_INTERVAL,
+) -> str:
+    """
+    chat completions 応答から本文を取り出す。
 
-    # Determine product type flags based on content
-    if any(word in description.lower() for word in ['同人', '個人制作', 'インディーズ']):
-        structured_data["product_type_flags"].append("doujin")
-    else:
-        structured_data["product_type_flags"].append("commercial")
+    ストリーム応答なら差分を連結しつつ min_interval 毎に on_partial(累積テキスト) を呼ぶ。
+    プロバイダが stream を無視して通常の JSON を返した場合もそのまま読む。
+    """
+    content_type = (response.headers.get("Content-Type") or "").lower()
+    if "text/event-stream" not in content_type:
+        data = response.json()
+        return _extract_text_from_content(data["choices"][0]["message"]["content"])
+
+    parts: List[str] = []
+    last_emit = 0.0
+    emitted_len = 0
+    for delta in iter_stream_deltas(response):
+        parts.append(delta)
+        if on_partial is None:
+            continue
+        now = time.monotonic()
+        if now - last_emit >= min_interval:
+            text = "".join(parts)
+            on_partial(text)
+            last_emit = now
+            emitted_len = len(text)
+    text = "".join(parts)
+    if on_partial is not None and len(text) != emitted_len:
+        on_partial(text)
+    return text.strip()
 
-    if any(word in description.lower() for word in ['デジタル', 'ダウンロード', 'データ']):
-        structured_data["product_type_flags"].append("digital")
 
-    return structured_data
+def _extract_structured_data(description: str) -> Dict[str, Any]:
+    """Extract structured data from IO Intelligence description (precompiled extractor)."""
+    return extract_structured_data(description)
 
 
-def describe_image(image_source: str, raw_base64: Optional[str] = None) -> Dict[str, Any]:
+def describe_image(
+    image_source: str,
+    raw_base64: Optional[str] = None,
+    on_partial: Optional[Callable[[str], None]] = None,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
     """Call IO Intelligence API to describe the provided image.
 
     image_source: can be a data URI (data:image/jpeg;base64,...) or a public URL (https://...).
     raw_base64: if available, provide the pure base64 (no header) for raw variants.
+    on_partial: if given (and IO_INTELLIGENCE_STREAMING is on), the request uses
+        ``stream: true`` and receives the accumulated description as it arrives.
+    deadline: step deadline shared with later calls; variants stop once it runs out.
     """
+    deadline = deadline or Deadline(ENRICHMENT_DEADLINE_SEC)
 
     print(
         f"DEBUG: describe_image called with image_source length: {len(image_source) if image_source else 0}, raw_b64 provided: {bool(raw_base64)}"
@@ -243,6 +237,11 @@ def describe_image(image_source: str, raw_base64: Optional[str] = None) -> Dict[
             "message": "画像から製品説明と構造化データを生成しました。",
         }
 
+    # ブレーカーが open の間はタイムアウトを待たずに即座に諦める（タグはローカル抽出にフォールバック）
+    if IO_BREAKER.state == "open":
+        print("DEBUG: describe_image skipped - io_intelligence circuit is open")
+        return _unavailable_response()
+
     if not image_source:
         return {
             "status": "invalid",
@@ -342,35 +341,48 @@ def describe_image(image_source: str, raw_base64: Optional[str] = None) -> Dict[
         "Content-Type": "application/json",
     }
 
-    @retry(
-        stop_max_attempt_number=3,
-        wait_fixed=2000,
-        retry_on_exception=lambda exc: isinstance(exc, requests.RequestException),
-    )
     def _call_api(payload: Dict[str, Any]):
-        print(f"IO API describe_image: sending request with timeout={IO_TIMEOUT}s")
-        start_time = time.time()
-        response = requests.post(
-            IO_API_URL, headers=headers, json=payload, timeout=IO_TIMEOUT
-        )
-        response.raise_for_status()
-        elapsed = time.time() - start_time
-        print(f"IO API describe_image: response received in {elapsed:.2f}s")
-        return response
+        def _once():
+            print(
+                f"IO API describe_image: sending request with {deadline.remaining():.1f}s left"
+            )
+            start_time = time.time()
+            response = post_chat_completion(
+                headers, payload, deadline=deadline, stream=bool(payload.get("stream"))
+            )
+            response.raise_for_status()
+            elapsed = time.time() - start_time
+            print(f"IO API describe_image: response received in {elapsed:.2f}s")
+            return response
+
+        return call_with_retry(_once, deadline, is_transient_error)
+
+    use_stream = on_partial is not None and IO_STREAMING
 
     def _run_variant(content_list: list, model_name: str) -> Tuple[str, Dict[str, Any]]:
         payload_obj = _build_messages(content_list, model_name)
+        if use_stream:
+            payload_obj["stream"] = True
+        # 締め切り後は残りの変種・モデルを試さない
+        if deadline.expired():
+            return "", {"error": "deadline_exceeded"}
         try:
             resp = _call_api(payload_obj)
-        except requests.RequestException as exc:  # pragma: no cover - ネットワーク依存
+        except (requests.RequestException, CircuitOpenError, DeadlineExceeded) as exc:  # pragma: no cover - ネットワーク依存
             return "", {"error": str(exc)}
+
+        def _forward(text: str) -> None:
+            # 拒否文・英語の定型文など無効な途中経過は UI に流さない
+            if not _is_invalid(text):
+                on_partial(text.strip())
+
         try:
-            data = resp.json()
-            content = data["choices"][0]["message"]["content"]
+            desc = read_completion_text(resp, _forward if use_stream else None)
         except Exception as exc:
             return "", {"error": f"parse_error: {exc}"}
-        desc = _extract_text_from_content(content)
-        return desc, data
+        finally:
+            resp.close()
+        return desc, {"model": model_name}
 
     # 判定関数（汎用英語・日本語非含有は無効）
     def _is_invalid(text: str) -> bool:
@@ -389,7 +401,6 @@ def describe_image(image_source: str, raw_base64: Optional[str] = None) -> Dict[
             ]
         ):
             return True
-        import re
         # Japanese apology/placeholder indicating image not processed
         jp_apology = [
             "申し訳ありません",
@@ -489,6 +500,9 @@ def describe_image(image_source: str, raw_base64: Optional[str] = None) -> Dict[
                 used_model = alt_model
                 break
 
+    if _is_invalid(description) and IO_BREAKER.state == "open":
+        return _unavailable_response()
+
     # Extract structured data from the description
     structured_data = _extract_structured_data(description)
 
@@ -0,0 +1,244 @@
+"""JAN → 商品メタデータのローカルカタログ（SQLite + FTS5）。
+
+登録済みの商品（barcode_number と商品名・作品名・キャラ名）と楽天の照合結果を貯め、
+同じ JAN の再スキャン時は外部 API より先に引いて即座に返す。カタログは全ユーザーで共有するため、
+登録からは個人に結びつかない項目（商品名・グループ名・作品シリーズ名・作品名・キャラ名）だけを入れる。
+メモ・購入価格・購入場所・写真・members_id は保存しない。
+
+JAN_CATALOG_SHARE=off で登録からの取り込みを止める（楽天の照合結果のみ貯める）。
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.barcode_canonical import canonical_key
+
+CATALOG_PATH = os.getenv("JAN_CATALOG_PATH") or os.path.join(
+    tempfile.gettempdir(), "oshi_jan_catalog.sqlite3"
+)
+SHARE_REGISTRATIONS = os.getenv("JAN_CATALOG_SHARE", "public").lower() != "off"
+# 共有してよい登録項目（カタログの列名 → 登録の列名）
+PUBLIC_FIELDS = {
+    "name": "product_name",
+    "product_group_name": "product_group_name",
+    "series": "works_series_name",
+    "works": "title",
+    "character": "character_name",
+}
+SOURCE_REGISTRATION = "registration"
+SOURCE_RAKUTEN = "rakuten"
+# 楽天の照合結果は 1 JAN につき上位数件だけ残す
+MAX_LOOKUP_ITEMS_PER_JAN = 3
+
+_SCHEMA = """
+create table if not exists jan_catalog (
+    jan text not null,
+    name text not null,
+    product_group_name text not null default '',
+    series text not null default '',
+    works text not null default '',
+    character text not null default '',
+    brand text not null default '',
+    price integer,
+    url text,
+    image_url text,
+    source text not null,
+    hits integer not null default 1,
+    updated_at real not null,
+    primary key (jan, name)
+);
+"""
+_FTS_SCHEMA = """
+create virtual table if not exists jan_catalog_fts using fts5(
+    name, series, works, character, tokenize='trigram'
+);
+"""
+_COLUMNS = (
+    "jan",
+    "name",
+    "product_group_name",
+    "series",
+    "works",
+    "character",
+    "brand",
+    "price",
+    "url",
+    "image_url",
+    "source",
+    "hits",
+)
+
+
+class JanCatalog:
+    def __init__(self, path: str = CATALOG_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+            try:
+                self._conn.execute(_FTS_SCHEMA)
+                self.fts_enabled = True
+            except sqlite3.OperationalError:
+                # trigram トークナイザが無い SQLite（3.34 未満）では LIKE 検索に落とす
+                self.fts_enabled = False
+
+    def add(self, jan: str, fields: Dict[str, Any], source: str) -> bool:
+        """JAN と商品メタデータを登録（同じ JAN＋商品名は更新して hits を加算）。"""
+        name = str(fields.get("name") or "").strip()
+        if not jan or not name:
+            return False
+        values = {
+            "product_group_name": str(fields.get("product_group_name") or ""),
+            "series": str(fields.get("series") or ""),
+            "works": str(fields.get("works") or ""),
+            "character": str(fields.get("character") or ""),
+            "brand": str(fields.get("brand") or ""),
+            "price": fields.get("price") if isinstance(fields.get("price"), int) else None,
+            "url": fields.get("url"),
+            "image_url": fields.get("image_url"),
+        }
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "select rowid, source from jan_catalog where jan = ? and name = ?", (jan, name)
+            ).fetchone()
+            if row is None:
+                cursor = self._conn.execute(
+                    "insert into jan_catalog (jan, name, product_group_name, series, works, character,"
+                    " brand, price, url, image_url, source, updated_at)"
+                    " values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (jan, name, *values.values(), source, time.time()),
+                )
+                rowid = cursor.lastrowid
+            else:
+                rowid = row["rowid"]
+                # 登録由来の行は楽天の結果で上書きしない（空欄だけ埋める）
+                keep_existing = row["source"] == SOURCE_REGISTRATION and source != SOURCE_REGISTRATION
+                assignments = ", ".join(
+                    f"{col} = coalesce(nullif({col}, ''), ?)" if keep_existing else f"{col} = coalesce(nullif(?, ''), {col})"
+                    for col in values
+                )
+                self._conn.execute(
+                    f"update jan_catalog set {assignments}, source = ?, hits = hits + 1,"
+                    " updated_at = ? where rowid = ?",
+                    (
+                        *values.values(),
+                        SOURCE_REGISTRATION if keep_existing else source,
+                        time.time(),
+                        rowid,
+                    ),
+                )
+                if self.fts_enabled:
+                    self._conn.execute("delete from jan_catalog_fts where rowid = ?", (rowid,))
+            if self.fts_enabled:
+                self._conn.execute(
+                    "insert into jan_catalog_fts (rowid, name, series, works, character)"
+                    " select rowid, name, series, works, character from jan_catalog where rowid = ?",
+                    (rowid,),
+                )
+        return True
+
+    def lookup(self, jan: str) -> List[Dict[str, Any]]:
+        """JAN の完全一致（登録由来を先、次に参照回数の多い順）。"""
+        if not jan:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"select {', '.join(_COLUMNS)} from jan_catalog where jan = ?"
+                " order by source = ? desc, hits desc, updated_at desc",
+                (jan, SOURCE_REGISTRATION),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, text: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """商品名・作品名・キャラ名の部分一致検索（3 文字以上は FTS、未満は LIKE）。"""
+        query = (text or "").strip()
+        if not query:
+            return []
+        columns = ", ".join(f"c.{col}" for col in _COLUMNS)
+        with self._lock:
+            if self.fts_enabled and len(query) >= 3:
+                phrase = '"' + query.replace('"', '""') + '"'
+                rows = self._conn.execute(
+                    f"select {columns} from jan_catalog_fts f join jan_catalog c on c.rowid = f.rowid"
+                    " where jan_catalog_fts match ? order by f.rank, c.hits desc limit ?",
+                    (phrase, limit),
+                ).fetchall()
+            else:
+                pattern = "%" + query.replace("%", r"\%").replace("_", r"\_") + "%"
+                rows = self._conn.execute(
+                    f"select {columns} from jan_catalog c where c.name like ? escape '\\'"
+                    " or c.series like ? escape '\\' or c.works like ? escape '\\'"
+                    " or c.character like ? escape '\\' order by c.hits desc limit ?",
+                    (pattern, pattern, pattern, pattern, limit),
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("select count(*) from jan_catalog").fetchone()[0]
+
+
+_catalog_lock = threading.Lock()
+_catalog: Optional[JanCatalog] = None
+
+
+def get_catalog() -> JanCatalog:
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = JanCatalog(CATALOG_PATH)
+        return _catalog
+
+
+def set_catalog(catalog: Optional[JanCatalog]) -> None:
+    """カタログを差し替える（テスト用。None で既定のファイルに戻す）。"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
+
+
+def record_registration(barcode: Optional[str], record: Dict[str, Any]) -> bool:
+    """登録済み商品の共有可能な項目だけをカタログに入れる。個人制作物（personal_product_flag）は入れない。"""
+    if not SHARE_REGISTRATIONS or not barcode:
+        return False
+    if record.get("personal_product_flag"):
+        return False
+    fields = {key: record.get(column) for key, column in PUBLIC_FIELDS.items()}
+    try:
+        return get_catalog().add(canonical_key(str(barcode)), fields, SOURCE_REGISTRATION)
+    except sqlite3.Error as exc:
+        print(f"DEBUG: jan catalog registration skipped: {exc}")
+        return False
+
+
+def record_lookup_items(barcode: Optional[str], items: Iterable[Dict[str, Any]]) -> int:
+    """楽天のバーコード照合結果（正規化済み items）の上位をカタログに入れる。"""
+    if not barcode:
+        return 0
+    added = 0
+    try:
+        catalog = get_catalog()
+        for item in items:
+            if added >= MAX_LOOKUP_ITEMS_PER_JAN:
+                break
+            if not isinstance(item, dict):
+                continue
+            images = item.get("mediumImageUrls") or []
+            fields = {
+                "name": item.get("name"),
+                "series": item.get("series"),
+                "brand": item.get("brand"),
+                "price": item.get("price"),
+                "url": item.get("url"),
+                "image_url": images[0] if images else None,
+            }
+            if catalog.add(canonical_key(str(barcode)), fields, SOURCE_RAKUTEN):
+                added += 1
+    except sqlite3.Error as exc:
+        print(f"DEBUG: jan catalog lookup record skipped: {exc}")
+    return added
@@ -0,0 +1,112 @@
+"""ユーザー毎の所持バーコード索引（重複購入の確認用）。
+
+registration_product_information.barcode_number を初回だけ RLS のユーザークライアントで読み、
+正規キー（services.barcode_canonical）→ 所持点数の Counter としてメモリに持つ。
+登録・削除時に更新するため、スキャン時の所持確認は楽天照合の前に辞書引き 1 回で済む。
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Optional, Tuple
+
+from flask import g, has_app_context
+
+from services.barcode_canonical import canonical_key
+
+INDEX_TTL_SEC = 600
+_MAX_USERS = 256
+_PAGE_SIZE = 1000
+
+_lock = threading.Lock()
+_indexes: "OrderedDict[str, Tuple[float, Counter]]" = OrderedDict()
+
+
+def _current_members_id() -> Optional[str]:
+    """flask.g から現在のユーザーIDを取得（無ければ None）。"""
+    if g is None or not has_app_context():
+        return None
+    uid = getattr(g, "user_id", None)
+    return str(uid) if uid else None
+
+
+def _load(supabase: Any, members_id: str) -> Counter:
+    counts: Counter = Counter()
+    start = 0
+    while True:
+        response = (
+            supabase.table("registration_product_information")
+            .select("barcode_number")
+            .eq("members_id", members_id)
+            .range(start, start + _PAGE_SIZE - 1)
+            .execute()
+        )
+        rows = getattr(response, "data", None) or []
+        for row in rows:
+            value = row.get("barcode_number") if isinstance(row, dict) else None
+            if value is not None and str(value).strip():
+                counts[canonical_key(str(value))] += 1
+        if len(rows) < _PAGE_SIZE:
+            return counts
+        start += _PAGE_SIZE
+
+
+def _index_for(supabase: Any, members_id: str) -> Optional[Counter]:
+    with _lock:
+        entry = _indexes.get(members_id)
+        if entry is not None and time.monotonic() - entry[0] <= INDEX_TTL_SEC:
+            _indexes.move_to_end(members_id)
+            return entry[1]
+    if supabase is None:
+        return None
+    counts = _load(supabase, members_id)
+    with _lock:
+        _indexes[members_id] = (time.monotonic(), counts)
+        _indexes.move_to_end(members_id)
+        while len(_indexes) > _MAX_USERS:
+            _indexes.popitem(last=False)
+    return counts
+
+
+def owned_count(supabase: Any, members_id: Optional[str], barcode: Optional[str]) -> int:
+    """members_id が barcode の商品を何点登録しているか。読み込めない場合は 0。"""
+    if not members_id or not barcode:
+        return 0
+    try:
+        counts = _index_for(supabase, members_id)
+    except Exception as exc:
+        print(f"DEBUG: owned barcode index load failed: {exc}")
+        return 0
+    if counts is None:
+        return 0
+    with _lock:
+        return counts.get(canonical_key(barcode), 0)
+
+
+def owned_count_for_current_user(barcode: Optional[str]) -> int:
+    """コールバック用: ログイン中のユーザーの所持点数（初回のみ RLS クライアントで読み込む）。"""
+    members_id = _current_members_id()
+    if not members_id or not barcode:
+        return 0
+    from services.supabase_client import get_supabase_client
+
+    return owned_count(get_supabase_client(), members_id, barcode)
+
+
+def record_insert(members_id: Optional[str], barcode: Optional[str]) -> None:
+    """登録後に索引を更新する（未読み込みのユーザーは次回の読み込みに任せる）。"""
+    if not members_id or not barcode or not str(barcode).strip():
+        return
+    with _lock:
+        entry = _indexes.get(members_id)
+        if entry is not None:
+            entry[1][canonical_key(str(barcode))] += 1
+
+
+def record_delete_all(members_id: Optional[str]) -> None:
+    """全件削除後: 読み直さずに空の索引にする。"""
+    if not members_id:
+        return
+    with _lock:
+        _indexes[members_id] = (time.monotonic(), Counter())
+        _indexes.move_to_end(members_id)
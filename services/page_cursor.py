@@ -0,0 +1,150 @@
+"""ギャラリー一覧のキーセット・ページング用カーソル。
+
+並びは (creation_date desc, registration_product_id desc)。最後に返した行のキーを
+base64url の不透明なトークンにして Store に持たせ、次ページは「そのキーより後ろ」を読む。
+OFFSET と違い深いページでも読み飛ばしが無く、閲覧中に登録された行で重複・欠落が起きない。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+
+class PageKey(NamedTuple):
+    creation_date: str
+    registration_product_id: int
+
+
+def key_of(row: Any) -> Optional[PageKey]:
+    """行の並びキー。creation_date か id が無い行はカーソルにできない。"""
+    if not isinstance(row, dict):
+        return None
+    created = row.get("creation_date")
+    raw_id = row.get("registration_product_id")
+    if not created or raw_id is None or isinstance(raw_id, bool):
+        return None
+    try:
+        return PageKey(str(created), int(raw_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def encode(key: Optional[PageKey]) -> Optional[str]:
+    if key is None:
+        return None
+    raw = json.dumps([key.creation_date, key.registration_product_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode(token: Optional[str]) -> Optional[PageKey]:
+    """トークンを並びキーに戻す。壊れている・改変されたものは None（先頭から読む）。"""
+    if not token or not isinstance(token, str):
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created, raw_id = json.loads(raw.decode("utf-8"))
+        # 日時として読めないものはフィルタ式に渡さない
+        datetime.fromisoformat(str(created).replace("Z", "+00:00"))
+        if isinstance(raw_id, bool):
+            return None
+        return PageKey(str(created), int(raw_id))
+    except Exception:
+        return None
+
+
+def after_filter(key: PageKey) -> str:
+    """PostgREST の or フィルタ: 並びで key より後ろ（古い・同時刻なら id が小さい）の行。"""
+    created = key.creation_date.replace('"', "")
+    return (
+        f'creation_date.lt."{created}",'
+        f'and(creation_date.eq."{created}",registration_product_id.lt.{key.registration_product_id})'
+    )
+
+
+def rpc_params(key: Optional[PageKey]) -> Dict[str, Any]:
+    """app_gallery_page のキーセット引数（先頭ページは null）。"""
+    return {
+        "p_after_creation_date": key.creation_date if key else None,
+        "p_after_id": key.registration_product_id if key else None,
+    }
+
+
+# 並び替え（app_gallery_facets の p_sort）。値が同じ行は id で順序を決める
+SORTS = ("date", "price_desc", "price_asc", "name")
+# 価格未入力の行は昇順・降順とも末尾に置く（SQL の coalesce と同じ値）
+_PRICE_LAST_DESC = -1
+_PRICE_LAST_ASC = 2147483647
+
+
+class SortedKey(NamedTuple):
+    sort: str
+    # date: ISO 日時、price_*: 整数（未入力は末尾用の番兵）、name: 商品名（未入力は空文字）
+    value: Union[str, int]
+    registration_product_id: int
+
+
+def sorted_key_of(row: Any, sort: str) -> Optional[SortedKey]:
+    """並び sort での行のキー。"""
+    if sort not in SORTS or not isinstance(row, dict):
+        return None
+    raw_id = row.get("registration_product_id")
+    if raw_id is None or isinstance(raw_id, bool):
+        return None
+    try:
+        pid = int(raw_id)
+        if sort == "date":
+            created = row.get("creation_date")
+            if not created:
+                return None
+            value: Union[str, int] = str(created)
+        elif sort == "name":
+            value = str(row.get("product_name") or "")
+        else:
+            price = row.get("purchase_price")
+            if price is None:
+                value = _PRICE_LAST_DESC if sort == "price_desc" else _PRICE_LAST_ASC
+            else:
+                value = int(price)
+    except (TypeError, ValueError):
+        return None
+    return SortedKey(sort, value, pid)
+
+
+def encode_sorted(key: Optional[SortedKey]) -> Optional[str]:
+    if key is None:
+        return None
+    raw = json.dumps([key.sort, key.value, key.registration_product_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_sorted(token: Optional[str], sort: str) -> Optional[SortedKey]:
+    """並び sort のトークンだけを受け付ける（並びを変えた後の古いカーソルは None）。"""
+    if not token or not isinstance(token, str):
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        token_sort, value, raw_id = json.loads(raw.decode("utf-8"))
+        if token_sort != sort or sort not in SORTS or isinstance(raw_id, bool):
+            return None
+        if sort == "date":
+            datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            value = str(value)
+        elif sort == "name":
+            if not isinstance(value, str):
+                return None
+        elif isinstance(value, bool) or not isinstance(value, int):
+            return None
+        return SortedKey(sort, value, int(raw_id))
+    except Exception:
+        return None
+
+
+def sorted_rpc_params(key: Optional[SortedKey]) -> Dict[str, Any]:
+    """app_gallery_facets のキーセット引数。並びごとに型の合う引数だけを埋める。"""
+    return {
+        "p_after_date": key.value if key and key.sort == "date" else None,
+        "p_after_price": key.value if key and key.sort in ("price_desc", "price_asc") else None,
+        "p_after_name": key.value if key and key.sort == "name" else None,
+        "p_after_id": key.registration_product_id if key else None,
+    }
@@ -0,0 +1,76 @@
+"""写真の主要色の保存値（photo_theme_color・photo_palette）とカラータグ候補。
+
+photo_theme_color は共有の color テーブル（基本色）の id。color は全ユーザー共通で変化が少ないため、
+プロセス内に TTL 付きでキャッシュする。カラータグ候補はユーザーの 7 slot から Lab で最寄りを選ぶ。
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.color_palette import (
+    PaletteColor,
+    extract_palette,
+    nearest_color,
+    palette_json,
+    suggest_slots,
+)
+
+COLOR_TABLE_TTL_SEC = 3600
+
+_lock = threading.Lock()
+_color_table: Optional[Tuple[float, List[Tuple[int, str]]]] = None
+
+
+def _base_colors(supabase: Any) -> List[Tuple[int, str]]:
+    global _color_table
+    with _lock:
+        if _color_table is not None and time.monotonic() - _color_table[0] <= COLOR_TABLE_TTL_SEC:
+            return _color_table[1]
+    if supabase is None:
+        return []
+    response = supabase.table("color").select("color_group_id,color_preference").execute()
+    rows = [
+        (int(row["color_group_id"]), row.get("color_preference") or "")
+        for row in getattr(response, "data", None) or []
+        if isinstance(row, dict) and row.get("color_group_id") is not None
+    ]
+    with _lock:
+        _color_table = (time.monotonic(), rows)
+    return rows
+
+
+def reset_cache() -> None:
+    global _color_table
+    with _lock:
+        _color_table = None
+
+
+def theme_color_id(supabase: Any, palette: List[PaletteColor]) -> Optional[int]:
+    """主要色に Lab で最も近い基本色（color.color_group_id）。"""
+    if not palette:
+        return None
+    try:
+        colors = _base_colors(supabase)
+    except Exception as exc:
+        print(f"DEBUG: color table load failed: {exc}")
+        return None
+    return nearest_color(palette[0].lab, colors)
+
+
+def analyze_photo_colors(
+    supabase: Any, image_bytes: Optional[bytes]
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """登録時: (photo_palette 用の JSON, photo_theme_color) を返す。"""
+    palette = extract_palette(image_bytes or b"")
+    return palette_json(palette), theme_color_id(supabase, palette)
+
+
+def suggest_color_slots_for_current_user(image_bytes: Optional[bytes]) -> List[int]:
+    """撮影直後: ログイン中ユーザーのカラータグ slot から写真の主要色に近いものを選ぶ。"""
+    palette = extract_palette(image_bytes or b"")
+    if not palette:
+        return []
+    from services.tag_service import get_color_tags_ordered
+
+    return suggest_slots(palette, get_color_tags_ordered())
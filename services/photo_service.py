@@ -3,7 +3,7 @@ import os
 import time
 import threading
 import requests
-from typing import Any, Dict, Optional, List, Tuple
+from typing import Any, Dict, NamedTuple, Optional, List, Tuple
 
 from supabase import Client
 
@@ -15,12 +15,34 @@ except Exception:  # pragma: no cover
 
 from services.supabase_client import SUPABASE_URL, PUBLISHABLE_KEY
 from services.debug_log import dash_debug_print
+from services.description_extractor import invalidate_user_terms
+from services.image_hash import ImageHashes, to_signed64
+from services import gallery_cache, gallery_facets, owned_barcodes, page_cursor, search_text, similar_photos
+from services.barcode_canonical import canonical_key
+from services.jan_catalog import record_registration
+from services.product_color_tag_service import get_product_color_tag_slots
 
 # 署名 URL のプロセス内キャッシュ（A2: members_id + object_path、短 TTL）
 _SIGN_CACHE_TTL_SEC = 90.0
 _sign_cache_lock = threading.Lock()
 _signed_url_cache: Dict[Tuple[str, str], Tuple[str, float]] = {}
 
+# app_gallery_page RPC が未適用・失敗したとき、PostgREST 経路に切り替えてから再試行するまでの秒数
+_GALLERY_RPC_RETRY_SEC = 300.0
+_gallery_rpc_disabled_until = 0.0
+# app_gallery_facets も同様（未適用の DB では絞り込みなしの一覧に戻す）
+_facet_rpc_disabled_until = 0.0
+
+# 検索対象の列（DB では search_text 生成列にまとめている）
+_GALLERY_SEARCH_COLUMNS = (
+    "product_name",
+    "product_group_name",
+    "works_series_name",
+    "title",
+    "character_name",
+    "memo",
+)
+
 # ギャラリー一覧用 select（* より転送量を抑える）
 _GALLERY_PRODUCT_SELECT = """
     registration_product_id,
@@ -32,6 +54,7 @@ _GALLERY_PRODUCT_SELECT = """
     memo,
     barcode_number,
     photo_id,
+    creation_date,
     category_tag_id,
     receipt_location_id,
     category_tag(
@@ -259,6 +282,8 @@ def insert_photo_record(
     thumbnail_url: str = None,
     front_flag: int = 1,
     theme_color: int = None,
+    hashes: Optional[ImageHashes] = None,
+    palette: Optional[List[Dict[str, Any]]] = None,
 ) -> Optional[int]:
     """Insert photo record and return photo_id"""
     if not members_id:
@@ -274,6 +299,13 @@ def insert_photo_record(
 
     if theme_color:
         data["photo_theme_color"] = theme_color
+    if hashes is not None:
+        # 類似写真検索用の知覚ハッシュ（bigint は符号付き）
+        data["photo_phash"] = to_signed64(hashes.phash)
+        data["photo_dhash"] = to_signed64(hashes.dhash)
+    if palette:
+        # 主要色（HEX と割合）。photo_theme_color はその先頭に最も近い基本色
+        data["photo_palette"] = palette
 
     response = supabase.table("photo").insert(data).execute()
     if getattr(response, "error", None):
@@ -343,6 +375,13 @@ def insert_product_record(
     if getattr(response, "error", None):
         raise RuntimeError(f"製品レコードの挿入に失敗しました: {response.error}")
 
+    # 画像説明の抽出辞書（作品シリーズ名・キャラ名）を次回作り直させる
+    invalidate_user_terms(members_id)
+    # 同じ JAN の次回スキャン用に、共有してよい項目だけをローカルカタログへ
+    record_registration(barcode, data)
+    owned_barcodes.record_insert(members_id, barcode)
+    gallery_cache.invalidate(members_id)
+
     if hasattr(response, "data") and response.data:
         return response.data[0].get("registration_product_id")
     return None
@@ -361,6 +400,9 @@ def delete_all_products(supabase: Client) -> None:
     )
     if getattr(response, "error", None):
         raise RuntimeError(f"製品削除に失敗しました: {response.error}")
+    owned_barcodes.record_delete_all(members_id)
+    similar_photos.record_delete_all(members_id)
+    gallery_cache.invalidate(members_id)
 
 
 def get_products_page(
@@ -392,6 +434,280 @@ def get_products_page(
     return _with_signed_photo_urls(supabase, data)
 
 
+class ProductPage(NamedTuple):
+    rows: List[Dict[str, Any]]
+    # 次ページのカーソル（最後のページなら None）
+    next_cursor: Optional[str]
+
+
+def get_products_after(
+    supabase: Client,
+    *,
+    limit: int = 48,
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+) -> ProductPage:
+    """
+    ギャラリー用のキーセット・ページング: (creation_date, registration_product_id) の降順で
+    cursor より後ろを limit 件読む。件数が増えても 1 ページのコストは一定（複合インデックス前提）。
+    search は RPC が無い DB 向けの簡易検索（空白区切りの各語を列の ilike で AND。
+    列は畳み込まれていないため、入力のままの語か畳み込んだ語のどちらかに一致すれば当たりとする）。
+    """
+    members_id = _current_members_id()
+    if not members_id or supabase is None or limit <= 0:
+        return ProductPage([], None)
+    query = (
+        supabase.table("registration_product_information")
+        .select(_GALLERY_PRODUCT_SELECT)
+        .eq("members_id", members_id)
+    )
+    key = page_cursor.decode(cursor)
+    if key is not None:
+        query = query.or_(page_cursor.after_filter(key))
+    raw_terms: List[str] = []
+    for raw in (search or "").split():
+        if raw not in raw_terms:
+            raw_terms.append(raw)
+    for raw in raw_terms:
+        patterns: List[str] = []
+        for term in (raw, search_text.fold(raw)):
+            pattern = term.replace('"', "").replace("\\", "")
+            if pattern and pattern not in patterns:
+                patterns.append(pattern)
+        if patterns:
+            query = query.or_(
+                ",".join(f'{col}.ilike."*{pattern}*"' for pattern in patterns for col in _GALLERY_SEARCH_COLUMNS)
+            )
+    # 1 件多く読み、次ページの有無を件数の推測ではなく実際に判定する
+    response = (
+        query.order("creation_date", desc=True)
+        .order("registration_product_id", desc=True)
+        .limit(limit + 1)
+        .execute()
+    )
+    if getattr(response, "error", None):
+        raise RuntimeError(f"製品取得に失敗しました: {response.error}")
+    data = [row for row in (response.data if hasattr(response, "data") else []) or [] if isinstance(row, dict)]
+    rows = data[:limit]
+    next_cursor = page_cursor.encode(page_cursor.key_of(rows[-1])) if len(data) > limit and rows else None
+    return ProductPage(_with_signed_photo_urls(supabase, rows), next_cursor)
+
+
+def attach_color_slots(supabase: Client, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """製品リストに color_slots を付与する（RPC を使わない経路用）。"""
+    if not products:
+        return products
+    ids: List[int] = []
+    for p in products:
+        pid = gallery_cache.row_id(p)
+        if pid is not None:
+            ids.append(pid)
+    slots_map = get_product_color_tag_slots(supabase, None, ids)
+    for p in products:
+        if not isinstance(p, dict):
+            continue
+        pid = gallery_cache.row_id(p)
+        p["color_slots"] = slots_map.get(pid, []) if pid is not None else []
+    return products
+
+
+def _gallery_row_from_rpc(row: Dict[str, Any]) -> Dict[str, Any]:
+    """app_gallery_page の平らな行を、PostgREST の埋め込み（photo・category_tag・receipt_location）と同じ形にする。"""
+    out = {
+        key: row.get(key)
+        for key in (
+            "registration_product_id",
+            "product_name",
+            "product_group_name",
+            "works_series_name",
+            "title",
+            "character_name",
+            "memo",
+            "barcode_number",
+            "photo_id",
+            "creation_date",
+            "category_tag_id",
+            "receipt_location_id",
+        )
+    }
+    out["category_tag"] = (
+        {
+            "category_tag_name": row.get("category_tag_name"),
+            "category_tag_color": row.get("category_tag_color"),
+            "category_tag_icon": row.get("category_tag_icon"),
+            "category_tag_use_flag": row.get("category_tag_use_flag"),
+        }
+        if row.get("category_tag_id") is not None
+        else None
+    )
+    out["receipt_location"] = (
+        {
+            "receipt_location_name": row.get("receipt_location_name"),
+            "receipt_location_icon": row.get("receipt_location_icon"),
+            "receipt_location_use_flag": row.get("receipt_location_use_flag"),
+        }
+        if row.get("receipt_location_id") is not None
+        else None
+    )
+    out["photo"] = (
+        {
+            "photo_thumbnail_url": row.get("photo_thumbnail_url"),
+            "photo_high_resolution_url": row.get("photo_high_resolution_url"),
+            "front_flag": row.get("front_flag"),
+            "photo_theme_color": row.get("photo_theme_color"),
+        }
+        if row.get("photo_id") is not None
+        else None
+    )
+    slots = [int(s) for s in row.get("color_slots") or [] if s is not None]
+    colors = list(row.get("color_slot_colors") or [])
+    out["color_slots"] = slots
+    # 一覧のチップ描画で ensure_default_color_tags を呼ばずに済むよう、slot の色も持たせる
+    out["color_slot_colors"] = {slot: color for slot, color in zip(slots, colors) if color}
+    return out
+
+
+def get_gallery_page(
+    supabase: Client,
+    *,
+    limit: int = 48,
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+) -> ProductPage:
+    """
+    ギャラリー 1 ページ（行・カラータグ・写真の object path）を app_gallery_page RPC の 1 往復で読み、
+    写真にだけ署名 URL を付ける。RPC が使えない DB では get_products_after + カラータグ取得に切り替える。
+    search はコレクション全体の検索（正規化・部分一致は DB の search_text 列で行う）。
+    """
+    global _gallery_rpc_disabled_until
+    members_id = _current_members_id()
+    if not members_id or supabase is None or limit <= 0:
+        return ProductPage([], None)
+    if time.monotonic() >= _gallery_rpc_disabled_until:
+        params = {
+            "p_limit": limit + 1,
+            **page_cursor.rpc_params(page_cursor.decode(cursor)),
+            "p_query": (search or "").strip() or None,
+        }
+        try:
+            rpc = supabase.rpc("app_gallery_page", params).execute()
+            data = [row for row in (rpc.data if hasattr(rpc, "data") else None) or [] if isinstance(row, dict)]
+        except Exception as exc:
+            dash_debug_print(f"DEBUG: app_gallery_page rpc unavailable, fallback: {type(exc).__name__}")
+            _gallery_rpc_disabled_until = time.monotonic() + _GALLERY_RPC_RETRY_SEC
+        else:
+            rows = [_gallery_row_from_rpc(row) for row in data[:limit]]
+            next_cursor = (
+                page_cursor.encode(page_cursor.key_of(rows[-1])) if len(data) > limit and rows else None
+            )
+            return ProductPage(_with_signed_photo_urls(supabase, rows), next_cursor)
+    page = get_products_after(supabase, limit=limit, cursor=cursor, search=search)
+    return ProductPage(attach_color_slots(supabase, page.rows), page.next_cursor)
+
+
+class FacetPage(NamedTuple):
+    rows: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    # 項目ごとの件数（gallery_facets.parse_counts の形）。先頭ページ以外・RPC 未適用では None
+    counts: Optional[Dict[str, Dict[str, int]]]
+    # 条件に合う全件数（先頭ページ以外・RPC 未適用では None）
+    total: Optional[int]
+
+
+def get_gallery_facet_page(
+    supabase: Client,
+    *,
+    limit: int = 48,
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    facets: Optional[Dict[str, Any]] = None,
+    with_counts: bool = True,
+) -> Optional[FacetPage]:
+    """
+    絞り込み（カテゴリ・収納場所・色・価格帯・フラグ）と並び替え付きの 1 ページを、
+    項目ごとの件数と一緒に app_gallery_facets RPC の 1 往復で読む。cursor は並びごとのキーセット。
+    絞り込みなしの登録日順は行を get_gallery_page で読み、件数だけを RPC（p_limit = 0）で数える
+    （続きのページは RPC を呼ばない）。
+    RPC が使えない DB では絞り込み・並び替えなしの get_gallery_page に切り替える（counts は None）。
+    cursor が読む経路のカーソルでない（RPC の停止・復帰をまたいだ・壊れている）ときは None を返す。
+    先頭ページを読み直して続きに足すと重複するため、呼び出し側は先頭から取り直す。
+    """
+    global _facet_rpc_disabled_until
+    members_id = _current_members_id()
+    if not members_id or supabase is None or limit <= 0:
+        return FacetPage([], None, None, None)
+    facets = gallery_facets.normalize(facets)
+    sort = facets["sort"]
+    default = gallery_facets.is_default(facets)
+
+    def _from_gallery_page(counts, total) -> Optional[FacetPage]:
+        # app_gallery_page / get_products_after のカーソルは登録日順の PageKey
+        if cursor and page_cursor.decode(cursor) is None:
+            return None
+        page = get_gallery_page(supabase, limit=limit, cursor=cursor, search=search)
+        return FacetPage(page.rows, page.next_cursor, counts, total)
+
+    if (with_counts or not default) and time.monotonic() >= _facet_rpc_disabled_until:
+        after = None if default else page_cursor.decode_sorted(cursor, sort)
+        if cursor and not default and after is None:
+            return None
+        params = {
+            "p_limit": 0 if default else limit + 1,
+            **page_cursor.sorted_rpc_params(after),
+            "p_query": (search or "").strip() or None,
+            **gallery_facets.rpc_params(facets),
+            "p_with_counts": bool(with_counts),
+        }
+        try:
+            rpc = supabase.rpc("app_gallery_facets", params).execute()
+            payload = rpc.data if hasattr(rpc, "data") else None
+            if not isinstance(payload, dict):
+                raise ValueError("unexpected app_gallery_facets payload")
+        except Exception as exc:
+            dash_debug_print(f"DEBUG: app_gallery_facets rpc unavailable, fallback: {type(exc).__name__}")
+            _facet_rpc_disabled_until = time.monotonic() + _GALLERY_RPC_RETRY_SEC
+        else:
+            counts = gallery_facets.parse_counts(payload.get("counts")) if with_counts else None
+            total = payload.get("total")
+            total = int(total) if isinstance(total, int) and not isinstance(total, bool) else None
+            if default:
+                return _from_gallery_page(counts, total)
+            data = [row for row in payload.get("rows") or [] if isinstance(row, dict)]
+            rows = [_gallery_row_from_rpc(row) for row in data[:limit]]
+            next_cursor = (
+                page_cursor.encode_sorted(page_cursor.sorted_key_of(data[limit - 1], sort))
+                if len(data) > limit
+                else None
+            )
+            return FacetPage(_with_signed_photo_urls(supabase, rows), next_cursor, counts, total)
+    return _from_gallery_page(None, None)
+
+
+def get_products_by_ids(supabase: Client, product_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    ギャラリー用: 表示中の id の行だけを読み直す（サーバー側キャッシュに無いとき）。並びは product_ids の順。
+    """
+    members_id = _current_members_id()
+    if not members_id or supabase is None or not product_ids:
+        return []
+    response = (
+        supabase.table("registration_product_information")
+        .select(_GALLERY_PRODUCT_SELECT)
+        .eq("members_id", members_id)
+        .in_("registration_product_id", list(product_ids))
+        .execute()
+    )
+    if getattr(response, "error", None):
+        raise RuntimeError(f"製品取得に失敗しました: {response.error}")
+    data = response.data if hasattr(response, "data") else []
+    order = {pid: i for i, pid in enumerate(product_ids)}
+    rows = sorted(
+        (row for row in data or [] if isinstance(row, dict)),
+        key=lambda row: order.get(gallery_cache.row_id(row), len(order)),
+    )
+    return _with_signed_photo_urls(supabase, rows)
+
+
 def get_all_products(supabase: Client):
     """
     全件取得（互換・デモ用）。件数が多いと署名コストが高いため、UI は get_products_page を推奨。
@@ -425,9 +741,10 @@ def _get_product_stats_fallback(supabase: Client, members_id: str) -> Dict[str,
         .execute()
     )
     bc_rows = bc_resp.data if hasattr(bc_resp, "data") else []
+    # UPC-A / EAN-13 などの表記揺れは同じ商品として数える
     unique_barcodes = len(
         {
-            str(r.get("barcode_number")).strip()
+            canonical_key(str(r.get("barcode_number")))
             for r in bc_rows or []
             if isinstance(r, dict)
             and r.get("barcode_number") is not None
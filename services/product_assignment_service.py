@@ -7,6 +7,7 @@ import httpx
 from postgrest.exceptions import APIError
 from supabase import Client
 
+from services import gallery_cache
 from services.debug_log import dash_debug_print
 from services.supabase_client import PUBLISHABLE_KEY, SUPABASE_URL
 
@@ -203,7 +204,10 @@ def set_product_category_and_receipt(
             "category_tag_id": cid,
             "receipt_location_id": rid,
         }
-        return _patch_registration_product_fks_http(members_id, pid, payload)
+        ok, message = _patch_registration_product_fks_http(members_id, pid, payload)
+        if ok:
+            gallery_cache.invalidate(members_id)
+        return ok, message
     except APIError as e:
         dash_debug_print(f"product_assignment APIError: {e!s}"[:500])
         return False, "保存に失敗しました。しばらくしてから再度お試しください。"
@@ -2,6 +2,8 @@ from typing import Dict, List, Optional
 
 from supabase import Client
 
+from services import gallery_cache
+
 try:  # Flask が無い場合も安全に
     from flask import g, has_app_context
 except Exception:  # pragma: no cover
@@ -56,6 +58,7 @@ def set_product_color_tags(
         supabase.table("registration_product_color_tag").delete().eq(
             "members_id", members_id
         ).eq("registration_product_id", registration_product_id).execute()
+        gallery_cache.invalidate(members_id)
 
         if not clean_slots:
             return True  # 付与なしで終了
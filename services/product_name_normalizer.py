@@ -0,0 +1,102 @@
+"""楽天の商品名の正規化（宣伝文句の除去・ブランド/シリーズ抽出）。
+
+- NFKC で全角英数・全角括弧・半角カナを畳み込んでから処理する（「ＳＡＬＥ」「［限定］」「ｱｸｽﾀ」など）
+- 除去する語と括弧書きは 1 本の事前コンパイル済み選択パターンで一度に消す
+- 検索結果 1 回分（最大 10 件）は normalize_names でまとめて処理し、同じ商品名は 1 回だけ計算する
+"""
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple
+
+# 商品そのものを表さない宣伝・在庫・販路の語
+NOISE_WORDS = (
+    "送料無料",
+    "代引不可",
+    "メール便対応",
+    "楽天市場",
+    "Yahoo!ショッピング",
+    "Amazon",
+    "価格比較",
+    "最安値",
+    "新品",
+    "中古",
+    "即納",
+    "在庫あり",
+    "限定",
+    "予約受付中",
+    "完売",
+)
+
+_BRACKET = r"\[[^\]]*\]|【[^】]*】"
+_NOISE_RE = re.compile(
+    r"\s*(?:"
+    + _BRACKET
+    + "|"
+    + "|".join(re.escape(w) for w in sorted(NOISE_WORDS, key=len, reverse=True))
+    + r")\s*",
+    re.IGNORECASE,
+)
+_SPACE_RE = re.compile(r"\s+")
+_BRACKET_RE = re.compile(r"[【\[]([^】\]]*)[】\]]")
+_PAREN_RE = re.compile(r"\(([^()]*)\)")
+
+
+class NormalizedName(NamedTuple):
+    name: str
+    brand: str
+    series: str
+
+
+def fold_width(text: str) -> str:
+    """NFKC による全角/半角の畳み込み（全角英数・記号→半角、半角カナ→全角）。"""
+    return unicodedata.normalize("NFKC", text or "")
+
+
+def _strip_noise(folded: str) -> str:
+    return _SPACE_RE.sub(" ", _NOISE_RE.sub(" ", folded)).strip()
+
+
+def clean_name(name: str) -> str:
+    """宣伝文句・括弧書きを除いた商品名。"""
+    if not name:
+        return ""
+    return _strip_noise(fold_width(name))
+
+
+def _brand_and_series(folded: str) -> Dict[str, str]:
+    # 【送料無料】のように宣伝文句しか入っていない括弧は手がかりにしない
+    segments = [m for m in _BRACKET_RE.finditer(folded) if _strip_noise(m.group(1))]
+    brand = ""
+    series = ""
+    if segments:
+        first = segments[0]
+        # 「ブランド【シリーズ】商品」: 最初の括弧の前をブランドとする（括弧の後ろに商品名がある場合のみ）
+        if folded[first.end() :].strip():
+            brand = _strip_noise(folded[: first.start()])
+        series = segments[-1].group(1).strip()
+    else:
+        parens = _PAREN_RE.findall(folded)
+        if parens:
+            series = parens[-1].strip()
+    return {"brand": brand, "series": series}
+
+
+def normalize_name(raw_name: str) -> NormalizedName:
+    folded = fold_width(raw_name)
+    parts = _brand_and_series(folded)
+    return NormalizedName(_strip_noise(folded), parts["brand"], parts["series"])
+
+
+def normalize_names(raw_names: Iterable[str]) -> List[NormalizedName]:
+    """検索結果の商品名をまとめて正規化する（店舗違いで同じ商品名が並ぶことが多いので重複は 1 回だけ）。"""
+    memo: Dict[str, NormalizedName] = {}
+    results: List[NormalizedName] = []
+    for raw in raw_names:
+        key = raw or ""
+        normalized = memo.get(key)
+        if normalized is None:
+            normalized = normalize_name(key)
+            memo[key] = normalized
+        results.append(normalized)
+    return results
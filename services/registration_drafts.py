@@ -0,0 +1,349 @@
+"""登録ドラフトのサーバー側保存（SQLite・TTL 付き）とブラウザに渡す薄いハンドル。
+
+registration-store にプレビュー画像・vision_raw・楽天の items・説明文まで載せると、
+store を Input に持つコールバックのたびに数百 KB が往復する。ドラフト本体はここに置き、
+ブラウザには署名付きのドラフト id・版数と、clientside で参照する小さな UI 項目だけを返す。
+
+- 本体はセクション（meta / barcode / front_photo / lookup / tags / color_tags）ごとの行で持ち、
+  内容が変わったセクションだけ書き換える。
+- ハンドルの id は所有者（members_id）込みで HMAC 署名し、他人のドラフトは読めない。
+- 版数はサーバー側の書き込み（コールバックの保存・エンリッチの差分）ごとに 1 増える。
+  ブラウザの UI 項目は、ブラウザの版数がサーバーと同じとき（古くないとき）だけ上書きに使う。
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from flask import current_app, g, has_app_context
+except Exception:  # pragma: no cover
+    current_app = None
+    g = None
+    has_app_context = lambda: False  # type: ignore
+
+DRAFT_PATH = os.getenv("REGISTRATION_DRAFT_PATH") or os.path.join(
+    tempfile.gettempdir(), "oshi_registration_drafts.sqlite3"
+)
+DRAFT_TTL_SEC = int(os.getenv("REGISTRATION_DRAFT_TTL_SEC", "86400"))
+_PURGE_INTERVAL_SEC = 300.0
+# ブラウザの store に載せるキー
+HANDLE_KEY = "draft"
+VERSION_KEY = "version"
+# ブラウザに写す小さな UI 項目（assets/enrichmentEvents.js・クライアント側の表示切替が参照する）
+MIRROR_FIELDS = {
+    "barcode": ("status",),
+    "front_photo": ("status", "description_status"),
+    "tags": ("status",),
+    "color_tags": ("selected_slots",),
+}
+# state["meta"] のうちサーバー内部だけで使うキー（ブラウザにも DB の本体にも出さない）
+# draft_key: ドラフト id、draft_base: 読み込み時の各セクションのダイジェスト（変更検出用）
+DRAFT_KEY = "draft_key"
+DRAFT_BASE = "draft_base"
+INTERNAL_META_KEYS = (DRAFT_KEY, DRAFT_BASE)
+
+_SCHEMA = (
+    """
+    create table if not exists registration_draft (
+        draft_key text primary key,
+        owner text not null,
+        version integer not null default 0,
+        updated_at real not null
+    )
+    """,
+    """
+    create table if not exists registration_draft_section (
+        draft_key text not null,
+        section text not null,
+        body text not null,
+        primary key (draft_key, section)
+    )
+    """,
+)
+
+
+def _current_members_id() -> Optional[str]:
+    if g is None or not has_app_context():
+        return None
+    uid = getattr(g, "user_id", None)
+    return str(uid) if uid else None
+
+
+def _signing_key() -> bytes:
+    secret = None
+    if has_app_context() and current_app is not None:
+        secret = current_app.config.get("SECRET_KEY")
+    return str(secret or os.getenv("SECRET_KEY") or "").encode("utf-8")
+
+
+def sign(draft_key: str, owner: str) -> str:
+    digest = hmac.new(
+        _signing_key(), f"{draft_key}:{owner}".encode("utf-8"), hashlib.sha256
+    ).hexdigest()[:32]
+    return f"{draft_key}.{digest}"
+
+
+def verify(token: Any, owner: Optional[str]) -> Optional[str]:
+    """署名を検証してドラフト id を返す。所有者が違う・改ざんされていれば None。"""
+    if not isinstance(token, str) or "." not in token or not owner or not _signing_key():
+        return None
+    draft_key = token.split(".", 1)[0]
+    if not hmac.compare_digest(sign(draft_key, owner), token):
+        return None
+    return draft_key
+
+
+def _merge(base: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """assets/enrichmentEvents.js の mergePatch と同じ（辞書は深くマージ、配列は置き換え）。"""
+    out = dict(base)
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(out.get(key), dict):
+            out[key] = _merge(out[key], value)
+        else:
+            out[key] = value
+    return out
+
+
+class DraftStore:
+    def __init__(self, path: str = DRAFT_PATH, ttl_sec: int = DRAFT_TTL_SEC):
+        self._lock = threading.Lock()
+        self._ttl_sec = ttl_sec
+        self._last_purge = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def _purge_locked(self, now: float) -> None:
+        if now - self._last_purge < _PURGE_INTERVAL_SEC:
+            return
+        self._last_purge = now
+        cutoff = time.time() - self._ttl_sec
+        self._conn.execute(
+            "delete from registration_draft_section where draft_key in"
+            " (select draft_key from registration_draft where updated_at < ?)",
+            (cutoff,),
+        )
+        self._conn.execute("delete from registration_draft where updated_at < ?", (cutoff,))
+
+    def _read_locked(self, draft_key: str) -> Dict[str, Any]:
+        rows = self._conn.execute(
+            "select section, body from registration_draft_section where draft_key = ?",
+            (draft_key,),
+        ).fetchall()
+        return {section: json.loads(body) for section, body in rows}
+
+    def _write_locked(self, draft_key: str, sections: Dict[str, Any]) -> int:
+        if not sections:
+            # 変更が無ければ版数を上げない（store の Input が無駄に発火しないように）
+            return self._conn.execute(
+                "select version from registration_draft where draft_key = ?", (draft_key,)
+            ).fetchone()[0]
+        for section, value in sections.items():
+            self._conn.execute(
+                "insert into registration_draft_section (draft_key, section, body) values (?, ?, ?)"
+                " on conflict (draft_key, section) do update set body = excluded.body",
+                (draft_key, section, json.dumps(value, ensure_ascii=False, separators=(",", ":"))),
+            )
+        self._conn.execute(
+            "update registration_draft set version = version + 1, updated_at = ? where draft_key = ?",
+            (time.time(), draft_key),
+        )
+        return self._conn.execute(
+            "select version from registration_draft where draft_key = ?", (draft_key,)
+        ).fetchone()[0]
+
+    def load(self, draft_key: str, owner: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(版数, 状態) を返す。無い・期限切れ・所有者違いは None。"""
+        with self._lock:
+            row = self._conn.execute(
+                "select owner, version, updated_at from registration_draft where draft_key = ?",
+                (draft_key,),
+            ).fetchone()
+            if row is None or row[0] != owner or time.time() - row[2] > self._ttl_sec:
+                return None
+            return row[1], self._read_locked(draft_key)
+
+    def save(
+        self, draft_key: str, owner: str, sections: Dict[str, Any]
+    ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        渡したセクションだけを保存して (新しい版数, 保存後の状態) を返す。他人のドラフト id なら None。
+        保存後の状態は書き込みと同じロックの中で読む（並行したエンリッチの差分を含む最新の内容）。
+        """
+        with self._lock, self._conn:
+            self._purge_locked(time.monotonic())
+            row = self._conn.execute(
+                "select owner from registration_draft where draft_key = ?", (draft_key,)
+            ).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "insert into registration_draft (draft_key, owner, version, updated_at)"
+                    " values (?, ?, 0, ?)",
+                    (draft_key, owner, time.time()),
+                )
+            elif row[0] != owner:
+                return None
+            version = self._write_locked(draft_key, sections)
+            return version, self._read_locked(draft_key)
+
+    def apply_patch(self, draft_key: str, patch: Dict[str, Any]) -> Optional[int]:
+        """セクション単位の差分を深くマージして新しい版数を返す（エンリッチ処理から呼ぶ）。"""
+        if not patch:
+            return None
+        with self._lock, self._conn:
+            exists = self._conn.execute(
+                "select 1 from registration_draft where draft_key = ?", (draft_key,)
+            ).fetchone()
+            if exists is None:
+                return None
+            current = self._read_locked(draft_key)
+            merged = {
+                section: _merge(current.get(section) or {}, value)
+                if isinstance(value, dict)
+                else value
+                for section, value in patch.items()
+            }
+            return self._write_locked(draft_key, merged)
+
+
+_store_lock = threading.Lock()
+_store: Optional[DraftStore] = None
+
+
+def get_store() -> DraftStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DraftStore(DRAFT_PATH)
+        return _store
+
+
+def set_store(store: Optional[DraftStore]) -> None:
+    """ストアを差し替える（テスト用。None で既定のファイルに戻す）。"""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def is_handle(data: Any) -> bool:
+    return isinstance(data, dict) and HANDLE_KEY in data
+
+
+def _section_digest(value: Any) -> str:
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _body(state: Dict[str, Any]) -> Dict[str, Any]:
+    meta = {k: v for k, v in (state.get("meta") or {}).items() if k not in INTERNAL_META_KEYS}
+    return dict(state, meta=meta)
+
+
+def _mirror(state: Dict[str, Any]) -> Dict[str, Any]:
+    mirror: Dict[str, Any] = {"meta": _body(state)["meta"]}
+    for section, fields in MIRROR_FIELDS.items():
+        values = state.get(section) or {}
+        mirror[section] = {field: values.get(field) for field in fields}
+    return mirror
+
+
+def _save(state: Dict[str, Any]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """
+    状態をサーバーに保存して (新しい版数, 保存後の状態) を返す（ログイン中のユーザーが無ければ None）。
+    読み込み時から変わったセクションだけを書くため、並行して走るエンリッチ処理の差分を上書きしない。
+    state["meta"] にドラフト id と保存後のダイジェストを書き戻す。
+    """
+    owner = _current_members_id()
+    if not owner or not _signing_key():
+        return None
+    meta = state.setdefault("meta", {})
+    draft_key = meta.get(DRAFT_KEY) or uuid.uuid4().hex
+    body = _body(state)
+    base = meta.get(DRAFT_BASE) or {}
+    digests = {section: _section_digest(value) for section, value in body.items()}
+    changed = {section: body[section] for section in body if base.get(section) != digests[section]}
+    try:
+        saved = get_store().save(draft_key, owner, changed)
+    except sqlite3.Error as exc:
+        print(f"DEBUG: registration draft save failed: {exc}")
+        return None
+    if saved is None:
+        return None
+    meta[DRAFT_KEY] = draft_key
+    meta[DRAFT_BASE] = digests
+    return saved
+
+
+def persist(state: Dict[str, Any]) -> Optional[int]:
+    """状態をサーバーに保存して新しい版数を返す（保存の規則は _save と同じ）。"""
+    saved = _save(state)
+    return saved[0] if saved is not None else None
+
+
+def to_handle(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    状態を保存し、ブラウザ用の薄いハンドルを返す。保存できなければ None（呼び出し側は状態をそのまま返す）。
+    UI 項目は保存後のドラフトから写す。コールバックの状態は読み込み後のエンリッチの差分を含まず、
+    古い項目を最新の版数で返すと次の from_handle で重なり、次の保存で書き戻されてしまう。
+    """
+    saved = _save(state)
+    if saved is None:
+        return None
+    version, stored = saved
+    handle = _mirror(stored)
+    handle[HANDLE_KEY] = sign(state["meta"][DRAFT_KEY], _current_members_id() or "")
+    handle[VERSION_KEY] = version
+    return handle
+
+
+def from_handle(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    ハンドルからドラフト本体を読み、ブラウザ側の UI 項目（古くなければ）を重ねて返す。
+    署名不正・期限切れなら None。
+    """
+    owner = _current_members_id()
+    draft_key = verify(data.get(HANDLE_KEY), owner)
+    if not draft_key:
+        return None
+    try:
+        loaded = get_store().load(draft_key, owner)
+    except sqlite3.Error as exc:
+        print(f"DEBUG: registration draft load failed: {exc}")
+        return None
+    if loaded is None:
+        return None
+    version, state = loaded
+    # ダイジェストは重ねる前に取る（clientside で変えた UI 項目も次の保存で書かれる）
+    base = {section: _section_digest(value) for section, value in state.items()}
+    try:
+        browser_version = int(data.get(VERSION_KEY) or 0)
+    except (TypeError, ValueError):
+        browser_version = 0
+    if browser_version >= version:
+        # SSE 失敗時のポーリング切替など、clientside で書き換えた UI 項目を反映する
+        overlay = {key: value for key, value in data.items() if key not in (HANDLE_KEY, VERSION_KEY)}
+        state = _merge(state, overlay)
+    meta = state.setdefault("meta", {})
+    meta[DRAFT_KEY] = draft_key
+    meta[DRAFT_BASE] = base
+    return state
+
+
+def apply_patch(draft_key: Optional[str], patch: Dict[str, Any]) -> Optional[int]:
+    """エンリッチ処理の差分をドラフトに反映して新しい版数を返す（ドラフトが無ければ None）。"""
+    if not draft_key:
+        return None
+    try:
+        return get_store().apply_patch(draft_key, patch)
+    except sqlite3.Error as exc:
+        print(f"DEBUG: registration draft patch failed: {exc}")
+        return None
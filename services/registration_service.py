@@ -6,7 +6,10 @@ from dash import html
 from dash.exceptions import PreventUpdate
 
 from components.state_utils import ensure_state, serialise_state
+from services import similar_photos
 from services.app_paths import ensure_log_dir, log_file_path
+from services.image_hash import compute_hashes
+from services.photo_colors import analyze_photo_colors
 from services.photo_service import insert_photo_record, upload_to_storage
 from services.supabase_client import get_supabase_client
 from services.product_color_tag_service import set_product_color_tags
@@ -129,14 +132,19 @@ store_data keys: {list(store_data.keys()) if store_data else "None"}
                             "Preview photo data is not available for upload."
                         )
 
-                # photoレコードを作成
+                # photoレコードを作成（類似写真検索用の知覚ハッシュもここで計算）
                 print("Inserting photo record...")
+                photo_hashes = compute_hashes(file_bytes)
+                photo_palette, theme_color = analyze_photo_colors(supabase, file_bytes)
                 photo_id = insert_photo_record(
                     supabase,
                     members_id=members_id,
                     image_url="",  # Will be updated after upload (object path)
                     thumbnail_url="",  # Will be updated after upload (object path)
                     front_flag=1,
+                    theme_color=theme_color,
+                    hashes=photo_hashes,
+                    palette=photo_palette,
                 )
                 print(f"Photo record inserted, photo_id: {photo_id}")
 
@@ -200,6 +208,8 @@ store_data keys: {list(store_data.keys()) if store_data else "None"}
             purchase_location=purchase_location or "",
             memo=memo or "",
         )
+        if photo_id:
+            similar_photos.record_insert(members_id, product_id, product_name, photo_hashes)
         # カラータグ（slot）を保存（最大7・OR用）
         slots = state.get("color_tags", {}).get("selected_slots", []) or []
         if product_id:
@@ -276,12 +286,17 @@ def save_quick_registration_with_photo(store_data: Dict[str, Any]) -> Dict[str,
                 }
 
         # photoレコード作成
+        photo_hashes = compute_hashes(file_bytes)
+        photo_palette, theme_color = analyze_photo_colors(supabase, file_bytes)
         photo_id = insert_photo_record(
             supabase,
             members_id=members_id,
             image_url="",
             thumbnail_url="",
             front_flag=1,
+            theme_color=theme_color,
+            hashes=photo_hashes,
+            palette=photo_palette,
         )
 
         # ストレージアップロード
@@ -304,7 +319,7 @@ def save_quick_registration_with_photo(store_data: Dict[str, Any]) -> Dict[str,
         # productレコード作成（バーコードがなくても登録可）
         from services.photo_service import insert_product_record
 
-        insert_product_record(
+        product_id = insert_product_record(
             supabase,
             members_id=members_id,
             photo_id=photo_id,
@@ -319,6 +334,8 @@ def save_quick_registration_with_photo(store_data: Dict[str, Any]) -> Dict[str,
             purchase_location="",
             memo="",
         )
+        if photo_id:
+            similar_photos.record_insert(members_id, product_id, product_name, photo_hashes)
 
         return {
             "status": "success",
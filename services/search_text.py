@@ -0,0 +1,25 @@
+"""ギャラリー検索の正規化（DB の public.app_search_fold と同じ規則）。
+
+NFKC（全角英数→半角、半角カナ→全角）→ ひらがな→カタカナ → 小文字。
+「あくすた」「ｱｸｽﾀ」「アクスタ」や「ＡＢＣ」「abc」を同じ語として扱う。
+"""
+
+import unicodedata
+from typing import List
+
+# ぁ..ゖ（U+3041..U+3096）とゝゞ → ァ..ヶ・ヽヾ
+_HIRAGANA_TO_KATAKANA = {code: code + 0x60 for code in range(0x3041, 0x3097)}
+_HIRAGANA_TO_KATAKANA.update({ord("ゝ"): ord("ヽ"), ord("ゞ"): ord("ヾ")})
+
+
+def fold(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").translate(_HIRAGANA_TO_KATAKANA).lower()
+
+
+def terms(query: str) -> List[str]:
+    """空白区切りの検索語（AND）。重複は除き、長い語を先に並べる。"""
+    seen: List[str] = []
+    for term in fold(query).split():
+        if term not in seen:
+            seen.append(term)
+    return sorted(seen, key=len, reverse=True)
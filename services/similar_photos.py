@@ -0,0 +1,167 @@
+"""ユーザー毎の写真類似検索（知覚ハッシュの BK-tree）。
+
+登録済み商品の写真ハッシュ（photo.photo_phash / photo_dhash）を初回だけ RLS のユーザークライアントで読み、
+pHash の BK-tree をメモリに持つ。撮影直後に半径内の登録済みアイテムを数 ms で返す。
+登録時に追記し、全件削除で空にする（TTL 切れで読み直す）。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import g, has_app_context
+
+from services.bk_tree import BKTree
+from services.image_hash import ImageHashes, compute_hashes, from_signed64, hamming
+
+# pHash のハミング距離の上限（64 bit 中）。小さいほど厳しい
+SIMILAR_RADIUS = int(os.getenv("SIMILAR_PHOTO_RADIUS", "10"))
+SIMILAR_LIMIT = 5
+INDEX_TTL_SEC = 600
+_MAX_USERS = 128
+_PAGE_SIZE = 1000
+
+_lock = threading.Lock()
+_indexes: "OrderedDict[str, Tuple[float, BKTree]]" = OrderedDict()
+
+
+def _current_members_id() -> Optional[str]:
+    """flask.g から現在のユーザーIDを取得（無ければ None）。"""
+    if g is None or not has_app_context():
+        return None
+    uid = getattr(g, "user_id", None)
+    return str(uid) if uid else None
+
+
+def _entry_from_row(row: Dict[str, Any]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    photo = row.get("photo") or {}
+    if isinstance(photo, list):
+        photo = photo[0] if photo else {}
+    phash = photo.get("photo_phash")
+    if phash is None:
+        return None
+    dhash = photo.get("photo_dhash")
+    return from_signed64(int(phash)), {
+        "registration_product_id": row.get("registration_product_id"),
+        "product_name": row.get("product_name") or "",
+        "dhash": from_signed64(int(dhash)) if dhash is not None else None,
+    }
+
+
+def _load(supabase: Any, members_id: str) -> BKTree:
+    tree = BKTree()
+    start = 0
+    while True:
+        response = (
+            supabase.table("registration_product_information")
+            .select("registration_product_id,product_name,photo(photo_phash,photo_dhash)")
+            .eq("members_id", members_id)
+            .not_.is_("photo_id", "null")
+            .range(start, start + _PAGE_SIZE - 1)
+            .execute()
+        )
+        rows = getattr(response, "data", None) or []
+        for row in rows:
+            entry = _entry_from_row(row) if isinstance(row, dict) else None
+            if entry is not None:
+                tree.add(*entry)
+        if len(rows) < _PAGE_SIZE:
+            return tree
+        start += _PAGE_SIZE
+
+
+def _index_for(supabase: Any, members_id: str) -> Optional[BKTree]:
+    with _lock:
+        entry = _indexes.get(members_id)
+        if entry is not None and time.monotonic() - entry[0] <= INDEX_TTL_SEC:
+            _indexes.move_to_end(members_id)
+            return entry[1]
+    if supabase is None:
+        return None
+    tree = _load(supabase, members_id)
+    with _lock:
+        _indexes[members_id] = (time.monotonic(), tree)
+        _indexes.move_to_end(members_id)
+        while len(_indexes) > _MAX_USERS:
+            _indexes.popitem(last=False)
+    return tree
+
+
+def find_similar(
+    supabase: Any,
+    members_id: Optional[str],
+    hashes: Optional[ImageHashes],
+    radius: int = SIMILAR_RADIUS,
+    limit: int = SIMILAR_LIMIT,
+) -> List[Dict[str, Any]]:
+    """pHash が半径内の登録済みアイテム（距離の近い順、同距離は dHash で並べる）。"""
+    if not members_id or hashes is None:
+        return []
+    try:
+        tree = _index_for(supabase, members_id)
+    except Exception as exc:
+        print(f"DEBUG: similar photo index load failed: {exc}")
+        return []
+    if tree is None:
+        return []
+    with _lock:
+        hits = tree.search(hashes.phash, radius)
+    ranked = []
+    for distance, payload in hits:
+        dhash = payload.get("dhash")
+        d_distance = hamming(hashes.dhash, dhash) if dhash is not None else 64
+        ranked.append((distance, d_distance, payload))
+    ranked.sort(key=lambda entry: (entry[0], entry[1]))
+    return [
+        {
+            "registration_product_id": payload["registration_product_id"],
+            "product_name": payload["product_name"],
+            "distance": distance,
+        }
+        for distance, _, payload in ranked[:limit]
+    ]
+
+
+def find_similar_for_current_user(image_bytes: Optional[bytes]) -> List[Dict[str, Any]]:
+    """コールバック用: 撮影画像に似たログイン中ユーザーの登録済みアイテム。"""
+    members_id = _current_members_id()
+    if not members_id or not image_bytes:
+        return []
+    hashes = compute_hashes(image_bytes)
+    if hashes is None:
+        return []
+    from services.supabase_client import get_supabase_client
+
+    return find_similar(get_supabase_client(), members_id, hashes)
+
+
+def record_insert(
+    members_id: Optional[str],
+    registration_product_id: Optional[int],
+    product_name: Optional[str],
+    hashes: Optional[ImageHashes],
+) -> None:
+    """登録後に索引へ追記する（未読み込みのユーザーは次回の読み込みに任せる）。"""
+    if not members_id or not registration_product_id or hashes is None:
+        return
+    with _lock:
+        entry = _indexes.get(members_id)
+        if entry is not None:
+            entry[1].add(
+                hashes.phash,
+                {
+                    "registration_product_id": registration_product_id,
+                    "product_name": product_name or "",
+                    "dhash": hashes.dhash,
+                },
+            )
+
+
+def record_delete_all(members_id: Optional[str]) -> None:
+    if not members_id:
+        return
+    with _lock:
+        _indexes[members_id] = (time.monotonic(), BKTree())
+        _indexes.move_to_end(members_id)
@@ -2,22 +2,28 @@
 
 import json
 import os
+import re
 import time
-from typing import Any, Dict, Iterable, List, Optional
-
-import requests
-from retrying import retry
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from services.io_intelligence import (
     IO_API_KEY,
     IO_MODEL,
     IO_TAG_MODEL,
     IO_FALLBACK_MODEL,
-    IO_TIMEOUT,
-    IO_API_URL,
+    IO_BREAKER,
+    IO_STREAMING,
+    is_transient_error,
+    post_chat_completion,
+    read_completion_text,
 )
+from services.deadline import ENRICHMENT_DEADLINE_SEC, Deadline, call_with_retry
+from services.candidate_condenser import condense_candidates
+from services.description_extractor import semantic_tags
 DEFAULT_TAG_COUNT = 10
 
+_JSON_STRING_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
 
 def _format_product_candidates(candidates: Iterable[Dict[str, Any]]) -> str:
     lines: List[str] = []
@@ -44,6 +50,20 @@ def _format_product_candidates(candidates: Iterable[Dict[str, Any]]) -> str:
     return "\n".join(lines)
 
 
+def _condensed_product_candidates(candidates: Iterable[Dict[str, Any]]) -> str:
+    """近似重複の候補をまとめ、トークン予算内に収めたプロンプト用テキスト。"""
+    items = [c for c in (candidates or []) if isinstance(c, dict)]
+    if not items:
+        return ""
+    condensed = condense_candidates(items, baseline_text=_format_product_candidates(items))
+    print(
+        f"DEBUG: candidates condensed: {len(items)} -> {condensed.clusters} clusters"
+        f" (dropped={condensed.dropped}), tokens {condensed.tokens_before} -> {condensed.tokens_after}"
+        f" (saved={condensed.tokens_saved})"
+    )
+    return condensed.text
+
+
 def _parse_tags(raw_text: str) -> List[str]:
     """Robustly parse tags from model output.
 
@@ -257,208 +277,71 @@ def _parse_tags(raw_text: str) -> List[str]:
     return result
 
 
-def _semantic_tags_from_description(description: str) -> List[str]:
-    """Lightweight heuristic tags (color/material/object/character) extracted from the description text."""
-    if not description:
+def _parse_partial_tags(raw_text: str) -> List[str]:
+    """ストリーム途中の JSON 配列から、閉じ終わった文字列要素だけをタグとして取り出す。"""
+    text = raw_text or ""
+    start = text.find("[")
+    if start < 0:
         return []
+    values: List[str] = []
+    for literal in _JSON_STRING_RE.findall(text[start:]):
+        try:
+            values.append(json.loads(f'"{literal}"'))
+        except ValueError:
+            continue
+    if not values:
+        return []
+    return _parse_tags(json.dumps(values, ensure_ascii=False))
 
-    import re
-
-    text = description.replace("\u3000", " ")
-    normalized = text
-
-    # Helper to deduplicate while preserving order
-    seen_lower = set()
-
-    def _dedup(seq: List[str]) -> List[str]:
-        result: List[str] = []
-        for item in seq:
-            candidate = item.strip()
-            if not candidate:
-                continue
-            key = candidate.lower()
-            if key in seen_lower:
-                continue
-            seen_lower.add(key)
-            result.append(candidate)
-        return result
-
-    # Known vocabularies
-    COLOR_VARIANTS = {
-        "白色": "白",
-        "白い": "白",
-        "ホワイト": "白",
-        "白": "白",
-        "青色": "青",
-        "青い": "青",
-        "ブルー": "青",
-        "青": "青",
-        "水色": "水色",
-        "ライトブルー": "水色",
-        "紺色": "紺",
-        "ネイビー": "紺",
-        "紺": "紺",
-        "灰色": "灰色",
-        "グレー": "灰色",
-        "オレンジ色": "オレンジ",
-        "オレンジ": "オレンジ",
-        "赤色": "赤",
-        "赤い": "赤",
-        "レッド": "赤",
-        "赤": "赤",
-        "黒色": "黒",
-        "ブラック": "黒",
-        "黒": "黒",
-        "金色": "金色",
-        "ゴールド": "金色",
-        "銀色": "銀色",
-        "シルバー": "銀色",
-        "紫色": "紫",
-        "パープル": "紫",
-        "紫": "紫",
-        "緑色": "緑",
-        "グリーン": "緑",
-        "緑": "緑",
-        "黄色": "黄色",
-        "イエロー": "黄色",
-        "黄": "黄色",
-        "ピンク色": "ピンク",
-        "ピンク": "ピンク",
-        "茶色": "茶色",
-        "ブラウン": "茶色",
-    }
-
-    MATERIAL_VARIANTS = {
-        "シリコン": "シリコン",
-        "シリコン製": "シリコン",
-        "シリコンや": "シリコン",
-        "ゴム": "ゴム",
-        "ゴム製": "ゴム",
-        "ラバー": "ラバー",
-        "PVC": "PVC",
-        "pvc": "PVC",
-        "アクリル": "アクリル",
-        "プラスチック": "プラスチック",
-        "金属": "金属",
-        "メタル": "金属",
-        "布": "布",
-        "布製": "布",
-        "紙": "紙",
-        "紙製": "紙",
-        "木製": "木製",
-    }
-
-    ITEM_KEYWORDS = [
-        "キーホルダー",
-        "キーリング",
-        "チャーム",
-        "ストラップ",
-        "マスコット",
-        "フィギュア",
-        "アクリルスタンド",
-        "缶バッジ",
-        "ステッカー",
-        "ラバーキーホルダー",
-        "アクセサリー",
-        "雑貨",
-        "グッズ",
-    ]
-
-    MOTIF_KEYWORDS = [
-        "雪だるま",
-        "雪の結晶",
-        "冬",
-        "北海道",
-        "キャラクター",
-        "動物",
-        "鳥",
-        "シマエナガ",
-        "ペンギン",
-        "星",
-    ]
 
-    # Collect candidates per category
-    colors: List[str] = []
-    for variant, canonical in COLOR_VARIANTS.items():
-        if variant and variant in normalized:
-            colors.append(canonical)
-    colors = _dedup(colors)
-
-    materials: List[str] = []
-    for variant, canonical in MATERIAL_VARIANTS.items():
-        if variant and variant in normalized:
-            materials.append(canonical)
-    materials = _dedup(materials)
-
-    items: List[str] = []
-    for kw in ITEM_KEYWORDS:
-        if kw in normalized:
-            items.append(kw)
-    items = _dedup(items)
-
-    motifs: List[str] = []
-    for kw in MOTIF_KEYWORDS:
-        if kw in normalized:
-            motifs.append(kw)
-    motifs = _dedup(motifs)
-
-    names: List[str] = []
-    for quoted in re.findall(r"[『「\"]([^』」\"\n]{1,12})[』」\"]", text):
-        name = quoted.strip().strip("・,，。:：;；")
-        if name and len(name) >= 2:
-            names.append(name)
-    for latin in re.findall(r"\b[A-Za-z][A-Za-z0-9\-]{2,}\b", text):
-        names.append(latin.strip())
-    names = _dedup(names)
-
-    # Combine with balanced coverage (item, motif, color, material, name)
-    final_tags: List[str] = []
-    added_lower = set()
-
-    def push(tag: str):
-        candidate = tag.strip()
-        if not candidate:
-            return
-        key = candidate.lower()
-        if key in added_lower:
-            return
-        added_lower.add(key)
-        final_tags.append(candidate)
-
-    category_priority = [
-        ("item", items),
-        ("motif", motifs),
-        ("color", colors),
-        ("material", materials),
-        ("name", names),
-    ]
+def _semantic_tags_from_description(description: str) -> List[str]:
+    """Lightweight heuristic tags (color/material/object/character) extracted from the description text."""
+    return semantic_tags(description)
 
-    # First pass: one from each category when available
-    for _, bucket in category_priority:
-        if len(final_tags) >= 5:
-            break
-        if bucket:
-            push(bucket[0])
-
-    # Second pass: fill remaining slots with leftover values in priority order
-    if len(final_tags) < 5:
-        for _, bucket in category_priority:
-            for candidate in bucket[1:]:
-                if len(final_tags) >= 5:
-                    break
-                push(candidate)
-            if len(final_tags) >= 5:
-                break
 
-    return final_tags[:5]
+def _local_fallback_tags(
+    product_candidates: List[Dict[str, Any]], description_text: str
+) -> Dict[str, Any]:
+    """IO Intelligence が使えないときのローカル抽出（説明文のヒューリスティック＋楽天候補の作品/ブランド）。"""
+    tags: List[str] = []
+    if description_text:
+        tags.extend(_semantic_tags_from_description(description_text))
+    for item in product_candidates or []:
+        if not isinstance(item, dict):
+            continue
+        for key in ("series", "brand"):
+            value = str(item.get(key) or "").strip()
+            if value and value not in tags:
+                tags.append(value)
+    tags = tags[:DEFAULT_TAG_COUNT]
+    if not tags:
+        return {
+            "status": "not_ready",
+            "tags": [],
+            "message": "IO Intelligence が一時的に利用できないため、タグを生成できませんでした。",
+        }
+    return {
+        "status": "success",
+        "tags": tags,
+        "message": f"IO Intelligence が一時的に利用できないため、ローカル抽出で{len(tags)}個のタグを生成しました。",
+    }
 
 
 def extract_tags(
     product_candidates: List[Dict[str, Any]],
     description: Optional[str],
     image_base64: Optional[str] = None,
+    on_partial: Optional[Callable[[List[str]], None]] = None,
+    deadline: Optional[Deadline] = None,
 ) -> Dict[str, Any]:
-    """Generate tags using product search results and description text."""
+    """Generate tags using product search results and description text.
+
+    on_partial: if given, text-model calls use ``stream: true`` and the callback
+    receives the tags confirmed so far (provisional; the final result replaces them).
+    deadline: step deadline; model calls are skipped once it runs out and the
+    heuristic extraction below fills in.
+    """
+    deadline = deadline or Deadline(ENRICHMENT_DEADLINE_SEC)
 
     print(f"DEBUG: extract_tags called with candidates: {len(product_candidates) if product_candidates else 0}, description: {bool(description)}")
 
@@ -477,7 +360,7 @@ def extract_tags(
             "message": "タグ抽出に必要な情報が不足しています。",
         }
 
-    formatted_candidates = _format_product_candidates(product_candidates)
+    formatted_candidates = _condensed_product_candidates(product_candidates)
     description_text = description or ""
     # Treat non-descriptive placeholders as invalid/empty to force image-based tagging
     _invalid_desc_markers = [
@@ -494,11 +377,28 @@ def extract_tags(
 
     print(f"DEBUG: formatted_candidates: {bool(formatted_candidates)}, description_text: {bool(description_text)}")
 
+    # ブレーカーが open の間は API を呼ばずにローカル抽出を返す
+    if IO_BREAKER.state == "open":
+        print("DEBUG: extract_tags using local fallback - io_intelligence circuit is open")
+        return _local_fallback_tags(product_candidates, description_text)
+
     headers = {
         "Authorization": f"Bearer {IO_API_KEY}",
         "Content-Type": "application/json",
     }
 
+    use_stream = on_partial is not None and IO_STREAMING
+    early_tags: List[str] = []
+
+    def _emit_partial(tags: List[str]) -> None:
+        added = False
+        for tag in tags:
+            if tag and tag not in early_tags:
+                early_tags.append(tag)
+                added = True
+        if added and on_partial is not None:
+            on_partial(list(early_tags))
+
     def _call_with_model(model: str, prompt: str) -> Optional[List[str]]:
         payload = {
             "model": model,
@@ -516,36 +416,37 @@ def extract_tags(
             ],
             "temperature": 0.2,
         }
+        if use_stream:
+            payload["stream"] = True
 
-        @retry(
-            stop_max_attempt_number=3,
-            wait_fixed=2000,
-            retry_on_exception=lambda exc: isinstance(exc, requests.RequestException),
-        )
-        def _call_api():
+        def _call_once():
             start_time = time.time()
-            response = requests.post(IO_API_URL, headers=headers, json=payload, timeout=IO_TIMEOUT)
+            response = post_chat_completion(
+                headers, payload, deadline=deadline, stream=use_stream
+            )
             response.raise_for_status()
             elapsed = time.time() - start_time
             print(f"IO API extract_tags: model={model}, elapsed={elapsed:.2f}s")
             return response
 
+        def _call_api():
+            return call_with_retry(_call_once, deadline, is_transient_error)
+
         try:
-            data = _call_api().json()
-            content = data["choices"][0]["message"]["content"]
+            response = _call_api()
+            try:
+                raw_text = read_completion_text(
+                    response,
+                    (lambda text: _emit_partial(_parse_partial_tags(text)))
+                    if use_stream
+                    else None,
+                )
+            finally:
+                response.close()
         except Exception as exc:
             print(f"IO API extract_tags: request/parse failed for model={model}: {exc}")
             return None
 
-        if isinstance(content, list):
-            text_parts: List[str] = []
-            for entry in content:
-                if isinstance(entry, dict) and entry.get("type") in {"output_text", "text"}:
-                    text_parts.append(str(entry.get("text", "")))
-            raw_text = "\n".join(text_parts).strip()
-        else:
-            raw_text = str(content).strip()
-
         try:
             print(
                 f"DEBUG: extract_tags raw (text model={model}) len={len(raw_text)} preview='{raw_text[:120]}'"
@@ -581,7 +482,7 @@ def extract_tags(
                 "temperature": 0.2,
             }
             start_time = time.time()
-            resp_tag_first = requests.post(IO_API_URL, headers=headers, json=payload_tag_first, timeout=IO_TIMEOUT)
+            resp_tag_first = post_chat_completion(headers, payload_tag_first, deadline=deadline)
             resp_tag_first.raise_for_status()
             elapsed = time.time() - start_time
             print(f"IO API extract_tags(image via tag-model): model={IO_TAG_MODEL}, elapsed={elapsed:.2f}s")
@@ -610,7 +511,7 @@ def extract_tags(
                     "temperature": 0.2,
                 }
                 start_time = time.time()
-                resp_tag_raw_first = requests.post(IO_API_URL, headers=headers, json=payload_tag_raw_first, timeout=IO_TIMEOUT)
+                resp_tag_raw_first = post_chat_completion(headers, payload_tag_raw_first, deadline=deadline)
                 resp_tag_raw_first.raise_for_status()
                 elapsed = time.time() - start_time
                 print(f"IO API extract_tags(image via tag-model RAW): model={IO_TAG_MODEL}, elapsed={elapsed:.2f}s")
@@ -643,19 +544,17 @@ def extract_tags(
             "temperature": 0.2,
         }
 
-        @retry(
-            stop_max_attempt_number=3,
-            wait_fixed=2000,
-            retry_on_exception=lambda exc: isinstance(exc, requests.RequestException),
-        )
-        def _call_api():
+        def _call_once():
             start_time = time.time()
-            response = requests.post(IO_API_URL, headers=headers, json=payload, timeout=IO_TIMEOUT)
+            response = post_chat_completion(headers, payload, deadline=deadline)
             response.raise_for_status()
             elapsed = time.time() - start_time
             print(f"IO API extract_tags(image via vision): model={IO_MODEL}, elapsed={elapsed:.2f}s")
             return response
 
+        def _call_api():
+            return call_with_retry(_call_once, deadline, is_transient_error)
+
         try:
             data = _call_api().json()
             content = data["choices"][0]["message"]["content"]
@@ -667,7 +566,7 @@ def extract_tags(
             try:
                 payload["model"] = IO_FALLBACK_MODEL
                 start_time = time.time()
-                response = requests.post(IO_API_URL, headers=headers, json=payload, timeout=IO_TIMEOUT)
+                response = post_chat_completion(headers, payload, deadline=deadline)
                 response.raise_for_status()
                 elapsed = time.time() - start_time
                 print(f"IO API extract_tags(image via vision): fallback model={IO_FALLBACK_MODEL}, elapsed={elapsed:.2f}s")
@@ -697,7 +596,7 @@ def extract_tags(
                     "temperature": 0.2,
                 }
                 start_time = time.time()
-                response = requests.post(IO_API_URL, headers=headers, json=payload_raw, timeout=IO_TIMEOUT)
+                response = post_chat_completion(headers, payload_raw, deadline=deadline)
                 response.raise_for_status()
                 elapsed = time.time() - start_time
                 print(f"IO API extract_tags(image via vision RAW): model={IO_MODEL}, elapsed={elapsed:.2f}s")
@@ -711,7 +610,7 @@ def extract_tags(
                 payload_tag = dict(payload)
                 payload_tag["model"] = IO_TAG_MODEL
                 start_time = time.time()
-                response = requests.post(IO_API_URL, headers=headers, json=payload_tag, timeout=IO_TIMEOUT)
+                response = post_chat_completion(headers, payload_tag, deadline=deadline)
                 response.raise_for_status()
                 elapsed = time.time() - start_time
                 print(f"IO API extract_tags(image via tag-model): model={IO_TAG_MODEL}, elapsed={elapsed:.2f}s")
@@ -740,7 +639,7 @@ def extract_tags(
                     "temperature": 0.2,
                 }
                 start_time = time.time()
-                response = requests.post(IO_API_URL, headers=headers, json=payload_tag_raw, timeout=IO_TIMEOUT)
+                response = post_chat_completion(headers, payload_tag_raw, deadline=deadline)
                 response.raise_for_status()
                 elapsed = time.time() - start_time
                 print(f"IO API extract_tags(image via tag-model RAW): model={IO_TAG_MODEL}, elapsed={elapsed:.2f}s")
@@ -876,6 +775,8 @@ def extract_tags(
             combined.append(t)
 
     if not combined:
+        if IO_BREAKER.state == "open" or deadline.expired():
+            return _local_fallback_tags(product_candidates, description_text)
         return {"status": "not_ready", "tags": [], "message": "タグ抽出に必要な情報が不足しています。"}
 
     return {
@@ -1,7 +1,9 @@
 """Tag management service for color tags, category tags, and receipt location tags."""
 
 import re
-from typing import Dict, List, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
+from services import gallery_cache
+from services.deadline import Deadline
 from services.supabase_client import get_supabase_client
 
 try:
@@ -191,6 +193,7 @@ def save_color_tags(entries: List[Dict[str, Any]]) -> bool:
         supabase.table("color_tag").upsert(
             payload, on_conflict="members_id,slot"
         ).execute()
+        gallery_cache.invalidate(members_id)
         return True
     except Exception:
         return False
@@ -479,6 +482,7 @@ def delete_receipt_location_tag(receipt_location_id: int) -> bool:
         supabase.table("receipt_location").delete().eq(
             "receipt_location_id", rid
         ).eq("members_id", members_id).execute()
+        gallery_cache.invalidate(members_id)
         return True
     except Exception:
         return False
@@ -662,6 +666,7 @@ def delete_category_tag(category_tag_id: int) -> bool:
         supabase.table("category_tag").delete().eq(
             "category_tag_id", cid
         ).eq("members_id", members_id).execute()
+        gallery_cache.invalidate(members_id)
         return True
     except Exception:
         return False
@@ -749,6 +754,7 @@ def update_color_tag(color_tag_id: int, name: str, color: str) -> bool:
         supabase.table("color_tag").update(
             {"color_tag_name": name, "color_tag_color": color}
         ).eq("color_tag_id", color_tag_id).eq("members_id", members_id).execute()
+        gallery_cache.invalidate(members_id)
         return True
     except Exception:
         return False
@@ -773,6 +779,7 @@ def update_category_tag(category_tag_id: int, name: str, color: str, icon: str)
                 "category_tag_icon": ic,
             }
         ).eq("category_tag_id", category_tag_id).eq("members_id", members_id).execute()
+        gallery_cache.invalidate(members_id)
         return True
     except Exception:
         return False
@@ -794,6 +801,7 @@ def update_receipt_location_tag(receipt_location_id: int, name: str, icon: str)
         ).eq("receipt_location_id", receipt_location_id).eq(
             "members_id", members_id
         ).execute()
+        gallery_cache.invalidate(members_id)
         return True
     except Exception:
         return False
@@ -871,8 +879,15 @@ def create_receipt_location_tag(name: str, icon: str) -> bool:
         return False
 
 
-def _update_tags(state: Dict[str, Any]) -> Dict[str, Any]:
-    """Update tags based on lookup data and image description."""
+def _update_tags(
+    state: Dict[str, Any],
+    on_partial: Optional[Callable[[List[str]], None]] = None,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    """Update tags based on lookup data and image description.
+
+    on_partial / deadline は extract_tags にそのまま渡す（暫定タグ通知・ステップの締め切り）。
+    """
     items = state["lookup"].get("items") or []
     description = state["front_photo"].get("description")
     description_status = state["front_photo"].get("description_status")
@@ -906,7 +921,9 @@ def _update_tags(state: Dict[str, Any]) -> Dict[str, Any]:
     print("DEBUG: Calling extract_tags...")
     photo_content = state.get("front_photo", {}).get("content")
     from services.tag_extraction import extract_tags
-    tag_result = extract_tags(items, description, photo_content)
+    tag_result = extract_tags(
+        items, description, photo_content, on_partial=on_partial, deadline=deadline
+    )
     print(f"DEBUG: extract_tags result: {tag_result}")
 
     # タグ生成結果に応じてメッセージを調整（既にメッセージがあれば優先）
@@ -0,0 +1,83 @@
+"""依存関係つきタスクをスレッドプールで並列実行する小さなオーケストレーター。
+
+各タスクは依存先がすべて終わった時点（成功・失敗を問わない）で投入されるため、
+全体の所要時間は直列の合計ではなく最長経路の長さになる。
+外部 API 呼び出しは I/O 待ちが主なので、asyncio ではなく既存の requests をそのまま使えるスレッドで並べる。
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from services.deadline import Deadline
+
+_MAX_WORKERS = int(os.getenv("ENRICHMENT_BRANCH_WORKERS", "4"))
+# エンリッチのジョブ用プールとは分ける（ジョブのスレッドが分岐の完了を待つため、同じプールだと詰まる）
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, _MAX_WORKERS), thread_name_prefix="enrichment-branch"
+)
+
+
+class Task(NamedTuple):
+    name: str
+    fn: Callable[[Dict[str, Any]], Any]
+    deps: Tuple[str, ...] = ()
+
+
+class GraphResult(NamedTuple):
+    results: Dict[str, Any]
+    errors: Dict[str, BaseException]
+    # 締め切りまでに終わらなかった（または開始できなかった）タスク名
+    pending: Tuple[str, ...]
+
+
+def run_graph(
+    tasks: Iterable[Task],
+    deadline: Optional[Deadline] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+) -> GraphResult:
+    """
+    tasks を依存順に並列実行する。fn には完了済みタスクの結果 dict が渡る。
+
+    例外はタスク単位で errors に入れ、依存先はそのまま実行する（結果が無いことを fn 側で判断する）。
+    deadline を過ぎたら未完了のタスクを待たずに戻る。
+    """
+    pool = executor or _executor
+    by_name = {task.name: task for task in tasks}
+    for task in by_name.values():
+        unknown = [dep for dep in task.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"task '{task.name}' depends on unknown tasks: {unknown}")
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, BaseException] = {}
+    finished: set = set()
+    running: Dict[Future, str] = {}
+    waiting = dict(by_name)
+
+    def _submit_ready() -> None:
+        for name, task in list(waiting.items()):
+            if all(dep in finished for dep in task.deps):
+                snapshot = {dep: results[dep] for dep in task.deps if dep in results}
+                running[pool.submit(task.fn, snapshot)] = name
+                del waiting[name]
+
+    _submit_ready()
+    while running:
+        timeout = deadline.remaining() if deadline is not None else None
+        if timeout is not None and timeout <= 0:
+            break
+        done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            name = running.pop(future)
+            finished.add(name)
+            try:
+                results[name] = future.result()
+            except Exception as exc:
+                errors[name] = exc
+        _submit_ready()
+
+    pending = tuple(sorted(list(waiting) + list(running.values())))
+    return GraphResult(results=results, errors=errors, pending=pending)
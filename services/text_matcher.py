@@ -0,0 +1,66 @@
+"""複数キーワードを 1 回の走査で見つける Aho-Corasick オートマトン。
+
+語彙（色・素材・形状など）やユーザー辞書（作品名・キャラ名）を事前にまとめて構築し、
+テキスト長に比例した時間で全一致（重なりを含む）を列挙する。英字は大文字小文字を区別しない。
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    def __init__(self, entries: Iterable[Tuple[str, Any]]):
+        """entries: (パターン, 任意のペイロード)。同じパターンに複数ペイロードを付けてもよい。"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self.size = 0
+        for pattern, payload in entries:
+            self._add(pattern, payload)
+        self._build()
+
+    def _add(self, pattern: str, payload: Any) -> None:
+        key = (pattern or "").lower()
+        if not key:
+            return
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(key), payload))
+        self.size += 1
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # 接尾辞として含まれる短いパターンの出力を引き継ぐ
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """(開始位置, 終了位置, ペイロード) を終了位置の昇順で返す。"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        node = 0
+        for idx, ch in enumerate((text or "").lower()):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                end = idx + 1
+                for length, payload in out[node]:
+                    yield end - length, end, payload
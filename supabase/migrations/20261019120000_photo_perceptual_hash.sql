@@ -0,0 +1,17 @@
+-- 類似写真（重複登録）検索用の知覚ハッシュ。
+-- 64 bit の pHash / dHash を bigint（符号付き）で保持し、検索はアプリ側の BK-tree で行う。
+-- 既存の写真は scripts/backfill_photo_hashes.py で埋める。
+
+alter table public.photo
+  add column if not exists photo_phash bigint,
+  add column if not exists photo_dhash bigint;
+
+comment on column public.photo.photo_phash is
+  '写真の知覚ハッシュ（DCT pHash 64 bit・符号付き bigint）。類似写真の検索に使う';
+comment on column public.photo.photo_dhash is
+  '写真の差分ハッシュ（dHash 64 bit・符号付き bigint）。pHash が同距離のときの並べ替えに使う';
+
+-- バックフィル対象（未計算でアップロード済み）の走査用
+create index if not exists photo_phash_missing_idx
+  on public.photo (photo_id)
+  where photo_phash is null and photo_high_resolution_url is not null;
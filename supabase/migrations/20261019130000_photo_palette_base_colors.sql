@@ -0,0 +1,25 @@
+-- 写真の主要色（アプリ側の k-means で抽出）と、photo_theme_color が指す基本色。
+-- photo_palette: [{"hex": "#rrggbb", "share": 0.42}, ...]（割合の大きい順）
+-- photo_theme_color: 先頭の主要色に Lab で最も近い color.color_group_id
+
+alter table public.photo
+  add column if not exists photo_palette jsonb;
+
+comment on column public.photo.photo_palette is
+  '写真の主要色（HEX と画素に占める割合、割合の大きい順）。登録時に NumPy で抽出';
+
+-- 基本色（color_preference は #RRGGBB）。既にある名前は上書きしない
+insert into public.color (color_group_name, color_preference) values
+  ('赤', '#dc3545'),
+  ('橙', '#fd7e14'),
+  ('黄', '#ffc107'),
+  ('緑', '#198754'),
+  ('水色', '#0dcaf0'),
+  ('青', '#0d6efd'),
+  ('紫', '#6f42c1'),
+  ('ピンク', '#d63384'),
+  ('茶', '#795548'),
+  ('黒', '#212529'),
+  ('灰', '#adb5bd'),
+  ('白', '#f8f9fa')
+on conflict (color_group_name) do nothing;
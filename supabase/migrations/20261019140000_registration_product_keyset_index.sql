@@ -0,0 +1,15 @@
+-- ギャラリー一覧のキーセット・ページング用。
+-- 並び (creation_date desc, registration_product_id desc) をユーザー毎にインデックスで辿れるようにし、
+-- 深いページでも OFFSET の読み飛ばし無しで 1 ページ分だけ読む（photo_service.get_products_after）。
+
+-- キーに null があると「そのキーより後ろ」が定義できないため、欠けている作成日時を埋めて必須にする
+update public.registration_product_information
+  set creation_date = coalesce(updated_date, now())
+  where creation_date is null;
+
+alter table public.registration_product_information
+  alter column creation_date set default now(),
+  alter column creation_date set not null;
+
+create index if not exists idx_rpi_member_creation_keyset
+  on public.registration_product_information (members_id, creation_date desc, registration_product_id desc);
@@ -0,0 +1,94 @@
+-- ギャラリー 1 ページ分を 1 回の呼び出しで返す（RLS: auth.uid() と members_id が一致する行のみ）。
+-- 商品行・カテゴリ・収納場所・正面写真の object path・カラータグ（slot と色）を固定の列で返し、
+-- 一覧表示のための追加の PostgREST 呼び出し（カラータグ・色マップ）を不要にする。
+-- ページングはキーセット: (creation_date, registration_product_id) が引数より後ろの行を降順で読む。
+-- 署名 URL は Storage API でしか発行できないため、アプリ側で object path に付与する。
+
+create or replace function public.app_gallery_page(
+  p_limit integer default 48,
+  p_after_creation_date timestamptz default null,
+  p_after_id integer default null
+)
+returns table(
+  registration_product_id integer,
+  product_name text,
+  product_group_name text,
+  works_series_name text,
+  title text,
+  character_name text,
+  memo text,
+  barcode_number text,
+  photo_id integer,
+  creation_date timestamptz,
+  category_tag_id integer,
+  category_tag_name text,
+  category_tag_color text,
+  category_tag_icon text,
+  category_tag_use_flag integer,
+  receipt_location_id integer,
+  receipt_location_name text,
+  receipt_location_icon text,
+  receipt_location_use_flag integer,
+  photo_thumbnail_url text,
+  photo_high_resolution_url text,
+  front_flag integer,
+  photo_theme_color integer,
+  color_slots integer[],
+  color_slot_colors text[]
+)
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+  select
+    rpi.registration_product_id,
+    rpi.product_name,
+    rpi.product_group_name,
+    rpi.works_series_name,
+    rpi.title,
+    rpi.character_name,
+    rpi.memo,
+    rpi.barcode_number::text,
+    rpi.photo_id,
+    rpi.creation_date,
+    rpi.category_tag_id,
+    ct.category_tag_name,
+    ct.category_tag_color,
+    ct.category_tag_icon,
+    ct.category_tag_use_flag,
+    rpi.receipt_location_id,
+    rl.receipt_location_name,
+    rl.receipt_location_icon,
+    rl.receipt_location_use_flag,
+    p.photo_thumbnail_url,
+    p.photo_high_resolution_url,
+    p.front_flag,
+    p.photo_theme_color,
+    coalesce(slots.color_slots, '{}'::integer[]),
+    coalesce(slots.color_slot_colors, '{}'::text[])
+  from public.registration_product_information rpi
+  left join public.category_tag ct on ct.category_tag_id = rpi.category_tag_id
+  left join public.receipt_location rl on rl.receipt_location_id = rpi.receipt_location_id
+  left join public.photo p on p.photo_id = rpi.photo_id
+  left join lateral (
+    select
+      array_agg(rpct.slot order by rpct.slot) as color_slots,
+      array_agg(coalesce(colt.color_tag_color, '#adb5bd') order by rpct.slot) as color_slot_colors
+    from public.registration_product_color_tag rpct
+    left join public.color_tag colt
+      on colt.members_id = rpct.members_id and colt.slot = rpct.slot
+    where rpct.members_id = rpi.members_id
+      and rpct.registration_product_id = rpi.registration_product_id
+  ) slots on true
+  where rpi.members_id = auth.uid()
+    and (
+      p_after_creation_date is null
+      or (rpi.creation_date, rpi.registration_product_id) < (p_after_creation_date, p_after_id)
+    )
+  -- idx_rpi_member_creation_keyset を辿る
+  order by rpi.creation_date desc, rpi.registration_product_id desc
+  limit least(greatest(coalesce(p_limit, 48), 1), 201);
+$$;
+
+grant execute on function public.app_gallery_page(integer, timestamptz, integer) to authenticated;
@@ -0,0 +1,148 @@
+-- ギャラリーのサーバー側全文検索（読み込み済みの 48 件ではなくコレクション全体が対象）。
+-- 商品名・グループ・シリーズ・タイトル・キャラクター・メモを 1 本の正規化済み列にまとめる:
+--   NFKC（全角英数→半角、半角カナ→全角）→ ひらがな→カタカナ → 小文字
+-- 部分一致は pg_trgm の GIN 索引で引く（2 文字以下の語は索引が効かず、本人の行の走査になる）。
+-- app_gallery_page に p_query を足し、検索結果も同じ列・同じキーセットでページングする。
+
+create extension if not exists pg_trgm with schema extensions;
+
+create or replace function public.app_search_fold(p_text text)
+returns text
+language sql
+immutable
+parallel safe
+as $$
+  select lower(
+    translate(
+      normalize(coalesce(p_text, ''), NFKC),
+      'ぁあぃいぅうぇえぉおかがきぎくぐけげこごさざしじすずせぜそぞただちぢっつづてでとどなにぬねのはばぱひびぴふぶぷへべぺほぼぽまみむめもゃやゅゆょよらりるれろゎわゐゑをんゔゕゖゝゞ',
+      'ァアィイゥウェエォオカガキギクグケゲコゴサザシジスズセゼソゾタダチヂッツヅテデトドナニヌネノハバパヒビピフブプヘベペホボポマミムメモャヤュユョヨラリルレロヮワヰヱヲンヴヵヶヽヾ'
+    )
+  );
+$$;
+
+alter table public.registration_product_information
+  add column if not exists search_text text
+  generated always as (
+    public.app_search_fold(
+      concat_ws(' ', product_name, product_group_name, works_series_name, title, character_name, memo)
+    )
+  ) stored;
+
+comment on column public.registration_product_information.search_text is
+  'ギャラリー検索用の正規化テキスト（app_search_fold）。直接更新しない';
+
+create index if not exists idx_rpi_search_text_trgm
+  on public.registration_product_information
+  using gin (search_text extensions.gin_trgm_ops);
+
+-- 引数が増えるため、旧シグネチャを置き換える
+drop function if exists public.app_gallery_page(integer, timestamptz, integer);
+
+create or replace function public.app_gallery_page(
+  p_limit integer default 48,
+  p_after_creation_date timestamptz default null,
+  p_after_id integer default null,
+  p_query text default null
+)
+returns table(
+  registration_product_id integer,
+  product_name text,
+  product_group_name text,
+  works_series_name text,
+  title text,
+  character_name text,
+  memo text,
+  barcode_number text,
+  photo_id integer,
+  creation_date timestamptz,
+  category_tag_id integer,
+  category_tag_name text,
+  category_tag_color text,
+  category_tag_icon text,
+  category_tag_use_flag integer,
+  receipt_location_id integer,
+  receipt_location_name text,
+  receipt_location_icon text,
+  receipt_location_use_flag integer,
+  photo_thumbnail_url text,
+  photo_high_resolution_url text,
+  front_flag integer,
+  photo_theme_color integer,
+  color_slots integer[],
+  color_slot_colors text[]
+)
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+  -- 検索語は空白区切りの AND。長い語を先頭にし、最初の 1 語の LIKE でトライグラム索引を引く
+  with terms as (
+    select coalesce(
+      array_agg(
+        '%' || replace(replace(replace(t, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+        order by length(t) desc
+      ),
+      '{}'::text[]
+    ) as patterns
+    from regexp_split_to_table(public.app_search_fold(p_query), '\s+') as t
+    where t <> ''
+  )
+  select
+    rpi.registration_product_id,
+    rpi.product_name,
+    rpi.product_group_name,
+    rpi.works_series_name,
+    rpi.title,
+    rpi.character_name,
+    rpi.memo,
+    rpi.barcode_number::text,
+    rpi.photo_id,
+    rpi.creation_date,
+    rpi.category_tag_id,
+    ct.category_tag_name,
+    ct.category_tag_color,
+    ct.category_tag_icon,
+    ct.category_tag_use_flag,
+    rpi.receipt_location_id,
+    rl.receipt_location_name,
+    rl.receipt_location_icon,
+    rl.receipt_location_use_flag,
+    p.photo_thumbnail_url,
+    p.photo_high_resolution_url,
+    p.front_flag,
+    p.photo_theme_color,
+    coalesce(slots.color_slots, '{}'::integer[]),
+    coalesce(slots.color_slot_colors, '{}'::text[])
+  from public.registration_product_information rpi
+  cross join terms
+  left join public.category_tag ct on ct.category_tag_id = rpi.category_tag_id
+  left join public.receipt_location rl on rl.receipt_location_id = rpi.receipt_location_id
+  left join public.photo p on p.photo_id = rpi.photo_id
+  left join lateral (
+    select
+      array_agg(rpct.slot order by rpct.slot) as color_slots,
+      array_agg(coalesce(colt.color_tag_color, '#adb5bd') order by rpct.slot) as color_slot_colors
+    from public.registration_product_color_tag rpct
+    left join public.color_tag colt
+      on colt.members_id = rpct.members_id and colt.slot = rpct.slot
+    where rpct.members_id = rpi.members_id
+      and rpct.registration_product_id = rpi.registration_product_id
+  ) slots on true
+  where rpi.members_id = auth.uid()
+    and (
+      cardinality(terms.patterns) = 0
+      or (rpi.search_text like terms.patterns[1] and rpi.search_text like all (terms.patterns))
+    )
+    and (
+      p_after_creation_date is null
+      or (rpi.creation_date, rpi.registration_product_id) < (p_after_creation_date, p_after_id)
+    )
+  -- idx_rpi_member_creation_keyset を辿る
+  order by rpi.creation_date desc, rpi.registration_product_id desc
+  limit least(greatest(coalesce(p_limit, 48), 1), 201);
+$$;
+
+grant execute on function public.app_gallery_page(integer, timestamptz, integer, text) to authenticated;
+grant execute on function public.app_search_fold(text) to authenticated;
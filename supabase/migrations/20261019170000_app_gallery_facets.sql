@@ -0,0 +1,237 @@
+-- ギャラリーの絞り込み（ファセット）: 条件に合う 1 ページ分の行と、項目ごとの件数を 1 回の呼び出しで返す。
+-- 条件: カテゴリ・収納場所・カラータグ・価格帯（いずれも OR、0 / -1 は未設定）、フラグ（AND）、検索語（app_gallery_page と同じ）。
+-- 件数はその項目以外の条件をすべて当てた件数（例: カテゴリ別の件数は収納場所・色・価格・フラグで絞った後の内訳）。
+-- 並び替え: date（登録日の新しい順）/ price_desc / price_asc（価格未入力は末尾）/ name。同値は id で順序を決め、
+-- キーセット（p_after_* と p_after_id）で次ページを読む。引数は並びに合う型のものだけを使う。
+-- 件数の集計は先頭ページ（p_with_counts = true）のときだけ行う。
+
+create index if not exists idx_rpi_member_category
+  on public.registration_product_information (members_id, category_tag_id);
+
+create index if not exists idx_rpi_member_receipt_location
+  on public.registration_product_information (members_id, receipt_location_id);
+
+create index if not exists idx_rpi_member_price_keyset
+  on public.registration_product_information (members_id, purchase_price, registration_product_id);
+
+create index if not exists idx_rpi_member_name_keyset
+  on public.registration_product_information (members_id, product_name, registration_product_id);
+
+create or replace function public.app_gallery_facets(
+  p_limit integer default 48,
+  p_sort text default 'date',
+  p_after_date timestamptz default null,
+  p_after_price integer default null,
+  p_after_name text default null,
+  p_after_id integer default null,
+  p_query text default null,
+  p_category_ids integer[] default null,
+  p_location_ids integer[] default null,
+  p_slots integer[] default null,
+  p_price_buckets integer[] default null,
+  p_flags text[] default null,
+  p_with_counts boolean default true
+)
+returns jsonb
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+  with terms as (
+    select coalesce(
+      array_agg(
+        '%' || replace(replace(replace(t, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+        order by length(t) desc
+      ),
+      '{}'::text[]
+    ) as patterns
+    from regexp_split_to_table(public.app_search_fold(p_query), '\s+') as t
+    where t <> ''
+  ),
+  base as (
+    select
+      rpi.registration_product_id,
+      rpi.product_name,
+      rpi.product_group_name,
+      rpi.works_series_name,
+      rpi.title,
+      rpi.character_name,
+      rpi.memo,
+      rpi.barcode_number::text as barcode_number,
+      rpi.photo_id,
+      rpi.creation_date,
+      rpi.category_tag_id,
+      rpi.receipt_location_id,
+      rpi.purchase_price,
+      coalesce(width_bucket(rpi.purchase_price, array[1000, 3000, 5000, 10000]), -1) as price_bucket,
+      coalesce(rpi.want_object_flag, 0) = 1 as want_object_flag,
+      coalesce(rpi.flag_with_freebie, 0) = 1 as flag_with_freebie,
+      coalesce(rpi.sales_desired_flag, 0) = 1 as sales_desired_flag,
+      coalesce(rpi.digital_product_flag, 0) = 1 as digital_product_flag,
+      coalesce(rpi.personal_product_flag, 0) = 1 as personal_product_flag,
+      coalesce(slots.color_slots, '{}'::integer[]) as color_slots,
+      coalesce(slots.color_slot_colors, '{}'::text[]) as color_slot_colors
+    from public.registration_product_information rpi
+    cross join terms
+    left join lateral (
+      select
+        array_agg(rpct.slot order by rpct.slot) as color_slots,
+        array_agg(coalesce(colt.color_tag_color, '#adb5bd') order by rpct.slot) as color_slot_colors
+      from public.registration_product_color_tag rpct
+      left join public.color_tag colt
+        on colt.members_id = rpct.members_id and colt.slot = rpct.slot
+      where rpct.members_id = rpi.members_id
+        and rpct.registration_product_id = rpi.registration_product_id
+    ) slots on true
+    where rpi.members_id = auth.uid()
+      and (
+        cardinality(terms.patterns) = 0
+        or (rpi.search_text like terms.patterns[1] and rpi.search_text like all (terms.patterns))
+      )
+  ),
+  matched as (
+    select
+      b.*,
+      (coalesce(cardinality(p_category_ids), 0) = 0
+        or coalesce(b.category_tag_id, 0) = any (p_category_ids)) as m_category,
+      (coalesce(cardinality(p_location_ids), 0) = 0
+        or coalesce(b.receipt_location_id, 0) = any (p_location_ids)) as m_location,
+      (coalesce(cardinality(p_slots), 0) = 0 or b.color_slots && p_slots) as m_color,
+      (coalesce(cardinality(p_price_buckets), 0) = 0 or b.price_bucket = any (p_price_buckets)) as m_price,
+      (
+        (not coalesce('want_object_flag' = any (p_flags), false) or b.want_object_flag)
+        and (not coalesce('flag_with_freebie' = any (p_flags), false) or b.flag_with_freebie)
+        and (not coalesce('sales_desired_flag' = any (p_flags), false) or b.sales_desired_flag)
+        and (not coalesce('digital_product_flag' = any (p_flags), false) or b.digital_product_flag)
+        and (not coalesce('personal_product_flag' = any (p_flags), false) or b.personal_product_flag)
+      ) as m_flags
+    from base b
+  ),
+  hits as (
+    select * from matched
+    where m_category and m_location and m_color and m_price and m_flags
+  ),
+  ranked as (
+    select
+      h.*,
+      row_number() over (
+        order by
+          case when p_sort = 'price_desc' then coalesce(h.purchase_price, -1) end desc,
+          case when p_sort = 'price_asc' then coalesce(h.purchase_price, 2147483647) end asc,
+          case when p_sort = 'name' then coalesce(h.product_name, '') end asc,
+          case when p_sort in ('price_asc', 'name') then h.registration_product_id end asc,
+          case when p_sort not in ('price_desc', 'price_asc', 'name') then h.creation_date end desc,
+          h.registration_product_id desc
+      ) as rn
+    from hits h
+    where p_after_id is null
+      or case
+        when p_sort = 'price_desc' then
+          (coalesce(h.purchase_price, -1), h.registration_product_id) < (p_after_price, p_after_id)
+        when p_sort = 'price_asc' then
+          (coalesce(h.purchase_price, 2147483647), h.registration_product_id) > (p_after_price, p_after_id)
+        when p_sort = 'name' then
+          (coalesce(h.product_name, ''), h.registration_product_id) > (p_after_name, p_after_id)
+        else
+          (h.creation_date, h.registration_product_id) < (p_after_date, p_after_id)
+      end
+  ),
+  page as (
+    select * from ranked
+    where rn <= least(greatest(coalesce(p_limit, 48), 1), 201)
+  )
+  select jsonb_build_object(
+    'rows', coalesce((
+      select jsonb_agg(
+        jsonb_build_object(
+          'registration_product_id', pg.registration_product_id,
+          'product_name', pg.product_name,
+          'product_group_name', pg.product_group_name,
+          'works_series_name', pg.works_series_name,
+          'title', pg.title,
+          'character_name', pg.character_name,
+          'memo', pg.memo,
+          'barcode_number', pg.barcode_number,
+          'photo_id', pg.photo_id,
+          'creation_date', pg.creation_date,
+          'purchase_price', pg.purchase_price,
+          'category_tag_id', pg.category_tag_id,
+          'category_tag_name', ct.category_tag_name,
+          'category_tag_color', ct.category_tag_color,
+          'category_tag_icon', ct.category_tag_icon,
+          'category_tag_use_flag', ct.category_tag_use_flag,
+          'receipt_location_id', pg.receipt_location_id,
+          'receipt_location_name', rl.receipt_location_name,
+          'receipt_location_icon', rl.receipt_location_icon,
+          'receipt_location_use_flag', rl.receipt_location_use_flag,
+          'photo_thumbnail_url', p.photo_thumbnail_url,
+          'photo_high_resolution_url', p.photo_high_resolution_url,
+          'front_flag', p.front_flag,
+          'photo_theme_color', p.photo_theme_color,
+          'color_slots', pg.color_slots,
+          'color_slot_colors', pg.color_slot_colors
+        )
+        order by pg.rn
+      )
+      from page pg
+      left join public.category_tag ct on ct.category_tag_id = pg.category_tag_id
+      left join public.receipt_location rl on rl.receipt_location_id = pg.receipt_location_id
+      left join public.photo p on p.photo_id = pg.photo_id
+    ), '[]'::jsonb),
+    'total', (select count(*) from hits),
+    'counts', case when p_with_counts then jsonb_build_object(
+      'category', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select coalesce(category_tag_id, 0)::text as k, count(*) as n
+          from matched
+          where m_location and m_color and m_price and m_flags
+          group by 1
+        ) s
+      ),
+      'location', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select coalesce(receipt_location_id, 0)::text as k, count(*) as n
+          from matched
+          where m_category and m_color and m_price and m_flags
+          group by 1
+        ) s
+      ),
+      'color', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select slot::text as k, count(*) as n
+          from matched, unnest(matched.color_slots) as slot
+          where m_category and m_location and m_price and m_flags
+          group by 1
+        ) s
+      ),
+      'price', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select price_bucket::text as k, count(*) as n
+          from matched
+          where m_category and m_location and m_color and m_flags
+          group by 1
+        ) s
+      ),
+      -- フラグは AND のため、すべての条件を当てた行のうち各フラグが立っている件数
+      'flags', (
+        select jsonb_build_object(
+          'want_object_flag', count(*) filter (where want_object_flag),
+          'flag_with_freebie', count(*) filter (where flag_with_freebie),
+          'sales_desired_flag', count(*) filter (where sales_desired_flag),
+          'digital_product_flag', count(*) filter (where digital_product_flag),
+          'personal_product_flag', count(*) filter (where personal_product_flag)
+        )
+        from hits
+      )
+    ) end
+  );
+$$;
+
+grant execute on function public.app_gallery_facets(
+  integer, text, timestamptz, integer, text, integer, text, integer[], integer[], integer[], integer[], text[], boolean
+) to authenticated;
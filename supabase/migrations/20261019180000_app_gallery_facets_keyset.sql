@@ -0,0 +1,292 @@
+-- app_gallery_facets の 1 ページの読み方を、並びごとのキーセット検索に置き換える。
+-- 旧版は本人の全行にカラータグを付けてから row_number で並べていたため、ページごとにコレクション全体を読んでいた。
+-- ・行: 「where 条件 and キーセット order by 並びの列 limit n」を並びごとの索引で辿り、
+--       カラータグ・カテゴリ・収納場所・写真はそのページの行にだけ付ける。
+-- ・件数（total / counts）: p_with_counts = true（先頭ページ）のときだけ集計する。続きのページでは null。
+-- ・p_limit = 0 は件数だけを返す（絞り込みなしの登録日順は行を app_gallery_page で読み、件数だけここで数える）。
+-- 並びのキーは旧版と同じ（価格未入力は price_desc で -1、price_asc で 2147483647、名前未入力は ''）。
+
+drop index if exists public.idx_rpi_member_price_keyset;
+drop index if exists public.idx_rpi_member_name_keyset;
+
+-- price_desc は後ろから辿る
+create index if not exists idx_rpi_member_price_desc_keyset
+  on public.registration_product_information
+  (members_id, (coalesce(purchase_price, -1)), registration_product_id);
+
+create index if not exists idx_rpi_member_price_asc_keyset
+  on public.registration_product_information
+  (members_id, (coalesce(purchase_price, 2147483647)), registration_product_id);
+
+create index if not exists idx_rpi_member_name_keyset
+  on public.registration_product_information
+  (members_id, (coalesce(product_name, '')), registration_product_id);
+
+create or replace function public.app_gallery_facets(
+  p_limit integer default 48,
+  p_sort text default 'date',
+  p_after_date timestamptz default null,
+  p_after_price integer default null,
+  p_after_name text default null,
+  p_after_id integer default null,
+  p_query text default null,
+  p_category_ids integer[] default null,
+  p_location_ids integer[] default null,
+  p_slots integer[] default null,
+  p_price_buckets integer[] default null,
+  p_flags text[] default null,
+  p_with_counts boolean default true
+)
+returns jsonb
+language plpgsql
+stable
+security invoker
+set search_path = public
+as $$
+declare
+  v_limit integer := least(greatest(coalesce(p_limit, 48), 0), 201);
+  v_patterns text[];
+  v_ids integer[] := '{}'::integer[];
+  v_keyset text;
+  v_order text;
+  v_rows jsonb;
+  v_total bigint;
+  v_counts jsonb;
+begin
+  -- 検索語は app_gallery_page と同じ（空白区切りの AND、長い語を先頭にしてトライグラム索引を引く）
+  select coalesce(
+    array_agg(
+      '%' || replace(replace(replace(t, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+      order by length(t) desc
+    ),
+    '{}'::text[]
+  )
+  into v_patterns
+  from regexp_split_to_table(public.app_search_fold(p_query), '\s+') as t
+  where t <> '';
+
+  if v_limit > 0 then
+    -- 並びの列とキーセットは固定の文字列から選ぶ（引数は using で渡し、SQL 文には埋め込まない）
+    case p_sort
+      when 'price_desc' then
+        v_keyset := '(coalesce(rpi.purchase_price, -1), rpi.registration_product_id) < ($9, $11)';
+        v_order := 'coalesce(rpi.purchase_price, -1) desc, rpi.registration_product_id desc';
+      when 'price_asc' then
+        v_keyset := '(coalesce(rpi.purchase_price, 2147483647), rpi.registration_product_id) > ($9, $11)';
+        v_order := 'coalesce(rpi.purchase_price, 2147483647), rpi.registration_product_id';
+      when 'name' then
+        v_keyset := '(coalesce(rpi.product_name, ''''), rpi.registration_product_id) > ($10, $11)';
+        v_order := 'coalesce(rpi.product_name, ''''), rpi.registration_product_id';
+      else
+        v_keyset := '(rpi.creation_date, rpi.registration_product_id) < ($8, $11)';
+        v_order := 'rpi.creation_date desc, rpi.registration_product_id desc';
+    end case;
+
+    execute format(
+      $q$
+      select array(
+        select rpi.registration_product_id
+        from public.registration_product_information rpi
+        where rpi.members_id = auth.uid()
+          and (cardinality($2) = 0 or (rpi.search_text like $2[1] and rpi.search_text like all ($2)))
+          and (coalesce(cardinality($3), 0) = 0 or coalesce(rpi.category_tag_id, 0) = any ($3))
+          and (coalesce(cardinality($4), 0) = 0 or coalesce(rpi.receipt_location_id, 0) = any ($4))
+          and (
+            coalesce(cardinality($5), 0) = 0
+            or exists (
+              select 1
+              from public.registration_product_color_tag rpct
+              where rpct.members_id = rpi.members_id
+                and rpct.registration_product_id = rpi.registration_product_id
+                and rpct.slot = any ($5)
+            )
+          )
+          and (
+            coalesce(cardinality($6), 0) = 0
+            or coalesce(width_bucket(rpi.purchase_price, array[1000, 3000, 5000, 10000]), -1) = any ($6)
+          )
+          and (not coalesce('want_object_flag' = any ($7), false) or rpi.want_object_flag = 1)
+          and (not coalesce('flag_with_freebie' = any ($7), false) or rpi.flag_with_freebie = 1)
+          and (not coalesce('sales_desired_flag' = any ($7), false) or rpi.sales_desired_flag = 1)
+          and (not coalesce('digital_product_flag' = any ($7), false) or rpi.digital_product_flag = 1)
+          and (not coalesce('personal_product_flag' = any ($7), false) or rpi.personal_product_flag = 1)
+          and ($11 is null or %s)
+        order by %s
+        limit $1
+      )
+      $q$,
+      v_keyset,
+      v_order
+    )
+    into v_ids
+    using v_limit, v_patterns, p_category_ids, p_location_ids, p_slots, p_price_buckets, p_flags,
+      p_after_date, p_after_price, p_after_name, p_after_id;
+  end if;
+
+  -- カラータグ・カテゴリ・収納場所・写真はページの行にだけ付ける
+  select coalesce(
+    jsonb_agg(
+      jsonb_build_object(
+        'registration_product_id', rpi.registration_product_id,
+        'product_name', rpi.product_name,
+        'product_group_name', rpi.product_group_name,
+        'works_series_name', rpi.works_series_name,
+        'title', rpi.title,
+        'character_name', rpi.character_name,
+        'memo', rpi.memo,
+        'barcode_number', rpi.barcode_number::text,
+        'photo_id', rpi.photo_id,
+        'creation_date', rpi.creation_date,
+        'purchase_price', rpi.purchase_price,
+        'category_tag_id', rpi.category_tag_id,
+        'category_tag_name', ct.category_tag_name,
+        'category_tag_color', ct.category_tag_color,
+        'category_tag_icon', ct.category_tag_icon,
+        'category_tag_use_flag', ct.category_tag_use_flag,
+        'receipt_location_id', rpi.receipt_location_id,
+        'receipt_location_name', rl.receipt_location_name,
+        'receipt_location_icon', rl.receipt_location_icon,
+        'receipt_location_use_flag', rl.receipt_location_use_flag,
+        'photo_thumbnail_url', p.photo_thumbnail_url,
+        'photo_high_resolution_url', p.photo_high_resolution_url,
+        'front_flag', p.front_flag,
+        'photo_theme_color', p.photo_theme_color,
+        'color_slots', coalesce(slots.color_slots, '{}'::integer[]),
+        'color_slot_colors', coalesce(slots.color_slot_colors, '{}'::text[])
+      )
+      order by pg.ord
+    ),
+    '[]'::jsonb
+  )
+  into v_rows
+  from unnest(v_ids) with ordinality as pg(registration_product_id, ord)
+  join public.registration_product_information rpi
+    on rpi.registration_product_id = pg.registration_product_id
+    and rpi.members_id = auth.uid()
+  left join public.category_tag ct on ct.category_tag_id = rpi.category_tag_id
+  left join public.receipt_location rl on rl.receipt_location_id = rpi.receipt_location_id
+  left join public.photo p on p.photo_id = rpi.photo_id
+  left join lateral (
+    select
+      array_agg(rpct.slot order by rpct.slot) as color_slots,
+      array_agg(coalesce(colt.color_tag_color, '#adb5bd') order by rpct.slot) as color_slot_colors
+    from public.registration_product_color_tag rpct
+    left join public.color_tag colt
+      on colt.members_id = rpct.members_id and colt.slot = rpct.slot
+    where rpct.members_id = rpi.members_id
+      and rpct.registration_product_id = rpi.registration_product_id
+  ) slots on true;
+
+  if not coalesce(p_with_counts, false) then
+    return jsonb_build_object('rows', v_rows, 'total', null, 'counts', null);
+  end if;
+
+  -- 件数はその項目以外の条件をすべて当てた件数（フラグは AND のため、全条件を当てた行のうち各フラグの件数）
+  with matched as (
+    select
+      rpi.registration_product_id,
+      coalesce(rpi.category_tag_id, 0) as category_key,
+      coalesce(rpi.receipt_location_id, 0) as location_key,
+      coalesce(width_bucket(rpi.purchase_price, array[1000, 3000, 5000, 10000]), -1) as price_bucket,
+      coalesce(rpi.want_object_flag, 0) = 1 as want_object_flag,
+      coalesce(rpi.flag_with_freebie, 0) = 1 as flag_with_freebie,
+      coalesce(rpi.sales_desired_flag, 0) = 1 as sales_desired_flag,
+      coalesce(rpi.digital_product_flag, 0) = 1 as digital_product_flag,
+      coalesce(rpi.personal_product_flag, 0) = 1 as personal_product_flag,
+      (coalesce(cardinality(p_category_ids), 0) = 0
+        or coalesce(rpi.category_tag_id, 0) = any (p_category_ids)) as m_category,
+      (coalesce(cardinality(p_location_ids), 0) = 0
+        or coalesce(rpi.receipt_location_id, 0) = any (p_location_ids)) as m_location,
+      (
+        coalesce(cardinality(p_slots), 0) = 0
+        or exists (
+          select 1
+          from public.registration_product_color_tag rpct
+          where rpct.members_id = rpi.members_id
+            and rpct.registration_product_id = rpi.registration_product_id
+            and rpct.slot = any (p_slots)
+        )
+      ) as m_color,
+      (coalesce(cardinality(p_price_buckets), 0) = 0
+        or coalesce(width_bucket(rpi.purchase_price, array[1000, 3000, 5000, 10000]), -1) = any (p_price_buckets))
+        as m_price,
+      (
+        (not coalesce('want_object_flag' = any (p_flags), false) or coalesce(rpi.want_object_flag, 0) = 1)
+        and (not coalesce('flag_with_freebie' = any (p_flags), false) or coalesce(rpi.flag_with_freebie, 0) = 1)
+        and (not coalesce('sales_desired_flag' = any (p_flags), false) or coalesce(rpi.sales_desired_flag, 0) = 1)
+        and (not coalesce('digital_product_flag' = any (p_flags), false) or coalesce(rpi.digital_product_flag, 0) = 1)
+        and (not coalesce('personal_product_flag' = any (p_flags), false) or coalesce(rpi.personal_product_flag, 0) = 1)
+      ) as m_flags
+    from public.registration_product_information rpi
+    where rpi.members_id = auth.uid()
+      and (
+        cardinality(v_patterns) = 0
+        or (rpi.search_text like v_patterns[1] and rpi.search_text like all (v_patterns))
+      )
+  ),
+  hits as (
+    select * from matched
+    where m_category and m_location and m_color and m_price and m_flags
+  )
+  select
+    (select count(*) from hits),
+    jsonb_build_object(
+      'category', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select category_key::text as k, count(*) as n
+          from matched
+          where m_location and m_color and m_price and m_flags
+          group by 1
+        ) s
+      ),
+      'location', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select location_key::text as k, count(*) as n
+          from matched
+          where m_category and m_color and m_price and m_flags
+          group by 1
+        ) s
+      ),
+      'color', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select rpct.slot::text as k, count(*) as n
+          from matched m
+          join public.registration_product_color_tag rpct
+            on rpct.members_id = auth.uid()
+            and rpct.registration_product_id = m.registration_product_id
+          where m.m_category and m.m_location and m.m_price and m.m_flags
+          group by 1
+        ) s
+      ),
+      'price', (
+        select coalesce(jsonb_object_agg(k, n), '{}'::jsonb)
+        from (
+          select price_bucket::text as k, count(*) as n
+          from matched
+          where m_category and m_location and m_color and m_flags
+          group by 1
+        ) s
+      ),
+      'flags', (
+        select jsonb_build_object(
+          'want_object_flag', count(*) filter (where want_object_flag),
+          'flag_with_freebie', count(*) filter (where flag_with_freebie),
+          'sales_desired_flag', count(*) filter (where sales_desired_flag),
+          'digital_product_flag', count(*) filter (where digital_product_flag),
+          'personal_product_flag', count(*) filter (where personal_product_flag)
+        )
+        from hits
+      )
+    )
+  into v_total, v_counts;
+
+  return jsonb_build_object('rows', v_rows, 'total', v_total, 'counts', v_counts);
+end;
+$$;
+
+grant execute on function public.app_gallery_facets(
+  integer, text, timestamptz, integer, text, integer, text, integer[], integer[], integer[], integer[], text[], boolean
+) to authenticated;
@@ -0,0 +1,112 @@
+-- バーコードの正規キーを DB でも作る（services/barcode_canonical.canonical_key と同じ規則）。
+-- app_registration_product_stats の「バーコードの種類数」を、RPC が無い DB 向けの集計
+-- （photo_service._get_product_stats_fallback）と同じキーで数える。
+--   NFKC → 区切り（空白・ハイフン・長音）を除く → 大文字
+--   EAN-13 / UPC-A / ISBN-10 / GTIN-14（先頭 0）→ 13 桁、UPC-E → UPC-A に展開して 13 桁、EAN-8 → 8 桁
+--   2 桁・5 桁のアドオンは落とす。無効な値（過去の誤入力・QR など）は前後の空白を除いた元の値
+
+create or replace function public.app_gtin_check_digit(p_payload text)
+returns text
+language sql
+immutable
+parallel safe
+as $$
+  -- 右端から 3,1,3,... の重み
+  select ((10 - coalesce(sum(substr(reverse(p_payload), i, 1)::integer * case when i % 2 = 1 then 3 else 1 end), 0) % 10) % 10)::text
+  from generate_series(1, length(p_payload)) as i;
+$$;
+
+create or replace function public.app_barcode_key(p_raw text)
+returns text
+language plpgsql
+immutable
+parallel safe
+as $$
+declare
+  v_text text := regexp_replace(coalesce(p_raw, ''), '^\s+|\s+$', '', 'g');
+  v_code text;
+  v_len integer;
+  v_body text;
+  v_last text;
+  v_upca text;
+  v_isbn13 text;
+  v_sum integer;
+begin
+  if v_text = '' then
+    return '';
+  end if;
+  v_code := upper(regexp_replace(normalize(v_text, NFKC), '[\s\-‐ー]+', '', 'g'));
+  v_len := length(v_code);
+  if v_code !~ '^[0-9]+$' and v_code !~ '^[0-9]{9}X$' then
+    return v_text;
+  end if;
+
+  -- EAN-8 として無効な 8 桁は UPC-E として展開してみる
+  if v_len = 8 and public.app_gtin_check_digit(left(v_code, 7)) <> right(v_code, 1) and left(v_code, 1) in ('0', '1') then
+    v_body := substr(v_code, 2, 6);
+    v_last := substr(v_body, 6, 1);
+    if v_last in ('0', '1', '2') then
+      v_upca := left(v_code, 1) || substr(v_body, 1, 2) || v_last || '0000' || substr(v_body, 3, 3);
+    elsif v_last = '3' then
+      v_upca := left(v_code, 1) || substr(v_body, 1, 3) || '00000' || substr(v_body, 4, 2);
+    elsif v_last = '4' then
+      v_upca := left(v_code, 1) || substr(v_body, 1, 4) || '00000' || substr(v_body, 5, 1);
+    else
+      v_upca := left(v_code, 1) || substr(v_body, 1, 5) || '0000' || v_last;
+    end if;
+    v_upca := v_upca || right(v_code, 1);
+    if public.app_gtin_check_digit(left(v_upca, 11)) = right(v_upca, 1) then
+      return '0' || v_upca;
+    end if;
+  end if;
+
+  if v_len in (8, 12, 13) then
+    if public.app_gtin_check_digit(left(v_code, v_len - 1)) <> right(v_code, 1) then
+      return v_text;
+    end if;
+    return case when v_len = 12 then '0' || v_code else v_code end;
+  end if;
+
+  if v_len = 10 then
+    select sum((11 - i) * substr(v_code, i, 1)::integer) into v_sum from generate_series(1, 9) as i;
+    v_sum := v_sum + case when right(v_code, 1) = 'X' then 10 else right(v_code, 1)::integer end;
+    if v_sum % 11 <> 0 then
+      return v_text;
+    end if;
+    v_isbn13 := '978' || left(v_code, 9);
+    return v_isbn13 || public.app_gtin_check_digit(v_isbn13);
+  end if;
+
+  if v_len = 14 and public.app_gtin_check_digit(left(v_code, 13)) = right(v_code, 1) then
+    return case when left(v_code, 1) = '0' then substr(v_code, 2) else v_code end;
+  end if;
+
+  -- アドオン付き: 13+2 / 13+5 / 12+2 / 12+5
+  if v_len - 13 in (2, 5) and public.app_gtin_check_digit(left(v_code, 12)) = substr(v_code, 13, 1) then
+    return left(v_code, 13);
+  end if;
+  if v_len - 12 in (2, 5) and public.app_gtin_check_digit(left(v_code, 11)) = substr(v_code, 12, 1) then
+    return '0' || left(v_code, 12);
+  end if;
+  return v_text;
+end;
+$$;
+
+create or replace function public.app_registration_product_stats()
+returns table(total bigint, total_photos bigint, unique_barcodes bigint)
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+  select
+    count(*)::bigint as total,
+    count(*) filter (where photo_id is not null)::bigint as total_photos,
+    count(distinct nullif(public.app_barcode_key(barcode_number::text), ''))::bigint as unique_barcodes
+  from public.registration_product_information
+  where members_id = auth.uid();
+$$;
+
+grant execute on function public.app_gtin_check_digit(text) to authenticated;
+grant execute on function public.app_barcode_key(text) to authenticated;
+grant execute on function public.app_registration_product_stats() to authenticated;
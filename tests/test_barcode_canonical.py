@@ -0,0 +1,48 @@
+"""barcode_canonical（バーコードの正規化・チェックディジット検証）のユニットテスト。"""
+
+from unittest.mock import patch
+
+import pytest
+
+from services import barcode_lookup
+from services.barcode_canonical import canonical_key, canonicalize
+
+
+@pytest.mark.parametrize(
+    "raw, symbology, key, kind, addon",
+    [
+        ("4901234567894", None, "4901234567894", "EAN13", ""),
+        ("490-1234-567894", None, "4901234567894", "EAN13", ""),
+        ("４９０１２３４５６７８９４", None, "4901234567894", "EAN13", ""),
+        ("036000291452", None, "0036000291452", "UPCA", ""),
+        ("00036000291452", None, "0036000291452", "GTIN14", ""),
+        ("4-06-182610-7", None, "9784061826106", "ISBN10", ""),
+        ("9784061826106", None, "9784061826106", "ISBN13", ""),
+        ("490123456789412", None, "4901234567894", "EAN13", "12"),
+        ("04252614", "UPCE", "0042100005264", "UPCE", ""),
+        ("49012347", None, "49012347", "EAN8", ""),
+        ("https://example.com/x", "QRCODE", "https://example.com/x", "OTHER", ""),
+    ],
+)
+def test_canonical_forms(raw, symbology, key, kind, addon):
+    result = canonicalize(raw, symbology)
+    assert result.valid
+    assert (result.key, result.kind, result.addon) == (key, kind, addon)
+
+
+@pytest.mark.parametrize("raw", ["4901234567895", "406182610X", "123", "abc", ""])
+def test_invalid_input_is_rejected_with_message(raw):
+    result = canonicalize(raw)
+    assert not result.valid
+    assert result.message
+
+
+def test_upc_and_ean_share_one_key():
+    assert canonical_key("036000291452") == canonical_key("0036000291452")
+
+
+def test_invalid_manual_input_never_reaches_providers():
+    with patch.object(barcode_lookup, "get_default_chain") as chain:
+        result = barcode_lookup.lookup_product_by_barcode("4901234567895")
+    chain.assert_not_called()
+    assert result["status"] == "invalid"
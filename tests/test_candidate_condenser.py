@@ -0,0 +1,45 @@
+"""candidate_condenser（楽天候補の近似重複まとめ・トークン予算）のユニットテスト。"""
+
+from services import candidate_condenser as cc
+from services.tag_extraction import _format_product_candidates
+
+
+def _listing(name, shop, price, jan=""):
+    return {"name": name, "shopName": shop, "price": price, "jan": jan, "itemCode": f"{shop}:1"}
+
+
+def test_near_duplicate_names_are_merged_with_price_range_and_shops():
+    candidates = [
+        _listing("呪術廻戦 アクリルスタンド 五条悟 描き下ろし", "A店", 1500),
+        _listing("【新品】呪術廻戦 アクリルスタンド 五条悟 描き下ろし", "B店", 1800),
+        _listing("呪術廻戦 アクリルスタンド 五条悟 描き下ろし 送料無料", "C店", 1650),
+        _listing("ちいかわ ぬいぐるみ ハチワレ", "A店", 2200),
+    ]
+    result = cc.condense_candidates(
+        candidates, token_budget=1000, baseline_text=_format_product_candidates(candidates)
+    )
+    lines = result.text.splitlines()
+    assert result.clusters == 2
+    assert lines[0].startswith("#1 | Name: 呪術廻戦 アクリルスタンド 五条悟 描き下ろし")
+    assert "Shop: A店, B店, C店" in lines[0]
+    assert "Price: 1500-1800" in lines[0]
+    assert "Listings: 3" in lines[0]
+    assert "ハチワレ" in lines[1]
+    assert result.tokens_saved > 0
+
+
+def test_same_jan_is_one_cluster_even_with_different_names():
+    candidates = [
+        _listing("アクスタ 五条", "A店", 1500, jan="4549743000001"),
+        _listing("Acrylic stand Gojo", "B店", 1600, jan="4549743000001"),
+    ]
+    assert cc.cluster_candidates(candidates) == [[0, 1]]
+
+
+def test_token_budget_drops_trailing_clusters_but_keeps_first():
+    names = ["缶バッジ 虎杖", "ぬいぐるみ パンダ", "タペストリー 海", "マグカップ 猫", "下敷き 桜", "Tシャツ 星"]
+    candidates = [_listing(name, "店", 100 + i) for i, name in enumerate(names)]
+    result = cc.condense_candidates(candidates, token_budget=30)
+    assert len(result.text.splitlines()) >= 1
+    assert result.dropped > 0
+    assert result.tokens_after <= 30 or len(result.text.splitlines()) == 1
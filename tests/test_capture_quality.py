@@ -0,0 +1,78 @@
+"""撮影品質の判定（ブレ・露出・バーコード領域のコントラスト）のテスト。"""
+
+import base64
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+from services import capture_quality
+from services.barcode_service import decode_from_base64
+
+
+def _jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _barcode_like() -> Image.Image:
+    image = Image.new("L", (1200, 900), 200)
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(0)
+    x = 400
+    while x < 800:
+        width = int(rng.integers(2, 9))
+        draw.rectangle([x, 350, x + width, 550], fill=20)
+        x += width + int(rng.integers(2, 9))
+    return image.convert("RGB")
+
+
+def _blocks() -> Image.Image:
+    rng = np.random.default_rng(1)
+    return Image.fromarray(rng.integers(0, 256, (6, 6, 3), dtype=np.uint8)).resize(
+        (800, 800), Image.NEAREST
+    )
+
+
+@pytest.mark.parametrize(
+    "image, for_barcode, verdict, issue",
+    [
+        (_barcode_like(), True, "ok", None),
+        (_barcode_like().filter(ImageFilter.GaussianBlur(12)), True, "reject", "blur"),
+        (Image.new("RGB", (800, 800), (180, 170, 160)), True, "reject", "blur"),
+        (_blocks(), False, "ok", None),
+        (ImageEnhance.Brightness(_blocks()).enhance(0.05), False, "reject", "dark"),
+        (ImageEnhance.Brightness(_blocks()).enhance(20), False, "reject", "bright"),
+        # 滑らかな被写体の正面写真は弾かずに警告のみ
+        (_blocks().filter(ImageFilter.GaussianBlur(8)), False, "warn", "blur"),
+    ],
+)
+def test_verdicts(image, for_barcode, verdict, issue):
+    report = capture_quality.analyze_image(_jpeg(image), for_barcode=for_barcode)
+    assert report.verdict == verdict
+    assert (report.issues[0] if report.issues else None) == issue
+
+
+def test_flat_region_has_no_barcode_contrast():
+    flat = np.full((64, 64), 128.0)
+    assert capture_quality.barcode_region_contrast(flat) == 0.0
+
+
+def test_rejected_barcode_skips_decode_and_counts_saved_attempts():
+    before = capture_quality.stats()
+    dark = ImageEnhance.Brightness(_barcode_like()).enhance(0.02)
+    contents = "data:image/jpeg;base64," + base64.b64encode(_jpeg(dark)).decode()
+    with pytest.raises(ValueError, match="暗すぎます"):
+        decode_from_base64(contents)
+    after = capture_quality.stats()
+    assert after["rejected_total"] == before["rejected_total"] + 1
+    assert (
+        after["decode_attempts_saved_total"]
+        == before["decode_attempts_saved_total"] + capture_quality.DECODE_ATTEMPTS_PER_CAPTURE
+    )
+
+
+def test_unreadable_bytes_are_not_judged():
+    assert capture_quality.analyze_image(b"not an image") is None
@@ -0,0 +1,109 @@
+"""circuit_breaker と、ブレーカー open 時のローカルフォールバックのユニットテスト。"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from services import barcode_lookup
+from services.circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+def _breaker(**kwargs):
+    params = dict(window=4, min_calls=4, open_sec=60.0, slow_call_sec=1.0)
+    params.update(kwargs)
+    return CircuitBreaker("test", **params)
+
+
+def test_opens_on_failure_rate_and_rejects_fast():
+    cb = _breaker()
+    for ok in (True, False, True, False):
+        cb.record(ok, 0.01)
+    assert cb.state == STATE_OPEN
+    assert cb.allow_request() is False
+    with pytest.raises(CircuitOpenError):
+        with cb.guard():
+            pass
+    assert cb.snapshot()["rejected_total"] == 2
+
+
+def test_opens_on_slow_calls_even_if_successful():
+    cb = _breaker(slow_rate=0.75)
+    for elapsed in (2.0, 2.0, 2.0, 0.1):
+        cb.record(True, elapsed)
+    assert cb.state == STATE_OPEN
+
+
+def test_half_open_allows_single_probe_and_closes_on_success():
+    cb = _breaker(open_sec=0.0)
+    for _ in range(4):
+        cb.record(False, 0.01)
+    assert cb.state == STATE_HALF_OPEN
+    assert cb.allow_request() is True
+    assert cb.allow_request() is False  # プローブは1本だけ
+    cb.record(True, 0.01)
+    assert cb.state == STATE_CLOSED
+
+
+def test_half_open_probe_failure_reopens():
+    cb = _breaker(open_sec=0.0)
+    for _ in range(4):
+        cb.record(False, 0.01)
+    assert cb.allow_request() is True
+    cb.open_sec = 60.0
+    cb.record(False, 0.01)
+    assert cb.state == STATE_OPEN
+
+
+def test_rakuten_returns_stale_cache_when_breaker_open():
+    """楽天 API が落ちている間は、期限切れでも前回の検索結果を返す。"""
+    params = {"keyword": "4900000000009", "source": "barcode", "isbnjan": "4900000000009"}
+    key = barcode_lookup._cache_key(params)
+    barcode_lookup._cache_put(
+        key, {"status": "success", "items": [{"name": "缶バッジ"}], "source": "barcode"}
+    )
+    with barcode_lookup._cache_lock:
+        stored_at, result = barcode_lookup._cache[key]
+        barcode_lookup._cache[key] = (stored_at - barcode_lookup.CACHE_TTL_SEC - 1, result)
+
+    with patch.object(barcode_lookup, "APPLICATION_ID", "app"), patch.object(
+        barcode_lookup.RAKUTEN_BREAKER, "allow_request", return_value=False
+    ), patch("services.barcode_lookup.requests.get") as mock_get:
+        result = barcode_lookup.lookup_product_by_barcode("4900000000009")
+
+    mock_get.assert_not_called()
+    assert result["status"] == "success"
+    assert result["cached"] is True
+    assert result["items"][0]["name"] == "缶バッジ"
+
+
+def test_rakuten_network_error_without_cache_is_error():
+    with patch.object(barcode_lookup, "APPLICATION_ID", "app"), patch(
+        "services.barcode_lookup.requests.get",
+        side_effect=requests.ConnectionError("down"),
+    ):
+        result = barcode_lookup.lookup_product_by_barcode("4900000000993")
+    assert result["status"] == "error"
+    assert result["items"] == []
+
+
+def test_extract_tags_uses_local_fallback_when_io_open():
+    from services import tag_extraction
+
+    breaker = MagicMock()
+    breaker.state = STATE_OPEN
+    with patch.object(tag_extraction, "IO_API_KEY", "key"), patch.object(
+        tag_extraction, "IO_BREAKER", breaker
+    ), patch.object(tag_extraction, "post_chat_completion") as mock_post:
+        result = tag_extraction.extract_tags(
+            [{"name": "缶バッジ", "series": "テスト作品", "brand": ""}], ""
+        )
+    mock_post.assert_not_called()
+    assert result["status"] == "success"
+    assert "テスト作品" in result["tags"]
@@ -0,0 +1,72 @@
+"""主要色抽出（k-means）とカラータグ候補のテスト。"""
+
+import io
+from unittest.mock import MagicMock
+
+import numpy as np
+from PIL import Image
+
+from services import photo_colors
+from services.color_palette import extract_palette, hex_to_lab, rgb_to_lab, suggest_slots
+from services.tag_service import DEFAULT_COLOR_TAGS
+
+
+def _png(pixels: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.astype(np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _two_tone(main=(220, 30, 40), accent=(20, 60, 230), accent_rows=30) -> bytes:
+    pixels = np.zeros((100, 100, 3))
+    pixels[:, :] = main
+    pixels[:accent_rows, :] = accent
+    return _png(pixels)
+
+
+def test_rgb_to_lab_reference_values():
+    assert np.allclose(rgb_to_lab(np.array([255, 255, 255])), [100, 0, 0], atol=0.05)
+    assert np.allclose(rgb_to_lab(np.array([0, 0, 0])), [0, 0, 0], atol=0.05)
+    assert np.allclose(rgb_to_lab(np.array([255, 0, 0])), [53.24, 80.09, 67.20], atol=0.1)
+
+
+def test_palette_orders_by_share_and_is_deterministic():
+    data = _two_tone()
+    palette = extract_palette(data)
+    assert palette[0].hex == "#dc1e28"
+    assert abs(palette[0].share - 0.7) < 0.05
+    assert palette[1].hex == "#143ce6"
+    assert extract_palette(data) == palette
+
+
+def test_invalid_image_returns_empty_palette():
+    assert extract_palette(b"broken") == []
+
+
+def test_suggest_slots_picks_nearest_user_colors():
+    palette = extract_palette(_two_tone())
+    # 既定の 7 色: 1=赤, 2=青
+    assert suggest_slots(palette, DEFAULT_COLOR_TAGS) == [1, 2]
+    # 副色が少なければ主要色だけ
+    small_accent = extract_palette(_two_tone(accent_rows=5))
+    assert suggest_slots(small_accent, DEFAULT_COLOR_TAGS) == [1]
+
+
+def test_theme_color_uses_cached_base_colors():
+    photo_colors.reset_cache()
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.execute.return_value = MagicMock(
+        data=[
+            {"color_group_id": 1, "color_preference": "#dc3545"},
+            {"color_group_id": 10, "color_preference": "#212529"},
+            {"color_group_id": 99, "color_preference": None},
+        ]
+    )
+    palette_json, theme = photo_colors.analyze_photo_colors(supabase, _two_tone())
+    assert theme == 1
+    assert palette_json[0] == {"hex": "#dc1e28", "share": palette_json[0]["share"]}
+    black = _png(np.full((20, 20, 3), 10))
+    assert photo_colors.analyze_photo_colors(supabase, black)[1] == 10
+    assert supabase.table.call_count == 1
+    assert hex_to_lab("not-a-color") is None
+    photo_colors.reset_cache()
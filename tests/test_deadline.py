@@ -0,0 +1,88 @@
+"""deadline（締め切り・共有リトライ予算）のユニットテスト。"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from services.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    RetryBudget,
+    call_with_retry,
+)
+
+
+def _always(_exc):
+    return True
+
+
+def test_timeout_is_capped_by_remaining_time():
+    d = Deadline(5.0)
+    assert d.timeout(30) <= 5.0
+    assert d.timeout(2) == 2
+
+
+def test_expired_deadline_refuses_new_calls():
+    d = Deadline(0.0)
+    assert d.expired()
+    with pytest.raises(DeadlineExceeded):
+        d.timeout(30)
+
+
+@patch("services.deadline.time.sleep")
+def test_retry_budget_is_shared_across_calls(_sleep):
+    """同じ deadline を使う呼び出し同士でリトライ回数を分け合う。"""
+    d = Deadline(60.0, RetryBudget(2))
+    fn = MagicMock(side_effect=requests.ConnectionError("down"))
+    with pytest.raises(requests.ConnectionError):
+        call_with_retry(fn, d, _always, wait_sec=0.0, max_attempts=3)
+    assert fn.call_count == 3  # 1 回目 + リトライ 2 回
+    fn.reset_mock()
+    with pytest.raises(requests.ConnectionError):
+        call_with_retry(fn, d, _always, wait_sec=0.0, max_attempts=3)
+    assert fn.call_count == 1  # 予算切れでリトライしない
+
+
+def test_non_retryable_error_is_raised_immediately():
+    d = Deadline(60.0)
+    fn = MagicMock(side_effect=ValueError("bad"))
+    with pytest.raises(ValueError):
+        call_with_retry(fn, d, lambda exc: False)
+    assert fn.call_count == 1
+    assert d.retries.remaining == 3
+
+
+def test_no_retry_when_wait_would_pass_deadline():
+    d = Deadline(1.5)
+    fn = MagicMock(side_effect=requests.Timeout("slow"))
+    with pytest.raises(requests.Timeout):
+        call_with_retry(fn, d, _always, wait_sec=2.0)
+    assert fn.call_count == 1
+
+
+def test_is_transient_error_skips_client_errors():
+    from services.io_intelligence import is_transient_error
+
+    def _http_error(status):
+        resp = MagicMock()
+        resp.status_code = status
+        return requests.HTTPError(response=resp)
+
+    assert is_transient_error(_http_error(503))
+    assert is_transient_error(_http_error(429))
+    assert not is_transient_error(_http_error(400))
+    assert is_transient_error(requests.ConnectionError())
+
+
+def test_rakuten_lookup_skips_call_after_deadline():
+    from services import barcode_lookup
+
+    with patch.object(barcode_lookup, "APPLICATION_ID", "app"), patch(
+        "services.barcode_lookup.requests.get"
+    ) as mock_get:
+        result = barcode_lookup.lookup_product_by_barcode(
+            "4900000000887", deadline=Deadline(0.0)
+        )
+    mock_get.assert_not_called()
+    assert result["status"] == "error"
@@ -0,0 +1,66 @@
+"""description_extractor（Aho-Corasick による説明文抽出）のユニットテスト。"""
+
+from unittest.mock import MagicMock
+
+from services import description_extractor as de
+from services.text_matcher import AhoCorasick
+
+
+def test_automaton_reports_overlapping_matches_case_insensitively():
+    ac = AhoCorasick([("キーホルダー", "k"), ("ラバーキーホルダー", "rk"), ("pvc", "p")])
+    hits = [(s, e, p) for s, e, p in ac.iter_matches("ラバーキーホルダー PVC製")]
+    assert (0, 9, "rk") in hits
+    assert (3, 9, "k") in hits
+    assert (10, 13, "p") in hits
+
+
+def test_structured_data_from_labels_and_vocabulary():
+    text = "キャラクター: 星野アイ\n素材：アクリル\nピンク色のアクリルスタンド。描き下ろし、限定版。"
+    data = de.extract_structured_data(text)
+    assert data["character_name"] == "星野アイ"
+    assert data["materials"] == ["アクリル"]
+    assert data["product_shape"] == "アクリルスタンド"
+    assert data["colors"] == ["ピンク"]
+    assert data["features"] == ["描き下ろし", "限定"]
+    assert data["product_type_flags"] == ["commercial"]
+
+
+def test_suffix_patterns_and_flags():
+    data = de.extract_structured_data("ミクちゃんのイラストが入った同人のデジタルデータです。")
+    assert data["character_name"] == "ミク"
+    assert data["product_type_flags"] == ["doujin", "digital"]
+
+
+def test_user_dictionary_fills_series_and_character():
+    extractor = de.DescriptionExtractor(
+        {"works_series_name": ["推しの子", "A"], "character_name": ["有馬かな"]}
+    )
+    data = extractor.extract_structured_data("推しの子の缶バッジ。有馬かなが描かれている。")
+    assert data["works_series_name"] == "推しの子"
+    assert data["character_name"] == "有馬かな"
+    # 1 文字の語は誤一致が多いので辞書に入れない
+    assert extractor.user_term_count == 2
+
+
+def test_semantic_tags_pick_one_per_category_first():
+    tags = de.semantic_tags("白いシマエナガのラバーキーホルダー。シリコン製で「ふわふわ」と印字。")
+    assert tags == ["ラバーキーホルダー", "シマエナガ", "白", "ラバー", "ふわふわ"]
+    assert de.semantic_tags("") == []
+
+
+def test_extractor_for_user_caches_and_invalidates():
+    supabase = MagicMock()
+    chain = supabase.table.return_value.select.return_value.eq.return_value.limit.return_value
+    chain.execute.return_value = MagicMock(
+        data=[{"works_series_name": "推しの子", "character_name": "星野アイ"}]
+    )
+    first = de.extractor_for_user("member-x", supabase)
+    assert de.extractor_for_user("member-x", supabase) is first
+    assert supabase.table.call_count == 1
+    de.invalidate_user_terms("member-x")
+    de.extractor_for_user("member-x", supabase)
+    assert supabase.table.call_count == 2
+
+
+def test_extractor_for_user_falls_back_without_client():
+    assert de.extractor_for_user(None, None) is de.default_extractor()
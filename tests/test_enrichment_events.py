@@ -0,0 +1,115 @@
+"""enrichment_events / enrichment_jobs のユニットテスト（外部 API はモック）。"""
+
+from unittest.mock import patch
+
+from components.state_utils import empty_registration_state
+from services import enrichment_events as events
+from services import enrichment_jobs
+
+
+def test_iter_events_replays_after_last_event_id():
+    """再接続時は Last-Event-ID より後だけを返し、done で終わる。"""
+    events.open_channel("d1", "u1")
+    events.publish("d1", events.EVENT_DESCRIPTION, {"front_photo": {"x": 1}})
+    events.publish("d1", events.EVENT_TAGS, {"tags": {"status": "ready"}})
+    events.publish("d1", events.EVENT_DONE, {})
+
+    all_items = list(events.iter_events("d1", heartbeat_sec=0.01))
+    assert [e[1] for e in all_items] == ["description", "tags", "done"]
+
+    resumed = list(events.iter_events("d1", last_seq=1, heartbeat_sec=0.01))
+    assert [e[0] for e in resumed] == [2, 3]
+
+
+def test_publish_after_done_is_ignored():
+    events.open_channel("d2", "u1")
+    events.publish("d2", events.EVENT_DONE, {})
+    events.publish("d2", events.EVENT_TAGS, {"tags": {}})
+    items = list(events.iter_events("d2", heartbeat_sec=0.01))
+    assert [e[1] for e in items] == ["done"]
+
+
+def test_iter_events_yields_keepalive_then_stops_at_max_duration():
+    events.open_channel("d3", "u1")
+    items = list(
+        events.iter_events("d3", heartbeat_sec=0.01, max_duration_sec=0.05)
+    )
+    assert items and all(item is None for item in items)
+
+
+def test_channel_owner_and_unknown_draft():
+    events.open_channel("d4", "owner-1")
+    assert events.channel_owner("d4") == (True, "owner-1")
+    assert events.channel_owner("missing") == (False, None)
+    assert list(events.iter_events("missing")) == []
+
+
+def test_format_sse_keeps_japanese_as_is():
+    msg = events.format_sse(3, "tags", {"tags": {"message": "完了"}})
+    assert msg.startswith("id: 3\nevent: tags\n")
+    assert "完了" in msg and msg.endswith("\n\n")
+
+
+@patch("services.tag_service._update_tags")
+@patch("services.io_intelligence.describe_image")
+def test_run_publishes_description_tags_and_done(mock_describe, mock_update):
+    """ジョブは説明→タグ→done の順に、セクション単位の差分を publish する。"""
+    mock_describe.return_value = {
+        "status": "success",
+        "text": "缶バッジ",
+        "model_used": "m",
+        "structured_data": {},
+    }
+
+    def _fake_update(state, on_partial=None, deadline=None):
+        on_partial(["缶"])
+        state["tags"] = {"status": "ready", "tags": ["缶バッジ"], "message": "ok"}
+
+    mock_update.side_effect = _fake_update
+
+    state = empty_registration_state()
+    state["front_photo"]["status"] = "captured"
+    state["front_photo"]["description_status"] = "pending"
+    events.open_channel("d5", "u1")
+    enrichment_jobs._run("d5", state)
+
+    items = list(events.iter_events("d5", heartbeat_sec=0.01))
+    assert [e[1] for e in items] == ["description", "partial", "tags", "done"]
+    assert items[0][2]["front_photo"]["description"] == "缶バッジ"
+    assert items[1][2]["tags"]["status"] == "loading"
+    assert items[2][2]["tags"]["tags"] == ["缶バッジ"]
+    # 画像本体（content/vision_raw）は差分に載せない
+    assert "content" not in items[0][2]["front_photo"]
+
+
+@patch("services.tag_service._update_tags", side_effect=RuntimeError("boom"))
+def test_run_publishes_error_patch_on_failure(_mock_update):
+    state = empty_registration_state()
+    events.open_channel("d6", "u1")
+    enrichment_jobs._run("d6", state)
+    items = list(events.iter_events("d6", heartbeat_sec=0.01))
+    assert [e[1] for e in items] == ["error", "done"]
+    assert items[0][2]["tags"]["status"] == "error"
+
+
+@patch("services.tag_service._update_tags")
+@patch("services.io_intelligence.describe_image")
+def test_run_skips_only_description_for_rejected_photo(mock_describe, mock_update):
+    """撮影品質で説明を見送った写真でも、楽天照合の結果からタグは生成する。"""
+
+    def _fake_update(state, on_partial=None, deadline=None):
+        state["tags"] = {"status": "ready", "tags": ["アクスタ"], "message": "ok"}
+
+    mock_update.side_effect = _fake_update
+
+    state = empty_registration_state()
+    state["front_photo"]["status"] = "captured"
+    state["front_photo"]["description_status"] = "skipped"
+    state["lookup"] = {"status": "success", "items": [{"title": "アクスタ"}]}
+    events.open_channel("d7", "u1")
+    enrichment_jobs._run("d7", state)
+
+    mock_describe.assert_not_called()
+    mock_update.assert_called_once()
+    items = list(events.iter_events("d7", heartbeat_sec=0.01))
+    assert [e[1] for e in items] == ["tags", "done"]
@@ -0,0 +1,84 @@
+"""ギャラリー一覧のサーバー側キャッシュ（版・id・無効化）のテスト。"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services import gallery_cache, tag_service
+
+
+@pytest.fixture(autouse=True)
+def _clear():
+    gallery_cache.clear()
+    yield
+    gallery_cache.clear()
+
+
+def _rows(*ids):
+    return [{"registration_product_id": pid, "product_name": f"商品{pid}"} for pid in ids]
+
+
+def test_reset_and_extend_keep_rows_server_side():
+    version, ids = gallery_cache.reset("u1", _rows(3, 2))
+    added = gallery_cache.extend("u1", version, _rows(1))
+
+    assert ids == [3, 2]
+    assert added == [1]
+    found, missing = gallery_cache.get_rows("u1", version, ["3", 1, 99])
+    assert sorted(found) == [1, 3]
+    assert found[3]["product_name"] == "商品3"
+    assert missing == [99]
+
+
+def test_invalidate_makes_store_version_stale():
+    version, _ = gallery_cache.reset("u1", _rows(1))
+    assert gallery_cache.is_current("u1", version)
+
+    gallery_cache.invalidate("u1")
+
+    assert not gallery_cache.is_current("u1", version)
+    assert gallery_cache.extend("u1", version, _rows(2)) is None
+    assert gallery_cache.get_rows("u1", version, [1]) == ({}, [1])
+    # 無効化後に id で読み直した行は、古い版のキャッシュとしては戻さない
+    gallery_cache.fill("u1", version, _rows(1))
+    assert not gallery_cache.is_current("u1", version)
+
+
+def test_fill_restores_rows_for_unknown_user_entry():
+    # 別プロセスで作られた版（このプロセスには未登録）
+    gallery_cache.fill("u1", 12345, _rows(5))
+
+    found, missing = gallery_cache.get_rows("u1", 12345, [5])
+    assert list(found) == [5]
+    assert missing == []
+
+
+def test_users_are_isolated():
+    version, _ = gallery_cache.reset("u1", _rows(1))
+
+    assert gallery_cache.get_rows("u2", version, [1]) == ({}, [1])
+    gallery_cache.invalidate("u2")
+    assert gallery_cache.is_current("u1", version)
+
+
+_COLOR_ENTRIES = [
+    {"slot": slot, "color_tag_name": f"色{slot}", "color_tag_color": "#112233"} for slot in range(1, 8)
+]
+
+
+@pytest.mark.parametrize(
+    "save",
+    [
+        lambda: tag_service.save_color_tags(_COLOR_ENTRIES),
+        lambda: tag_service.update_color_tag(3, "赤", "#ff0000"),
+    ],
+)
+def test_color_tag_saves_invalidate_gallery(save):
+    # 一覧のスウォッチ色はキャッシュ行に入っているため、カラータグの保存で版を変える
+    version, _ = gallery_cache.reset("u1", _rows(1))
+    with patch.object(tag_service, "get_supabase_client", return_value=MagicMock()), patch.object(
+        tag_service, "_current_members_id", return_value="u1"
+    ):
+        assert save() is True
+
+    assert not gallery_cache.is_current("u1", version)
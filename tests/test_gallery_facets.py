@@ -0,0 +1,205 @@
+"""ギャラリーの絞り込み（ファセット）と並び替えカーソルのテスト。"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask, g
+
+from services import gallery_facets, page_cursor, photo_service
+
+
+def test_normalize_drops_invalid_values():
+    facets = gallery_facets.normalize(
+        {
+            "category": ["3", 3, True, -1, "x"],
+            "location": [0],
+            "color": [9, 2],
+            "price": [7, -1, 0],
+            "flags": ["want_object_flag", "members_id"],
+            "sort": "drop table",
+        }
+    )
+
+    assert facets == {
+        "category": [3],
+        "location": [0],
+        "color": [2],
+        "price": [-1, 0],
+        "flags": ["want_object_flag"],
+        "sort": "date",
+    }
+    assert gallery_facets.has_filters(facets)
+    assert gallery_facets.is_default({"sort": "date"})
+    assert not gallery_facets.is_default({"sort": "name"})
+
+
+def test_rpc_params_send_null_for_empty_conditions():
+    params = gallery_facets.rpc_params({"location": [4], "sort": "price_asc"})
+
+    assert params == {
+        "p_sort": "price_asc",
+        "p_category_ids": None,
+        "p_location_ids": [4],
+        "p_slots": None,
+        "p_price_buckets": None,
+        "p_flags": None,
+    }
+
+
+def test_count_label_without_counts_is_plain_name():
+    counts = gallery_facets.parse_counts({"category": {"3": 5, "0": "x"}})
+
+    assert counts["category"] == {"3": 5}
+    assert counts["flags"] == {}
+    assert gallery_facets.count_label("缶バッジ", counts, "category", 3) == "缶バッジ（5）"
+    assert gallery_facets.count_label("未設定", counts, "category", 0) == "未設定（0）"
+    assert gallery_facets.count_label("缶バッジ", None, "category", 3) == "缶バッジ"
+
+
+@pytest.mark.parametrize(
+    "sort, row, value",
+    [
+        ("date", {"creation_date": "2026-10-19T12:00:00+00:00"}, "2026-10-19T12:00:00+00:00"),
+        ("price_desc", {"purchase_price": None}, -1),
+        ("price_asc", {"purchase_price": None}, 2147483647),
+        ("price_asc", {"purchase_price": 1200}, 1200),
+        ("name", {"product_name": None}, ""),
+    ],
+)
+def test_sorted_cursor_roundtrip(sort, row, value):
+    key = page_cursor.sorted_key_of({"registration_product_id": 5, **row}, sort)
+
+    assert key == page_cursor.SortedKey(sort, value, 5)
+    assert page_cursor.decode_sorted(page_cursor.encode_sorted(key), sort) == key
+
+
+def test_sorted_cursor_from_other_sort_starts_from_top():
+    token = page_cursor.encode_sorted(page_cursor.SortedKey("name", "缶バッジ", 5))
+
+    assert page_cursor.decode_sorted(token, "price_desc") is None
+    assert page_cursor.decode_sorted(token, "name").value == "缶バッジ"
+
+
+def test_sorted_rpc_params_fill_only_matching_type():
+    params = page_cursor.sorted_rpc_params(page_cursor.SortedKey("price_desc", 800, 5))
+
+    assert params == {"p_after_date": None, "p_after_price": 800, "p_after_name": None, "p_after_id": 5}
+
+
+def _rpc_row(pid, price):
+    return {
+        "registration_product_id": pid,
+        "product_name": f"商品{pid}",
+        "creation_date": "2026-10-19T12:00:00+00:00",
+        "purchase_price": price,
+        "photo_id": None,
+        "category_tag_id": None,
+        "receipt_location_id": None,
+        "color_slots": [],
+        "color_slot_colors": [],
+    }
+
+
+def test_facet_page_returns_rows_counts_and_sorted_cursor(monkeypatch):
+    monkeypatch.setattr(photo_service, "_facet_rpc_disabled_until", 0.0)
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute.return_value = MagicMock(
+        data={
+            "rows": [_rpc_row(9, 3000), _rpc_row(8, None), _rpc_row(7, None)],
+            "total": 3,
+            "counts": {"price": {"2": 1, "-1": 2}},
+        }
+    )
+    app = Flask(__name__)
+    with app.test_request_context():
+        g.user_id = "u1"
+        page = photo_service.get_gallery_facet_page(
+            supabase, limit=2, facets={"price": [2, -1], "sort": "price_desc"}
+        )
+
+    name, params = supabase.rpc.call_args.args
+    assert name == "app_gallery_facets"
+    assert params["p_limit"] == 3
+    assert params["p_sort"] == "price_desc"
+    assert params["p_price_buckets"] == [-1, 2]
+    assert params["p_after_id"] is None and params["p_with_counts"] is True
+    assert [r["registration_product_id"] for r in page.rows] == [9, 8]
+    assert page.total == 3
+    assert page.counts["price"] == {"2": 1, "-1": 2}
+    assert page_cursor.decode_sorted(page.next_cursor, "price_desc") == page_cursor.SortedKey("price_desc", -1, 8)
+
+
+def test_facet_page_falls_back_without_counts(monkeypatch):
+    monkeypatch.setattr(photo_service, "_facet_rpc_disabled_until", 0.0)
+    fallback = photo_service.ProductPage([{"registration_product_id": 1}], None)
+    monkeypatch.setattr(photo_service, "get_gallery_page", lambda *a, **k: fallback)
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute.side_effect = RuntimeError("PGRST202")
+    app = Flask(__name__)
+    with app.test_request_context():
+        g.user_id = "u1"
+        page = photo_service.get_gallery_facet_page(supabase, limit=3, facets={"category": [1]})
+        photo_service.get_gallery_facet_page(supabase, limit=3)
+
+    assert page.rows == fallback.rows
+    assert page.counts is None and page.total is None
+    assert supabase.rpc.call_count == 1
+
+
+def test_default_view_reads_rows_from_gallery_page(monkeypatch):
+    monkeypatch.setattr(photo_service, "_facet_rpc_disabled_until", 0.0)
+    page_calls = []
+    token = page_cursor.encode(page_cursor.PageKey("2026-10-19T12:00:00+00:00", 1))
+    fallback = photo_service.ProductPage([{"registration_product_id": 1}], token)
+
+    def _page(*args, **kwargs):
+        page_calls.append(kwargs)
+        return fallback
+
+    monkeypatch.setattr(photo_service, "get_gallery_page", _page)
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute.return_value = MagicMock(
+        data={"rows": [], "total": 1, "counts": {"category": {"0": 1}}}
+    )
+    app = Flask(__name__)
+    with app.test_request_context():
+        g.user_id = "u1"
+        first = photo_service.get_gallery_facet_page(supabase, limit=2, facets={"sort": "date"})
+        more = photo_service.get_gallery_facet_page(supabase, limit=2, cursor=token, with_counts=False)
+
+    # 件数だけを RPC で数え、行は app_gallery_page のキーセットで読む（続きのページは RPC なし）
+    name, params = supabase.rpc.call_args.args
+    assert name == "app_gallery_facets"
+    assert params["p_limit"] == 0 and params["p_with_counts"] is True
+    assert supabase.rpc.call_count == 1
+    assert [c["cursor"] for c in page_calls] == [None, token]
+    assert first.rows == fallback.rows and first.next_cursor == token
+    assert first.total == 1 and first.counts["category"] == {"0": 1}
+    assert more.counts is None and more.total is None
+
+
+@pytest.mark.parametrize(
+    "rpc_up, token",
+    [
+        # RPC 停止中に登録日順の一覧で作ったカーソルを、RPC 復帰後の絞り込みで使う
+        (True, page_cursor.encode(page_cursor.PageKey("2026-10-19T12:00:00+00:00", 5))),
+        # RPC で作った並び替えのカーソルを、RPC 停止中（登録日順の一覧に切り替え）で使う
+        (False, page_cursor.encode_sorted(page_cursor.SortedKey("price_desc", 800, 5))),
+    ],
+)
+def test_cursor_from_other_path_asks_to_restart(monkeypatch, rpc_up, token):
+    monkeypatch.setattr(photo_service, "_facet_rpc_disabled_until", 0.0 if rpc_up else float("inf"))
+    page_calls = []
+    monkeypatch.setattr(photo_service, "get_gallery_page", lambda *a, **k: page_calls.append(k))
+    supabase = MagicMock()
+    app = Flask(__name__)
+    with app.test_request_context():
+        g.user_id = "u1"
+        page = photo_service.get_gallery_facet_page(
+            supabase, limit=2, cursor=token, facets={"price": [2], "sort": "price_desc"}, with_counts=False
+        )
+
+    # 先頭ページを読み直して続きに足す（重複する）代わりに、呼び出し側に取り直させる
+    assert page is None
+    supabase.rpc.assert_not_called()
+    assert page_calls == []
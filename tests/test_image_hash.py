@@ -0,0 +1,90 @@
+"""知覚ハッシュ・BK-tree・類似写真検索のテスト。"""
+
+import io
+import random
+from unittest.mock import MagicMock
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from services import similar_photos
+from services.bk_tree import BKTree
+from services.image_hash import compute_hashes, from_signed64, hamming, to_signed64
+
+
+def _jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _pattern(seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, size=(6, 6, 3), dtype=np.uint8)
+    return Image.fromarray(blocks).resize((480, 480), Image.NEAREST)
+
+
+def test_near_duplicate_is_closer_than_different_photo():
+    original = _pattern(1)
+    retake = ImageEnhance.Brightness(original.resize((400, 400))).enhance(1.1)
+    base = compute_hashes(_jpeg(original))
+    near = compute_hashes(_jpeg(retake))
+    other = compute_hashes(_jpeg(_pattern(2)))
+    assert hamming(base.phash, near.phash) <= 6
+    assert hamming(base.phash, other.phash) > 16
+
+
+def test_invalid_bytes_return_none():
+    assert compute_hashes(b"not an image") is None
+    assert compute_hashes(b"") is None
+
+
+def test_signed64_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed64(value)
+        assert -(1 << 63) <= signed < (1 << 63)
+        assert from_signed64(signed) == value
+
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(7)
+    keys = [rng.getrandbits(64) for _ in range(300)]
+    tree = BKTree((key, index) for index, key in enumerate(keys))
+    query = keys[10] ^ 0b1011
+    expected = sorted(
+        (hamming(query, key), index) for index, key in enumerate(keys) if hamming(query, key) <= 12
+    )
+    assert sorted(tree.search(query, 12)) == expected
+    assert tree.size == 300
+
+
+def test_find_similar_loads_once_and_tracks_inserts():
+    original = compute_hashes(_jpeg(_pattern(1)))
+    other = compute_hashes(_jpeg(_pattern(2)))
+    rows = [
+        {
+            "registration_product_id": 1,
+            "product_name": "アクスタ",
+            "photo": {
+                "photo_phash": to_signed64(original.phash),
+                "photo_dhash": to_signed64(original.dhash),
+            },
+        },
+        {"registration_product_id": 2, "product_name": "写真なし", "photo": None},
+    ]
+    supabase = MagicMock()
+    chain = supabase.table.return_value.select.return_value.eq.return_value
+    chain.not_.is_.return_value.range.return_value.execute.return_value = MagicMock(data=rows)
+    similar_photos.record_delete_all("user-a")
+    similar_photos._indexes.pop("user-a", None)
+
+    assert [hit["registration_product_id"] for hit in similar_photos.find_similar(supabase, "user-a", original)] == [1]
+    assert similar_photos.find_similar(supabase, "user-a", other) == []
+
+    similar_photos.record_insert("user-a", 3, "缶バッジ", other)
+    hits = similar_photos.find_similar(supabase, "user-a", other)
+    assert hits == [{"registration_product_id": 3, "product_name": "缶バッジ", "distance": 0}]
+    assert supabase.table.call_count == 1
+
+    similar_photos.record_delete_all("user-a")
+    assert similar_photos.find_similar(supabase, "user-a", original) == []
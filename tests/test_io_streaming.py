@@ -0,0 +1,57 @@
+"""IO Intelligence のストリーミング応答パーサのユニットテスト（HTTP はモック）。"""
+
+from unittest.mock import MagicMock
+
+from services.io_intelligence import iter_stream_deltas, read_completion_text
+from services.tag_extraction import _parse_partial_tags
+
+
+def _stream_response(lines):
+    resp = MagicMock()
+    resp.headers = {"Content-Type": "text/event-stream; charset=utf-8"}
+    resp.iter_lines.return_value = iter(lines)
+    return resp
+
+
+def test_iter_stream_deltas_skips_noise_and_stops_at_done():
+    resp = _stream_response(
+        [
+            "",
+            ": keepalive",
+            'data: {"choices":[{"delta":{"role":"assistant"}}]}',
+            'data: {"choices":[{"delta":{"content":"青い"}}]}',
+            "data: not-json",
+            'data: {"choices":[{"delta":{"content":"缶バッジ"}}]}',
+            "data: [DONE]",
+            'data: {"choices":[{"delta":{"content":"無視"}}]}',
+        ]
+    )
+    assert list(iter_stream_deltas(resp)) == ["青い", "缶バッジ"]
+
+
+def test_read_completion_text_reports_accumulated_partials():
+    resp = _stream_response(
+        [
+            'data: {"choices":[{"delta":{"content":"アクリル"}}]}',
+            'data: {"choices":[{"delta":{"content":"スタンド"}}]}',
+            "data: [DONE]",
+        ]
+    )
+    seen = []
+    text = read_completion_text(resp, seen.append, min_interval=0.0)
+    assert text == "アクリルスタンド"
+    assert seen == ["アクリル", "アクリルスタンド"]
+
+
+def test_read_completion_text_accepts_non_stream_json():
+    """プロバイダが stream を無視して通常の JSON を返しても読める。"""
+    resp = MagicMock()
+    resp.headers = {"Content-Type": "application/json"}
+    resp.json.return_value = {"choices": [{"message": {"content": " 説明文 "}}]}
+    assert read_completion_text(resp, lambda _t: None) == "説明文"
+
+
+def test_parse_partial_tags_returns_only_closed_strings():
+    assert _parse_partial_tags('```json\n["缶バッジ", "ピン') == ["缶バッジ"]
+    assert _parse_partial_tags('["缶バッジ", "ピンク", "画像"]') == ["缶バッジ", "ピンク"]
+    assert _parse_partial_tags("タグは") == []
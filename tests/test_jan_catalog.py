@@ -0,0 +1,70 @@
+"""jan_catalog（ローカル JAN カタログ）と CatalogProvider のユニットテスト。"""
+
+from unittest.mock import patch
+
+from services import barcode_lookup as bl
+from services import jan_catalog
+from services.jan_catalog import JanCatalog
+
+JAN = "4549743000008"
+
+
+def _use_memory_catalog():
+    catalog = JanCatalog(":memory:")
+    jan_catalog.set_catalog(catalog)
+    return catalog
+
+
+def test_registration_shares_only_public_fields():
+    catalog = _use_memory_catalog()
+    try:
+        record = {
+            "members_id": "user-1",
+            "product_name": "呪術廻戦 アクリルスタンド 五条悟",
+            "works_series_name": "呪術廻戦",
+            "character_name": "五条悟",
+            "memo": "誕生日にもらった",
+            "purchase_price": 1500,
+            "purchase_location": "池袋",
+        }
+        assert jan_catalog.record_registration(JAN, record)
+        row = catalog.lookup(JAN)[0]
+        assert row["name"] == "呪術廻戦 アクリルスタンド 五条悟"
+        assert row["character"] == "五条悟"
+        assert row["price"] is None
+        assert "誕生日" not in str(row) and "池袋" not in str(row) and "user-1" not in str(row)
+        assert not jan_catalog.record_registration(JAN, dict(record, personal_product_flag=1, product_name="自作"))
+        assert catalog.search("アクリルスタンド")[0]["jan"] == JAN
+        assert catalog.search("五条")[0]["jan"] == JAN
+    finally:
+        jan_catalog.set_catalog(None)
+
+
+def test_catalog_hit_skips_external_providers():
+    catalog = _use_memory_catalog()
+    try:
+        catalog.add(JAN, {"name": "推しの子 缶バッジ 星野アイ", "series": "推しの子"}, jan_catalog.SOURCE_REGISTRATION)
+        with patch.object(bl, "_call_rakuten") as rakuten:
+            result = bl.ProviderChain([bl.CatalogProvider(), bl.RakutenProvider()]).lookup(JAN)
+        rakuten.assert_not_called()
+        assert result["status"] == "success"
+        assert result["items"][0]["name"] == "推しの子 缶バッジ 星野アイ"
+        assert result["items"][0]["provider"] == "catalog"
+    finally:
+        jan_catalog.set_catalog(None)
+
+
+def test_rakuten_hits_are_recorded_and_do_not_override_registration():
+    catalog = _use_memory_catalog()
+    try:
+        catalog.add(JAN, {"name": "ちいかわ ぬいぐるみ", "series": ""}, jan_catalog.SOURCE_REGISTRATION)
+        items = [bl.make_item({"name": "ちいかわ ぬいぐるみ", "series": "ちいかわ", "price": 2200})]
+        rakuten_result = {"status": "success", "items": items, "message": "", "source": "barcode", "keyword": JAN}
+        with patch.object(bl, "_call_rakuten", return_value=rakuten_result):
+            bl.RakutenProvider().lookup(JAN, deadline=None)
+        row = catalog.lookup(JAN)[0]
+        assert row["source"] == jan_catalog.SOURCE_REGISTRATION
+        assert row["series"] == "ちいかわ"
+        assert row["hits"] == 2
+    finally:
+        jan_catalog.set_catalog(None)
@@ -0,0 +1,54 @@
+"""barcode_lookup の照合プロバイダ（並列照合・ランキング・早期終了）のユニットテスト。"""
+
+import time
+
+from services import barcode_lookup as bl
+from services.deadline import Deadline
+
+JAN = "4549743000008"
+
+
+def _entry(name, jan=JAN, price=1000):
+    return {"name": name, "jan": jan, "price": price, "shopName": "テスト店"}
+
+
+def test_merges_providers_and_ranks_jan_match_first():
+    keyword_like = bl.StaticCatalogProvider(
+        {JAN: [_entry("呪術廻戦 缶バッジ 五条悟", jan="")]}, name="search", weight=0.8
+    )
+    catalog = bl.StaticCatalogProvider({JAN: [_entry("呪術廻戦 アクリルスタンド 五条悟")]}, name="catalog")
+    chain = bl.ProviderChain([keyword_like, catalog], early_stop_confidence=1.1)
+    result = chain.lookup(JAN, deadline=Deadline(5))
+    assert result["status"] == "success"
+    assert [item["provider"] for item in result["items"]] == ["catalog", "search"]
+    assert result["items"][0]["confidence"] == 1.0
+    assert result["providers"] == {"search": "success", "catalog": "success"}
+
+
+def test_high_confidence_jan_match_stops_without_waiting_for_slow_provider():
+    slow = bl.StaticCatalogProvider({JAN: [_entry("遅い照合元の商品")]}, name="slow", delay_sec=2.0)
+    fast = bl.StaticCatalogProvider({JAN: [_entry("ちいかわ ぬいぐるみ")]}, name="fast")
+    started = time.monotonic()
+    result = bl.ProviderChain([slow, fast]).lookup(JAN, deadline=Deadline(5))
+    assert time.monotonic() - started < 1.5
+    assert [item["name"] for item in result["items"]] == ["ちいかわ ぬいぐるみ"]
+    assert "slow" not in result["providers"]
+
+
+def test_not_found_everywhere_and_duplicates_across_providers():
+    empty = bl.StaticCatalogProvider({}, name="empty")
+    assert bl.ProviderChain([empty]).lookup(JAN)["status"] == "not_found"
+
+    strong = bl.StaticCatalogProvider({JAN: [_entry("推しの子 缶バッジ")]}, name="strong")
+    weak = bl.StaticCatalogProvider({JAN: [_entry("推しの子 缶バッジ")]}, name="weak", weight=0.2)
+    result = bl.ProviderChain([weak, strong], early_stop_confidence=1.1).lookup(JAN)
+    assert [item["provider"] for item in result["items"]] == ["strong"]
+
+
+def test_default_chain_can_be_replaced_for_offline_lookup():
+    bl.set_default_providers([bl.StaticCatalogProvider({JAN: [_entry("ホロライブ アクキー")]})])
+    try:
+        result = bl.lookup_product_by_barcode(JAN)
+        assert result["items"][0]["structured_data"]["product_name"] == "ホロライブ アクキー"
+    finally:
+        bl.set_default_providers(None)
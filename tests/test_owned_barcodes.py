@@ -0,0 +1,81 @@
+"""owned_barcodes（ユーザー毎の所持バーコード索引）のユニットテスト。"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services import owned_barcodes
+
+
+def _supabase(rows):
+    client = MagicMock()
+    query = client.table.return_value.select.return_value.eq.return_value.range.return_value
+    query.execute.return_value = MagicMock(data=rows)
+    return client
+
+
+def test_lazy_load_counts_canonical_keys_once():
+    owned_barcodes._indexes.pop("u1", None)
+    client = _supabase(
+        [
+            {"barcode_number": "036000291452"},
+            {"barcode_number": "0036000291452"},
+            {"barcode_number": ""},
+            {"barcode_number": "4900000000009"},
+        ]
+    )
+    assert owned_barcodes.owned_count(client, "u1", "0036000291452") == 2
+    assert owned_barcodes.owned_count(client, "u1", "4900000000009") == 1
+    assert owned_barcodes.owned_count(client, "u1", "4549743000008") == 0
+    assert client.table.call_count == 1
+
+
+def test_insert_and_delete_all_update_loaded_index():
+    owned_barcodes._indexes.pop("u2", None)
+    client = _supabase([])
+    assert owned_barcodes.owned_count(client, "u2", "4900000000009") == 0
+    owned_barcodes.record_insert("u2", "4900000000009")
+    owned_barcodes.record_insert("u2", "490-0000-000009")
+    assert owned_barcodes.owned_count(None, "u2", "4900000000009") == 2
+    owned_barcodes.record_delete_all("u2")
+    assert owned_barcodes.owned_count(None, "u2", "4900000000009") == 0
+    assert client.table.call_count == 1
+
+
+def test_unloaded_user_without_client_is_zero():
+    owned_barcodes._indexes.pop("u3", None)
+    assert owned_barcodes.owned_count(None, "u3", "4900000000009") == 0
+    assert owned_barcodes.owned_count(None, None, "4900000000009") == 0
+
+
+@pytest.mark.parametrize(
+    "trigger_id, upload, manual",
+    [
+        ("barcode-manual-submit", None, "4900000000009"),
+        ("barcode-upload", "data:image/png;base64,AAAA", None),
+    ],
+)
+def test_owned_notice_does_not_wait_for_lookup(trigger_id, upload, manual):
+    from features.barcode import controller
+
+    decoded = {"barcode": "4900000000009", "barcode_type": "EAN13"}
+    # 楽天照合が遅い・失敗していても、所持確認は照合を呼ばずに返す
+    with patch.object(controller, "lookup_product_by_barcode", side_effect=TimeoutError) as lookup, patch.object(
+        controller, "decode_from_base64", return_value=decoded
+    ), patch.object(controller, "owned_count_for_current_user", return_value=2) as owned:
+        notice = controller.owned_notice_for(trigger_id, upload, None, manual)
+
+    assert notice.children == "すでに所持しています（2点）"
+    owned.assert_called_once_with("4900000000009")
+    lookup.assert_not_called()
+
+
+def test_owned_notice_is_empty_for_unowned_or_invalid_input():
+    from features.barcode import controller
+
+    with patch.object(controller, "owned_count_for_current_user", return_value=0) as owned:
+        assert controller.owned_notice_for("barcode-manual-submit", None, None, "4900000000009") is None
+        assert controller.owned_notice_for("barcode-manual-submit", None, None, "4900000000008") is None
+        assert controller.owned_notice_for("barcode-skip-button", None, None, None) is None
+
+    owned.assert_called_once_with("4900000000009")
@@ -0,0 +1,148 @@
+"""ギャラリーのキーセット・ページング（カーソル）のテスト。"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask, g
+
+from services import page_cursor, photo_service
+
+
+def test_cursor_roundtrip_is_opaque():
+    key = page_cursor.PageKey("2026-10-19T12:34:56.123456+00:00", 42)
+
+    token = page_cursor.encode(key)
+
+    assert "2026" not in token
+    assert page_cursor.decode(token) == key
+
+
+@pytest.mark.parametrize("token", [None, "", "not-base64!", "W10", "eyJ4IjoxfQ"])
+def test_broken_cursor_starts_from_top(token):
+    assert page_cursor.decode(token) is None
+
+
+def test_cursor_rejects_non_timestamp():
+    import base64
+
+    forged = base64.urlsafe_b64encode(b'["x),id.gt.(0",1]').decode().rstrip("=")
+
+    assert page_cursor.decode(forged) is None
+
+
+def test_after_filter_breaks_ties_by_id():
+    key = page_cursor.PageKey("2026-10-19T12:00:00+00:00", 7)
+
+    assert page_cursor.after_filter(key) == (
+        'creation_date.lt."2026-10-19T12:00:00+00:00",'
+        'and(creation_date.eq."2026-10-19T12:00:00+00:00",registration_product_id.lt.7)'
+    )
+
+
+def _rows(n):
+    return [
+        {"registration_product_id": 100 - i, "creation_date": f"2026-10-19T12:00:{59 - i:02d}+00:00"}
+        for i in range(n)
+    ]
+
+
+def _run(rows, cursor=None, limit=3, search=None):
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.eq.return_value
+    query.or_.return_value = query
+    query.order.return_value = query
+    query.limit.return_value.execute.return_value = MagicMock(data=rows, error=None)
+    app = Flask(__name__)
+    with app.test_request_context():
+        g.user_id = "u1"
+        page = photo_service.get_products_after(supabase, limit=limit, cursor=cursor, search=search)
+    return page, query
+
+
+def test_next_cursor_points_after_last_row():
+    page, query = _run(_rows(4))
+
+    assert [r["registration_product_id"] for r in page.rows] == [100, 99, 98]
+    assert page_cursor.decode(page.next_cursor) == page_cursor.PageKey("2026-10-19T12:00:57+00:00", 98)
+    query.limit.assert_called_once_with(4)
+    query.or_.assert_not_called()
+
+
+def test_last_page_has_no_cursor_and_uses_keyset_filter():
+    token = page_cursor.encode(page_cursor.PageKey("2026-10-19T12:00:57+00:00", 98))
+
+    page, query = _run(_rows(2), cursor=token)
+
+    assert page.next_cursor is None
+    query.or_.assert_called_once()
+
+
+def test_fallback_search_matches_raw_and_folded_terms():
+    _, query = _run(_rows(1), search="あくすた  ABC あくすた")
+
+    filters = [c.args[0] for c in query.or_.call_args_list]
+    assert len(filters) == 2
+    # 列は畳み込まれていないため、入力のままの語も残す
+    assert 'product_name.ilike."*あくすた*"' in filters[0]
+    assert 'product_name.ilike."*アクスタ*"' in filters[0]
+    assert 'product_name.ilike."*ABC*"' in filters[1]
+    assert 'product_name.ilike."*abc*"' in filters[1]
+
+
+def _rpc_row(pid, second, slots=(), colors=()):
+    return {
+        "registration_product_id": pid,
+        "product_name": f"商品{pid}",
+        "creation_date": f"2026-10-19T12:00:{second:02d}+00:00",
+        "photo_id": None,
+        "category_tag_id": 3,
+        "category_tag_name": "アクスタ",
+        "category_tag_icon": "bi-star",
+        "receipt_location_id": None,
+        "color_slots": list(slots),
+        "color_slot_colors": list(colors),
+    }
+
+
+def test_gallery_page_uses_single_rpc(monkeypatch):
+    monkeypatch.setattr(photo_service, "_gallery_rpc_disabled_until", 0.0)
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute.return_value = MagicMock(
+        data=[_rpc_row(9, 50, (1, 3), ("#ff0000", "#0000ff")), _rpc_row(8, 40), _rpc_row(7, 30)]
+    )
+    app = Flask(__name__)
+    with app.test_request_context():
+        g.user_id = "u1"
+        page = photo_service.get_gallery_page(supabase, limit=2)
+
+    supabase.rpc.assert_called_once_with(
+        "app_gallery_page",
+        {"p_limit": 3, "p_after_creation_date": None, "p_after_id": None, "p_query": None},
+    )
+    supabase.table.assert_not_called()
+    first = page.rows[0]
+    assert first["color_slots"] == [1, 3]
+    assert first["color_slot_colors"] == {1: "#ff0000", 3: "#0000ff"}
+    assert first["category_tag"]["category_tag_name"] == "アクスタ"
+    assert first["receipt_location"] is None and first["photo"] is None
+    assert page_cursor.decode(page.next_cursor) == page_cursor.PageKey("2026-10-19T12:00:40+00:00", 8)
+
+
+def test_gallery_page_falls_back_when_rpc_missing(monkeypatch):
+    monkeypatch.setattr(photo_service, "_gallery_rpc_disabled_until", 0.0)
+    monkeypatch.setattr(photo_service, "get_product_color_tag_slots", lambda *a: {100: [2]})
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute.side_effect = RuntimeError("PGRST202")
+    query = supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value = query
+    query.limit.return_value.execute.return_value = MagicMock(data=_rows(1), error=None)
+    app = Flask(__name__)
+    with app.test_request_context():
+        g.user_id = "u1"
+        page = photo_service.get_gallery_page(supabase, limit=3)
+        photo_service.get_gallery_page(supabase, limit=3)
+
+    assert page.rows[0]["color_slots"] == [2]
+    assert page.next_cursor is None
+    # 失敗後はしばらく RPC を呼ばない
+    assert supabase.rpc.call_count == 1
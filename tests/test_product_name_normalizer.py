@@ -0,0 +1,57 @@
+"""product_name_normalizer（楽天の商品名正規化）のゴールデンテスト。"""
+
+import pytest
+
+from services import barcode_lookup
+from services.product_name_normalizer import NormalizedName, normalize_name, normalize_names
+
+GOLDEN = [
+    (
+        "【送料無料】呪術廻戦 アクリルスタンド 五条悟 描き下ろし【新品】",
+        NormalizedName("呪術廻戦 アクリルスタンド 五条悟 描き下ろし", "", ""),
+    ),
+    (
+        "【予約受付中】推しの子 【B小町】 缶バッジ 星野アイ (ホロ仕様)",
+        NormalizedName("推しの子 缶バッジ 星野アイ (ホロ仕様)", "推しの子", "B小町"),
+    ),
+    (
+        "ちいかわ ぬいぐるみ ハチワレ Sサイズ ［限定］ ｱｸｽﾀ付き",
+        NormalizedName("ちいかわ ぬいぐるみ ハチワレ Sサイズ アクスタ付き", "", ""),
+    ),
+    (
+        "バンダイ【ワンピース】フィギュア ルフィ ギア5 送料無料 代引不可",
+        NormalizedName("バンダイ フィギュア ルフィ ギア5", "バンダイ", "ワンピース"),
+    ),
+    (
+        "[メール便対応] ＳＰＹ×ＦＡＭＩＬＹ ラバーストラップ アーニャ",
+        NormalizedName("SPY×FAMILY ラバーストラップ アーニャ", "", ""),
+    ),
+    (
+        "【中古】ラブライブ！サンシャイン!! タペストリー 黒澤ダイヤ（生誕祭2023）",
+        NormalizedName("ラブライブ!サンシャイン!! タペストリー 黒澤ダイヤ(生誕祭2023)", "", "生誕祭2023"),
+    ),
+    (
+        "ホロライブ 兎田ぺこら アクリルキーホルダー 在庫あり 最安値",
+        NormalizedName("ホロライブ 兎田ぺこら アクリルキーホルダー", "", ""),
+    ),
+    ("", NormalizedName("", "", "")),
+]
+
+
+@pytest.mark.parametrize("raw, expected", GOLDEN)
+def test_golden_titles(raw, expected):
+    assert normalize_name(raw) == expected
+
+
+def test_batch_matches_per_item_and_keeps_order():
+    raws = [raw for raw, _ in GOLDEN] + [GOLDEN[0][0]]
+    assert normalize_names(raws) == [normalize_name(raw) for raw in raws]
+
+
+def test_normalise_items_uses_normalized_fields():
+    items = [{"Item": {"itemName": GOLDEN[1][0], "itemPrice": 880, "janCode": "4549743000001"}}]
+    result = barcode_lookup._normalise_items(items)[0]
+    assert result["name"] == "推しの子 缶バッジ 星野アイ (ホロ仕様)"
+    assert result["raw_name"] == GOLDEN[1][0]
+    assert result["structured_data"]["works_series_name"] == "B小町"
+    assert result["structured_data"]["copyright_company_name"] == "推しの子"
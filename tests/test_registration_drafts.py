@@ -0,0 +1,135 @@
+"""登録ドラフトのサーバー側保存と薄いハンドルのテスト。"""
+
+import json
+
+import pytest
+from flask import Flask, g
+
+from components.state_utils import empty_registration_state, ensure_state, serialise_state
+from services import registration_drafts
+
+
+@pytest.fixture
+def app():
+    registration_drafts.set_store(registration_drafts.DraftStore(":memory:"))
+    flask_app = Flask(__name__)
+    flask_app.config["SECRET_KEY"] = "test-secret"
+    yield flask_app
+    registration_drafts.set_store(None)
+
+
+def _as_user(app, user_id):
+    ctx = app.test_request_context()
+    ctx.push()
+    g.user_id = user_id
+    return ctx
+
+
+def _heavy_state():
+    state = empty_registration_state()
+    state["front_photo"].update(
+        {
+            "status": "captured",
+            "content": "data:image/jpeg;base64," + "A" * 60000,
+            "vision_raw": "B" * 200000,
+            "description_status": "processing",
+        }
+    )
+    state["lookup"]["items"] = [{"name": f"商品{i}", "mediumImageUrls": ["https://x"] * 3} for i in range(30)]
+    state["tags"]["status"] = "loading"
+    return state
+
+
+def test_handle_is_small_and_round_trips(app):
+    ctx = _as_user(app, "user-1")
+    try:
+        handle = serialise_state(_heavy_state())
+        assert registration_drafts.is_handle(handle)
+        assert len(json.dumps(handle)) < 1024
+        assert "vision_raw" not in json.dumps(handle)
+        assert handle["front_photo"] == {"status": "captured", "description_status": "processing"}
+
+        state = ensure_state(handle)
+        assert len(state["front_photo"]["vision_raw"]) == 200000
+        assert len(state["lookup"]["items"]) == 30
+    finally:
+        ctx.pop()
+
+
+def test_other_user_cannot_load_draft(app):
+    ctx = _as_user(app, "user-1")
+    try:
+        handle = serialise_state(_heavy_state())
+    finally:
+        ctx.pop()
+    ctx = _as_user(app, "user-2")
+    try:
+        state = ensure_state(handle)
+        assert state["front_photo"]["vision_raw"] is None
+        forged = dict(handle, draft=handle["draft"].split(".")[0] + ".deadbeef")
+        assert registration_drafts.from_handle(forged) is None
+    finally:
+        ctx.pop()
+
+
+def test_stale_callback_does_not_clobber_enrichment_patch(app):
+    ctx = _as_user(app, "user-1")
+    try:
+        handle = serialise_state(_heavy_state())
+        state = ensure_state(handle)
+        # エンリッチ処理が並行して照合結果を書く
+        draft_key = state["meta"]["draft_key"]
+        patched = registration_drafts.apply_patch(draft_key, {"lookup": {"status": "success", "items": []}})
+        assert patched == handle["version"] + 1
+        # 古い状態を読んだコールバックがカラータグだけ変えて保存する
+        state["color_tags"]["selected_slots"] = [1]
+        new_handle = serialise_state(state)
+        reloaded = ensure_state(new_handle)
+        assert reloaded["lookup"]["status"] == "success"
+        assert reloaded["color_tags"]["selected_slots"] == [1]
+    finally:
+        ctx.pop()
+
+
+def test_stale_callback_does_not_clobber_mirrored_tags_patch(app):
+    ctx = _as_user(app, "user-1")
+    try:
+        handle = serialise_state(_heavy_state())
+        state = ensure_state(handle)
+        # エンリッチ処理がタグを書き終える（tags はブラウザに写す項目を持つセクション）
+        registration_drafts.apply_patch(state["meta"]["draft_key"], {"tags": {"status": "success"}})
+        # 古い状態（tags は loading）を読んだコールバックがカラータグだけ変えて保存する
+        state["color_tags"]["selected_slots"] = [2]
+        new_handle = serialise_state(state)
+        assert new_handle["tags"] == {"status": "success"}
+        assert new_handle["color_tags"] == {"selected_slots": [2]}
+
+        # もう 1 回保存しても loading に戻らない
+        again = ensure_state(new_handle)
+        again["color_tags"]["selected_slots"] = [2, 3]
+        assert ensure_state(serialise_state(again))["tags"]["status"] == "success"
+    finally:
+        ctx.pop()
+
+
+def test_browser_ui_fields_apply_only_when_version_is_current(app):
+    ctx = _as_user(app, "user-1")
+    try:
+        handle = serialise_state(_heavy_state())
+        # SSE が使えずクライアント側でポーリングに切り替えた
+        switched = dict(handle, meta=dict(handle["meta"], enrichment="poll"))
+        assert ensure_state(switched)["meta"]["enrichment"] == "poll"
+
+        state = ensure_state(handle)
+        registration_drafts.apply_patch(state["meta"]["draft_key"], {"tags": {"status": "success"}})
+        stale = dict(handle, tags={"status": "loading"})
+        assert ensure_state(stale)["tags"]["status"] == "success"
+    finally:
+        ctx.pop()
+
+
+def test_without_login_state_is_returned_as_is():
+    state = _heavy_state()
+    stored = serialise_state(state)
+    assert not registration_drafts.is_handle(stored)
+    assert stored["front_photo"]["vision_raw"] == state["front_photo"]["vision_raw"]
@@ -0,0 +1,25 @@
+"""ギャラリー検索の正規化（かな・全角半角の畳み込み）のテスト。"""
+
+import pytest
+
+from services.search_text import fold, terms
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("あくすた", "アクスタ"),
+        ("ｱｸｽﾀ", "アクスタ"),
+        ("アクスタ", "アクスタ"),
+        ("ＡＢＣ缶バッジ", "abc缶バッジ"),
+        ("いすゞ", "イスヾ"),
+        (None, ""),
+    ],
+)
+def test_fold_matches_db_rule(raw, expected):
+    assert fold(raw) == expected
+
+
+def test_terms_are_folded_deduplicated_and_longest_first():
+    assert terms("  ねこ　キーホルダー ネコ ") == ["キーホルダー", "ネコ"]
+    assert terms("") == []
@@ -0,0 +1,52 @@
+"""registration-store の差分（Dash Patch）生成のテスト。"""
+
+from dash import Patch, no_update
+
+from components.state_utils import store_patch
+
+
+def _operations(patch):
+    return [
+        (op["operation"], tuple(op["location"]), op["params"].get("value"))
+        for op in patch.to_plotly_json()["operations"]
+    ]
+
+
+def test_only_changed_leaves_are_sent():
+    previous = {
+        "barcode": {"value": None, "status": "pending"},
+        "front_photo": {"content": "A" * 1000, "status": "captured"},
+        "tags": {"tags": ["a"]},
+    }
+    new = {
+        "barcode": {"value": "4901234567894", "status": "captured"},
+        "front_photo": {"content": "A" * 1000, "status": "captured"},
+        "tags": {"tags": ["a", "b"]},
+    }
+
+    patch = store_patch(previous, new)
+
+    assert isinstance(patch, Patch)
+    assert sorted(_operations(patch)) == [
+        ("Assign", ("barcode", "status"), "captured"),
+        ("Assign", ("barcode", "value"), "4901234567894"),
+        ("Assign", ("tags", "tags"), ["a", "b"]),
+    ]
+
+
+def test_removed_keys_are_deleted():
+    patch = store_patch({"meta": {"draft_key": "k", "x": 1}}, {"meta": {"x": 1}})
+
+    assert _operations(patch) == [("Delete", ("meta", "draft_key"), None)]
+
+
+def test_unchanged_state_is_no_update():
+    state = {"barcode": {"value": "1"}, "tags": {"tags": []}}
+
+    assert store_patch(state, {"barcode": {"value": "1"}, "tags": {"tags": []}}) is no_update
+
+
+def test_full_value_without_previous_store():
+    new = {"barcode": {"value": "1"}}
+
+    assert store_patch(None, new) is new
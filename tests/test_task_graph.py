@@ -0,0 +1,107 @@
+"""task_graph（依存つき並列実行）と、エンリッチ分岐の並列化のユニットテスト。"""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from components.state_utils import empty_registration_state
+from services import enrichment_events as events
+from services import enrichment_jobs
+from services.deadline import Deadline
+from services.task_graph import Task, run_graph
+
+
+def test_independent_tasks_run_concurrently():
+    """独立したタスクは並列に走り、所要時間は最長のタスク程度になる。"""
+    started = time.monotonic()
+    graph = run_graph(
+        [
+            Task("a", lambda _r: time.sleep(0.2) or "A"),
+            Task("b", lambda _r: time.sleep(0.2) or "B"),
+        ]
+    )
+    assert graph.results == {"a": "A", "b": "B"}
+    assert time.monotonic() - started < 0.35
+
+
+def test_dependent_task_receives_dependency_results():
+    graph = run_graph(
+        [
+            Task("tags", lambda r: f"{r['a']}+{r.get('b')}", deps=("a", "b")),
+            Task("a", lambda _r: "A"),
+            Task("b", lambda _r: "B"),
+        ]
+    )
+    assert graph.results["tags"] == "A+B"
+
+
+def test_failed_dependency_is_reported_and_dependents_still_run():
+    def _boom(_r):
+        raise RuntimeError("down")
+
+    graph = run_graph(
+        [Task("a", _boom), Task("b", lambda r: sorted(r), deps=("a",))]
+    )
+    assert isinstance(graph.errors["a"], RuntimeError)
+    assert graph.results["b"] == []
+
+
+def test_deadline_returns_without_waiting_for_slow_tasks():
+    release = threading.Event()
+    started = time.monotonic()
+    graph = run_graph(
+        [Task("slow", lambda _r: release.wait(2.0)), Task("fast", lambda _r: 1)],
+        deadline=Deadline(0.2),
+    )
+    release.set()
+    assert time.monotonic() - started < 1.0
+    assert graph.results == {"fast": 1}
+    assert graph.pending == ("slow",)
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        run_graph([Task("a", lambda _r: 1, deps=("missing",))])
+
+
+@patch("services.tag_service._update_tags")
+@patch("services.io_intelligence.describe_image")
+@patch("services.barcode_lookup.lookup_product_by_barcode")
+def test_enrichment_runs_lookup_and_description_in_parallel(
+    mock_lookup, mock_describe, mock_update
+):
+    """照合と画像説明は並列に走り、タグ生成は両方の結果を見てから 1 回だけ行う。"""
+
+    def _slow_lookup(_barcode, deadline=None):
+        time.sleep(0.2)
+        return {"status": "success", "items": [{"name": "缶バッジ"}]}
+
+    def _slow_describe(*_a, **_k):
+        time.sleep(0.2)
+        return {"status": "success", "text": "青い缶バッジ", "structured_data": {}}
+
+    seen = {}
+
+    def _fake_update(state, on_partial=None, deadline=None):
+        seen["items"] = state["lookup"].get("items")
+        seen["description"] = state["front_photo"].get("description")
+        state["tags"] = {"status": "success", "tags": ["缶バッジ"], "message": ""}
+
+    mock_lookup.side_effect = _slow_lookup
+    mock_describe.side_effect = _slow_describe
+    mock_update.side_effect = _fake_update
+
+    state = empty_registration_state()
+    state["barcode"]["value"] = "4900000000001"
+    state["front_photo"]["status"] = "captured"
+    events.open_channel("tg1", "u1")
+    started = time.monotonic()
+    enrichment_jobs._run("tg1", state)
+
+    assert time.monotonic() - started < 0.35
+    assert seen == {"items": [{"name": "缶バッジ"}], "description": "青い缶バッジ"}
+    names = [e[1] for e in events.iter_events("tg1", heartbeat_sec=0.01)]
+    assert sorted(names[:2]) == ["description", "lookup"]
+    assert names[-2:] == ["tags", "done"]